@@ -1,14 +1,115 @@
 import os
+import argparse
 from builder_files.util.html import render_html_vars, md_file_to_html_fragment, indent_html
 from builder_files.page_constructors.article import build_all_articles
 from builder_files.page_constructors.projects import build_projects_page, build_homepage
 from builder_files.page_constructors.skills import build_skills_page
 from builder_files.page_constructors.articles_list import build_articles_list_page
+from builder_files.page_constructors.feeds import build_feeds
+from builder_files.page_constructors.api import build_api
+from builder_files.util.icon_sprites import build_icon_sprites
+from builder_files.util.highlight import build_highlight_css
+from builder_files.util.page_weight import build_page_weight_report
+from builder_files.util.audit import run_audit, AUDIT_RUNS
+from builder_files.util.validation import validate_content
+from builder_files.util.link_check import check_links
+from builder_files.util.shards import parse_shard, write_shard_manifest, merge_shards
+from builder_files.util.third_party import defer_third_party_scripts
+from builder_files.util.post_build import finish_site
+from builder_files.util.content_store import open_content_store
+from builder_files.util.serve import serve, SERVE_HOST, SERVE_PORT
 
-if __name__ == "__main__":
-    build_all_articles()
-    build_skills_page()
-    build_projects_page()
-    build_articles_list_page()
-    build_homepage()
 
+def build(shard=None) -> None:
+    # Before anything else: bad content data fails the build here, not part way through it
+    validate_content()
+    # Pages point their icons at the sheets built here
+    build_icon_sprites()
+    if shard:
+        # One slice of the articles; `merge` builds everything else once all shards are in
+        build_all_articles(shard=shard)
+        # Before the manifest, so the hashes it records are of the final pages
+        defer_third_party_scripts()
+        write_shard_manifest(shard)
+        return
+    fragments = build_all_articles()
+    build_site_pages(fragments)
+
+
+def merge(shard_dirs=None) -> None:
+    validate_content()
+    build_icon_sprites()
+    merge_shards(shard_dirs)
+    build_site_pages()
+
+
+def build_site_pages(fragments=None) -> None:
+    """Everything after the article pages: the pages and files that span the whole site."""
+    # Listing pages query an indexed copy of the catalogue and projects (None when turned off)
+    store = open_content_store()
+    try:
+        build_skills_page()
+        build_projects_page(store=store)
+        build_articles_list_page(store=store)
+        build_homepage(store=store)
+        # Feed entries reuse the markdown converted for the article pages
+        build_feeds(fragments, store=store)
+        build_api(fragments, store=store)
+    finally:
+        if store is not None:
+            store.close()
+    # Third-party deferral, CSS bundles, sw.js and _headers (shared with SiteBuilder)
+    finish_site()
+    # Fails the build if any page links to a missing file or #anchor
+    check_links()
+    # Fails the build if any page is over its page-weight budget
+    build_page_weight_report()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Build the static site.")
+    commands = parser.add_subparsers(dest="command")
+    build_parser = commands.add_parser("build", help="build every page (the default)")
+    build_parser.add_argument(
+        "--shard", type=parse_shard, metavar="I/N",
+        help="only build the articles in shard I of N (e.g. 3/8) and write a partial manifest",
+    )
+    merge_parser = commands.add_parser(
+        "merge", help="check and combine the outputs of a sharded build, then build the site-wide pages"
+    )
+    merge_parser.add_argument(
+        "shard_dirs", nargs="*",
+        help="directories holding shard outputs to copy in (default: they are already in place)",
+    )
+    commands.add_parser("validate", help="only check the content data (front matter, projects, skills)")
+    commands.add_parser(
+        "highlight-css", help="regenerate the committed code highlight stylesheet (after changing HIGHLIGHT_STYLE)"
+    )
+    audit_parser = commands.add_parser(
+        "audit", help="load the built pages in throttled headless Chromium and record performance metrics"
+    )
+    audit_parser.add_argument("urls", nargs="*", help="URL paths to audit, e.g. /articles/ (default: every built page)")
+    audit_parser.add_argument("--runs", type=int, help="loads per page; the median is recorded")
+    serve_parser = commands.add_parser(
+        "serve", help="serve the built site locally as the production host would (compression, caching, ranges)"
+    )
+    serve_parser.add_argument("--host", default=SERVE_HOST, help=f"address to listen on (default: {SERVE_HOST})")
+    serve_parser.add_argument("--port", type=int, default=SERVE_PORT, help=f"port to listen on (default: {SERVE_PORT})")
+    args = parser.parse_args(argv)
+
+    if args.command == "validate":
+        validate_content()
+    elif args.command == "highlight-css":
+        build_highlight_css()
+    elif args.command == "audit":
+        run_audit(urls=args.urls or None, runs=args.runs or AUDIT_RUNS)
+    elif args.command == "serve":
+        serve(host=args.host, port=args.port)
+    elif args.command == "merge":
+        merge(args.shard_dirs or None)
+    else:
+        build(getattr(args, "shard", None))
+
+
+if __name__ == "__main__":
+    main()
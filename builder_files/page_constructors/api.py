@@ -0,0 +1,202 @@
+import os
+import gzip
+import json
+import hashlib
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set
+
+from builder_files.util.html import md_file_to_html_fragment
+from builder_files.util.catalogue import ARTICLES_INDEX, MD_ROOT, article_md_path, load_catalogue
+from builder_files.util.build_cache import load_cache, save_cache, fingerprint
+from builder_files.util.content_store import ContentStore
+from builder_files.page_constructors.projects import PROJECTS_JSON, parse_project_date
+from builder_files.page_constructors.feeds import BASE_URL, absolute_urls, article_dates, article_url
+
+try:
+    import brotli
+except ImportError:  # optional: only gzip copies are written without it
+    brotli = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+API_ROOT = "api"
+# Article summaries per /api/articles/page-N.json
+API_PAGE_SIZE = 20
+# Part of every document; bump when the document shape changes
+API_VERSION = 1
+HASH_LENGTH = 16
+# Catalogue fields carried by the article summaries (hidden/auto_build are build flags)
+SUMMARY_FIELDS = ("id", "title", "author", "strap_line", "date", "labels", "featured")
+COMPRESSED_SUFFIXES = (".gz", ".br")
+
+
+def _content_hash(payload: Dict[str, Any]) -> str:
+    data = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()[:HASH_LENGTH]
+
+
+def _write_endpoint(path: str, payload: Dict[str, Any]) -> bool:
+    """
+    Write `payload` as compact JSON with its content hash as "hash", plus
+    `.gz` (and, with brotli installed, `.br`) copies for hosts that serve
+    precompressed files. Nothing is rewritten when the JSON is unchanged.
+    Returns True if the endpoint changed.
+    """
+    document = {"hash": _content_hash(payload), **payload}
+    data = (json.dumps(document, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+    copies = {path: lambda: data, path + ".gz": lambda: gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        copies[path + ".br"] = lambda: brotli.compress(data, quality=11)
+
+    changed = True
+    if os.path.isfile(path):
+        with open(path, "rb") as f:
+            changed = f.read() != data
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    for copy_path, encode in copies.items():
+        if changed or not os.path.isfile(copy_path):
+            with open(copy_path, "wb") as f:
+                f.write(encode())
+    return changed
+
+
+def _absolute(url: str, base_url: str) -> str:
+    return f"{base_url}{url}" if url.startswith("/") else url
+
+
+def _article_summary(entry: Dict[str, Any], base_url: str) -> Dict[str, Any]:
+    summary = {field: entry[field] for field in SUMMARY_FIELDS if field in entry}
+    summary["url"] = article_url(entry["id"], base_url)
+    summary["api_url"] = f"{base_url}/{API_ROOT}/articles/{entry['id']}.json"
+    if entry.get("featured_image"):
+        summary["featured_image"] = _absolute(entry["featured_image"], base_url)
+    return summary
+
+
+def _visible_articles(md_root: str, catalogue_path: str, store: Optional[ContentStore]) -> List[Dict[str, Any]]:
+    """
+    Non-hidden catalogue entries that have a page (auto_build, as for
+    build_all_articles), newest first.
+    """
+    if store is not None:
+        return store.articles(auto_build=True)
+    catalogue = load_catalogue(md_root=md_root, index_path=catalogue_path)
+    visible = [e for e in catalogue if e.get("auto_build", False) and not e.get("hidden", False)]
+    visible.sort(key=lambda e: article_dates(e)[0] or datetime.min.replace(tzinfo=timezone.utc), reverse=True)
+    return visible
+
+
+def _visible_projects(projects_path: str, store: Optional[ContentStore]) -> List[Dict[str, Any]]:
+    """Non-hidden projects, newest first (as the projects page shows them)."""
+    if store is not None:
+        return store.projects()
+    if not os.path.isfile(projects_path):
+        return []
+    with open(projects_path, "r", encoding="utf-8") as f:
+        projects = [p for p in json.load(f) if not p.get("hidden", False)]
+    projects.sort(key=lambda p: parse_project_date(p) or datetime.min, reverse=True)
+    return projects
+
+
+def _remove_stale(api_root: str, keep: Set[str]) -> int:
+    """Delete endpoints (and their compressed copies) under `api_root` not in `keep`."""
+    removed = 0
+    for root, _, files in os.walk(api_root):
+        for name in files:
+            path = os.path.join(root, name)
+            base = os.path.splitext(path)[0] if name.endswith(COMPRESSED_SUFFIXES) else path
+            if base not in keep:
+                os.remove(path)
+                removed += 1
+    return removed
+
+
+def build_api(
+    fragments: Optional[Dict[str, str]] = None,
+    md_root: str = MD_ROOT,
+    catalogue_path: str = ARTICLES_INDEX,
+    projects_path: str = PROJECTS_JSON,
+    base_url: str = BASE_URL,
+    site_root: str = ".",
+    store: Optional[ContentStore] = None,
+) -> List[str]:
+    """
+    Write the static JSON API under `/api/` for widgets and other sites:
+
+      - `/api/articles/page-N.json`: API_PAGE_SIZE article summaries per
+        page, newest first, with the page count and next/previous links;
+      - `/api/articles/{id}.json`: an article's summary plus its content
+        as HTML with absolute URLs;
+      - `/api/projects.json`: every visible project, newest first.
+
+    Only articles that have a page are included (hidden articles and
+    projects, and articles without auto_build, are left out), from the content `store` when one is given. Every
+    document carries a "hash" of its content for ETag-style revalidation and
+    has precompressed `.gz`/`.br` copies. Article content comes from
+    `fragments` ({id: converted markdown}) when available and is cached per
+    article until its markdown changes. Unchanged endpoints are not
+    rewritten and endpoints that no longer exist are deleted. Returns the
+    paths written.
+    """
+    fragments = fragments or {}
+    api_root = os.path.join(site_root, API_ROOT)
+    articles = _visible_articles(md_root, catalogue_path, store)
+    documents: Dict[str, Dict[str, Any]] = {}
+
+    pages = max(1, -(-len(articles) // API_PAGE_SIZE))
+
+    def _page_url(n: int) -> Optional[str]:
+        return f"{base_url}/{API_ROOT}/articles/page-{n}.json" if 1 <= n <= pages else None
+
+    for page in range(1, pages + 1):
+        documents[os.path.join(api_root, "articles", f"page-{page}.json")] = {
+            "version": API_VERSION,
+            "page": page,
+            "pages": pages,
+            "total": len(articles),
+            "next": _page_url(page + 1),
+            "previous": _page_url(page - 1),
+            "articles": [
+                _article_summary(e, base_url) for e in articles[(page - 1) * API_PAGE_SIZE:page * API_PAGE_SIZE]
+            ],
+        }
+
+    # --- Article content: reuse the cached HTML unless the markdown changed
+    cache = load_cache("api")
+    new_cache: Dict[str, Any] = {}
+    converted = 0
+    for entry in articles:
+        article_id = entry["id"]
+        md_path = article_md_path(article_id, md_root)
+        digest = fingerprint([("file", md_path), API_VERSION, base_url])
+        cached = cache.get(article_id)
+        if not cached or cached.get("digest") != digest:
+            content_html = fragments.get(article_id)
+            if content_html is None:
+                content_html = md_file_to_html_fragment(md_path) if os.path.isfile(md_path) else ""
+            cached = {"digest": digest, "content_html": absolute_urls(content_html, article_url(article_id, base_url))}
+            converted += 1
+        new_cache[article_id] = cached
+        documents[os.path.join(api_root, "articles", f"{article_id}.json")] = {
+            "version": API_VERSION,
+            **_article_summary(entry, base_url),
+            "content_html": cached["content_html"],
+        }
+    save_cache("api", new_cache)
+
+    projects = _visible_projects(projects_path, store)
+    documents[os.path.join(api_root, "projects.json")] = {
+        "version": API_VERSION,
+        "total": len(projects),
+        "projects": [{k: v for k, v in p.items() if k != "hidden"} for p in projects],
+    }
+
+    written = [path for path, payload in documents.items() if _write_endpoint(path, payload)]
+    removed = _remove_stale(api_root, set(documents))
+    logger.info(
+        "API: %d endpoint(s), %d written, %d removed, %d article(s) converted",
+        len(documents), len(written), removed, converted,
+    )
+    return written
@@ -1,10 +1,9 @@
 # build_script.py
 import os
-import json
 import logging
 import html as html_module
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 
 # adjust the import path as needed - assumes this script is run from repo root
 from builder_files.util.html import (
@@ -13,17 +12,46 @@ from builder_files.util.html import (
     indent_html,
     html_to_pdf
 )
+from builder_files.util.images import annotate_images, local_image_paths
+from builder_files.util.icon_sprites import apply_icon_sprites
+from builder_files.util.resource_hints import add_resource_hints
+from builder_files.util.catalogue import (
+    ARTICLES_INDEX,
+    article_md_path,
+    load_article_metadata,
+    load_catalogue,
+)
+from builder_files.util.build_cache import load_cache, save_cache, file_stat_key, fingerprint
+from builder_files.util.related import compute_related_articles
+from builder_files.util.highlight import (
+    HIGHLIGHT_CSS_OUTPUT,
+    HIGHLIGHT_STYLE,
+    prune_highlight_cache,
+)
+from builder_files.util.pdf_optimise import optimise_pdfs
+from builder_files.util.shards import Shard, in_shard
+from builder_files.util.social_cards import render_social_cards, card_url
+from builder_files.util.diagrams import DIAGRAM_FALLBACK_CLASS, prerender_diagrams
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Defaults - change if needed
-ARTICLES_JSON = "resource/data/articles_data.json"
 TEMPLATE_PATH = "builder_files/templates/article_page.html"
 TEMPLATE_PRINT_PATH = "builder_files/templates/article_page_print.html"
 MD_ROOT = "resource/articles"
 OUTPUT_ROOT = "articles"
 BASE_URL = "https://majdij.com"  # used to build absolute URLs for social images (if desired)
+SITE_ROOT = "."  # served to the browser when rendering PDFs in memory
+# Write articles/{id}/print.html and render the PDF from it via file:// (slower;
+# also publishes the print page). By default the print HTML stays in memory.
+WRITE_PRINT_HTML = False
+# Post-process freshly rendered PDFs (resample images, dedupe fonts, linearise).
+# Needs pikepdf and Pillow; skipped with a warning if they are missing.
+OPTIMISE_PDFS = True
+# Part of every article's build fingerprint. Bump it when a change to the builder
+# code alters the pages or PDFs it writes, so every article is rebuilt once.
+ARTICLE_BUILDER_VERSION = 1
 
 
 def _parse_iso_date_to_human(iso_str: Optional[str]) -> Optional[str]:
@@ -124,18 +152,46 @@ def _convert_absolute_to_relative_paths(html_content: str, from_article_dir: boo
     return html_content
 
 
-def build_article_page(
+def _build_related_html(related: Optional[List[Dict[str, Any]]]) -> str:
+    """Build the "Related reading" block from catalogue entries (empty string if none)."""
+    if not related:
+        return ""
+    items = []
+    for entry in related:
+        items.append(
+            f'<li><a href="/articles/{html_module.escape(entry["id"])}/">'
+            f'{html_module.escape(entry.get("title", ""))}</a>'
+            f'<p>{html_module.escape(entry.get("strap_line", ""))}</p></li>'
+        )
+    return (
+        '<nav class="related-articles" aria-label="Related articles">'
+        '<h2>Related reading</h2>'
+        f'<ul>{"".join(items)}</ul>'
+        '</nav>'
+    )
+
+
+def render_article_page(
     article: Dict[str, Any],
     template_path: str = TEMPLATE_PATH,
     md_root: str = MD_ROOT,
     output_root: str = OUTPUT_ROOT,
     base_url: str = BASE_URL,
     md_start_heading_level: int = 1,
+    related: Optional[List[Dict[str, Any]]] = None,
+    content_html: Optional[str] = None,
+    social_image: Optional[str] = None,
+    template_text: Optional[str] = None,
 ) -> str:
     """
-    Build a single article HTML page from `article` dict (one element from articles_data.json).
-
-    Returns the path to the generated output file on success.
+    Render a single article HTML page from `article` dict (the article's front
+    matter, plus "id") and return it as a string; build_article_page() writes it.
+    `related` is an optional list of catalogue entries shown as "Related reading".
+    `content_html` is the already-converted markdown fragment, if the caller has it.
+    `social_image` is the root-relative URL of the article's generated social
+    card; without one the featured image is used for og:image/twitter:image.
+    `template_text` is the template already read from `template_path`, if the
+    caller has it.
 
     Raises exceptions for serious errors (missing id or missing template).
     """
@@ -143,22 +199,23 @@ def build_article_page(
         raise ValueError("Article object missing 'id' field")
 
     article_id = article["id"]
-    logger.info("Building article: %s", article_id)
 
-    # Load template
-    if not os.path.isfile(template_path):
-        raise FileNotFoundError(f"Template not found: {template_path}")
-    with open(template_path, "r", encoding="utf-8") as f:
-        template_text = f.read()
+    # Load template (unless the caller already has it)
+    if template_text is None:
+        if not os.path.isfile(template_path):
+            raise FileNotFoundError(f"Template not found: {template_path}")
+        with open(template_path, "r", encoding="utf-8") as f:
+            template_text = f.read()
 
-    # Locate markdown file
+    # Locate markdown file (unless the caller already converted it)
     md_path = os.path.join(md_root, article_id, "index.md")
-    if not os.path.isfile(md_path):
-        logger.warning("Markdown not found for %s at %s — building page with empty content.", article_id, md_path)
-        content_html = ""
-    else:
-        # convert md -> html fragment
-        content_html = md_file_to_html_fragment(md_path, start_heading_level=md_start_heading_level)
+    if content_html is None:
+        if not os.path.isfile(md_path):
+            logger.warning("Markdown not found for %s at %s — building page with empty content.", article_id, md_path)
+            content_html = ""
+        else:
+            # convert md -> html fragment
+            content_html = md_file_to_html_fragment(md_path, start_heading_level=md_start_heading_level)
 
     # Prepare derived values
     published_iso = None
@@ -194,7 +251,7 @@ def build_article_page(
     # Featured / social image
     featured_image = article.get("featured_image") or article.get("featuredImage") or ""
     # If you want absolute URL for social tags, use base_url
-    article_social_image_url = _make_full_url_if_rooted(featured_image)
+    article_social_image_url = _make_full_url_if_rooted(social_image or featured_image)
 
     # image alt
     article_image_alt = article.get("image_alt") or article.get("featured_image_alt") or article.get("title", "")
@@ -219,63 +276,118 @@ def build_article_page(
         "article_image_alt": html_module.escape(article_image_alt or ""),
         # NOTE: article_content_html must be raw HTML (not escaped)
         "article_content_html": content_html,
+        "article_related_html": _build_related_html(related),
     }
 
     # Render template (missing -> empty string so leftover tokens are removed)
     rendered = render_html_vars(template_text, values=mapping, html_escape=False, missing="")
 
+    out_dir = os.path.join(output_root, article_id)
+    out_file = os.path.join(out_dir, "index.html")
+
+    # Intrinsic image sizes; the featured image is marked eager in the template,
+    # everything else (share icons, images in the body) loads lazily
+    rendered = apply_icon_sprites(rendered, out_file)
+    rendered = annotate_images(rendered, out_file, eager_count=0)
+    rendered = add_resource_hints(rendered, out_file)
+
     # Optional: pretty indent
     try:
         rendered = indent_html(rendered)
     except Exception:
         # avoid failing build if indenting breaks; keep raw rendered if that happens
         logger.exception("indent_html failed — using unindented HTML")
+    return rendered
+
+
+def build_article_page(
+    article: Dict[str, Any],
+    template_path: str = TEMPLATE_PATH,
+    md_root: str = MD_ROOT,
+    output_root: str = OUTPUT_ROOT,
+    base_url: str = BASE_URL,
+    md_start_heading_level: int = 1,
+    related: Optional[List[Dict[str, Any]]] = None,
+    content_html: Optional[str] = None,
+    social_image: Optional[str] = None,
+) -> str:
+    """
+    Build a single article HTML page (see render_article_page()) and write it
+    to articles/{id}/index.html.
+
+    Returns the path to the generated output file on success.
+
+    Raises exceptions for serious errors (missing id or missing template).
+    """
+    if "id" not in article:
+        raise ValueError("Article object missing 'id' field")
+    logger.info("Building article: %s", article["id"])
+
+    rendered = render_article_page(
+        article,
+        template_path=template_path,
+        md_root=md_root,
+        output_root=output_root,
+        base_url=base_url,
+        md_start_heading_level=md_start_heading_level,
+        related=related,
+        content_html=content_html,
+        social_image=social_image,
+    )
 
     # Write output file
-    out_dir = os.path.join(output_root, article_id)
-    _ensure_dir(out_dir)
+    out_dir = os.path.join(output_root, article["id"])
     out_file = os.path.join(out_dir, "index.html")
+    _ensure_dir(out_dir)
     with open(out_file, "w", encoding="utf-8") as f:
         f.write(rendered)
 
     logger.info("Wrote article page: %s", out_file)
     return out_file
 
-def build_article_print_page(
+def render_article_print_page(
     article: Dict[str, Any],
     template_path: str = TEMPLATE_PRINT_PATH,
     md_root: str = MD_ROOT,
     output_root: str = OUTPUT_ROOT,
     base_url: str = BASE_URL,
     md_start_heading_level: int = 1,
+    content_html: Optional[str] = None,
+    template_text: Optional[str] = None,
 ) -> str:
     """
-    Build a print-friendly HTML page for the article using the PDF template.
-    
-    Returns the path to the generated print.html file on success.
-    
+    Render the print-friendly HTML for the article using the PDF template and
+    return it as a string (nothing is written to disk). Resource paths are left
+    as in the template, i.e. correct for a page served at
+    /articles/{id}/print.html.
+    `content_html` is the already-converted markdown fragment, if the caller has it.
+    `template_text` is the template already read from `template_path`, if the
+    caller has it.
+
     Raises exceptions for serious errors (missing id or missing template).
     """
     if "id" not in article:
         raise ValueError("Article object missing 'id' field")
 
     article_id = article["id"]
-    logger.info("Building article print page: %s", article_id)
+    logger.info("Rendering article print page: %s", article_id)
 
-    # Load print template
-    if not os.path.isfile(template_path):
-        raise FileNotFoundError(f"PDF template not found: {template_path}")
-    with open(template_path, "r", encoding="utf-8") as f:
-        template_text = f.read()
+    # Load print template (unless the caller already has it)
+    if template_text is None:
+        if not os.path.isfile(template_path):
+            raise FileNotFoundError(f"PDF template not found: {template_path}")
+        with open(template_path, "r", encoding="utf-8") as f:
+            template_text = f.read()
 
-    # Locate markdown file
+    # Locate markdown file (unless the caller already converted it)
     md_path = os.path.join(md_root, article_id, "index.md")
-    if not os.path.isfile(md_path):
-        logger.warning("Markdown not found for %s at %s — building print page with empty content.", article_id, md_path)
-        content_html = ""
-    else:
-        # convert md -> html fragment
-        content_html = md_file_to_html_fragment(md_path, start_heading_level=md_start_heading_level)
+    if content_html is None:
+        if not os.path.isfile(md_path):
+            logger.warning("Markdown not found for %s at %s — building print page with empty content.", article_id, md_path)
+            content_html = ""
+        else:
+            # convert md -> html fragment
+            content_html = md_file_to_html_fragment(md_path, start_heading_level=md_start_heading_level)
 
     # Prepare derived values
     published_iso = None
@@ -337,7 +449,44 @@ def build_article_print_page(
 
     # Render template (missing -> empty string so leftover tokens are removed)
     rendered = render_html_vars(template_text, values=mapping, html_escape=False, missing="")
-    
+
+    out_dir = os.path.join(output_root, article_id)
+    out_file = os.path.join(out_dir, "print.html")
+
+    # Print pages are rendered in one go, so every image loads eagerly
+    return annotate_images(rendered, out_file, eager_count=None, placeholders=False)
+
+
+def build_article_print_page(
+    article: Dict[str, Any],
+    template_path: str = TEMPLATE_PRINT_PATH,
+    md_root: str = MD_ROOT,
+    output_root: str = OUTPUT_ROOT,
+    base_url: str = BASE_URL,
+    md_start_heading_level: int = 1,
+    content_html: Optional[str] = None,
+) -> str:
+    """
+    Build a print-friendly HTML page for the article using the PDF template and
+    write it to articles/{id}/print.html (for loading via file:// URLs).
+    `content_html` is the already-converted markdown fragment, if the caller has it.
+
+    Returns the path to the generated print.html file on success.
+
+    Raises exceptions for serious errors (missing id or missing template).
+    """
+    rendered = render_article_print_page(
+        article,
+        template_path=template_path,
+        md_root=md_root,
+        output_root=output_root,
+        base_url=base_url,
+        md_start_heading_level=md_start_heading_level,
+        content_html=content_html,
+    )
+    out_dir = os.path.join(output_root, article["id"])
+    out_file = os.path.join(out_dir, "print.html")
+
     # Convert absolute paths to relative paths for file:// URL compatibility
     rendered = _convert_absolute_to_relative_paths(rendered, from_article_dir=True)
 
@@ -349,66 +498,204 @@ def build_article_print_page(
         logger.exception("indent_html failed — using unindented HTML")
 
     # Write print.html file
-    out_dir = os.path.join(output_root, article_id)
     _ensure_dir(out_dir)
-    out_file = os.path.join(out_dir, "print.html")
     with open(out_file, "w", encoding="utf-8") as f:
         f.write(rendered)
 
     logger.info("Wrote article print page: %s", out_file)
     return out_file
 
+def social_card_values(entry: Dict[str, Any]) -> Dict[str, str]:
+    """Template values for an article's social card (builder_files/templates/social_card.html)."""
+    date = entry.get("date") if isinstance(entry.get("date"), dict) else {}
+    authors = entry.get("author") or entry.get("authors") or []
+    return {
+        "card_title": entry.get("title", ""),
+        "card_strap_line": entry.get("strap_line") or entry.get("description") or "",
+        "card_author": ", ".join(a.get("name", "") for a in authors if isinstance(a, dict)),
+        "card_date": _parse_iso_date_to_human(date.get("published")) or "",
+    }
+
+
+def _article_fingerprint(
+    article_id: str,
+    md_root: str,
+    template_path: str,
+    related: List[Dict[str, Any]],
+    assets: List[str],
+) -> str:
+    """
+    Fingerprint everything a single article's outputs depend on: its own markdown
+    file (front matter + body), the page templates, the title/strap line of its
+    related articles, the local images the last build of its page referenced
+    (their sizes are baked into the markup), the highlight style and stylesheet,
+    the icon sprite sheets and ARTICLE_BUILDER_VERSION. Other articles' files
+    are deliberately not included, so editing one article only invalidates that
+    one (and any article whose related-reading links change as a result).
+    """
+    parts: List[Any] = [
+        ARTICLE_BUILDER_VERSION,
+        ("file", article_md_path(article_id, md_root)),
+        ("file", template_path),
+        ("file", TEMPLATE_PRINT_PATH),
+        HIGHLIGHT_STYLE,
+        ("file", HIGHLIGHT_CSS_OUTPUT),
+        load_cache("icon_sprites").get("key"),
+    ]
+    parts += [(e["id"], e.get("title", ""), e.get("strap_line", "")) for e in related]
+    parts += [(path, file_stat_key(path)) for path in assets]
+    return fingerprint(parts)
+
+
 def build_all_articles(
-    json_path: str = ARTICLES_JSON,
-    template_path: str = TEMPLATE_PATH,
     md_root: str = MD_ROOT,
+    template_path: str = TEMPLATE_PATH,
     output_root: str = OUTPUT_ROOT,
-) -> None:
+    catalogue_path: str = ARTICLES_INDEX,
+    force: bool = False,
+    print_html_to_disk: bool = WRITE_PRINT_HTML,
+    optimise_pdf_output: bool = OPTIMISE_PDFS,
+    shard: Optional[Shard] = None,
+) -> Dict[str, str]:
     """
-    Read the articles JSON file and build pages for any article with "auto_build": true.
+    Build pages for every article whose front matter has "auto_build": true.
+
+    PDFs are rendered from in-memory print HTML by default; with
+    `print_html_to_disk` the old behaviour (write print.html, rewrite paths to
+    relative, load it via file://) is used instead. With `optimise_pdf_output`,
+    the PDFs rendered in this run are then shrunk in a worker pool. With
+    `shard` (i, n), only the articles that shard_of() assigns to shard i of n
+    are built.
+
+    Articles whose inputs (see _article_fingerprint) are unchanged since their last
+    successful build (and whose outputs still exist) are skipped unless `force` is True.
+
+    Returns {article id: converted markdown fragment} for the articles built in
+    this run, so later stages (feeds) don't convert them again.
     """
-    if not os.path.isfile(json_path):
-        raise FileNotFoundError(f"Articles JSON not found: {json_path}")
+    catalogue = load_catalogue(md_root=md_root, index_path=catalogue_path)
+    build_state = load_cache("articles")
+    # article id -> local images its built page references; see _article_fingerprint()
+    asset_state = load_cache("article_assets")
 
-    with open(json_path, "r", encoding="utf-8") as f:
-        try:
-            data = json.load(f)
-        except json.JSONDecodeError:
-            logger.exception("Failed to parse JSON: %s", json_path)
-            raise
+    by_id = {entry["id"]: entry for entry in catalogue}
+    related_ids = compute_related_articles(catalogue, md_root=md_root)
+    rendered_pdfs: List[str] = []
+    fragments: Dict[str, str] = {}
+
+    to_build = []
+    for entry in catalogue:
+        article_id = entry["id"]
 
-    if not isinstance(data, list):
-        raise ValueError("Articles JSON expected to be a list of article objects")
+        # build if auto_build true
+        if not entry.get("auto_build", False):
+            logger.debug("Skipping article (auto_build=false): %s", article_id)
+            continue
+        if not in_shard(article_id, shard):
+            continue
 
-    for idx, article in enumerate(data):
-        if not isinstance(article, dict):
-            logger.warning("Skipping non-object entry at index %d in %s", idx, json_path)
+        related = [by_id[r] for r in related_ids.get(article_id, []) if r in by_id]
+        digest = _article_fingerprint(
+            article_id, md_root, template_path, related, asset_state.get(article_id, []),
+        )
+        outputs_exist = all(
+            os.path.isfile(os.path.join(output_root, article_id, name))
+            for name in ("index.html", "article.pdf")
+        )
+        if not force and outputs_exist and build_state.get(article_id) == digest:
+            logger.debug("Skipping article (unchanged): %s", article_id)
             continue
+        to_build.append((entry, related))
 
-        # build if auto_build true
-        if article.get("auto_build", False):
-            try:
-                build_article_page(
+    # Diagram and math blocks are rendered to SVG in one browser session, before
+    # any markdown is converted
+    prerender_diagrams(article_md_path(entry["id"], md_root) for entry, _ in to_build)
+
+    # One browser session for every card that needs rendering, before the pages
+    # that point at them
+    cards = render_social_cards(
+        {entry["id"]: social_card_values(entry) for entry, _ in to_build}, output_root=output_root,
+    )
+
+    for entry, related in to_build:
+        article_id = entry["id"]
+        try:
+            # Full front matter (incl. keywords) is only loaded for articles being rebuilt
+            article = load_article_metadata(article_id, md_root)
+            # Convert the markdown once; the web and print pages share the fragment
+            md_path = article_md_path(article_id, md_root)
+            content_html = md_file_to_html_fragment(md_path) if os.path.isfile(md_path) else None
+            if content_html is not None:
+                fragments[article_id] = content_html
+            page_path = build_article_page(
+                article,
+                template_path=template_path,
+                md_root=md_root,
+                output_root=output_root,
+                related=related,
+                content_html=content_html,
+                social_image=card_url(cards.get(article_id)),
+            )
+            pdf_path = os.path.join(output_root, article_id, "article.pdf")
+            if print_html_to_disk:
+                build_article_print_page(
                     article,
-                    template_path=template_path,
+                    template_path=TEMPLATE_PRINT_PATH,
                     md_root=md_root,
                     output_root=output_root,
+                    content_html=content_html,
                 )
-                build_article_print_page(
+                # Convert print.html to PDF using file path for proper resource loading
+                html_to_pdf(
+                    html_file=os.path.join(output_root, article_id, "print.html"),
+                    output_path=pdf_path,
+                )
+            else:
+                # Render straight into the browser; resources are served from disk
+                # by request routing, so no print.html is written or published
+                print_html = render_article_print_page(
                     article,
                     template_path=TEMPLATE_PRINT_PATH,
                     md_root=md_root,
                     output_root=output_root,
+                    content_html=content_html,
                 )
-                # Convert print.html to PDF using file path for proper resource loading
+                page_dir = os.path.relpath(os.path.join(output_root, article_id), SITE_ROOT).replace(os.sep, "/")
                 html_to_pdf(
-                    html_file=os.path.join(output_root, article["id"], "print.html"),
-                    output_path=os.path.join(output_root, article["id"], "article.pdf"),
+                    html=print_html,
+                    page_url=f"{BASE_URL}/{page_dir}/print.html",
+                    site_root=SITE_ROOT,
+                    output_path=pdf_path,
                 )
-            except Exception:
-                logger.exception("Failed to build article: %s", article.get("id"))
+        except Exception:
+            logger.exception("Failed to build article: %s", article_id)
+            build_state.pop(article_id, None)
         else:
-            logger.debug("Skipping article (auto_build=false): %s", article.get("id"))
+            if content_html and DIAGRAM_FALLBACK_CLASS in content_html:
+                # Shows the source of a diagram that failed to render; try again next build
+                build_state.pop(article_id, None)
+            else:
+                # The images are only known once the page is written; fingerprint
+                # them now so editing one invalidates this article next time
+                with open(page_path, "r", encoding="utf-8") as f:
+                    assets = local_image_paths(f.read(), page_path, SITE_ROOT)
+                asset_state[article_id] = assets
+                build_state[article_id] = _article_fingerprint(
+                    article_id, md_root, template_path, related, assets,
+                )
+            rendered_pdfs.append(pdf_path)
+
+    if optimise_pdf_output and rendered_pdfs:
+        optimise_pdfs(rendered_pdfs)
+
+    # Forget articles that no longer exist, and code blocks no article has any more
+    known_ids = {entry["id"] for entry in catalogue}
+    build_state = {k: v for k, v in build_state.items() if k in known_ids}
+    asset_state = {k: v for k, v in asset_state.items() if k in known_ids}
+    save_cache("articles", build_state)
+    save_cache("article_assets", asset_state)
+    prune_highlight_cache(article_md_path(article_id, md_root) for article_id in sorted(known_ids))
+    return fragments
 
 
 if __name__ == "__main__":
@@ -1,22 +1,28 @@
 import os
-import json
 import re
+import zlib
 import logging
 import html as html_module
 from datetime import datetime
 from typing import Optional, Dict, Any, List
 
-from builder_files.util.html import render_html_vars
+from builder_files.util.stream_render import render_to_file, join_chunks
+from builder_files.util.catalogue import ARTICLES_INDEX, MD_ROOT, load_catalogue
+from builder_files.util.content_store import ContentStore
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-ARTICLES_JSON = "resource/data/articles_data.json"
 ARTICLES_LIST_TEMPLATE = "builder_files/templates/articles_list_page.html"
 ARTICLES_LIST_OUTPUT = "articles/index.html"
 
 NEW_ARTICLE_DAYS = 30
-PLACEHOLDER_COUNT = 10
+# Thumbnails for articles without a featured image; one is picked per article id
+PLACEHOLDER_DIR = "resource/image/placeholder"
+# Used when PLACEHOLDER_DIR is missing or empty
+DEFAULT_PLACEHOLDER = "/resource/image/dunes.webp"
+# Thumbnails in the first row are above the fold; the rest load lazily
+EAGER_THUMBNAILS = 2
 
 
 def _ordinal(n: int) -> str:
@@ -61,12 +67,26 @@ def _is_new_article(iso_str: Optional[str], threshold_days: int = NEW_ARTICLE_DA
     return diff <= threshold_days
 
 
-def _deterministic_placeholder(article_id: str, count: int = PLACEHOLDER_COUNT) -> str:
-    """Return a stable placeholder image path derived from the article ID."""
-    n = (hash(article_id) % count) + 1
-    if n <= 0:
-        n += count
-    return f"/resource/image/placeholder/{n}.png"
+def _deterministic_placeholder(article_id: str, placeholder_dir: str = PLACEHOLDER_DIR) -> str:
+    """
+    Return a placeholder image path derived from the article ID. Picked from
+    the images actually in `placeholder_dir`, with a CRC of the id so the
+    choice is the same on every build (str hash() is salted per process).
+    Falls back to DEFAULT_PLACEHOLDER if the directory has no images.
+    """
+    try:
+        entries = os.listdir(placeholder_dir)
+    except FileNotFoundError:
+        entries = []
+    names = sorted(
+        name for name in entries
+        if os.path.isfile(os.path.join(placeholder_dir, name)) and not name.startswith(".")
+    )
+    if not names:
+        logger.warning("No placeholder images in %s — using %s", placeholder_dir, DEFAULT_PLACEHOLDER)
+        return DEFAULT_PLACEHOLDER
+    name = names[zlib.crc32(article_id.encode("utf-8")) % len(names)]
+    return f"/{placeholder_dir}/{name}"
 
 
 def _slugify_label(label: str) -> str:
@@ -104,7 +124,7 @@ def _build_article_item_html(article: Dict[str, Any]) -> str:
     return (
         f'<a class="article-item" href="/articles/{html_module.escape(article_id)}/">\n'
         f'    <div class="item-image-body">\n'
-        f'        <img src="{image_src}" alt="{title}" loading="lazy" />\n'
+        f'        <img src="{image_src}" alt="{title}" />\n'
         f'    </div>\n'
         f'    <div class="item-header">\n'
         f'        <h3>{title}</h3>\n'
@@ -121,39 +141,44 @@ def _build_article_item_html(article: Dict[str, Any]) -> str:
 
 
 def build_articles_list_page(
-    json_path: str = ARTICLES_JSON,
+    md_root: str = MD_ROOT,
+    catalogue_path: str = ARTICLES_INDEX,
     template_path: str = ARTICLES_LIST_TEMPLATE,
     output_path: str = ARTICLES_LIST_OUTPUT,
+    store: Optional[ContentStore] = None,
 ) -> str:
-    """Build the static articles list page (sorted newest first, hidden articles excluded)."""
+    """
+    Build the static articles list page (sorted newest first, hidden articles
+    excluded). With a synced content `store`, the filtering and sorting is an
+    indexed query rather than a pass over the whole catalogue.
+    """
     logger.info("Building articles list page")
 
-    with open(json_path, "r", encoding="utf-8") as f:
-        articles = json.load(f)
-
-    with open(template_path, "r", encoding="utf-8") as f:
-        template = f.read()
-
-    visible = [a for a in articles if not a.get("hidden", False)]
-    visible.sort(
-        key=lambda a: _parse_iso_date(
-            a.get("date", {}).get("published", "") if isinstance(a.get("date"), dict) else ""
-        ) or datetime.min,
-        reverse=True,
-    )
-
-    items_html = "\n\n".join(_build_article_item_html(a) for a in visible)
-
-    rendered = render_html_vars(
-        template,
-        values={"articles_list_html": items_html},
-        html_escape=False,
-        missing="",
+    if store is not None:
+        visible = store.articles()
+    else:
+        # Catalogue records only — article bodies are never read for the list page
+        articles = load_catalogue(md_root=md_root, index_path=catalogue_path)
+
+        visible = [a for a in articles if not a.get("hidden", False)]
+        visible.sort(
+            key=lambda a: _parse_iso_date(
+                a.get("date", {}).get("published", "") if isinstance(a.get("date"), dict) else ""
+            ) or datetime.min,
+            reverse=True,
+        )
+
+    # Cards are generated and written one at a time; the page is never held whole
+    items = join_chunks((_build_article_item_html(a) for a in visible), "\n\n")
+    render_to_file(
+        template_path,
+        {"articles_list_html": items},
+        output_path,
+        eager_count=EAGER_THUMBNAILS,
+        sprites=False,
+        speculation=True,
+        prerender_pattern="/articles/*",
     )
 
-    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(rendered)
-
     logger.info("Wrote articles list page: %s", output_path)
     return output_path
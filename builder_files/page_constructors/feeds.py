@@ -0,0 +1,291 @@
+import io
+import os
+import re
+import json
+import filecmp
+import logging
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urljoin
+from xml.sax.saxutils import XMLGenerator
+
+from builder_files.util.html import md_file_to_html_fragment
+from builder_files.util.catalogue import ARTICLES_INDEX, MD_ROOT, article_md_path, load_catalogue
+from builder_files.util.build_cache import load_cache, save_cache, fingerprint
+from builder_files.util.content_store import ContentStore
+from builder_files.page_constructors.projects import PROJECTS_JSON, parse_project_date
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BASE_URL = "https://majdij.com"
+SITEMAP_OUTPUT = "sitemap.xml"
+RSS_OUTPUT = "feed.xml"
+ATOM_OUTPUT = "atom.xml"
+
+FEED_TITLE = "Majdi Jaigirdar — Articles"
+FEED_DESCRIPTION = "Articles by Majdi Jaigirdar on software, projects and computer science."
+FEED_AUTHOR = "Majdi Jaigirdar"
+# Newest articles included in the RSS/Atom feeds
+FEED_ITEMS = 20
+# Bump to regenerate every cached feed entry when the entry markup changes
+FEED_VERSION = 1
+
+# src/href values in the article fragment; feed readers need absolute URLs
+URL_ATTR_RE = re.compile(r'\b(src|href)=(["\'])(.*?)\2', re.DOTALL)
+
+
+def _parse_iso(value: Optional[str]) -> Optional[datetime]:
+    """Parse an ISO 8601 string ("...Z" or with an offset) to an aware UTC datetime."""
+    if not value:
+        return None
+    s = value.strip()
+    if s.endswith("Z"):
+        s = s[:-1] + "+00:00"
+    try:
+        dt = datetime.fromisoformat(s)
+    except ValueError:
+        return None
+    return (dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)).astimezone(timezone.utc)
+
+
+def _w3c_date(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def article_dates(entry: Dict[str, Any]) -> tuple:
+    """(published, last modified) for a catalogue entry; edited wins over published."""
+    date = entry.get("date") if isinstance(entry.get("date"), dict) else {}
+    published = _parse_iso(date.get("published"))
+    edited = _parse_iso(date.get("edited"))
+    return published, max(filter(None, (published, edited)), default=None)
+
+
+def article_url(article_id: str, base_url: str) -> str:
+    """Absolute URL of an article page, in the same form as its rel=canonical."""
+    return f"{base_url}/articles/{article_id}"
+
+
+def absolute_urls(fragment: str, page_url: str) -> str:
+    """Resolve every src/href in `fragment` against the article's URL."""
+    base = page_url.rstrip("/") + "/"
+
+    def _replace(m: re.Match) -> str:
+        return f"{m.group(1)}={m.group(2)}{urljoin(base, m.group(3))}{m.group(2)}"
+
+    return URL_ATTR_RE.sub(_replace, fragment)
+
+
+def _element(xml: XMLGenerator, name: str, text: str = "", attrs: Optional[Dict[str, str]] = None) -> None:
+    xml.startElement(name, attrs or {})
+    if text:
+        xml.characters(text)
+    xml.endElement(name)
+
+
+def _render_entries(entry: Dict[str, Any], content_html: str, base_url: str) -> Dict[str, str]:
+    """The RSS <item> and Atom <entry> XML for one article."""
+    url = article_url(entry["id"], base_url)
+    published, updated = article_dates(entry)
+    content_html = absolute_urls(content_html, url)
+    authors = [a.get("name", "") for a in entry.get("author") or [] if isinstance(a, dict)]
+
+    rss_buf = io.StringIO()
+    rss = XMLGenerator(rss_buf, "utf-8", short_empty_elements=True)
+    rss.startElement("item", {})
+    _element(rss, "title", entry.get("title", ""))
+    _element(rss, "link", url)
+    _element(rss, "guid", url, {"isPermaLink": "true"})
+    if published:
+        _element(rss, "pubDate", format_datetime(published, usegmt=True))
+    for name in authors:
+        _element(rss, "dc:creator", name)
+    for label in entry.get("labels") or []:
+        _element(rss, "category", label)
+    _element(rss, "description", entry.get("strap_line", ""))
+    _element(rss, "content:encoded", content_html)
+    rss.endElement("item")
+
+    atom_buf = io.StringIO()
+    atom = XMLGenerator(atom_buf, "utf-8", short_empty_elements=True)
+    atom.startElement("entry", {})
+    _element(atom, "title", entry.get("title", ""))
+    _element(atom, "link", attrs={"rel": "alternate", "type": "text/html", "href": url})
+    _element(atom, "id", url)
+    if published:
+        _element(atom, "published", _w3c_date(published))
+    if updated:
+        _element(atom, "updated", _w3c_date(updated))
+    for name in authors:
+        atom.startElement("author", {})
+        _element(atom, "name", name)
+        atom.endElement("author")
+    for label in entry.get("labels") or []:
+        _element(atom, "category", attrs={"term": label})
+    _element(atom, "summary", entry.get("strap_line", ""))
+    _element(atom, "content", content_html, {"type": "html"})
+    atom.endElement("entry")
+
+    return {"rss": rss_buf.getvalue(), "atom": atom_buf.getvalue()}
+
+
+def _write_streamed(path: str, write: Callable[[Any], None]) -> bool:
+    """
+    Stream a document to `path` through `write(file)`, replacing the existing
+    file only if the bytes differ (so its mtime, and ETag, stay put otherwise).
+    Returns True if the file was written.
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        write(f)
+    if os.path.isfile(path) and filecmp.cmp(tmp_path, path, shallow=False):
+        os.remove(tmp_path)
+        return False
+    os.replace(tmp_path, path)
+    return True
+
+
+def _latest(dates: List[Optional[datetime]]) -> Optional[datetime]:
+    return max(filter(None, dates), default=None)
+
+
+def build_feeds(
+    fragments: Optional[Dict[str, str]] = None,
+    md_root: str = MD_ROOT,
+    catalogue_path: str = ARTICLES_INDEX,
+    projects_path: str = PROJECTS_JSON,
+    base_url: str = BASE_URL,
+    site_root: str = ".",
+    store: Optional[ContentStore] = None,
+) -> List[str]:
+    """
+    Write `sitemap.xml`, an RSS 2.0 feed (`feed.xml`) and an Atom feed
+    (`atom.xml`) for the published (auto-built, non-hidden) articles.
+
+    Sitemap `lastmod` comes from each article's edited/published date; the
+    listing pages take the newest date of what they list. The feeds carry the
+    FEED_ITEMS newest articles with their full content. Each feed entry is
+    cached per article and only re-rendered when the article's markdown
+    changes, from `fragments` ({id: converted markdown}, as returned by
+    build_all_articles()) when available. Documents are streamed to disk and
+    only replaced when their content changes. A synced content `store`
+    supplies the articles and projects in place of the JSON sources. Returns
+    the paths written.
+    """
+    fragments = fragments or {}
+    projects: List[Dict[str, Any]] = []
+    if store is not None:
+        articles = store.articles(auto_build=True)
+        projects = store.projects()
+    else:
+        catalogue = load_catalogue(md_root=md_root, index_path=catalogue_path)
+        articles = [e for e in catalogue if e.get("auto_build", False) and not e.get("hidden", False)]
+        articles.sort(key=lambda e: article_dates(e)[0] or datetime.min.replace(tzinfo=timezone.utc), reverse=True)
+
+        if os.path.isfile(projects_path):
+            with open(projects_path, "r", encoding="utf-8") as f:
+                projects = [p for p in json.load(f) if not p.get("hidden", False)]
+
+    # --- Feed entries: reuse cached XML unless the article changed ---------
+    cache = load_cache("feeds")
+    new_cache: Dict[str, Any] = {}
+    rendered = 0
+    for entry in articles[:FEED_ITEMS]:
+        article_id = entry["id"]
+        md_path = article_md_path(article_id, md_root)
+        digest = fingerprint([("file", md_path), FEED_VERSION, base_url])
+        cached = cache.get(article_id)
+        if not cached or cached.get("digest") != digest:
+            content_html = fragments.get(article_id)
+            if content_html is None:
+                content_html = md_file_to_html_fragment(md_path) if os.path.isfile(md_path) else ""
+            cached = {"digest": digest, **_render_entries(entry, content_html, base_url)}
+            rendered += 1
+        new_cache[article_id] = cached
+    save_cache("feeds", new_cache)
+
+    feed_articles = articles[:FEED_ITEMS]
+    feed_updated = _latest([article_dates(e)[1] for e in feed_articles]) or datetime.now(timezone.utc)
+
+    def _write_rss(f) -> None:
+        xml = XMLGenerator(f, "utf-8", short_empty_elements=True)
+        xml.startDocument()
+        xml.startElement("rss", {
+            "version": "2.0",
+            "xmlns:atom": "http://www.w3.org/2005/Atom",
+            "xmlns:content": "http://purl.org/rss/1.0/modules/content/",
+            "xmlns:dc": "http://purl.org/dc/elements/1.1/",
+        })
+        xml.startElement("channel", {})
+        _element(xml, "title", FEED_TITLE)
+        _element(xml, "link", f"{base_url}/articles")
+        _element(xml, "description", FEED_DESCRIPTION)
+        _element(xml, "language", "en-gb")
+        _element(xml, "atom:link", attrs={"href": f"{base_url}/{RSS_OUTPUT}", "rel": "self", "type": "application/rss+xml"})
+        _element(xml, "lastBuildDate", format_datetime(feed_updated, usegmt=True))
+        for entry in feed_articles:
+            f.write(new_cache[entry["id"]]["rss"])
+        xml.endElement("channel")
+        xml.endElement("rss")
+        xml.endDocument()
+        f.write("\n")
+
+    def _write_atom(f) -> None:
+        xml = XMLGenerator(f, "utf-8", short_empty_elements=True)
+        xml.startDocument()
+        xml.startElement("feed", {"xmlns": "http://www.w3.org/2005/Atom"})
+        _element(xml, "title", FEED_TITLE)
+        _element(xml, "subtitle", FEED_DESCRIPTION)
+        _element(xml, "link", attrs={"rel": "self", "type": "application/atom+xml", "href": f"{base_url}/{ATOM_OUTPUT}"})
+        _element(xml, "link", attrs={"rel": "alternate", "type": "text/html", "href": f"{base_url}/articles"})
+        _element(xml, "id", f"{base_url}/articles")
+        _element(xml, "updated", _w3c_date(feed_updated))
+        xml.startElement("author", {})
+        _element(xml, "name", FEED_AUTHOR)
+        xml.endElement("author")
+        for entry in feed_articles:
+            f.write(new_cache[entry["id"]]["atom"])
+        xml.endElement("feed")
+        xml.endDocument()
+        f.write("\n")
+
+    # --- Sitemap ---------------------------------------------------------
+    latest_article = _latest([article_dates(e)[1] for e in articles])
+    latest_project = _latest([
+        parse_project_date(p).replace(tzinfo=timezone.utc) if parse_project_date(p) else None for p in projects
+    ])
+    # (canonical URL, lastmod); pages without a dated source get no lastmod
+    # rather than a made-up one
+    urls = [
+        (f"{base_url}/", _latest([latest_article, latest_project])),
+        (f"{base_url}/articles", latest_article),
+        (f"{base_url}/projects", latest_project),
+        (f"{base_url}/skills", None),
+    ]
+    urls += [(article_url(e["id"], base_url), article_dates(e)[1]) for e in articles]
+
+    def _write_sitemap(f) -> None:
+        xml = XMLGenerator(f, "utf-8", short_empty_elements=True)
+        xml.startDocument()
+        xml.startElement("urlset", {"xmlns": "http://www.sitemaps.org/schemas/sitemap/0.9"})
+        for loc, lastmod in urls:
+            xml.startElement("url", {})
+            _element(xml, "loc", loc)
+            if lastmod:
+                _element(xml, "lastmod", lastmod.strftime("%Y-%m-%d"))
+            xml.endElement("url")
+        xml.endElement("urlset")
+        xml.endDocument()
+        f.write("\n")
+
+    written = []
+    for name, write in ((SITEMAP_OUTPUT, _write_sitemap), (RSS_OUTPUT, _write_rss), (ATOM_OUTPUT, _write_atom)):
+        path = os.path.join(site_root, name)
+        if _write_streamed(path, write):
+            written.append(path)
+            logger.info("Wrote %s", path)
+        else:
+            logger.info("Unchanged: %s", path)
+    logger.info("Feeds: %d article(s), %d entry(ies) re-rendered", len(feed_articles), rendered)
+    return written
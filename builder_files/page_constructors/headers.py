@@ -0,0 +1,153 @@
+import os
+import re
+import glob
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from builder_files.util.resource_hints import collect_resource_hints
+from builder_files.page_constructors.service_worker import SITE_PAGES, ARTICLE_PAGES_GLOB, SW_OUTPUT
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+HEADERS_OUTPUT = "_headers"
+SITE_ROOT = "."
+# Everything the pages load (and the JSON API) lives under these directories
+ASSET_ROOTS = ["resource", "api"]
+ARTICLE_PDF_GLOB = "articles/*/article.pdf"
+
+# "app.3f9a1c2e.css", "logo-0a1b2c3d4e.png": a content hash in the file name means
+# the URL changes whenever the content does, so it can be cached forever
+HASHED_NAME_RE = re.compile(r"[.-][0-9a-f]{8,}\.[A-Za-z0-9]+$")
+
+CACHE_IMMUTABLE = "public, max-age=31536000, immutable"
+CACHE_HTML = "public, max-age=300, must-revalidate"
+CACHE_MEDIUM = "public, max-age=86400, stale-while-revalidate=604800"
+CACHE_SHORT = "public, max-age=3600, must-revalidate"
+# Browsers cap service worker script caching anyway; never let a CDN hold it
+CACHE_NONE = "no-cache"
+
+MEDIUM_EXTENSIONS = {
+    ".pdf",
+    ".png", ".jpg", ".jpeg", ".gif", ".webp", ".avif", ".svg", ".ico",
+    ".woff2", ".woff", ".ttf", ".otf",
+}
+# Files that are in the tree but never requested by the site
+IGNORED_NAMES = {".DS_Store"}
+IGNORED_EXTENSIONS = {".md", ".py"}
+
+
+def cache_policy(path: str) -> str:
+    """Cache-Control value for one output file."""
+    name = os.path.basename(path)
+    ext = os.path.splitext(name)[1].lower()
+    if HASHED_NAME_RE.search(name):
+        return CACHE_IMMUTABLE
+    if ext == ".html":
+        return CACHE_HTML
+    if ext in MEDIUM_EXTENSIONS:
+        return CACHE_MEDIUM
+    return CACHE_SHORT
+
+
+def _link_header(hint: Dict) -> str:
+    """Render a hint from collect_resource_hints() as a Link header value."""
+    value = f"<{hint['href']}>; rel={hint['rel']}"
+    for key in ("as", "type", "fetchpriority"):
+        if hint.get(key):
+            value += f'; {key}="{hint[key]}"' if key == "type" else f"; {key}={hint[key]}"
+    if hint.get("crossorigin"):
+        value += "; crossorigin"
+    return value
+
+
+def _page_rules(site_root: str) -> List[Tuple[str, List[Tuple[str, str]]]]:
+    """(URL, headers) for every built page: short TTL plus its critical-asset Link headers."""
+    pages = [(os.path.join(site_root, rel), url) for rel, url in SITE_PAGES]
+    for path in sorted(glob.glob(os.path.join(site_root, ARTICLE_PAGES_GLOB))):
+        pages.append((path, "/" + os.path.relpath(os.path.dirname(path), site_root).replace(os.sep, "/") + "/"))
+
+    rules = []
+    for path, url in pages:
+        if not os.path.isfile(path):
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            hints = collect_resource_hints(f.read(), path, site_root)
+        headers = [("Cache-Control", CACHE_HTML)]
+        headers += [("Link", _link_header(h)) for h in hints]
+        rules.append((url, headers))
+    return rules
+
+
+def _asset_rules(directory: str, site_root: str) -> List[Tuple[str, List[Tuple[str, str]]]]:
+    """
+    Cache rules for every file under `directory`. A directory whose whole subtree
+    shares one policy collapses into a single "/dir/*" rule; otherwise files get
+    exact rules and subdirectories are handled the same way. Rules never overlap,
+    so hosts that merge matching rules never see two Cache-Control values.
+    """
+    policies = set()
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name not in IGNORED_NAMES and os.path.splitext(name)[1].lower() not in IGNORED_EXTENSIONS:
+                policies.add(cache_policy(name))
+    if not policies:
+        return []
+
+    url = "/" + os.path.relpath(directory, site_root).replace(os.sep, "/")
+    if len(policies) == 1:
+        return [(f"{url}/*", [("Cache-Control", policies.pop())])]
+
+    rules = []
+    for entry in sorted(os.scandir(directory), key=lambda e: e.name):
+        if entry.is_dir():
+            rules.extend(_asset_rules(entry.path, site_root))
+        elif entry.name not in IGNORED_NAMES and os.path.splitext(entry.name)[1].lower() not in IGNORED_EXTENSIONS:
+            rules.append((f"{url}/{entry.name}", [("Cache-Control", cache_policy(entry.name))]))
+    return rules
+
+
+def build_headers_rules(site_root: str = SITE_ROOT) -> List[Tuple[str, List[Tuple[str, str]]]]:
+    """All (URL pattern, [(header, value), ...]) rules for the current build output."""
+    rules = _page_rules(site_root)
+    if os.path.isfile(os.path.join(site_root, SW_OUTPUT)):
+        rules.append((f"/{SW_OUTPUT}", [("Cache-Control", CACHE_NONE)]))
+    for path in sorted(glob.glob(os.path.join(site_root, ARTICLE_PDF_GLOB))):
+        url = "/" + os.path.relpath(path, site_root).replace(os.sep, "/")
+        rules.append((url, [("Cache-Control", cache_policy(path))]))
+    for asset_root in ASSET_ROOTS:
+        directory = os.path.join(site_root, asset_root)
+        if os.path.isdir(directory):
+            rules.extend(_asset_rules(directory, site_root))
+    return rules
+
+
+def build_headers_file(output_path: Optional[str] = None, site_root: str = SITE_ROOT) -> str:
+    """
+    Write the static host's `_headers` file from what the build produced.
+
+    Content-hashed files are cached for a year as immutable; HTML gets a short
+    TTL with revalidation; PDFs, images and fonts a medium TTL; anything else a
+    short one. Each page also gets `Link` headers for the assets it preloads
+    (fonts, LCP image) and the origins it preconnects to, so the browser (or a
+    CDN sending 103 Early Hints) can start fetching them before the HTML arrives.
+    Run after all pages and sw.js are built; only rewritten when it changes.
+    """
+    output_path = output_path or os.path.join(site_root, HEADERS_OUTPUT)
+    lines = ["# Generated by builder.py from the build output. Do not edit."]
+    rules = build_headers_rules(site_root)
+    for url, headers in rules:
+        lines.append(url)
+        lines.extend(f"  {name}: {value}" for name, value in headers)
+    content = "\n".join(lines) + "\n"
+
+    if os.path.isfile(output_path):
+        with open(output_path, "r", encoding="utf-8") as f:
+            if f.read() == content:
+                logger.info("Headers file unchanged: %s", output_path)
+                return output_path
+
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    logger.info("Wrote headers file: %s (%d rules)", output_path, len(rules))
+    return output_path
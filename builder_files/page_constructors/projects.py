@@ -1,4 +1,3 @@
-import os
 import json
 import re
 import logging
@@ -6,7 +5,8 @@ import html as html_module
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 
-from builder_files.util.html import render_html_vars
+from builder_files.util.stream_render import render_to_file, join_chunks
+from builder_files.util.content_store import ContentStore
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -20,6 +20,9 @@ PROJECTS_OUTPUT = "projects/index.html"
 MAX_TAGS = 5
 MAX_TECH = 6
 DEFAULT_BRAND_COLOR = "#4A90E2"
+# Number of project icons (in page order) that load eagerly
+EAGER_ICONS_GRID = 6
+EAGER_ICONS_CAROUSEL = 3
 
 
 def _slugify_tech(name: str) -> str:
@@ -28,7 +31,7 @@ def _slugify_tech(name: str) -> str:
     return f"{slug}-tag"
 
 
-def _parse_project_date(project: Dict[str, Any]) -> Optional[datetime]:
+def parse_project_date(project: Dict[str, Any]) -> Optional[datetime]:
     """Parse the best available date from a project dict for sort purposes."""
     date_obj = project.get("date", {})
     if not isinstance(date_obj, dict):
@@ -152,36 +155,38 @@ def build_projects_page(
     json_path: str = PROJECTS_JSON,
     template_path: str = PROJECTS_PAGE_TEMPLATE,
     output_path: str = PROJECTS_OUTPUT,
+    store: Optional[ContentStore] = None,
 ) -> str:
-    """Build the static projects page (grid of all non-hidden projects, sorted newest first)."""
+    """
+    Build the static projects page (grid of all non-hidden projects, sorted
+    newest first), querying the content `store` when one is given.
+    """
     logger.info("Building projects page")
 
-    with open(json_path, "r", encoding="utf-8") as f:
-        projects = json.load(f)
+    if store is not None:
+        visible = store.projects(order="date")
+    else:
+        with open(json_path, "r", encoding="utf-8") as f:
+            projects = json.load(f)
 
-    with open(template_path, "r", encoding="utf-8") as f:
-        template = f.read()
+        visible = [p for p in projects if not p.get("hidden", False)]
+        visible.sort(key=lambda p: parse_project_date(p) or datetime.min, reverse=True)
 
-    visible = [p for p in projects if not p.get("hidden", False)]
-    visible.sort(key=lambda p: _parse_project_date(p) or datetime.min, reverse=True)
-
-    cards_html = "\n\n".join(_build_project_card_html(p, "grid") for p in visible)
+    cards = join_chunks((_build_project_card_html(p, "grid") for p in visible), "\n\n")
     brand_styles = _build_brand_styles_html(visible, ["carousel", "grid"])
 
-    rendered = render_html_vars(
-        template,
-        values={
-            "projects_grid_html": cards_html,
+    render_to_file(
+        template_path,
+        {
+            "projects_grid_html": cards,
             "projects_brand_styles": brand_styles,
         },
-        html_escape=False,
-        missing="",
+        output_path,
+        eager_count=EAGER_ICONS_GRID,
+        speculation=True,
+        prerender_pattern="/articles/*",
     )
 
-    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(rendered)
-
     logger.info("Wrote projects page: %s", output_path)
     return output_path
 
@@ -190,34 +195,35 @@ def build_homepage(
     json_path: str = PROJECTS_JSON,
     template_path: str = HOMEPAGE_TEMPLATE,
     output_path: str = HOMEPAGE_OUTPUT,
+    store: Optional[ContentStore] = None,
 ) -> str:
-    """Build the static homepage (featured projects carousel, preserving JSON order)."""
+    """
+    Build the static homepage (featured projects carousel, preserving JSON
+    order). With a content `store`, only the featured projects are loaded.
+    """
     logger.info("Building homepage")
 
-    with open(json_path, "r", encoding="utf-8") as f:
-        projects = json.load(f)
+    if store is not None:
+        featured = store.projects(featured=True, order="source")
+    else:
+        with open(json_path, "r", encoding="utf-8") as f:
+            projects = json.load(f)
 
-    with open(template_path, "r", encoding="utf-8") as f:
-        template = f.read()
+        # Featured carousel: filter featured + not hidden, preserve original JSON order
+        featured = [p for p in projects if p.get("featured", False) and not p.get("hidden", False)]
 
-    # Featured carousel: filter featured + not hidden, preserve original JSON order
-    featured = [p for p in projects if p.get("featured", False) and not p.get("hidden", False)]
-
-    cards_html = "\n\n".join(_build_project_card_html(p, "carousel") for p in featured)
+    cards = join_chunks((_build_project_card_html(p, "carousel") for p in featured), "\n\n")
     brand_styles = _build_brand_styles_html(featured, ["carousel", "grid"])
 
-    rendered = render_html_vars(
-        template,
-        values={
-            "projects_carousel_html": cards_html,
+    render_to_file(
+        template_path,
+        {
+            "projects_carousel_html": cards,
             "projects_brand_styles": brand_styles,
         },
-        html_escape=False,
-        missing="",
+        output_path,
+        eager_count=EAGER_ICONS_CAROUSEL,
     )
 
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(rendered)
-
     logger.info("Wrote homepage: %s", output_path)
     return output_path
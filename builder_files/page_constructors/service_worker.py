@@ -0,0 +1,161 @@
+import os
+import glob
+import json
+import hashlib
+import logging
+from typing import Dict, List, Tuple
+from urllib.parse import unquote
+
+from builder_files.util.html import render_html_vars
+from builder_files.util.build_cache import load_cache, save_cache, file_stat_key, file_digest
+from builder_files.util.resource_hints import css_font_urls
+from builder_files.util.css_bundles import linked_stylesheets
+from builder_files.util.page_weight import asset_category, page_assets
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SW_TEMPLATE = "builder_files/templates/service_worker.js"
+SW_OUTPUT = "sw.js"
+SITE_ROOT = "."
+
+# Top-level pages: (output file, URL). Checked for existence at build time.
+SITE_PAGES = [
+    ("index.html", "/"),
+    ("projects/index.html", "/projects/"),
+    ("skills/index.html", "/skills/"),
+    ("articles/index.html", "/articles/"),
+    ("404.html", "/404.html"),
+]
+ARTICLE_PAGES_GLOB = "articles/*/index.html"
+SHELL_GLOBS = [
+    "resource/style/**/*.css",
+    "resource/script/*.js",
+]
+
+STRATEGY_SHELL = "cache-first"
+STRATEGY_ARTICLE = "stale-while-revalidate"
+STRATEGY_PAGE = "network-first"
+# Images are precached after the pages and shell, and one that fails to download
+# doesn't fail the install; they are cached on first use instead
+STRATEGY_IMAGE = "cache-first-optional"
+
+REVISION_LENGTH = 16
+
+
+def _revision(path: str, hash_cache: Dict[str, list]) -> str:
+    """Content hash of `path`, recomputed only when its mtime/size changed."""
+    stat_key = file_stat_key(path)
+    entry = hash_cache.get(path)
+    if entry is None or entry[:2] != stat_key:
+        entry = stat_key + [file_digest(path)[:REVISION_LENGTH]]
+        hash_cache[path] = entry
+    return entry[2]
+
+
+def _path_to_url(path: str, site_root: str) -> str:
+    return "/" + os.path.relpath(path, site_root).replace(os.sep, "/")
+
+
+def _collect_precache_files(site_root: str) -> List[Tuple[str, str, str]]:
+    """
+    Return (url, file path, strategy) for every page, shell asset and image in
+    the build output. Images are those the pages load (including backgrounds
+    from their stylesheets), so unused files in resource/image are left out.
+    """
+    entries: List[Tuple[str, str, str]] = []
+
+    for rel_path, url in SITE_PAGES:
+        path = os.path.join(site_root, rel_path)
+        if os.path.isfile(path):
+            entries.append((url, path, STRATEGY_PAGE))
+
+    for path in sorted(glob.glob(os.path.join(site_root, ARTICLE_PAGES_GLOB))):
+        url = _path_to_url(os.path.dirname(path), site_root) + "/"
+        entries.append((url, path, STRATEGY_ARTICLE))
+
+    shell_paths: List[str] = []
+    for pattern in SHELL_GLOBS:
+        shell_paths.extend(sorted(glob.glob(os.path.join(site_root, pattern), recursive=True)))
+
+    # Stylesheets are only precached if a page links them: the per-page-type
+    # bundles, not the sources they were built from
+    linked_css = set()
+    images: List[str] = []
+    for _, path, _ in entries:
+        with open(path, "r", encoding="utf-8") as f:
+            page_html = f.read()
+        linked_css.update(linked_stylesheets(page_html))
+        local, lazy, _ = page_assets(page_html, path, site_root)
+        images.extend(p for p in local + lazy if asset_category(p) == "image" and p not in images)
+    shell_paths = [p for p in shell_paths if not p.endswith(".css") or _path_to_url(p, site_root) in linked_css]
+
+    # Fonts are only precached if a stylesheet actually declares them
+    fonts: List[str] = []
+    for css_path in shell_paths:
+        if css_path.endswith(".css"):
+            for font_url in css_font_urls(css_path):
+                font_path = os.path.join(site_root, unquote(font_url).lstrip("/"))
+                if os.path.isfile(font_path) and font_path not in fonts:
+                    fonts.append(font_path)
+
+    for path in shell_paths + fonts:
+        entries.append((_path_to_url(path, site_root), path, STRATEGY_SHELL))
+    for path in images:
+        entries.append((_path_to_url(path, site_root), path, STRATEGY_IMAGE))
+    return entries
+
+
+def build_precache_manifest(site_root: str = SITE_ROOT) -> List[List[str]]:
+    """
+    Return the precache manifest as sorted [url, revision, strategy] triples,
+    hashing only files that changed since the previous build.
+    """
+    hash_cache = load_cache("sw_hashes")
+    manifest = []
+    seen_paths = set()
+    for url, path, strategy in _collect_precache_files(site_root):
+        manifest.append([url, _revision(path, hash_cache), strategy])
+        seen_paths.add(path)
+    save_cache("sw_hashes", {k: v for k, v in hash_cache.items() if k in seen_paths})
+    manifest.sort(key=lambda e: e[0])
+    return manifest
+
+
+def build_service_worker(
+    template_path: str = SW_TEMPLATE,
+    output_path: str = SW_OUTPUT,
+    site_root: str = SITE_ROOT,
+) -> str:
+    """
+    Generate the service worker with a precache manifest of the current build
+    outputs. Run after every page has been built so the manifest matches exactly
+    what will be deployed. The file is only rewritten when the manifest changes.
+    """
+    logger.info("Building service worker")
+
+    manifest = build_precache_manifest(site_root)
+    manifest_json = json.dumps(manifest, separators=(",", ":"))
+    version = hashlib.sha256(manifest_json.encode("utf-8")).hexdigest()[:12]
+
+    with open(template_path, "r", encoding="utf-8") as f:
+        template = f.read()
+
+    rendered = render_html_vars(
+        template,
+        values={"sw_version": version, "sw_manifest": manifest_json},
+        html_escape=False,
+        missing="",
+    )
+
+    if os.path.isfile(output_path):
+        with open(output_path, "r", encoding="utf-8") as f:
+            if f.read() == rendered:
+                logger.info("Service worker unchanged: %s", output_path)
+                return output_path
+
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write(rendered)
+
+    logger.info("Wrote service worker: %s (%d precached entries)", output_path, len(manifest))
+    return output_path
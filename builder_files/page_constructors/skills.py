@@ -1,11 +1,10 @@
-import os
 import json
 import re
 import logging
 import html as html_module
 from typing import Dict, Any, List
 
-from builder_files.util.html import render_html_vars
+from builder_files.util.stream_render import render_to_file, join_chunks
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -13,6 +12,8 @@ logger = logging.getLogger(__name__)
 SKILLS_JSON = "resource/dynamic_blocks_skills.json"
 SKILLS_TEMPLATE = "builder_files/templates/skills_page.html"
 SKILLS_OUTPUT = "skills/index.html"
+# Icons in the first category are above the fold; the rest load lazily
+EAGER_ICONS = 8
 
 
 def _slugify(text: str) -> str:
@@ -95,38 +96,30 @@ def build_skills_page(
     with open(json_path, "r", encoding="utf-8") as f:
         skills_data = json.load(f)
 
-    with open(template_path, "r", encoding="utf-8") as f:
-        template = f.read()
-
     sidebar_items: List[str] = []
-    content_sections: List[str] = []
-
-    for category_name, skills in skills_data.items():
+    for category_name in skills_data:
         category_id = _slugify(category_name)
         sidebar_items.append(
             f'<li><a href="#{category_id}" data-category="{category_id}">'
             f'{html_module.escape(category_name)}</a></li>'
         )
-        content_sections.append(
-            _build_category_section_html(category_id, category_name, skills)
-        )
-
     sidebar_html = "\n                    ".join(sidebar_items)
-    content_html = "\n\n            ".join(content_sections)
 
-    rendered = render_html_vars(
-        template,
-        values={
+    # Category sections are generated and written one at a time
+    sections = (
+        _build_category_section_html(_slugify(category_name), category_name, skills)
+        for category_name, skills in skills_data.items()
+    )
+
+    render_to_file(
+        template_path,
+        {
             "skills_sidebar_html": sidebar_html,
-            "skills_content_html": content_html,
+            "skills_content_html": join_chunks(sections, "\n\n            "),
         },
-        html_escape=False,
-        missing="",
+        output_path,
+        eager_count=EAGER_ICONS,
     )
 
-    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(rendered)
-
     logger.info("Wrote skills page: %s", output_path)
     return output_path
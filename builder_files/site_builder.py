@@ -0,0 +1,337 @@
+import os
+import glob
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from playwright.sync_api import sync_playwright
+
+from builder_files.util.html import md_file_to_html_fragment, html_to_pdf
+from builder_files.util.catalogue import ARTICLES_INDEX, MD_ROOT, article_md_path, load_article_metadata, load_catalogue
+from builder_files.util.build_cache import file_stat_key
+from builder_files.util.content_store import ContentStore, open_content_store
+from builder_files.util.related import compute_related_articles
+from builder_files.util.diagrams import pending_diagrams, prerender_diagrams
+from builder_files.util.social_cards import CARD_NAME, CARD_TEMPLATE, render_social_cards, card_url
+from builder_files.util.css_bundles import BundleCache
+from builder_files.util.post_build import finish_page, finish_site
+from builder_files.page_constructors.article import (
+    BASE_URL,
+    OUTPUT_ROOT,
+    SITE_ROOT,
+    TEMPLATE_PATH,
+    TEMPLATE_PRINT_PATH,
+    render_article_page,
+    render_article_print_page,
+    social_card_values,
+)
+from builder_files.page_constructors.articles_list import ARTICLES_LIST_TEMPLATE, build_articles_list_page
+from builder_files.page_constructors.projects import (
+    HOMEPAGE_TEMPLATE,
+    PROJECTS_JSON,
+    PROJECTS_PAGE_TEMPLATE,
+    build_homepage,
+    build_projects_page,
+)
+from builder_files.page_constructors.skills import SKILLS_JSON, SKILLS_TEMPLATE, build_skills_page
+from builder_files.page_constructors.feeds import build_feeds
+from builder_files.page_constructors.api import build_api
+
+logger = logging.getLogger(__name__)
+
+# Site-wide pages: name -> (builder, given the content store as in a full
+# build, and the source files it reads). Pages listing articles are also
+# rebuilt whenever an article changes.
+SITE_PAGES: Dict[str, Tuple[Callable[[Optional[ContentStore]], str], List[str]]] = {
+    "skills": (lambda store: build_skills_page(), [SKILLS_JSON, SKILLS_TEMPLATE]),
+    "projects": (lambda store: build_projects_page(store=store), [PROJECTS_JSON, PROJECTS_PAGE_TEMPLATE]),
+    "homepage": (lambda store: build_homepage(store=store), [PROJECTS_JSON, HOMEPAGE_TEMPLATE]),
+    "articles_list": (lambda store: build_articles_list_page(store=store), [ARTICLES_LIST_TEMPLATE]),
+}
+ARTICLE_LISTING_PAGES = ["articles_list"]
+
+
+class SiteBuilder:
+    """
+    The builder as a long-lived object, for embedding in a preview server or a
+    test harness. It owns its configuration and keeps what it loads warm across
+    calls: templates, front matter and converted markdown (each reused until
+    its file's mtime/size changes), the catalogue and related-article index,
+    the built pages' tokens and pruned CSS bundles (until the next rebuild),
+    and one headless browser for PDFs and social cards, started on first use.
+    A warm render_article() only re-runs the template and post-processing,
+    without reading the rest of the site.
+
+    Use as a context manager, or call close(), to shut the browser down.
+
+        with SiteBuilder(pdfs=False) as site:
+            html = site.render_article("building-simple-pykv")
+            site.rebuild_changed(["resource/articles/building-simple-pykv/index.md"])
+    """
+
+    def __init__(
+        self,
+        md_root: str = MD_ROOT,
+        catalogue_path: str = ARTICLES_INDEX,
+        template_path: str = TEMPLATE_PATH,
+        print_template_path: str = TEMPLATE_PRINT_PATH,
+        output_root: str = OUTPUT_ROOT,
+        base_url: str = BASE_URL,
+        site_root: str = SITE_ROOT,
+        pdfs: bool = True,
+        social_cards: bool = True,
+    ):
+        self.md_root = md_root
+        self.catalogue_path = catalogue_path
+        self.template_path = template_path
+        self.print_template_path = print_template_path
+        self.output_root = output_root
+        self.base_url = base_url
+        self.site_root = site_root
+        self.pdfs = pdfs
+        self.social_cards = social_cards
+
+        # path -> (change key, value)
+        self._templates: Dict[str, Tuple[Any, str]] = {}
+        self._metadata: Dict[str, Tuple[Any, Dict[str, Any]]] = {}
+        self._fragments: Dict[str, Tuple[Any, str]] = {}
+        self._catalogue: Optional[List[Dict[str, Any]]] = None
+        self._related: Optional[Dict[str, List[Dict[str, Any]]]] = None
+        self._bundles = BundleCache(site_root)
+        self._playwright = None
+        self._browser = None
+
+    # --- Lifecycle ---------------------------------------------------------
+
+    def __enter__(self) -> "SiteBuilder":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._browser is not None:
+            self._browser.close()
+            self._browser = None
+        if self._playwright is not None:
+            self._playwright.stop()
+            self._playwright = None
+
+    @property
+    def browser(self):
+        """The shared headless Chromium, launched on first use."""
+        if self._browser is None:
+            self._playwright = sync_playwright().start()
+            self._browser = self._playwright.chromium.launch(headless=True)
+        return self._browser
+
+    # --- Warm data ---------------------------------------------------------
+
+    def template(self, path: str) -> str:
+        key = file_stat_key(path)
+        cached = self._templates.get(path)
+        if cached is None or cached[0] != key:
+            with open(path, "r", encoding="utf-8") as f:
+                cached = (key, f.read())
+            self._templates[path] = cached
+        return cached[1]
+
+    def catalogue(self) -> List[Dict[str, Any]]:
+        if self._catalogue is None:
+            self._catalogue = load_catalogue(md_root=self.md_root, index_path=self.catalogue_path)
+        return self._catalogue
+
+    def related(self, article_id: str) -> List[Dict[str, Any]]:
+        """The catalogue entries shown as an article's "Related reading"."""
+        if self._related is None:
+            catalogue = self.catalogue()
+            by_id = {e["id"]: e for e in catalogue}
+            related_ids = compute_related_articles(catalogue, md_root=self.md_root)
+            self._related = {
+                a: [by_id[r] for r in ids if r in by_id] for a, ids in related_ids.items()
+            }
+        return self._related.get(article_id, [])
+
+    def article(self, article_id: str) -> Dict[str, Any]:
+        """An article's full front matter (plus "id")."""
+        key = file_stat_key(article_md_path(article_id, self.md_root))
+        cached = self._metadata.get(article_id)
+        if cached is None or cached[0] != key:
+            cached = (key, load_article_metadata(article_id, self.md_root))
+            self._metadata[article_id] = cached
+        return cached[1]
+
+    def fragment(self, article_id: str) -> str:
+        """An article's markdown converted to HTML (diagrams prerendered in the shared browser)."""
+        md_path = article_md_path(article_id, self.md_root)
+        key = file_stat_key(md_path)
+        cached = self._fragments.get(article_id)
+        if cached is None or cached[0] != key:
+            # Only starts the browser when the article has a diagram that isn't cached yet
+            if pending_diagrams([md_path]):
+                prerender_diagrams([md_path], browser=self.browser)
+            cached = (key, md_file_to_html_fragment(md_path) if key is not None else "")
+            self._fragments[article_id] = cached
+        return cached[1]
+
+    def invalidate(self) -> None:
+        """Forget the catalogue and related-article index (front matter changed)."""
+        self._catalogue = None
+        self._related = None
+
+    # --- Articles ----------------------------------------------------------
+
+    def _page_path(self, article_id: str) -> str:
+        return os.path.join(self.output_root, article_id, "index.html")
+
+    def _social_image(self, article_id: str) -> Optional[str]:
+        cards = sorted(glob.glob(os.path.join(self.output_root, article_id, f"{CARD_NAME}.*")))
+        return card_url(cards[0], self.site_root) if cards else None
+
+    def _article_html(self, article_id: str) -> str:
+        """The article page from its template, before finish_site()'s post-processing."""
+        return render_article_page(
+            self.article(article_id),
+            template_text=self.template(self.template_path),
+            md_root=self.md_root,
+            output_root=self.output_root,
+            base_url=self.base_url,
+            related=self.related(article_id),
+            content_html=self.fragment(article_id),
+            social_image=self._social_image(article_id),
+        )
+
+    def render_article(self, article_id: str) -> str:
+        """
+        An article page exactly as a full build would leave it (see
+        finish_page()), without writing it. Its type's CSS bundle is written
+        if it doesn't exist yet.
+        """
+        return finish_page(
+            self._article_html(article_id), self._page_path(article_id), self.site_root, bundles=self._bundles,
+        )
+
+    def build_article(self, article_id: str, finish: bool = True) -> List[str]:
+        """
+        Write an article's page and, as configured, its social card and PDF,
+        using the shared browser, then run finish_site() so the page, the CSS
+        bundles, sw.js and _headers match a full build (`finish=False` leaves
+        that to the caller, when building several). Returns the paths written.
+        """
+        written: List[str] = []
+        if self.social_cards:
+            entry = next((e for e in self.catalogue() if e["id"] == article_id), self.article(article_id))
+            written += render_social_cards(
+                {article_id: social_card_values(entry)},
+                output_root=self.output_root,
+                site_root=self.site_root,
+                browser=self.browser,
+            ).values()
+
+        out_file = self._page_path(article_id)
+        os.makedirs(os.path.dirname(out_file), exist_ok=True)
+        with open(out_file, "w", encoding="utf-8") as f:
+            f.write(self._article_html(article_id))
+        written.append(out_file)
+
+        if self.pdfs:
+            print_html = render_article_print_page(
+                self.article(article_id),
+                template_text=self.template(self.print_template_path),
+                md_root=self.md_root,
+                output_root=self.output_root,
+                content_html=self.fragment(article_id),
+            )
+            page_dir = os.path.relpath(os.path.join(self.output_root, article_id), self.site_root).replace(os.sep, "/")
+            pdf_path = os.path.join(self.output_root, article_id, "article.pdf")
+            html_to_pdf(
+                html=print_html,
+                page_url=f"{self.base_url}/{page_dir}/print.html",
+                site_root=self.site_root,
+                output_path=pdf_path,
+                browser=self.browser,
+            )
+            written.append(pdf_path)
+        if finish:
+            self._finish_site()
+        logger.info("Built article: %s", article_id)
+        return written
+
+    # --- Incremental rebuilds ----------------------------------------------
+
+    def _finish_site(self) -> None:
+        finish_site(self.site_root)
+        # The built pages changed: render_article() re-reads them on its next call
+        self._bundles.reset()
+
+    def _rel(self, path: str) -> str:
+        return os.path.relpath(os.path.abspath(path), os.path.abspath(self.site_root)).replace(os.sep, "/")
+
+    def rebuild_changed(self, paths: Iterable[str]) -> List[str]:
+        """
+        Rebuild what depends on the changed files `paths` (relative to the
+        working directory, or absolute), e.g. from a file watcher:
+
+          - an article's files: that article, any article whose "Related
+            reading" changes as a result, and the pages that list articles;
+          - the article (or print, or card) template: every article;
+          - a site page's data or template: that page;
+          - articles or projects: the feeds and JSON API as needed.
+
+        Then, if anything was rebuilt, the same post-processing as a full
+        build (finish_site(): third-party deferral, CSS bundles, sw.js,
+        _headers), so the output matches one. Other paths are ignored. Returns
+        the paths written.
+        """
+        changed = {self._rel(p) for p in paths}
+        # Pages or stylesheets may have changed on disk since the last render
+        self._bundles.reset()
+        md_prefix = self._rel(self.md_root) + "/"
+        article_templates = {self._rel(p) for p in (self.template_path, self.print_template_path, CARD_TEMPLATE)}
+
+        articles: Set[str] = set()
+        pages: Set[str] = set()
+        all_articles = bool(changed & article_templates)
+        for rel in changed:
+            if rel.startswith(md_prefix):
+                articles.add(rel[len(md_prefix):].split("/")[0])
+            for name, (_, sources) in SITE_PAGES.items():
+                if rel in {self._rel(s) for s in sources}:
+                    pages.add(name)
+
+        if articles:
+            before = {e["id"]: self.related(e["id"]) for e in self.catalogue()}
+            self.invalidate()
+
+            def _summary(entries: List[Dict[str, Any]]) -> List[Tuple]:
+                return [(e["id"], e.get("title"), e.get("strap_line")) for e in entries]
+
+            for entry in self.catalogue():
+                if _summary(self.related(entry["id"])) != _summary(before.get(entry["id"], [])):
+                    articles.add(entry["id"])
+            pages.update(ARTICLE_LISTING_PAGES)
+
+        auto_build = [e["id"] for e in self.catalogue() if e.get("auto_build", False)]
+        targets = auto_build if all_articles else [a for a in auto_build if a in articles]
+
+        written: List[str] = []
+        for article_id in targets:
+            written += self.build_article(article_id, finish=False)
+        if pages or articles:
+            # The listing pages, feeds and API read the same indexed copy as a full build
+            store = open_content_store(md_root=self.md_root, catalogue_path=self.catalogue_path)
+            try:
+                for name in sorted(pages):
+                    written.append(SITE_PAGES[name][0](store))
+                if articles:
+                    written += build_feeds({a: self.fragment(a) for a in targets}, store=store)
+                if articles or "projects" in pages:
+                    written += build_api({a: self.fragment(a) for a in targets}, store=store)
+            finally:
+                if store is not None:
+                    store.close()
+        if written:
+            self._finish_site()
+        logger.info(
+            "Rebuilt %d article(s) and %d page(s) for %d changed file(s)", len(targets), len(pages), len(changed),
+        )
+        return written
@@ -0,0 +1,118 @@
+// sw.js — generated by builder.py from builder_files/templates/service_worker.js. Do not edit.
+'use strict';
+
+// Changes whenever the manifest does, which is what makes browsers install a new worker
+const VERSION = '{html_var(sw_version)}';
+const PRECACHE = 'majdij-precache';
+
+// [url, revision, strategy] for every page, shell asset and image in the last build
+const MANIFEST = {html_var(sw_manifest)};
+
+// url -> cache key; the revision is part of the key so changed files get new entries
+const KEYS = new Map(MANIFEST.map(([url, rev]) => [url, `${url}?__rev=${rev}`]));
+const STRATEGIES = new Map(MANIFEST.map(([url, , strategy]) => [url, strategy]));
+// Precached when possible, but never allowed to fail the install
+const OPTIONAL = 'cache-first-optional';
+
+// Fetch and store one manifest entry unless its revision is already cached
+async function precache(cache, cachedKeys, url) {
+  const key = KEYS.get(url);
+  if (cachedKeys.has(new URL(key, self.location.origin).href)) return;
+  const resp = await fetch(url, { cache: 'no-cache' });
+  if (!resp.ok) throw new TypeError(`Precache failed: ${url} (${resp.status})`);
+  await cache.put(key, resp);
+}
+
+self.addEventListener('install', (event) => {
+  event.waitUntil((async () => {
+    const cache = await caches.open(PRECACHE);
+    const cachedKeys = new Set((await cache.keys()).map((req) => req.url));
+    // Pages and shell assets must all be cached, as with cache.addAll(): if one
+    // fails, this worker is not installed and the previous one stays in charge
+    const critical = MANIFEST.filter(([, , strategy]) => strategy !== OPTIONAL);
+    await Promise.all(critical.map(([url]) => precache(cache, cachedKeys, url)));
+    // Images are best effort; any that fail are cached on first use
+    const optional = MANIFEST.filter(([, , strategy]) => strategy === OPTIONAL);
+    await Promise.allSettled(optional.map(([url]) => precache(cache, cachedKeys, url)));
+    await self.skipWaiting();
+  })());
+});
+
+self.addEventListener('activate', (event) => {
+  event.waitUntil((async () => {
+    // Evict entries whose revision is no longer in the manifest
+    const wanted = new Set([...KEYS.values()].map((key) => new URL(key, self.location.origin).href));
+    const cache = await caches.open(PRECACHE);
+    for (const req of await cache.keys()) {
+      if (!wanted.has(req.url)) await cache.delete(req);
+    }
+    await self.clients.claim();
+  })());
+});
+
+// "/articles/x", "/articles/x/index.html" -> "/articles/x/"
+function normalisePath(pathname) {
+  if (pathname.endsWith('/index.html')) return pathname.slice(0, -'index.html'.length);
+  if (!pathname.endsWith('/') && !/\.[a-z0-9]+$/i.test(pathname)) return pathname + '/';
+  return pathname;
+}
+
+async function cacheFirst(request, key) {
+  const cache = await caches.open(PRECACHE);
+  const cached = await cache.match(key);
+  if (cached) return cached;
+  const resp = await fetch(request);
+  if (resp.ok) cache.put(key, resp.clone());
+  return resp;
+}
+
+async function staleWhileRevalidate(event, key) {
+  const cache = await caches.open(PRECACHE);
+  const cached = await cache.match(key);
+  const network = fetch(event.request).then((resp) => {
+    if (resp.ok) cache.put(key, resp.clone());
+    return resp;
+  });
+  if (cached) {
+    event.waitUntil(network.catch(() => undefined));
+    return cached;
+  }
+  return network;
+}
+
+async function networkFirst(request, key) {
+  const cache = await caches.open(PRECACHE);
+  try {
+    const resp = await fetch(request);
+    if (resp.ok) cache.put(key, resp.clone());
+    return resp;
+  } catch (err) {
+    const cached = await cache.match(key);
+    if (cached) return cached;
+    const offline = KEYS.get('/404.html');
+    return (offline && await cache.match(offline)) || Response.error();
+  }
+}
+
+self.addEventListener('fetch', (event) => {
+  const request = event.request;
+  if (request.method !== 'GET') return;
+  const url = new URL(request.url);
+  if (url.origin !== self.location.origin) return;
+
+  const path = request.mode === 'navigate' ? normalisePath(url.pathname) : url.pathname;
+  const key = KEYS.get(path);
+  if (!key) return;
+
+  switch (STRATEGIES.get(path)) {
+    case 'cache-first':
+    case OPTIONAL:
+      event.respondWith(cacheFirst(request, key));
+      break;
+    case 'stale-while-revalidate':
+      event.respondWith(staleWhileRevalidate(event, key));
+      break;
+    default:
+      event.respondWith(networkFirst(request, key));
+  }
+});
@@ -0,0 +1,199 @@
+import os
+import glob
+import json
+import logging
+import statistics
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from playwright.sync_api import sync_playwright
+
+from builder_files.util.page_weight import PAGE_TYPES, REPORT_DIR
+from builder_files.util.serve import BackgroundServer
+
+logger = logging.getLogger(__name__)
+
+SITE_ROOT = "."
+AUDIT_HISTORY_FILE = "audit_history.jsonl"
+# Each page is loaded this many times (cold, in a fresh context); the median is kept
+AUDIT_RUNS = 3
+# Time to keep observing after "load" so late layout shifts and long tasks are counted
+SETTLE_MS = 1500
+
+# Roughly Lighthouse's mobile "Slow 4G" profile
+THROTTLING = {
+    "latency_ms": 150,
+    "download_kbps": 1600,
+    "upload_kbps": 750,
+    "cpu_slowdown": 4,
+}
+
+METRICS = ("lcp", "cls", "tbt", "fcp", "transfer_bytes", "requests")
+
+# Installed before any page script runs; buffered observers also pick up entries
+# recorded before they were registered
+OBSERVER_SCRIPT = """
+(() => {
+  const audit = window.__audit = { lcp: 0, cls: 0, longTasks: [] };
+  new PerformanceObserver((list) => {
+    for (const e of list.getEntries()) audit.lcp = e.renderTime || e.loadTime || e.startTime;
+  }).observe({ type: 'largest-contentful-paint', buffered: true });
+  new PerformanceObserver((list) => {
+    for (const e of list.getEntries()) if (!e.hadRecentInput) audit.cls += e.value;
+  }).observe({ type: 'layout-shift', buffered: true });
+  new PerformanceObserver((list) => {
+    for (const e of list.getEntries()) audit.longTasks.push([e.startTime, e.duration]);
+  }).observe({ type: 'longtask', buffered: true });
+})();
+"""
+
+COLLECT_SCRIPT = """
+() => {
+  const audit = window.__audit;
+  const fcpEntry = performance.getEntriesByName('first-contentful-paint')[0];
+  const fcp = fcpEntry ? fcpEntry.startTime : 0;
+  // Total Blocking Time: the part of each long task over 50 ms, after first contentful paint
+  let tbt = 0;
+  for (const [start, duration] of audit.longTasks) {
+    if (start + duration > fcp) tbt += Math.max(0, duration - 50);
+  }
+  return { lcp: audit.lcp, cls: audit.cls, tbt, fcp };
+}
+"""
+
+
+def audit_page_urls(site_root: str = SITE_ROOT) -> List[str]:
+    """URL paths of every built page, in the same order as the page-weight report."""
+    urls = []
+    for _, pattern in PAGE_TYPES:
+        for path in sorted(glob.glob(os.path.join(site_root, pattern))):
+            url = "/" + os.path.relpath(path, site_root).replace(os.sep, "/")
+            urls.append(url[:-len("index.html")] if url.endswith("/index.html") else url)
+    return urls
+
+
+def _measure_once(browser, url: str, throttling: Dict[str, int]) -> Dict[str, float]:
+    """Load `url` once, cold, under throttling and return its metrics."""
+    # Fresh context: empty HTTP cache, and no service worker serving from its cache
+    context = browser.new_context(service_workers="block", viewport={"width": 412, "height": 823})
+    try:
+        page = context.new_page()
+        page.add_init_script(OBSERVER_SCRIPT)
+
+        cdp = context.new_cdp_session(page)
+        cdp.send("Network.enable")
+        cdp.send("Network.emulateNetworkConditions", {
+            "offline": False,
+            "latency": throttling["latency_ms"],
+            "downloadThroughput": throttling["download_kbps"] * 1024 / 8,
+            "uploadThroughput": throttling["upload_kbps"] * 1024 / 8,
+        })
+        cdp.send("Emulation.setCPUThrottlingRate", {"rate": throttling["cpu_slowdown"]})
+
+        # Bytes on the wire for every request, including third-party ones
+        # (performance.getEntries() reports 0 for cross-origin resources)
+        traffic = {"bytes": 0, "requests": 0}
+
+        def _on_request(_event):
+            traffic["requests"] += 1
+
+        def _on_finished(event):
+            traffic["bytes"] += event["encodedDataLength"]
+
+        cdp.on("Network.requestWillBeSent", _on_request)
+        cdp.on("Network.loadingFinished", _on_finished)
+
+        page.goto(url, wait_until="load")
+        page.wait_for_timeout(SETTLE_MS)
+        metrics = page.evaluate(COLLECT_SCRIPT)
+        metrics["transfer_bytes"] = traffic["bytes"]
+        metrics["requests"] = traffic["requests"]
+        return metrics
+    finally:
+        context.close()
+
+
+def _median_metrics(runs: List[Dict[str, float]]) -> Dict[str, float]:
+    return {m: round(statistics.median(r[m] for r in runs), 4 if m == "cls" else 1) for m in METRICS}
+
+
+def _read_last_entry(history_path: str) -> Optional[Dict[str, Any]]:
+    if not os.path.isfile(history_path):
+        return None
+    last = None
+    with open(history_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                last = line
+    try:
+        return json.loads(last) if last else None
+    except json.JSONDecodeError:
+        return None
+
+
+def _format_delta(metric: str, value: float, previous: Optional[Dict[str, float]]) -> str:
+    """Change since the previous audit, formatted like " (+12)"; "" if unchanged or unknown."""
+    if not previous or metric not in previous:
+        return ""
+    precision = 3 if metric == "cls" else 0
+    delta = round(value - previous[metric], precision)
+    return f" ({delta:+.{precision}f})" if delta else ""
+
+
+def run_audit(
+    urls: Optional[List[str]] = None,
+    site_root: str = SITE_ROOT,
+    report_dir: str = REPORT_DIR,
+    runs: int = AUDIT_RUNS,
+    throttling: Optional[Dict[str, int]] = None,
+) -> Dict[str, Dict[str, float]]:
+    """
+    Audit the built site locally: serve `site_root` on localhost, load each page
+    `runs` times in headless Chromium with throttled network and CPU, and record
+    the median LCP, CLS, TBT and FCP (ms, from the Performance APIs), bytes
+    transferred and request count.
+
+    One JSON line per audit is appended to `build_reports/audit_history.jsonl`,
+    so trends per page can be followed across builds; a summary with the change
+    since the previous audit is logged. Returns {url path: metrics}.
+    """
+    throttling = throttling or THROTTLING
+    urls = urls or audit_page_urls(site_root)
+    results: Dict[str, Dict[str, float]] = {}
+
+    history_path = os.path.join(report_dir, AUDIT_HISTORY_FILE)
+    previous = (_read_last_entry(history_path) or {}).get("pages", {})
+
+    with BackgroundServer(site_root) as server, sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        try:
+            for url in urls:
+                try:
+                    samples = [_measure_once(browser, server.origin + url, throttling) for _ in range(runs)]
+                except Exception:
+                    logger.exception("Audit failed for %s", url)
+                    continue
+                results[url] = _median_metrics(samples)
+                m = results[url]
+                logger.info(
+                    "%-50s LCP %6.0f ms%s  CLS %.3f%s  TBT %5.0f ms%s  %5.0f KB  %3d req",
+                    url,
+                    m["lcp"], _format_delta("lcp", m["lcp"], previous.get(url)),
+                    m["cls"], _format_delta("cls", m["cls"], previous.get(url)),
+                    m["tbt"], _format_delta("tbt", m["tbt"], previous.get(url)),
+                    m["transfer_bytes"] / 1024, m["requests"],
+                )
+        finally:
+            browser.close()
+
+    os.makedirs(report_dir, exist_ok=True)
+    entry = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z"),
+        "runs": runs,
+        "throttling": throttling,
+        "pages": results,
+    }
+    with open(history_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, sort_keys=True) + "\n")
+    logger.info("Appended audit results to %s (%d pages)", history_path, len(results))
+    return results
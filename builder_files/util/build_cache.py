@@ -0,0 +1,79 @@
+import os
+import json
+import hashlib
+import logging
+from typing import Any, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Local-only state shared between builds (fingerprints, memoised results).
+# Never published; safe to delete at any time to force a full rebuild.
+BUILD_CACHE_DIR = ".build_cache"
+
+
+def _cache_path(name: str, cache_dir: str = BUILD_CACHE_DIR) -> str:
+    return os.path.join(cache_dir, f"{name}.json")
+
+
+def load_cache(name: str, cache_dir: str = BUILD_CACHE_DIR) -> Dict[str, Any]:
+    """
+    Load the named JSON cache from `cache_dir`. A missing or corrupt cache file is
+    treated as empty so the worst case is a full rebuild, never a failed one.
+    """
+    path = _cache_path(name, cache_dir)
+    if not os.path.isfile(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        logger.warning("Ignoring unreadable build cache: %s", path)
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def save_cache(name: str, data: Dict[str, Any], cache_dir: str = BUILD_CACHE_DIR) -> None:
+    """Atomically write the named JSON cache to `cache_dir`."""
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _cache_path(name, cache_dir)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def file_stat_key(path: str) -> Optional[list]:
+    """Return a cheap [mtime_ns, size] change key for `path`, or None if it doesn't exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def file_digest(path: str) -> str:
+    """Return the SHA-256 hex digest of a file's contents."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def fingerprint(parts: Iterable[Any]) -> str:
+    """
+    Combine strings, bytes and file paths (given as ("file", path) tuples) into a
+    single SHA-256 hex digest. Missing files contribute a fixed marker.
+    """
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, tuple) and len(part) == 2 and part[0] == "file":
+            path = part[1]
+            h.update(os.fsencode(path))
+            h.update(file_digest(path).encode() if os.path.isfile(path) else b"<missing>")
+        elif isinstance(part, bytes):
+            h.update(part)
+        else:
+            h.update(str(part).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
@@ -0,0 +1,109 @@
+import os
+import json
+import logging
+from typing import Any, Dict, List
+
+from builder_files.util.front_matter import read_front_matter
+from builder_files.util.build_cache import load_cache, save_cache, file_stat_key
+
+logger = logging.getLogger(__name__)
+
+MD_ROOT = "resource/articles"
+ARTICLES_INDEX = "resource/data/articles_index.json"
+
+# Front matter keys copied into the catalogue index. Anything heavier (keywords,
+# image alt text, ...) stays in the article's own front matter and is only read
+# when that article's page is built.
+CATALOGUE_FIELDS = (
+    "title",
+    "author",
+    "featured_image",
+    "strap_line",
+    "date",
+    "labels",
+    "featured",
+    "hidden",
+    "auto_build",
+)
+
+
+def article_md_path(article_id: str, md_root: str = MD_ROOT) -> str:
+    return os.path.join(md_root, article_id, "index.md")
+
+
+def list_article_ids(md_root: str) -> List[str]:
+    """Return the sorted ids (directory names) of every article with an index.md."""
+    if not os.path.isdir(md_root):
+        return []
+    return sorted(
+        name for name in os.listdir(md_root)
+        if os.path.isfile(article_md_path(name, md_root))
+    )
+
+
+def load_article_metadata(article_id: str, md_root: str = MD_ROOT) -> Dict[str, Any]:
+    """
+    Return the full front matter of one article (the article body is not read).
+    The directory name is the article id.
+    """
+    meta = read_front_matter(article_md_path(article_id, md_root))
+    meta["id"] = article_id
+    return meta
+
+
+def _catalogue_entry(meta: Dict[str, Any]) -> Dict[str, Any]:
+    entry = {"id": meta["id"]}
+    for key in CATALOGUE_FIELDS:
+        if key in meta:
+            entry[key] = meta[key]
+    return entry
+
+
+def load_catalogue(md_root: str = MD_ROOT, index_path: str = ARTICLES_INDEX) -> List[Dict[str, Any]]:
+    """
+    Return the article catalogue (one small record per article), refreshing the
+    generated index at `index_path` first.
+
+    Only articles whose index.md changed since the last build (by mtime/size) have
+    their front matter re-read; everything else is reused from the existing index.
+    The index file is rewritten only when its content actually changes.
+    """
+    stat_cache = load_cache("catalogue")
+
+    existing: Dict[str, Dict[str, Any]] = {}
+    old_text = None
+    if os.path.isfile(index_path):
+        with open(index_path, "r", encoding="utf-8") as f:
+            old_text = f.read()
+        try:
+            existing = {e["id"]: e for e in json.loads(old_text) if isinstance(e, dict) and "id" in e}
+        except (json.JSONDecodeError, TypeError):
+            logger.warning("Ignoring unreadable catalogue index: %s", index_path)
+
+    entries: List[Dict[str, Any]] = []
+    new_stats: Dict[str, Any] = {}
+    for article_id in list_article_ids(md_root):
+        md_path = article_md_path(article_id, md_root)
+        stat_key = file_stat_key(md_path)
+        new_stats[article_id] = stat_key
+
+        if article_id in existing and stat_cache.get(article_id) == stat_key:
+            entries.append(existing[article_id])
+            continue
+
+        logger.debug("Reading front matter: %s", md_path)
+        meta = load_article_metadata(article_id, md_root)
+        if len(meta) == 1:
+            logger.warning("No front matter in %s — article left out of the catalogue.", md_path)
+            continue
+        entries.append(_catalogue_entry(meta))
+
+    new_text = json.dumps(entries, indent=4, ensure_ascii=False) + "\n"
+    if new_text != old_text:
+        os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+        with open(index_path, "w", encoding="utf-8") as f:
+            f.write(new_text)
+        logger.info("Wrote article catalogue index: %s", index_path)
+
+    save_cache("catalogue", new_stats)
+    return entries
@@ -0,0 +1,357 @@
+import os
+import re
+import json
+import sqlite3
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from builder_files.util.build_cache import BUILD_CACHE_DIR, file_stat_key
+from builder_files.util.catalogue import ARTICLES_INDEX, MD_ROOT, article_md_path, load_catalogue
+from builder_files.util.front_matter import split_front_matter
+
+logger = logging.getLogger(__name__)
+
+# The store is derived data: the front matter and JSON files stay the editing
+# format, and the database can be deleted at any time
+CONTENT_STORE = os.path.join(BUILD_CACHE_DIR, "content.sqlite")
+PROJECTS_JSON = "resource/data/project_list.json"
+# Page constructors query the store instead of loading the JSON sources
+# wholesale; set False to go back to plain JSON (e.g. to rule the store out)
+USE_CONTENT_STORE = True
+# Bump when the tables change; an older database is rebuilt from scratch
+SCHEMA_VERSION = 1
+
+# Written for a project that hasn't been published yet
+UNSET_DATE = "N/A"
+# Links, images and tags only; code blocks stay searchable
+BODY_MARKUP_RE = re.compile(r"<[^>]+>|!\[[^\]]*\]\([^)]*\)|\]\([^)]*\)")
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE articles (
+    id TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    published TEXT NOT NULL,
+    featured INTEGER NOT NULL,
+    hidden INTEGER NOT NULL,
+    auto_build INTEGER NOT NULL,
+    md_stat TEXT,
+    entry TEXT NOT NULL
+);
+CREATE INDEX articles_published ON articles (published DESC, position);
+CREATE INDEX articles_featured ON articles (featured);
+CREATE INDEX articles_hidden ON articles (hidden, auto_build);
+CREATE TABLE article_labels (article_id TEXT NOT NULL, label TEXT NOT NULL);
+CREATE INDEX article_labels_label ON article_labels (label, article_id);
+CREATE INDEX article_labels_article ON article_labels (article_id);
+CREATE TABLE projects (
+    id TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    featured INTEGER NOT NULL,
+    hidden INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX projects_date ON projects (date DESC, position);
+CREATE INDEX projects_featured ON projects (featured, hidden, position);
+CREATE INDEX projects_hidden ON projects (hidden);
+"""
+FTS_SCHEMA = "CREATE VIRTUAL TABLE article_text USING fts5(id UNINDEXED, title, strap_line, body)"
+
+
+def _sort_date(value: Any) -> str:
+    """
+    An ISO 8601 date as a sortable UTC string ("2025-10-29T00:00:00"); "" when
+    missing or unparseable, which sorts last in newest-first order.
+    """
+    if not isinstance(value, str) or not value.strip() or value == UNSET_DATE:
+        return ""
+    s = value.strip()
+    if s.endswith("Z"):
+        s = s[:-1] + "+00:00"
+    try:
+        dt = datetime.fromisoformat(s)
+    except ValueError:
+        try:
+            dt = datetime.strptime(value[:10], "%Y-%m-%d")
+        except ValueError:
+            return ""
+    if dt.tzinfo:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def _article_published(entry: Dict[str, Any]) -> str:
+    date = entry.get("date")
+    return _sort_date(date.get("published") if isinstance(date, dict) else None)
+
+
+def _project_date(project: Dict[str, Any]) -> str:
+    """Published date, else started date (as the projects page sorts)."""
+    date = project.get("date")
+    if not isinstance(date, dict):
+        return ""
+    return _sort_date(date.get("published")) or _sort_date(date.get("started"))
+
+
+class ContentStore:
+    """
+    SQLite copy of the article catalogue, article text (for full-text search)
+    and project list, with indexes on what the pages filter and sort by:
+    published date, labels, featured and hidden. sync() brings it up to date
+    with the sources, touching only what changed; the query methods return the
+    same dicts the JSON sources hold.
+    """
+
+    def __init__(self, path: str = CONTENT_STORE):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.fts = True
+        self._ensure_schema()
+
+    def __enter__(self) -> "ContentStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.db.close()
+
+    def _ensure_schema(self) -> None:
+        try:
+            row = self.db.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+        except sqlite3.DatabaseError:
+            row = None
+        if row and row["value"] == str(SCHEMA_VERSION):
+            self.fts = self.db.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'article_text'"
+            ).fetchone() is not None
+            return
+
+        # Missing, outdated or unreadable: start again (everything here is derived)
+        self.db.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.db = sqlite3.connect(self.path)
+        self.db.row_factory = sqlite3.Row
+        with self.db:
+            self.db.executescript(SCHEMA)
+            try:
+                self.db.execute(FTS_SCHEMA)
+            except sqlite3.OperationalError:
+                logger.warning("SQLite was built without FTS5 — article search is unavailable")
+                self.fts = False
+            self.db.execute("INSERT INTO meta VALUES ('schema_version', ?)", (str(SCHEMA_VERSION),))
+
+    # --- Sync ----------------------------------------------------------------
+
+    def sync(
+        self,
+        md_root: str = MD_ROOT,
+        catalogue_path: str = ARTICLES_INDEX,
+        projects_path: str = PROJECTS_JSON,
+    ) -> None:
+        """
+        Bring the store up to date: articles whose catalogue entry or markdown
+        changed are rewritten (with their labels and search text), removed
+        articles are dropped, and the projects are reloaded if their JSON file
+        changed. One transaction; unchanged content costs a stat() per file.
+        """
+        catalogue = load_catalogue(md_root=md_root, index_path=catalogue_path)
+        stored = {
+            row["id"]: (row["position"], row["md_stat"], row["entry"])
+            for row in self.db.execute("SELECT id, position, md_stat, entry FROM articles")
+        }
+        updated = 0
+        with self.db:
+            for position, entry in enumerate(catalogue):
+                article_id = entry["id"]
+                md_path = article_md_path(article_id, md_root)
+                md_stat = json.dumps(file_stat_key(md_path))
+                entry_json = json.dumps(entry, sort_keys=True, ensure_ascii=False)
+                if stored.pop(article_id, None) == (position, md_stat, entry_json):
+                    continue
+                updated += 1
+                self._write_article(position, entry, entry_json, md_path, md_stat)
+            for article_id in stored:
+                self._delete_article(article_id)
+
+            projects_stat = json.dumps([projects_path, file_stat_key(projects_path)])
+            row = self.db.execute("SELECT value FROM meta WHERE key = 'projects_stat'").fetchone()
+            projects_changed = not row or row["value"] != projects_stat
+            if projects_changed:
+                self._load_projects(projects_path)
+                self.db.execute("INSERT OR REPLACE INTO meta VALUES ('projects_stat', ?)", (projects_stat,))
+        logger.info(
+            "Content store: %d article(s), %d updated, %d removed%s",
+            len(catalogue), updated, len(stored), ", projects reloaded" if projects_changed else "",
+        )
+
+    def _delete_article(self, article_id: str) -> None:
+        self.db.execute("DELETE FROM articles WHERE id = ?", (article_id,))
+        self.db.execute("DELETE FROM article_labels WHERE article_id = ?", (article_id,))
+        if self.fts:
+            self.db.execute("DELETE FROM article_text WHERE id = ?", (article_id,))
+
+    def _write_article(self, position: int, entry: Dict[str, Any], entry_json: str, md_path: str, md_stat: str) -> None:
+        article_id = entry["id"]
+        self._delete_article(article_id)
+        self.db.execute(
+            "INSERT INTO articles VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                article_id, position, _article_published(entry),
+                int(bool(entry.get("featured", False))), int(bool(entry.get("hidden", False))),
+                int(bool(entry.get("auto_build", False))), md_stat, entry_json,
+            ),
+        )
+        self.db.executemany(
+            "INSERT INTO article_labels VALUES (?, ?)",
+            [(article_id, label) for label in dict.fromkeys(entry.get("labels") or [])],
+        )
+        if self.fts:
+            body = ""
+            if os.path.isfile(md_path):
+                with open(md_path, "r", encoding="utf-8") as f:
+                    body = BODY_MARKUP_RE.sub(" ", split_front_matter(f.read(), source=md_path)[1])
+            self.db.execute(
+                "INSERT INTO article_text VALUES (?, ?, ?, ?)",
+                (article_id, entry.get("title", ""), entry.get("strap_line", ""), body),
+            )
+
+    def _load_projects(self, projects_path: str) -> None:
+        self.db.execute("DELETE FROM projects")
+        if not os.path.isfile(projects_path):
+            return
+        with open(projects_path, "r", encoding="utf-8") as f:
+            projects = json.load(f)
+        self.db.executemany(
+            "INSERT INTO projects VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    p.get("id") or f"#{i}", i, _project_date(p),
+                    int(bool(p.get("featured", False))), int(bool(p.get("hidden", False))),
+                    json.dumps(p, ensure_ascii=False),
+                )
+                for i, p in enumerate(projects)
+            ],
+        )
+
+    # --- Queries -------------------------------------------------------------
+
+    def articles(
+        self,
+        include_hidden: bool = False,
+        auto_build: Optional[bool] = None,
+        featured: Optional[bool] = None,
+        label: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> List[Dict[str, Any]]:
+        """
+        Catalogue entries, newest first (undated last, ties in catalogue
+        order), filtered in SQL; `limit`/`offset` select one page of them.
+        """
+        where, params = self._article_filters(include_hidden, auto_build, featured, label)
+        sql = f"SELECT entry FROM articles{where} ORDER BY published DESC, position"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params += [limit, offset]
+        return [json.loads(row["entry"]) for row in self.db.execute(sql, params)]
+
+    def count_articles(
+        self,
+        include_hidden: bool = False,
+        auto_build: Optional[bool] = None,
+        featured: Optional[bool] = None,
+        label: Optional[str] = None,
+    ) -> int:
+        where, params = self._article_filters(include_hidden, auto_build, featured, label)
+        return self.db.execute(f"SELECT COUNT(*) FROM articles{where}", params).fetchone()[0]
+
+    @staticmethod
+    def _article_filters(include_hidden, auto_build, featured, label):
+        clauses, params = [], []
+        if not include_hidden:
+            clauses.append("hidden = 0")
+        if auto_build is not None:
+            clauses.append("auto_build = ?")
+            params.append(int(auto_build))
+        if featured is not None:
+            clauses.append("featured = ?")
+            params.append(int(featured))
+        if label is not None:
+            clauses.append("id IN (SELECT article_id FROM article_labels WHERE label = ?)")
+            params.append(label)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def labels(self, include_hidden: bool = False) -> Dict[str, int]:
+        """{label: number of articles}, most used first."""
+        hidden = "" if include_hidden else " WHERE a.hidden = 0"
+        rows = self.db.execute(
+            "SELECT l.label, COUNT(*) AS n FROM article_labels l JOIN articles a ON a.id = l.article_id"
+            f"{hidden} GROUP BY l.label ORDER BY n DESC, l.label"
+        )
+        return {row["label"]: row["n"] for row in rows}
+
+    def projects(
+        self,
+        include_hidden: bool = False,
+        featured: Optional[bool] = None,
+        order: str = "date",
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Projects as in the JSON file, newest first (`order="date"`, undated
+        last) or in file order (`order="source"`).
+        """
+        clauses, params = [], []
+        if not include_hidden:
+            clauses.append("hidden = 0")
+        if featured is not None:
+            clauses.append("featured = ?")
+            params.append(int(featured))
+        if order not in ("date", "source"):
+            raise ValueError(f"Unknown project order: {order}")
+        sql = "SELECT data FROM projects"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY date DESC, position" if order == "date" else " ORDER BY position"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [json.loads(row["data"]) for row in self.db.execute(sql, params)]
+
+    def search(self, query: str, limit: int = 20, include_hidden: bool = False) -> List[Dict[str, Any]]:
+        """
+        Full-text search over article titles, strap lines and bodies (FTS5
+        query syntax), best match first: [{"id", "title", "snippet"}, ...].
+        """
+        if not self.fts:
+            raise RuntimeError("Article search needs SQLite with FTS5")
+        hidden = "" if include_hidden else " AND a.hidden = 0"
+        rows = self.db.execute(
+            "SELECT t.id, t.title, snippet(article_text, 3, '<mark>', '</mark>', '…', 16) AS snippet"
+            " FROM article_text t JOIN articles a ON a.id = t.id"
+            f" WHERE article_text MATCH ?{hidden} ORDER BY bm25(article_text, 0, 10.0, 5.0, 1.0) LIMIT ?",
+            (query, limit),
+        )
+        return [dict(row) for row in rows]
+
+
+def open_content_store(
+    enabled: bool = USE_CONTENT_STORE,
+    path: str = CONTENT_STORE,
+    md_root: str = MD_ROOT,
+    catalogue_path: str = ARTICLES_INDEX,
+    projects_path: str = PROJECTS_JSON,
+) -> Optional[ContentStore]:
+    """A synced ContentStore, or None when the store is turned off."""
+    if not enabled:
+        return None
+    store = ContentStore(path)
+    store.sync(md_root=md_root, catalogue_path=catalogue_path, projects_path=projects_path)
+    return store
@@ -0,0 +1,496 @@
+import os
+import re
+import glob
+import time
+import hashlib
+import html as html_module
+import logging
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+from builder_files.util.images import ATTR_RE, resolve_local_path
+from builder_files.util.page_weight import PAGE_TYPES, page_type_of
+from builder_files.util.resource_hints import CSS_URL_RE
+from builder_files.util.build_cache import BUILD_CACHE_DIR, load_cache, save_cache
+
+logger = logging.getLogger(__name__)
+
+SITE_ROOT = "."
+BUNDLE_DIR = "resource/style/bundles"
+# Superseded bundles stay published while HTML cached before the change may
+# still link them: headers.py caches HTML for this long
+BUNDLE_GRACE_SECONDS = 300
+# Scripts that may add classes/ids at runtime: every string in them is kept
+SAFELIST_SCRIPTS = ["resource/script/*.js"]
+# Class names, ids or tags that are never pruned (e.g. set by third-party code)
+CSS_SAFELIST: Set[str] = set()
+# Tags every document has, even when the markup leaves them implicit
+IMPLICIT_TAGS = {"html", "head", "body"}
+# Blocks whose contents are style rules, pruned like the top level; other
+# at-rules (@font-face, @keyframes, ...) are kept as they are
+NESTED_AT_RULES = {"media", "supports", "layer", "container", "document"}
+
+LINK_TAG_RE = re.compile(r"[ \t]*<link\b([^>]*)>[ \t]*\n?", re.IGNORECASE)
+TAG_NAME_RE = re.compile(r"<([a-zA-Z][a-zA-Z0-9-]*)")
+CLASS_ATTR_RE = re.compile(r"""\bclass\s*=\s*(["'])(.*?)\1""", re.IGNORECASE | re.DOTALL)
+ID_ATTR_RE = re.compile(r"""\bid\s*=\s*(["'])(.*?)\1""", re.IGNORECASE | re.DOTALL)
+SCRIPT_BODY_RE = re.compile(r"<script\b[^>]*>(.*?)</script\s*>", re.IGNORECASE | re.DOTALL)
+STRING_LITERAL_RE = re.compile(r"""'(?:\\.|[^'\\])*'|"(?:\\.|[^"\\])*"|`(?:\\.|[^`\\])*`""", re.DOTALL)
+WORD_RE = re.compile(r"[\w-]+")
+COMMENT_RE = re.compile(r"/\*.*?\*/", re.DOTALL)
+# Any name a stylesheet could use in a selector, escapes included
+CSS_NAME_RE = re.compile(r"(?:\\.|[\w-])+")
+# Pseudo-classes and pseudo-elements (their arguments are removed first); an
+# escaped colon is part of a name (".md\:wide")
+PSEUDO_RE = re.compile(r"(?<!\\)::?[\w-]+")
+COMBINATOR_RE = re.compile(r"\s*[>+~]\s*|\s+")
+COMPOUND_TAG_RE = re.compile(r"^([a-zA-Z][\w-]*)")
+COMPOUND_CLASS_RE = re.compile(r"\.((?:[\w-]|\\.)+)")
+COMPOUND_ID_RE = re.compile(r"#((?:[\w-]|\\.)+)")
+
+
+# --- Page markup --------------------------------------------------------------
+
+def _link_attrs(attrs_text: str) -> Dict[str, str]:
+    return {k.lower(): html_module.unescape(v[1:-1]) for k, v in ATTR_RE.findall(attrs_text)}
+
+
+def _bundleable(attrs: Dict[str, str]) -> bool:
+    """A plain, same-site stylesheet link (no media query, not disabled)."""
+    if "stylesheet" not in attrs.get("rel", "").lower().split() or "disabled" in attrs:
+        return False
+    if attrs.get("media", "all").strip().lower() not in ("", "all"):
+        return False
+    parts = urlsplit(attrs.get("href", ""))
+    return not parts.scheme and not parts.netloc and parts.path.endswith(".css")
+
+
+def page_stylesheets(page_html: str) -> List[Tuple[re.Match, List[str]]]:
+    """
+    The page's bundleable stylesheet links in order, with the stylesheet URLs
+    each stands for: its href, or for a bundle link written by this stage, the
+    source stylesheets recorded in its data-css-bundle attribute.
+    """
+    links = []
+    for m in LINK_TAG_RE.finditer(page_html):
+        attrs = _link_attrs(m.group(1))
+        if _bundleable(attrs):
+            sources = attrs["data-css-bundle"].split() if "data-css-bundle" in attrs else [attrs["href"]]
+            links.append((m, sources))
+    return links
+
+
+def linked_stylesheets(page_html: str) -> List[str]:
+    """The hrefs of the page's bundleable stylesheet links (bundles, once this stage has run)."""
+    return [_link_attrs(m.group(1))["href"] for m, _ in page_stylesheets(page_html)]
+
+
+def page_tokens(page_html: str) -> Tuple[Set[str], Set[str], Set[str]]:
+    """(tag names, class names, ids) used in a page's markup; inline script strings count as all three."""
+    tags = {t.lower() for t in TAG_NAME_RE.findall(page_html)} | IMPLICIT_TAGS
+    classes = {c for _, value in CLASS_ATTR_RE.findall(page_html) for c in value.split()}
+    ids = {value.strip() for _, value in ID_ATTR_RE.findall(page_html)}
+    for script in SCRIPT_BODY_RE.findall(page_html):
+        words = _string_words(script)
+        tags |= {w.lower() for w in words}
+        classes |= words
+        ids |= words
+    return tags, classes, ids
+
+
+def _string_words(script: str) -> Set[str]:
+    """Every word inside a string literal of a script: the class names it could add or query."""
+    return {w for literal in STRING_LITERAL_RE.findall(script) for w in WORD_RE.findall(literal)}
+
+
+def script_safelist(site_root: str = SITE_ROOT, patterns: List[str] = SAFELIST_SCRIPTS) -> Set[str]:
+    words = set(CSS_SAFELIST)
+    for pattern in patterns:
+        for path in sorted(glob.glob(os.path.join(site_root, pattern))):
+            with open(path, "r", encoding="utf-8") as f:
+                words |= _string_words(f.read())
+    return words
+
+
+# --- CSS ----------------------------------------------------------------------
+
+def _split_statements(css: str) -> List[Tuple[str, Optional[str]]]:
+    """
+    Split CSS into top-level statements: (prelude, block body) for rules and
+    block at-rules, (statement, None) for at-rules ending in ";". Strings and
+    nested braces are respected.
+    """
+    statements: List[Tuple[str, Optional[str]]] = []
+    depth, start, body_start, quote, i = 0, 0, 0, None, 0
+    prelude = ""
+    while i < len(css):
+        c = css[i]
+        if quote:
+            if c == "\\":
+                i += 1
+            elif c == quote:
+                quote = None
+        elif c in "\"'":
+            quote = c
+        elif c == "{":
+            if depth == 0:
+                prelude, body_start = css[start:i], i + 1
+            depth += 1
+        elif c == "}":
+            depth -= 1
+            if depth == 0:
+                statements.append((prelude.strip(), css[body_start:i]))
+                start = i + 1
+        elif c == ";" and depth == 0:
+            statements.append((css[start:i].strip(), None))
+            start = i + 1
+        i += 1
+    return [(p, b) for p, b in statements if p or b]
+
+
+def _remove_bracketed(selector: str) -> str:
+    """Drop attribute selectors and the arguments of functional pseudo-classes (:not(), :is(), ...)."""
+    out, depth = [], 0
+    for c in selector:
+        if c in "[(":
+            depth += 1
+        elif c in "])":
+            depth -= 1
+        elif depth == 0:
+            out.append(c)
+    return "".join(out)
+
+
+def _split_selector_list(prelude: str) -> List[str]:
+    parts, depth, current = [], 0, []
+    for c in prelude:
+        if c in "[(":
+            depth += 1
+        elif c in "])":
+            depth -= 1
+        if c == "," and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+        else:
+            current.append(c)
+    parts.append("".join(current).strip())
+    return [p for p in parts if p]
+
+
+def _unescape(name: str) -> str:
+    return re.sub(r"\\(.)", r"\1", name)
+
+
+def selector_can_match(selector: str, tags: Set[str], classes: Set[str], ids: Set[str]) -> bool:
+    """
+    False only when some part of the selector names a tag, class or id that
+    none of the pages use. Attribute selectors, pseudo-classes and the
+    arguments of :not()/:is()/:has() are ignored, so doubtful selectors are kept.
+    """
+    simplified = PSEUDO_RE.sub("", _remove_bracketed(selector))
+    for compound in COMBINATOR_RE.split(simplified.strip()):
+        if not compound:
+            continue
+        tag = COMPOUND_TAG_RE.match(compound)
+        if tag and tag.group(1).lower() not in tags:
+            return False
+        if any(_unescape(c) not in classes for c in COMPOUND_CLASS_RE.findall(compound)):
+            return False
+        if any(_unescape(i) not in ids for i in COMPOUND_ID_RE.findall(compound)):
+            return False
+    return True
+
+
+def _absolute_urls(css: str, css_url: str) -> str:
+    """Resolve relative url()s against the stylesheet's own URL, so they survive the move into a bundle."""
+    base_dir = os.path.dirname(css_url)
+
+    def _replace(m: re.Match) -> str:
+        url = m.group(2)
+        parts = urlsplit(url)
+        if parts.scheme or parts.netloc or url.startswith(("/", "#")):
+            return m.group(0)
+        return f"url({m.group(1)}{os.path.normpath(os.path.join(base_dir, url)).replace(os.sep, '/')}{m.group(1)})"
+
+    return CSS_URL_RE.sub(_replace, css)
+
+
+def _compact(text: str) -> str:
+    return re.sub(r"\s*\n\s*", "", text.strip())
+
+
+def prune_css(css: str, tags: Set[str], classes: Set[str], ids: Set[str]) -> Tuple[str, int, int]:
+    """
+    Remove the selectors that can't match any page, and the rules and
+    @media/@supports blocks left empty. Returns (pruned CSS, selectors kept,
+    selectors removed).
+    """
+    out: List[str] = []
+    kept = removed = 0
+    for prelude, body in _split_statements(css):
+        if body is None:
+            out.append(_compact(prelude) + ";")
+        elif prelude.startswith("@"):
+            name = re.match(r"@([\w-]+)", prelude)
+            if name and name.group(1).lower() in NESTED_AT_RULES:
+                inner, k, r = prune_css(body, tags, classes, ids)
+                kept, removed = kept + k, removed + r
+                if inner:
+                    out.append(f"{_compact(prelude)}{{{inner}}}")
+            else:
+                out.append(f"{_compact(prelude)}{{{_compact(body)}}}")
+        else:
+            selectors = _split_selector_list(prelude)
+            matching = [s for s in selectors if selector_can_match(s, tags, classes, ids)]
+            kept, removed = kept + len(matching), removed + len(selectors) - len(matching)
+            if matching and body.strip():
+                out.append(f"{','.join(_compact(s) for s in matching)}{{{_compact(body)}}}")
+    return "\n".join(out), kept, removed
+
+
+# --- Stage --------------------------------------------------------------------
+
+def _rewrite_links(page_html: str, bundle_url: str, sources: List[str]) -> str:
+    """Replace the page's bundleable stylesheet links with one link to the bundle, where the first was."""
+    links = page_stylesheets(page_html)
+    indent = re.match(r"[ \t]*", links[0][0].group(0)).group(0)
+    tag = f'{indent}<link rel="stylesheet" href="{bundle_url}" data-css-bundle="{" ".join(sources)}" />\n'
+    out, last = [], 0
+    for i, (m, _) in enumerate(links):
+        out.append(page_html[last:m.start()])
+        if i == 0:
+            out.append(tag)
+        last = m.end()
+    out.append(page_html[last:])
+    return "".join(out)
+
+
+def _page_groups(site_root: str) -> Dict[Tuple[str, Tuple[str, ...]], List[Tuple[str, str]]]:
+    """The built pages by (page type, source stylesheet URLs): [(path, html)]."""
+    groups: Dict[Tuple[str, Tuple[str, ...]], List[Tuple[str, str]]] = {}
+    for _, pattern in PAGE_TYPES:
+        for path in sorted(glob.glob(os.path.join(site_root, pattern))):
+            rel = os.path.relpath(path, site_root).replace(os.sep, "/")
+            with open(path, "r", encoding="utf-8") as f:
+                page_html = f.read()
+            sources = tuple(url for _, urls in page_stylesheets(page_html) for url in urls)
+            if sources:
+                groups.setdefault((page_type_of(rel), sources), []).append((path, page_html))
+    return groups
+
+
+def _combine_tokens(
+    token_sets: Iterable[Tuple[Set[str], Set[str], Set[str]]], safelist: Set[str],
+) -> Tuple[Set[str], Set[str], Set[str]]:
+    """The (tags, classes, ids) a bundle is pruned against: the pages' tokens, the safelist and IMPLICIT_TAGS."""
+    tags, classes, ids = set(IMPLICIT_TAGS), set(safelist), set(safelist)
+    tags |= {w.lower() for w in safelist}
+    for t, c, i in token_sets:
+        tags, classes, ids = tags | t, classes | c, ids | i
+    return tags, classes, ids
+
+
+def _write_bundle(
+    page_type: str,
+    sources: Tuple[str, ...],
+    base_path: str,
+    tokens: Tuple[Set[str], Set[str], Set[str]],
+    site_root: str,
+    bundle_dir: str,
+) -> Tuple[str, bool]:
+    """
+    Prune `sources` (URLs relative to the page at `base_path`) against
+    `tokens`, concatenate them and write the bundle if it doesn't exist yet.
+    Returns (bundle path relative to the site root, whether it was written).
+    """
+    tags, classes, ids = tokens
+    parts, kept, removed, before = [], 0, 0, 0
+    for url in sources:
+        css_path = resolve_local_path(url, base_path, site_root)
+        if not css_path:
+            logger.warning("Stylesheet %s (linked from %s pages) not found — left out of the bundle", url, page_type)
+            continue
+        with open(css_path, "r", encoding="utf-8") as f:
+            css = COMMENT_RE.sub("", f.read())
+        before += len(css.encode("utf-8"))
+        css_url = "/" + os.path.relpath(css_path, site_root).replace(os.sep, "/")
+        pruned, k, r = prune_css(_absolute_urls(css, css_url), tags, classes, ids)
+        kept, removed = kept + k, removed + r
+        if pruned:
+            parts.append(f"/* {css_url} */\n{pruned}")
+    bundle_css = "\n".join(parts) + "\n"
+    digest = hashlib.sha256(bundle_css.encode("utf-8")).hexdigest()[:10]
+    bundle_rel = f"{bundle_dir}/{page_type}.{digest}.css"
+    bundle_path = os.path.join(site_root, bundle_rel)
+    written = not os.path.isfile(bundle_path)
+    if written:
+        os.makedirs(os.path.dirname(bundle_path), exist_ok=True)
+        with open(bundle_path, "w", encoding="utf-8") as f:
+            f.write(bundle_css)
+    logger.info(
+        "CSS bundle %s: %d stylesheet(s), %.1f KB -> %.1f KB (%d selectors kept, %d pruned)",
+        bundle_rel, len(sources), before / 1024, len(bundle_css.encode("utf-8")) / 1024, kept, removed,
+    )
+    return bundle_rel, written
+
+
+class BundleCache:
+    """
+    What bundle_page() needs from the built site, kept between calls: the
+    tokens of every built page by page type and stylesheets, and the bundles
+    already pruned. A bundle is reused whenever the tokens it was pruned
+    against agree on every name its stylesheets use, so editing a page's text
+    doesn't re-prune. Call reset() once the built pages or the stylesheets
+    change on disk.
+    """
+
+    def __init__(self, site_root: str = SITE_ROOT, bundle_dir: str = BUNDLE_DIR):
+        self.site_root = site_root
+        self.bundle_dir = bundle_dir
+        self.reset()
+
+    def reset(self) -> None:
+        self._safelist: Optional[Set[str]] = None
+        # (page type, sources) -> {absolute page path: (tags, classes, ids)}
+        self._groups: Optional[Dict[Tuple[str, Tuple[str, ...]], Dict[str, Tuple[Set[str], Set[str], Set[str]]]]] = None
+        # (group, absolute page path) -> tokens of the group's other pages, with the safelist
+        self._others: Dict[Tuple, Tuple[Set[str], Set[str], Set[str]]] = {}
+        # group -> every name in the group's stylesheets (a superset of those in selectors)
+        self._names: Dict[Tuple[str, Tuple[str, ...]], Set[str]] = {}
+        # (group, tokens narrowed to the group's names) -> bundle path relative to the site root
+        self._bundles: Dict[Tuple, str] = {}
+
+    def _group_names(self, group: Tuple[str, Tuple[str, ...]], base_path: str) -> Set[str]:
+        names = self._names.get(group)
+        if names is None:
+            names = set()
+            for url in group[1]:
+                css_path = resolve_local_path(url, base_path, self.site_root)
+                if css_path and os.path.isfile(css_path):
+                    with open(css_path, "r", encoding="utf-8") as f:
+                        names.update(_unescape(w) for w in CSS_NAME_RE.findall(f.read()))
+            names |= {n.lower() for n in names}
+            self._names[group] = names
+        return names
+
+    def bundle_page(self, page_html: str, page_path: str) -> str:
+        """See bundle_page()."""
+        rel = os.path.relpath(page_path, self.site_root).replace(os.sep, "/")
+        sources = tuple(url for _, urls in page_stylesheets(page_html) for url in urls)
+        if not sources:
+            return page_html
+        page_type = page_type_of(rel)
+        group = (page_type, sources)
+        page_key = os.path.abspath(page_path)
+
+        if self._safelist is None:
+            self._safelist = script_safelist(self.site_root)
+        if self._groups is None:
+            self._groups = {
+                g: {os.path.abspath(p): page_tokens(h) for p, h in pages}
+                for g, pages in _page_groups(self.site_root).items()
+            }
+        others = self._others.get((group, page_key))
+        if others is None:
+            others = _combine_tokens(
+                (t for p, t in self._groups.get(group, {}).items() if p != page_key), self._safelist,
+            )
+            self._others[(group, page_key)] = others
+
+        tokens = _combine_tokens([others, page_tokens(page_html)], set())
+        names = self._group_names(group, page_path)
+        key = (group,) + tuple(frozenset(t & names) for t in tokens)
+        bundle_rel = self._bundles.get(key)
+        if bundle_rel is None or not os.path.isfile(os.path.join(self.site_root, bundle_rel)):
+            bundle_rel, _ = _write_bundle(page_type, sources, page_path, tokens, self.site_root, self.bundle_dir)
+            self._bundles[key] = bundle_rel
+        return _rewrite_links(page_html, f"/{bundle_rel}", list(sources))
+
+
+def bundle_page(page_html: str, page_path: str, site_root: str = SITE_ROOT, bundle_dir: str = BUNDLE_DIR) -> str:
+    """
+    `page_html`, to be written to `page_path`, linked to the bundle that
+    build_css_bundles() would give it: the one for its page type, pruned
+    against the other built pages of the type plus this page as given. The
+    bundle is written if needed; the built pages are left as they are. Reads
+    every built page; callers bundling repeatedly keep a BundleCache instead.
+    """
+    return BundleCache(site_root, bundle_dir).bundle_page(page_html, page_path)
+
+
+def retire_unused_bundles(
+    existing: List[str],
+    in_use: Set[str],
+    site_root: str = SITE_ROOT,
+    now: Optional[float] = None,
+    cache_dir: str = BUILD_CACHE_DIR,
+) -> List[str]:
+    """
+    Delete the bundles in `existing` (relative to `site_root`) that no page
+    links, once HTML cached before they were superseded has expired: the
+    previous build's bundles are always kept, and other unused ones until
+    BUNDLE_GRACE_SECONDS after the build that first found them unused.
+    Returns the bundles deleted.
+    """
+    now = time.time() if now is None else now
+    state = load_cache("css_bundles_retired", cache_dir)
+    previous = set(state.get("previous", []))
+    retired: Dict[str, float] = state.get("retired", {})
+
+    removed: List[str] = []
+    kept: Dict[str, float] = {}
+    for rel in sorted(set(existing) - in_use):
+        since = now if rel in previous else retired.get(rel, now)
+        if rel not in previous and now - since >= BUNDLE_GRACE_SECONDS:
+            os.remove(os.path.join(site_root, rel))
+            removed.append(rel)
+        else:
+            kept[rel] = since
+    save_cache("css_bundles_retired", {"previous": sorted(in_use), "retired": kept}, cache_dir)
+    if removed:
+        logger.info("CSS bundles: %d superseded bundle(s) removed", len(removed))
+    return removed
+
+
+def build_css_bundles(site_root: str = SITE_ROOT, bundle_dir: str = BUNDLE_DIR) -> List[str]:
+    """
+    Give each page type (PAGE_TYPES) one pruned, bundled stylesheet in place
+    of the stylesheets its pages link.
+
+    The tags, classes and ids used across all pages of the type, plus every
+    string in SAFELIST_SCRIPTS and the pages' inline scripts (classes added at
+    runtime), decide which selectors are kept; the type's stylesheets are
+    then concatenated in page order, pruned and written to
+    `{bundle_dir}/{type}.{hash}.css`, a content-hashed (so immutably cached)
+    name. Each page's stylesheet links are replaced by one link to its bundle
+    that records the source stylesheets, so pages kept from an earlier build
+    are re-bundled from the originals. Pages of a type that link a different
+    set of stylesheets get a bundle of their own. Bundles no page uses any
+    more are kept while cached HTML may still link them, then deleted (see
+    retire_unused_bundles()). Run after every page is built and before
+    anything derived from their markup. Returns the bundles written.
+    """
+    safelist = script_safelist(site_root)
+    bundles: Set[str] = set()
+    written: List[str] = []
+    for (page_type, sources), pages in _page_groups(site_root).items():
+        tokens = _combine_tokens((page_tokens(h) for _, h in pages), safelist)
+        bundle_rel, new = _write_bundle(page_type, sources, pages[0][0], tokens, site_root, bundle_dir)
+        bundles.add(bundle_rel)
+        if new:
+            written.append(os.path.join(site_root, bundle_rel))
+
+        rewrites = 0
+        for path, page_html in pages:
+            new_html = _rewrite_links(page_html, f"/{bundle_rel}", list(sources))
+            if new_html != page_html:
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(new_html)
+                rewrites += 1
+        logger.info("CSS bundle %s: %d page(s), %d relinked", bundle_rel, len(pages), rewrites)
+
+    existing = [
+        os.path.relpath(p, site_root).replace(os.sep, "/") for p in glob.glob(os.path.join(site_root, bundle_dir, "*.css"))
+    ]
+    retire_unused_bundles(existing, bundles, site_root)
+    return written
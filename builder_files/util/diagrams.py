@@ -0,0 +1,262 @@
+import os
+import re
+import html
+import json
+import base64
+import hashlib
+import logging
+import contextlib
+import urllib.request
+from typing import Dict, Iterable, Optional, Tuple
+
+from playwright.sync_api import sync_playwright
+
+from builder_files.util.build_cache import BUILD_CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+DIAGRAM_CACHE_DIR = os.path.join(BUILD_CACHE_DIR, "diagrams")
+# Fenced block language -> renderer
+DIAGRAM_LANGUAGES = {
+    "mermaid": "mermaid",
+    "math": "math",
+    "latex": "math",
+}
+# Only the build's headless browser loads these; readers get the finished SVG.
+# Pinned, and part of every cache key, so upgrading re-renders every block.
+RENDERER_SCRIPTS = {
+    "mermaid": "https://cdn.jsdelivr.net/npm/mermaid@11.4.1/dist/mermaid.min.js",
+    "math": "https://cdn.jsdelivr.net/npm/mathjax@3.2.2/es5/tex-svg-full.js",
+}
+# Vendored copies of RENDERER_SCRIPTS (fetched once, then committed) and their
+# pinned SRI hashes ({url: "sha384-..."}); the render page only ever gets these
+VENDOR_DIR = "builder_files/vendor"
+RENDERER_LOCK = os.path.join(VENDOR_DIR, "renderers.json")
+# Bump to re-render every cached block when the rendering itself changes
+DIAGRAM_VERSION = 1
+# Wraps blocks that could not be rendered; their source is shown instead and
+# their article is rebuilt on the next build
+DIAGRAM_FALLBACK_CLASS = "diagram-unrendered"
+# The one page every block is rendered in
+RENDER_PAGE_URL = "https://majdij.com/__diagrams__.html"
+# Python-Markdown's tab length; blocks are normalised the way it normalises text
+TAB_LENGTH = 4
+
+RENDER_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8">
+<script>window.MathJax = {startup: {typeset: false}, svg: {fontCache: "none"}};</script>
+%s
+</head><body></body></html>"""
+
+RENDER_JS = """async ([kind, source, id]) => {
+  if (kind === "mermaid") {
+    const { svg } = await mermaid.render(id, source);
+    return svg;
+  }
+  const node = await MathJax.tex2svgPromise(source, { display: true });
+  return node.querySelector("svg").outerHTML;
+}"""
+
+SVG_ID_RE = re.compile(r'\bid="([^"]+)"')
+ARIA_REF_RE = re.compile(r'(\baria-(?:labelledby|describedby)=")([^"]*)"')
+
+# In-process memo on top of the on-disk cache: key -> SVG
+_memo: Dict[str, str] = {}
+
+
+def normalise_source(source: str) -> str:
+    """A block's source as the markdown preprocessor sees it (line endings, tabs, blank lines)."""
+    source = source.replace("\r\n", "\n").replace("\r", "\n").expandtabs(TAB_LENGTH)
+    return re.sub(r"(?<=\n) +\n", "\n", source)
+
+
+def diagram_key(kind: str, source: str) -> str:
+    data = f"{DIAGRAM_VERSION}\0{kind}\0{RENDERER_SCRIPTS[kind]}\0{source}"
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def _cache_path(key: str) -> str:
+    return os.path.join(DIAGRAM_CACHE_DIR, f"{key}.svg")
+
+
+def cached_svg(key: str) -> Optional[str]:
+    if key in _memo:
+        return _memo[key]
+    path = _cache_path(key)
+    if not os.path.isfile(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        _memo[key] = f.read()
+    return _memo[key]
+
+
+def pending_diagrams(md_paths: Iterable[str]) -> Dict[str, Tuple[str, str]]:
+    """{key: (renderer, source)} for the diagram/math blocks in `md_paths` not yet cached."""
+    # Imported here: highlight.py imports this module for its preprocessor
+    from builder_files.util.highlight import FENCED_BLOCK_RE
+
+    pending: Dict[str, Tuple[str, str]] = {}
+    for md_path in md_paths:
+        if not os.path.isfile(md_path):
+            continue
+        with open(md_path, "r", encoding="utf-8") as f:
+            text = normalise_source(f.read())
+        for m in FENCED_BLOCK_RE.finditer(text):
+            kind = DIAGRAM_LANGUAGES.get(m.group("lang").lower())
+            if kind is None:
+                continue
+            key = diagram_key(kind, m.group("code"))
+            if key not in pending and cached_svg(key) is None:
+                pending[key] = (kind, m.group("code"))
+    return pending
+
+
+def _vendored_path(url: str) -> str:
+    """"https://cdn.jsdelivr.net/npm/mermaid@11.4.1/dist/mermaid.min.js" -> "{VENDOR_DIR}/mermaid@11.4.1-mermaid.min.js"."""
+    package = url.split("/npm/", 1)[-1].split("/", 1)[0]
+    return os.path.join(VENDOR_DIR, f"{package}-{url.rsplit('/', 1)[-1]}")
+
+
+def renderer_script(kind: str) -> bytes:
+    """
+    The renderer script for `kind`, from its vendored copy (downloaded into
+    VENDOR_DIR the first time). The copy must match the SRI hash pinned for
+    its URL in RENDERER_LOCK; a script without one is pinned now, so commit
+    VENDOR_DIR after upgrading a renderer. Raises RuntimeError on a mismatch.
+    """
+    url = RENDERER_SCRIPTS[kind]
+    path = _vendored_path(url)
+    if not os.path.isfile(path):
+        with urllib.request.urlopen(url, timeout=60) as response:
+            body = response.read()
+        os.makedirs(VENDOR_DIR, exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            f.write(body)
+        os.replace(path + ".tmp", path)
+        logger.info("Vendored %s as %s", url, path)
+    with open(path, "rb") as f:
+        body = f.read()
+    integrity = "sha384-" + base64.b64encode(hashlib.sha384(body).digest()).decode("ascii")
+
+    lock: Dict[str, str] = {}
+    if os.path.isfile(RENDERER_LOCK):
+        with open(RENDERER_LOCK, "r", encoding="utf-8") as f:
+            lock = json.load(f)
+    pinned = lock.get(url)
+    if pinned is None:
+        lock[url] = integrity
+        with open(RENDERER_LOCK, "w", encoding="utf-8") as f:
+            json.dump(lock, f, indent=1, sort_keys=True)
+            f.write("\n")
+        logger.warning("Pinned %s at %s — commit %s", url, integrity, VENDOR_DIR)
+    elif pinned != integrity:
+        raise RuntimeError(f"{path} does not match the integrity pinned for {url} ({pinned})")
+    return body
+
+
+def _render_batch(jobs: Dict[str, Tuple[str, str]], browser=None) -> Dict[str, str]:
+    """
+    Render each {key: (renderer, source)} to SVG in one headless Chromium
+    session and page, loading each renderer script once from its verified
+    vendored copy (see renderer_script()); every other request is blocked. A
+    block that fails (e.g. a syntax error) is logged and skipped. Returns
+    {key: SVG}.
+    """
+    kinds = sorted({kind for kind, _ in jobs.values()})
+    bodies = {RENDERER_SCRIPTS[k]: renderer_script(k) for k in kinds}
+    scripts = "\n".join(f'<script src="{RENDERER_SCRIPTS[k]}"></script>' for k in kinds)
+
+    def _route(route) -> None:
+        url = route.request.url
+        if url == RENDER_PAGE_URL:
+            route.fulfill(status=200, content_type="text/html; charset=utf-8", body=RENDER_PAGE % scripts)
+        elif url in bodies:
+            route.fulfill(status=200, content_type="text/javascript; charset=utf-8", body=bodies[url])
+        else:
+            route.abort()
+
+    results: Dict[str, str] = {}
+    with contextlib.ExitStack() as stack:
+        if browser is None:
+            p = stack.enter_context(sync_playwright())
+            browser = p.chromium.launch(headless=True)
+            stack.callback(browser.close)
+        page = browser.new_page()
+        stack.callback(page.close)
+        page.route("**/*", _route)
+        page.goto(RENDER_PAGE_URL, wait_until="load")
+        if "mermaid" in kinds:
+            page.evaluate('mermaid.initialize({startOnLoad: false, securityLevel: "strict"})')
+        if "math" in kinds:
+            page.evaluate("MathJax.startup.promise.then(() => true)")
+        for key, (kind, source) in jobs.items():
+            try:
+                # The id scopes mermaid's generated CSS; derived from the content so it is stable
+                results[key] = page.evaluate(RENDER_JS, [kind, source, f"diagram-{key[:12]}"])
+            except Exception as e:
+                logger.warning("Could not render %s block (%s): %s", kind, str(e).splitlines()[0], source[:60])
+    return results
+
+
+def prerender_diagrams(md_paths: Iterable[str], browser=None) -> int:
+    """
+    Render every diagram/math block in `md_paths` that isn't cached yet, all
+    in one batched browser session, and cache the SVG by a hash of the block
+    (renderer, its version and source). Run before converting the markdown:
+    md_file_to_html_fragment() then inlines the cached SVG. `browser` is an
+    already launched Playwright browser to render in. Returns the number of
+    blocks rendered.
+    """
+    jobs = pending_diagrams(md_paths)
+    if not jobs:
+        return 0
+    try:
+        results = _render_batch(jobs, browser)
+    except Exception as e:
+        logger.warning("Diagram rendering failed (%s) — %d block(s) not rendered", str(e).splitlines()[0], len(jobs))
+        return 0
+    os.makedirs(DIAGRAM_CACHE_DIR, exist_ok=True)
+    for key, svg in results.items():
+        tmp_path = _cache_path(key) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(svg)
+        os.replace(tmp_path, _cache_path(key))
+        _memo[key] = svg
+    logger.info("Diagrams: %d block(s) rendered in one batch, %d failed", len(results), len(jobs) - len(results))
+    return len(results)
+
+
+def _suffix_ids(svg: str, suffix: str) -> str:
+    """`svg` with `suffix` appended to every id it defines and to every reference to one."""
+    ids = set(SVG_ID_RE.findall(svg))
+    if not ids:
+        return svg
+    names = "|".join(re.escape(i) for i in sorted(ids, key=len, reverse=True))
+    svg = re.sub(r'(\bid="|#)(%s)(?![\w-])' % names, lambda m: m.group(1) + m.group(2) + suffix, svg)
+    return ARIA_REF_RE.sub(
+        lambda m: m.group(1) + " ".join(t + suffix if t in ids else t for t in m.group(2).split()) + '"', svg,
+    )
+
+
+def diagram_html(source: str, lang: str, occurrence: int = 0) -> str:
+    """
+    Inline SVG markup for a fenced diagram/math block, from the cache filled by
+    prerender_diagrams(). A block that was never rendered is shown as its
+    source, wrapped in DIAGRAM_FALLBACK_CLASS. `occurrence` counts earlier
+    copies of the same block on the page; from the second on, the SVG's ids
+    get a suffix so they stay unique.
+    """
+    kind = DIAGRAM_LANGUAGES[lang.lower()]
+    svg = cached_svg(diagram_key(kind, source))
+    if svg is None:
+        logger.warning("No rendered SVG for %s block — showing its source", kind)
+        return (
+            f'<div class="{DIAGRAM_FALLBACK_CLASS}"><pre><code class="language-{html.escape(lang)}">'
+            f"{html.escape(source)}</code></pre></div>"
+        )
+    if occurrence:
+        svg = _suffix_ids(svg, f"-{occurrence + 1}")
+    if kind == "math":
+        label = html.escape(source.strip(), quote=True)
+        return f'<div class="math-display" role="img" aria-label="{label}">{svg}</div>'
+    return f'<figure class="diagram diagram-{kind}">{svg}</figure>'
@@ -0,0 +1,100 @@
+import datetime as _dt
+import tomllib
+from typing import Any, Dict, Tuple
+
+import yaml
+
+# Opening/closing fence -> front matter format
+FRONT_MATTER_FENCES = {
+    "---": "yaml",
+    "+++": "toml",
+}
+
+
+class FrontMatterError(ValueError):
+    """Raised when a markdown file's front matter block is malformed."""
+
+
+def _normalise_value(value: Any) -> Any:
+    """
+    YAML turns unquoted timestamps into datetime objects; the rest of the builder
+    expects ISO 8601 strings (e.g. "2025-10-29T00:00:00Z"), so convert them back.
+    """
+    if isinstance(value, _dt.datetime):
+        if value.tzinfo is not None and value.utcoffset() == _dt.timedelta(0):
+            return value.replace(tzinfo=None).isoformat() + "Z"
+        return value.isoformat()
+    if isinstance(value, _dt.date):
+        return value.isoformat() + "T00:00:00Z"
+    if isinstance(value, dict):
+        return {k: _normalise_value(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_normalise_value(v) for v in value]
+    return value
+
+
+def _parse_block(block: str, fmt: str, source: str) -> Dict[str, Any]:
+    try:
+        if fmt == "toml":
+            data = tomllib.loads(block)
+        else:
+            data = yaml.safe_load(block)
+    except (yaml.YAMLError, tomllib.TOMLDecodeError) as e:
+        raise FrontMatterError(f"Invalid {fmt} front matter in {source}: {e}") from e
+    if data is None:
+        return {}
+    if not isinstance(data, dict):
+        raise FrontMatterError(f"Front matter in {source} must be a mapping, got {type(data).__name__}")
+    return _normalise_value(data)
+
+
+def split_front_matter(text: str, source: str = "<string>") -> Tuple[Dict[str, Any], str]:
+    """
+    Split markdown text into (metadata, body).
+
+    Front matter is a YAML block fenced by `---` lines or a TOML block fenced by
+    `+++` lines at the very start of the file. Text without front matter returns
+    ({}, text) unchanged.
+    """
+    first_line, sep, rest = text.partition("\n")
+    fence = first_line.strip()
+    fmt = FRONT_MATTER_FENCES.get(fence)
+    if fmt is None or not sep:
+        return {}, text
+
+    lines = rest.split("\n")
+    for i, line in enumerate(lines):
+        if line.rstrip() == fence:
+            block = "\n".join(lines[:i])
+            body = "\n".join(lines[i + 1:])
+            return _parse_block(block, fmt, source), body.lstrip("\n")
+
+    raise FrontMatterError(f"Unterminated front matter in {source} (missing closing '{fence}')")
+
+
+def strip_front_matter(text: str, source: str = "<string>") -> str:
+    """Return markdown text with any leading front matter block removed."""
+    return split_front_matter(text, source)[1]
+
+
+def read_front_matter(filepath: str) -> Dict[str, Any]:
+    """
+    Read only the front matter block of a markdown file.
+
+    Lines are consumed up to the closing fence, so the article body is never read
+    into memory — this is what keeps list-page builds cheap as articles grow.
+    """
+    with open(filepath, "r", encoding="utf-8") as f:
+        first_line = f.readline()
+        fence = first_line.strip()
+        fmt = FRONT_MATTER_FENCES.get(fence)
+        if fmt is None:
+            return {}
+
+        block_lines = []
+        for line in f:
+            if line.rstrip() == fence:
+                return _parse_block("".join(block_lines), fmt, filepath)
+            block_lines.append(line)
+
+    raise FrontMatterError(f"Unterminated front matter in {filepath} (missing closing '{fence}')")
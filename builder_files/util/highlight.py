@@ -0,0 +1,182 @@
+import os
+import re
+import hashlib
+import logging
+from typing import Dict, Iterable, Iterator, Tuple
+
+from markdown.extensions import Extension
+from markdown.preprocessors import Preprocessor
+from pygments import highlight
+from pygments.formatters import HtmlFormatter
+from pygments.lexers import get_lexer_by_name
+from pygments.lexers.special import TextLexer
+from pygments.util import ClassNotFound
+
+from builder_files.util.build_cache import BUILD_CACHE_DIR
+from builder_files.util.diagrams import DIAGRAM_LANGUAGES, diagram_html, normalise_source
+
+logger = logging.getLogger(__name__)
+
+HIGHLIGHT_STYLE = "monokai"
+HIGHLIGHT_CSS_CLASS = "codehilite"
+HIGHLIGHT_CSS_OUTPUT = "resource/style/code_highlight.css"
+HIGHLIGHT_CACHE_DIR = os.path.join(BUILD_CACHE_DIR, "highlight")
+
+# Same shape as Python-Markdown's fenced_code blocks (``` or ~~~, optional language).
+# Blocks using the {attr} form are left for fenced_code to handle.
+FENCED_BLOCK_RE = re.compile(
+    r"(?P<fence>^(?:~{3,}|`{3,}))[ ]*\.?(?P<lang>[\w#.+-]*)[ ]*\n"
+    r"(?P<code>.*?)(?<=\n)"
+    r"(?P=fence)[ ]*$",
+    re.MULTILINE | re.DOTALL,
+)
+
+# In-process memo on top of the on-disk cache: key -> highlighted HTML
+_memo: Dict[str, str] = {}
+
+
+def _formatter(style: str) -> HtmlFormatter:
+    return HtmlFormatter(style=style, cssclass=HIGHLIGHT_CSS_CLASS, wrapcode=True)
+
+
+def highlight_key(code: str, lang: str = "", style: str = HIGHLIGHT_STYLE) -> str:
+    return hashlib.sha256(f"{style}\0{lang}\0{code}".encode("utf-8")).hexdigest()
+
+
+def fenced_blocks(md_paths: Iterable[str]) -> Iterator[Tuple[str, str]]:
+    """(language, code) for every fenced block in `md_paths`, as the preprocessor sees it."""
+    for md_path in md_paths:
+        if not os.path.isfile(md_path):
+            continue
+        with open(md_path, "r", encoding="utf-8") as f:
+            text = normalise_source(f.read())
+        for m in FENCED_BLOCK_RE.finditer(text):
+            yield m.group("lang"), m.group("code")
+
+
+def highlight_code(code: str, lang: str = "", style: str = HIGHLIGHT_STYLE) -> str:
+    """
+    Return syntax-highlighted HTML for one code block.
+
+    Results are memoised by a hash of (code, language, style), in memory and in
+    the build cache, so unchanged blocks are never re-tokenised across builds or
+    between the web and print variants of a page.
+    """
+    key = highlight_key(code, lang, style)
+    if key in _memo:
+        return _memo[key]
+
+    cache_file = os.path.join(HIGHLIGHT_CACHE_DIR, f"{key}.html")
+    if os.path.isfile(cache_file):
+        with open(cache_file, "r", encoding="utf-8") as f:
+            result = f.read()
+    else:
+        try:
+            lexer = get_lexer_by_name(lang) if lang else TextLexer()
+        except ClassNotFound:
+            logger.warning("No syntax highlighter for language '%s' — rendering as plain text", lang)
+            lexer = TextLexer()
+        result = highlight(code, lexer, _formatter(style))
+        os.makedirs(HIGHLIGHT_CACHE_DIR, exist_ok=True)
+        with open(cache_file, "w", encoding="utf-8") as f:
+            f.write(result)
+
+    _memo[key] = result
+    return result
+
+
+def prune_highlight_cache(
+    md_paths: Iterable[str], style: str = HIGHLIGHT_STYLE, cache_dir: str = HIGHLIGHT_CACHE_DIR,
+) -> int:
+    """
+    Delete cached blocks that no longer appear in any of `md_paths` (every
+    article, not only the ones rebuilt). Returns the number of entries removed.
+    """
+    if not os.path.isdir(cache_dir):
+        return 0
+    live = {
+        f"{highlight_key(code, lang, style)}.html"
+        for lang, code in fenced_blocks(md_paths)
+        if lang.lower() not in DIAGRAM_LANGUAGES
+    }
+    removed = 0
+    for name in os.listdir(cache_dir):
+        if name not in live:
+            os.remove(os.path.join(cache_dir, name))
+            _memo.pop(name.split(".")[0], None)
+            removed += 1
+    if removed:
+        logger.info("Removed %d unused highlighted block(s) from %s", removed, cache_dir)
+    return removed
+
+
+def highlight_css(style: str = HIGHLIGHT_STYLE) -> str:
+    """Return the stylesheet for a highlight theme, as committed at HIGHLIGHT_CSS_OUTPUT."""
+    return (
+        f"/* Generated by `python builder.py highlight-css` (pygments style: {style}). Do not edit. */\n"
+        + _formatter(style).get_style_defs(f".{HIGHLIGHT_CSS_CLASS}")
+        + "\n"
+    )
+
+
+def build_highlight_css(output_path: str = HIGHLIGHT_CSS_OUTPUT, style: str = HIGHLIGHT_STYLE) -> str:
+    """
+    Write the stylesheet for the chosen highlight theme (only if it changed).
+
+    The stylesheet is committed and is not touched by `build`; run this (via
+    `python builder.py highlight-css`) after changing HIGHLIGHT_STYLE.
+    """
+    css = highlight_css(style)
+    if os.path.isfile(output_path):
+        with open(output_path, "r", encoding="utf-8") as f:
+            if f.read() == css:
+                return output_path
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write(css)
+    logger.info("Wrote code highlight stylesheet: %s", output_path)
+    return output_path
+
+
+class HighlightPreprocessor(Preprocessor):
+    """
+    Replace fenced code blocks with pre-highlighted HTML before fenced_code
+    sees them; diagram and math blocks become their prerendered SVG.
+    """
+
+    def __init__(self, md, style: str):
+        super().__init__(md)
+        self.style = style
+
+    def run(self, lines):
+        text = "\n".join(lines)
+        # (renderer, source) -> copies seen so far; repeated diagrams need their own ids
+        seen: Dict[Tuple[str, str], int] = {}
+
+        def _replace(m: re.Match) -> str:
+            lang = m.group("lang").lower()
+            if lang in DIAGRAM_LANGUAGES:
+                block = (DIAGRAM_LANGUAGES[lang], m.group("code"))
+                html = diagram_html(m.group("code"), m.group("lang"), seen.get(block, 0))
+                seen[block] = seen.get(block, 0) + 1
+            else:
+                html = highlight_code(m.group("code"), m.group("lang"), self.style)
+            return self.md.htmlStash.store(html)
+
+        return FENCED_BLOCK_RE.sub(_replace, text).split("\n")
+
+
+class HighlightExtension(Extension):
+    """Build-time syntax highlighting for fenced code blocks (codehilite-style markup)."""
+
+    def __init__(self, **kwargs):
+        self.config = {"style": [HIGHLIGHT_STYLE, "Pygments style name"]}
+        super().__init__(**kwargs)
+
+    def extendMarkdown(self, md):
+        # fenced_code_block runs at priority 25; run just before it
+        md.preprocessors.register(HighlightPreprocessor(md, self.getConfig("style")), "build_highlight", 26)
+
+
+def makeExtension(**kwargs):
+    return HighlightExtension(**kwargs)
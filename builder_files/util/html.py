@@ -3,11 +3,14 @@ import html
 from typing import Any, Mapping, Optional, List
 import math
 import os
+import contextlib
 import markdown
 from bs4 import BeautifulSoup
 import re as _re
 from playwright.sync_api import sync_playwright
 
+from builder_files.util.front_matter import strip_front_matter
+
 # Function to render HTML variables in a template string
 def render_html_vars(
         template: str,
@@ -75,6 +78,16 @@ def render_html_vars(
 
 # Function to indent HTML content
 def indent_html(html: str, indent: str = "    ") -> str:
+    # Whitespace inside <pre> is significant (code blocks): swap each block for a
+    # comment placeholder so it passes through untouched, and restore it at the end
+    pre_blocks: List[str] = []
+
+    def _stash_pre(m: re.Match) -> str:
+        pre_blocks.append(m.group(0))
+        return f"<!--indent-html-pre-{len(pre_blocks) - 1}-->"
+
+    html = re.sub(r"<pre\b.*?</pre>", _stash_pre, html, flags=re.DOTALL | re.IGNORECASE)
+
     # Split tags and text
     tokens = re.findall(r"<[^>]+>|[^<]+", html)
 
@@ -100,13 +113,22 @@ def indent_html(html: str, indent: str = "    ") -> str:
         ):
             level += 1
 
-    return "\n".join(output)
+    result = "\n".join(output)
+    if pre_blocks:
+        result = re.sub(
+            r"<!--indent-html-pre-(\d+)-->",
+            lambda m: pre_blocks[int(m.group(1))],
+            result,
+        )
+    return result
 
 DEFAULT_EXTENSIONS = [
     "extra",
     "sane_lists",
     "toc",
     "attr_list",
+    # build-time syntax highlighting for fenced code blocks (see util/highlight.py)
+    "builder_files.util.highlight",
 ]
 
 def md_file_to_html_fragment(
@@ -117,6 +139,7 @@ def md_file_to_html_fragment(
 ) -> str:
     """
     Read a markdown file and convert to an HTML fragment (no <html>/<body>).
+    Any leading YAML/TOML front matter block is stripped before conversion.
     Shift headings so that a single `#` in markdown becomes <h{start_heading_level}>.
 
     This version special-cases any <div ... class="... md-to-html ...">...</div> blocks:
@@ -132,6 +155,9 @@ def md_file_to_html_fragment(
     with open(filepath, "r", encoding="utf-8") as f:
         md_text = f.read()
 
+    # Article metadata lives in a front matter block at the top of the file
+    md_text = strip_front_matter(md_text, source=filepath)
+
     md_extensions = extensions if extensions is not None else DEFAULT_EXTENSIONS
     md_extension_configs = extension_configs or {}
 
@@ -188,6 +214,44 @@ def md_file_to_html_fragment(
 from playwright.sync_api import sync_playwright
 from typing import Optional
 from pathlib import Path
+from urllib.parse import urlsplit, unquote
+
+
+def make_local_route_handler(
+    page_url: str,
+    html: str,
+    site_root: str,
+    resources: Optional[Mapping[str, bytes]] = None,
+):
+    """
+    Build a Playwright route handler that serves `html` at `page_url` and every
+    other same-origin URL from `resources` (URL path -> bytes) or from files under
+    `site_root`. Requests to any other origin are aborted, so rendering never
+    waits on the network.
+    """
+    page_parts = urlsplit(page_url)
+    origin = f"{page_parts.scheme}://{page_parts.netloc}"
+    root = os.path.abspath(site_root)
+
+    def _handler(route, request) -> None:
+        parts = urlsplit(request.url)
+        if f"{parts.scheme}://{parts.netloc}" != origin:
+            route.abort()
+            return
+        if parts.path == page_parts.path:
+            route.fulfill(status=200, content_type="text/html; charset=utf-8", body=html)
+            return
+        url_path = unquote(parts.path)
+        if resources and url_path in resources:
+            route.fulfill(status=200, body=resources[url_path])
+            return
+        local_path = os.path.abspath(os.path.join(root, url_path.lstrip("/")))
+        if local_path.startswith(root + os.sep) and os.path.isfile(local_path):
+            route.fulfill(path=local_path)
+        else:
+            route.fulfill(status=404, body="")
+
+    return _handler
 
 def html_to_pdf(
     html: Optional[str] = None,
@@ -201,8 +265,12 @@ def html_to_pdf(
     margin_right: str = "12mm",
     paper_format: str = "A4",   # or "Letter"
     landscape: bool = False,
-    wait_until: str = "networkidle",
+    wait_until: Optional[str] = None,
     print_background: bool = True,
+    page_url: Optional[str] = None,
+    site_root: Optional[str] = None,
+    resources: Optional[Mapping[str, bytes]] = None,
+    browser=None,
 ) -> None:
     """
     Render HTML to a PDF file (output_path). If the HTML contains elements
@@ -214,6 +282,16 @@ def html_to_pdf(
         html: HTML content as string (optional if html_file is provided)
         html_file: Path to HTML file (optional if html is provided)
         output_path: Path where PDF will be saved
+        page_url: with `html` and `site_root`, render in memory: the HTML is served
+                  at this URL via request routing, same-origin resources are served
+                  from `resources` (URL path -> bytes) or from files under
+                  `site_root`, and third-party requests are aborted. No temporary
+                  file or path rewriting is needed.
+        wait_until: load state to wait for; defaults to "load" when rendering in
+                    memory (nothing external to wait on) and "networkidle" otherwise.
+        browser: an already launched Playwright browser to render in (only a new
+                 context is opened and closed); by default one is launched and
+                 closed for this call.
 
     Requirements:
       pip install playwright
@@ -224,13 +302,18 @@ def html_to_pdf(
       - pageNumber and totalPages placeholders are provided as <span class="pageNumber"></span>
         and <span class="totalPages"></span>.
       - PDF printing (page.pdf()) is supported on Chromium.
-      - Using html_file is preferred over html string for proper resource loading (images, fonts).
+      - For proper resource loading (images, fonts) use either html_file or the
+        in-memory mode (html + page_url + site_root); a bare html string has no base URL.
     """
     if html is None and html_file is None:
         raise ValueError("Either 'html' or 'html_file' must be provided")
     if output_path is None:
         raise ValueError("'output_path' must be provided")
 
+    in_memory = html is not None and page_url is not None and site_root is not None
+    if wait_until is None:
+        wait_until = "load" if in_memory else "networkidle"
+
     def build_template(content_html: Optional[str], default_text: str, is_header: bool) -> str:
         # Keep the template compact and safe for Chromium printToPDF.
         # We ensure the pageNumber / totalPages are present in the footer.
@@ -280,13 +363,20 @@ def html_to_pdf(
                     "</div></div>"
                 )
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
+    with contextlib.ExitStack() as stack:
+        if browser is None:
+            p = stack.enter_context(sync_playwright())
+            browser = p.chromium.launch(headless=True)
+            stack.callback(browser.close)
         context = browser.new_context()
         page = context.new_page()
         
+        if in_memory:
+            # Serve the page and its resources straight from memory / disk
+            page.route("**/*", make_local_route_handler(page_url, html, site_root, resources))
+            page.goto(page_url, wait_until=wait_until)
         # If html_file is provided, use goto with file:// URL for proper resource loading
-        if html_file:
+        elif html_file:
             file_path = Path(html_file).resolve()
             file_url = file_path.as_uri()
             page.goto(file_url, wait_until=wait_until)
@@ -341,6 +431,5 @@ def html_to_pdf(
         )
 
         context.close()
-        browser.close()
 
 
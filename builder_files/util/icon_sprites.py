@@ -0,0 +1,341 @@
+import io
+import os
+import re
+import glob
+import base64
+import hashlib
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from builder_files.util.images import IMG_TAG_RE, ATTR_RE, SVG_ROOT_RE, read_image_size, resolve_local_path
+from builder_files.util.build_cache import load_cache, save_cache, file_stat_key, fingerprint
+
+logger = logging.getLogger(__name__)
+
+SITE_ROOT = "."
+SPRITE_DIR = "resource/image/sprites"
+
+# Icon families packed into one sheet each. "height" is the cell height in
+# pixels (2x the largest size the icon is shown at, for high-DPI screens).
+# "square" families are shown in square boxes (object-fit: contain), so each
+# icon is letterboxed into a square cell; the others keep their aspect ratio
+# (shown at a fixed height with width: auto). Only square families can use an
+# SVG view sheet, because the box, not the image, decides the rendered size.
+ICON_FAMILIES: Dict[str, Dict[str, Any]] = {
+    "technology": {"dir": "resource/image/technology-icons", "height": 96, "square": True},
+    "project": {"dir": "resource/image/project-icons", "height": 80, "square": False},
+    "social": {"dir": "resource/image/social-icons", "height": 50, "square": False},
+}
+# Icons no bigger than this on disk are inlined as data: URIs instead
+INLINE_MAX_BYTES = 1536
+SHEET_MAX_WIDTH = 1024
+# Very wide logos are letterboxed into cells at most this many times their height
+MAX_CELL_ASPECT = 4
+SHEET_QUALITY = 90
+
+RASTER_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".webp"}
+INLINE_MIME_TYPES = {
+    ".png": "image/png", ".jpg": "image/jpeg", ".jpeg": "image/jpeg",
+    ".gif": "image/gif", ".webp": "image/webp",
+}
+SVG_ID_RE = re.compile(r'\bid\s*=\s*(["\'])([^"\']+)\1')
+SVG_CLOSE_RE = re.compile(r"</svg\s*>\s*$", re.IGNORECASE)
+XML_PROLOG_RE = re.compile(r"<\?xml[^>]*\?>|<!DOCTYPE[^>]*>|<!--.*?-->", re.IGNORECASE | re.DOTALL)
+SVG_PLACEMENT_ATTRS = {"id", "x", "y", "width", "height", "viewbox"}
+VIEWBOX_RE = re.compile(r'\bviewBox\s*=\s*["\']([^"\']+)["\']', re.IGNORECASE)
+
+# resolved file path -> entry; see build_icon_sprites()
+_icons: Optional[Dict[str, Dict[str, Any]]] = None
+
+
+def _icon_key(family: str, path: str) -> str:
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return f"{family}-" + re.sub(r"[^a-z0-9]+", "-", stem.lower()).strip("-")
+
+
+def _inline_uri(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, "rb") as f:
+        data = f.read()
+    if ext == ".svg":
+        # URL-encoded text is smaller than base64 for SVG
+        text = " ".join(data.decode("utf-8").split())
+        return "data:image/svg+xml," + quote(text, safe=" =:/'.,;-()")
+    return f"data:{INLINE_MIME_TYPES[ext]};base64," + base64.b64encode(data).decode("ascii")
+
+
+def _cell_size(size: Tuple[int, int], height: int, square: bool) -> Tuple[int, int]:
+    if square:
+        return height, height
+    w, h = size
+    return max(1, min(round(w * height / h), height * MAX_CELL_ASPECT)), height
+
+
+def _shelf_pack(cells: List[Tuple[int, int]], max_width: int) -> Tuple[List[Tuple[int, int]], int, int]:
+    """Place cells left to right in rows; returns ([(x, y)], sheet width, sheet height)."""
+    positions = []
+    x = y = row_height = sheet_width = 0
+    for w, h in cells:
+        if x and x + w > max_width:
+            x, y = 0, y + row_height
+            row_height = 0
+        positions.append((x, y))
+        x += w
+        row_height = max(row_height, h)
+        sheet_width = max(sheet_width, x)
+    return positions, sheet_width, y + row_height
+
+
+def _write_hashed(data: bytes, family: str, ext: str, sprite_dir: str) -> str:
+    name = f"{family}.{hashlib.sha256(data).hexdigest()[:10]}{ext}"
+    path = os.path.join(sprite_dir, name)
+    if not os.path.isfile(path):
+        os.makedirs(sprite_dir, exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+    return path
+
+
+def _build_raster_sheet(
+    family: str, paths: List[str], height: int, square: bool, sprite_dir: str, site_root: str
+) -> Dict[str, Dict[str, Any]]:
+    from PIL import Image
+
+    cells = [_cell_size(read_image_size(p) or (height, height), height, square) for p in paths]
+    positions, sheet_w, sheet_h = _shelf_pack(cells, SHEET_MAX_WIDTH)
+    sheet = Image.new("RGBA", (sheet_w, sheet_h), (0, 0, 0, 0))
+    for path, (cw, ch), (x, y) in zip(paths, cells, positions):
+        with Image.open(path) as im:
+            im = im.convert("RGBA")
+            im.thumbnail((cw, ch), Image.LANCZOS)
+            # Centre in the cell (letterboxing square cells and over-wide logos)
+            sheet.paste(im, (x + (cw - im.width) // 2, y + (ch - im.height) // 2))
+
+    buf = io.BytesIO()
+    sheet.save(buf, format="WEBP", quality=SHEET_QUALITY, method=6)
+    sheet_path = _write_hashed(buf.getvalue(), family, ".webp", sprite_dir)
+    sheet_url = "/" + os.path.relpath(sheet_path, site_root).replace(os.sep, "/")
+
+    entries = {}
+    for path, (cw, ch), (x, y) in zip(paths, cells, positions):
+        entries[path] = {
+            "kind": "sprite",
+            "family": family,
+            "class": f"icon-{_icon_key(family, path)}",
+            "sheet": sheet_url,
+            # Shown at half the cell size (cells are 2x for high-DPI screens)
+            "width": max(1, cw // 2), "height": max(1, ch // 2),
+            "size": [sheet_w * 100 / cw, sheet_h * 100 / ch],
+            "position": [
+                x * 100 / (sheet_w - cw) if sheet_w > cw else 0,
+                y * 100 / (sheet_h - ch) if sheet_h > ch else 0,
+            ],
+        }
+    return entries
+
+
+def _build_svg_sheet(
+    family: str, paths: List[str], height: int, sprite_dir: str, site_root: str
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Stack SVG icons into one file with a <view> per icon, referenced as
+    `sheet.svg#<icon>` from an ordinary <img>. Internal ids are prefixed per
+    icon so gradients and clip paths from different icons can't collide.
+    """
+    parts, views, entries = [], [], {}
+    y = 0.0
+    for path in paths:
+        key = _icon_key(family, path)
+        with open(path, "r", encoding="utf-8") as f:
+            svg = XML_PROLOG_RE.sub("", f.read()).strip()
+        root = SVG_ROOT_RE.search(svg)
+        size = read_image_size(path)
+        if root is None or size is None:
+            logger.warning("Cannot add SVG icon to sprite sheet: %s", path)
+            continue
+        w, h = size
+        viewbox = VIEWBOX_RE.search(root.group(0))
+        # Presentation attributes on the root (fill, preserveAspectRatio, ...) still apply
+        root_attrs = "".join(
+            f" {k}={v}" for k, v in ATTR_RE.findall(root.group(0))
+            if k.lower() not in SVG_PLACEMENT_ATTRS and not k.lower().startswith("xmlns")
+        )
+        ids = {m.group(2) for m in SVG_ID_RE.finditer(svg)}
+        body = svg[root.end():]
+        body = SVG_CLOSE_RE.sub("", body)
+        for old in sorted(ids, key=len, reverse=True):
+            body = re.sub(rf'(["\'#(])({re.escape(old)})(?=["\')\s])', rf"\g<1>{key}-\2", body)
+        parts.append(
+            f'<svg id="{key}-icon" x="0" y="{y:g}" width="{w}" height="{h}"'
+            f' viewBox="{viewbox.group(1) if viewbox else f"0 0 {w} {h}"}"{root_attrs}>{body}</svg>'
+        )
+        views.append(f'<view id="{key}" viewBox="0 {y:g} {w} {h}"/>')
+        entries[path] = {"kind": "view", "view": key, "width": height // 2, "height": height // 2}
+        y += h
+
+    if not entries:
+        return {}
+    sheet = (
+        '<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink">'
+        + "".join(views) + "".join(parts) + "</svg>\n"
+    )
+    sheet_path = _write_hashed(sheet.encode("utf-8"), family, ".svg", sprite_dir)
+    sheet_url = "/" + os.path.relpath(sheet_path, site_root).replace(os.sep, "/")
+    for entry in entries.values():
+        entry["src"] = f"{sheet_url}#{entry.pop('view')}"
+    return entries
+
+
+def build_icon_sprites(
+    families: Dict[str, Dict[str, Any]] = ICON_FAMILIES,
+    sprite_dir: str = SPRITE_DIR,
+    site_root: str = SITE_ROOT,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Pack each icon family into a single content-hashed sheet under `sprite_dir`
+    and return {icon file path: entry} for apply_icon_sprites().
+
+    Raster icons are resized to their cell size and packed into one WebP sheet
+    per family (needs Pillow; without it they are left as separate files).
+    Larger SVG icons in square families go into an SVG sheet with one <view>
+    per icon. Icons of at most INLINE_MAX_BYTES are inlined as data: URIs.
+    Sheets are only rebuilt when an icon file changes; stale sheets are removed.
+    """
+    global _icons
+
+    icon_paths = {
+        family: sorted(
+            os.path.normpath(p) for p in glob.glob(os.path.join(site_root, spec["dir"], "*"))
+            if os.path.splitext(p)[1].lower() in RASTER_EXTENSIONS | {".svg"}
+        )
+        for family, spec in families.items()
+    }
+    state_key = fingerprint(
+        [families, INLINE_MAX_BYTES, SHEET_MAX_WIDTH, SHEET_QUALITY]
+        + [(p, file_stat_key(p)) for paths in icon_paths.values() for p in paths]
+    )
+    cache = load_cache("icon_sprites")
+    sheets_exist = all(os.path.isfile(os.path.join(site_root, s.lstrip("/"))) for s in cache.get("sheets", []))
+    if cache.get("key") == state_key and sheets_exist:
+        _icons = cache["icons"]
+        return _icons
+
+    try:
+        import PIL  # noqa: F401
+        have_pillow = True
+    except ImportError:
+        logger.warning("Pillow not installed — raster icons will not be packed into sprite sheets")
+        have_pillow = False
+
+    icons: Dict[str, Dict[str, Any]] = {}
+    for family, spec in families.items():
+        raster, vector = [], []
+        for path in icon_paths[family]:
+            if os.path.getsize(path) <= INLINE_MAX_BYTES:
+                icons[path] = {"kind": "inline", "src": _inline_uri(path)}
+            elif path.lower().endswith(".svg"):
+                if spec["square"]:
+                    vector.append(path)
+            elif have_pillow:
+                raster.append(path)
+        if raster:
+            icons.update(_build_raster_sheet(family, raster, spec["height"], spec["square"], sprite_dir, site_root))
+        if vector:
+            icons.update(_build_svg_sheet(family, vector, spec["height"], sprite_dir, site_root))
+
+    sheets = sorted({e.get("sheet") or e["src"].split("#")[0] for e in icons.values() if e["kind"] != "inline"})
+    for old in glob.glob(os.path.join(site_root, sprite_dir, "*")):
+        if "/" + os.path.relpath(old, site_root).replace(os.sep, "/") not in sheets:
+            os.remove(old)
+
+    save_cache("icon_sprites", {"key": state_key, "sheets": sheets, "icons": icons})
+    logger.info("Built icon sprites: %d icons in %d sheet(s), %d inlined",
+                len(icons), len(sheets), sum(e["kind"] == "inline" for e in icons.values()))
+    _icons = icons
+    return icons
+
+
+def _sprite_css(entries: List[Dict[str, Any]]) -> str:
+    rules = [".icon-sprite{background-repeat:no-repeat}"]
+    for sheet in sorted({e["sheet"] for e in entries}):
+        classes = sorted({e["class"] for e in entries if e["sheet"] == sheet})
+        rules.append(",".join(f".{c}" for c in classes) + f"{{background-image:url({sheet})}}")
+    for e in sorted(entries, key=lambda e: e["class"]):
+        rules.append(
+            f".{e['class']}{{background-size:{e['size'][0]:.4g}% {e['size'][1]:.4g}%;"
+            f"background-position:{e['position'][0]:.4g}% {e['position'][1]:.4g}%}}"
+        )
+    return "".join(rules)
+
+
+def _set_attr(tag: str, name: str, value: str) -> str:
+    """Set (or replace) one double-quoted attribute on an HTML start tag."""
+    for m in ATTR_RE.finditer(tag):
+        if m.group(1).lower() == name:
+            return tag[:m.start(2)] + f'"{value}"' + tag[m.end(2):]
+    if tag.endswith("/>"):
+        return tag[:-2].rstrip() + f' {name}="{value}" />'
+    return tag[:-1].rstrip() + f' {name}="{value}">'
+
+
+def icon_sprite_rewriter(page_path: str, site_root: str = SITE_ROOT) -> Tuple[Callable[[str], str], Callable[[], str]]:
+    """
+    The two halves of apply_icon_sprites(), for pages written a chunk at a
+    time: (rewrite(html) -> html, applied to each chunk in turn, and style(),
+    returning the <style> block for every sprite icon rewritten so far, or "").
+    """
+    icons = _icons if _icons is not None else build_icon_sprites(site_root=site_root)
+    used: Dict[str, Dict[str, Any]] = {}
+
+    def _rewrite(m: re.Match) -> str:
+        tag = m.group(0)
+        attrs = {k.lower(): v[1:-1] for k, v in ATTR_RE.findall(tag)}
+        path = resolve_local_path(attrs.get("src", ""), page_path, site_root)
+        entry = icons.get(path) if path else None
+        if entry is None:
+            return tag
+
+        if entry["kind"] == "sprite":
+            used[entry["class"]] = entry
+            placeholder = (
+                "data:image/svg+xml,%3Csvg%20xmlns=%27http://www.w3.org/2000/svg%27"
+                f"%20width=%27{entry['width']}%27%20height=%27{entry['height']}%27/%3E"
+            )
+            tag = _set_attr(tag, "src", placeholder)
+            classes = attrs.get("class", "").split() + ["icon-sprite", entry["class"]]
+            tag = _set_attr(tag, "class", " ".join(classes))
+        else:
+            tag = _set_attr(tag, "src", entry["src"])
+        if entry["kind"] != "inline" and "width" not in attrs and "height" not in attrs:
+            tag = _set_attr(_set_attr(tag, "width", str(entry["width"])), "height", str(entry["height"]))
+        return tag
+
+    def _style() -> str:
+        return f"<style>{_sprite_css(list(used.values()))}</style>" if used else ""
+
+    return (lambda html: IMG_TAG_RE.sub(_rewrite, html)), _style
+
+
+def insert_head_style(html: str, style: str) -> str:
+    """Insert a <style> block on its own line just before </head>."""
+    head_close = re.search(r"^([ \t]*)</head>", html, re.IGNORECASE | re.MULTILINE)
+    if head_close:
+        indent = head_close.group(1)
+        return html[:head_close.start()] + f"{indent}    {style}\n" + html[head_close.start():]
+    return style + html
+
+
+def apply_icon_sprites(html: str, page_path: str, site_root: str = SITE_ROOT) -> str:
+    """
+    Point every <img> of a sprited icon at its sheet (or inline data: URI).
+
+    Sheet icons keep their <img> (and alt text and CSS sizing): the src becomes
+    a tiny transparent SVG of the icon's aspect ratio and the icon is drawn as
+    a background from the sheet, via CSS inlined into the page's <head> (only
+    rules for icons on that page). Run before annotate_images().
+    """
+    rewrite, style = icon_sprite_rewriter(page_path, site_root)
+    html = rewrite(html)
+    css = style()
+    return insert_head_style(html, css) if css else html
@@ -0,0 +1,335 @@
+import os
+import re
+import io
+import base64
+import struct
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+from builder_files.util.build_cache import load_cache, save_cache, file_stat_key
+
+logger = logging.getLogger(__name__)
+
+SITE_ROOT = "."
+
+# Images smaller than this on disk don't get a blurred placeholder; they arrive
+# quickly enough that the extra inline bytes aren't worth it.
+PLACEHOLDER_MIN_BYTES = 20 * 1024
+PLACEHOLDER_SIZE = 16
+# Inline blurred placeholders for large lazy-loaded images (no-op without Pillow)
+IMAGE_PLACEHOLDERS = True
+
+IMG_TAG_RE = re.compile(r"<img\b[^>]*>", re.IGNORECASE | re.DOTALL)
+ATTR_RE = re.compile(r'([a-zA-Z_:][-\w:.]*)\s*=\s*("[^"]*"|\'[^\']*\')')
+SVG_ROOT_RE = re.compile(r"<svg\b[^>]*>", re.IGNORECASE | re.DOTALL)
+SVG_LENGTH_RE = re.compile(r"^\s*([0-9]*\.?[0-9]+)\s*(px)?\s*$")
+
+# path -> [mtime_ns, size, width, height, placeholder]; loaded lazily. The
+# placeholder slot is None until computed and "" when the image doesn't get one.
+_size_cache: Optional[Dict[str, list]] = None
+_size_cache_dirty = False
+
+
+# ---------------------------------------------------------------------------
+# Header parsers — each reads only as many bytes as it needs
+# ---------------------------------------------------------------------------
+
+def _png_size(f, head: bytes) -> Optional[Tuple[int, int]]:
+    # 8-byte signature, then the IHDR chunk: length, type, width, height
+    if head[12:16] != b"IHDR":
+        return None
+    return struct.unpack(">II", head[16:24])
+
+
+def _gif_size(f, head: bytes) -> Optional[Tuple[int, int]]:
+    return struct.unpack("<HH", head[6:10])
+
+
+def _webp_size(f, head: bytes) -> Optional[Tuple[int, int]]:
+    chunk = head[12:16]
+    if chunk == b"VP8 ":
+        # lossy: 3-byte frame tag, 3-byte start code, then 14-bit width/height
+        w, h = struct.unpack("<HH", head[26:30])
+        return w & 0x3FFF, h & 0x3FFF
+    if chunk == b"VP8L":
+        b = head[21:25]
+        w = 1 + (((b[1] & 0x3F) << 8) | b[0])
+        h = 1 + (((b[3] & 0xF) << 10) | (b[2] << 2) | ((b[1] & 0xC0) >> 6))
+        return w, h
+    if chunk == b"VP8X":
+        w = 1 + int.from_bytes(head[24:27], "little")
+        h = 1 + int.from_bytes(head[27:30], "little")
+        return w, h
+    return None
+
+
+def _jpeg_size(f, head: bytes) -> Optional[Tuple[int, int]]:
+    # Walk the marker segments until a start-of-frame (SOFn) marker
+    f.seek(2)
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        code = marker[1]
+        while code == 0xFF:  # fill bytes
+            code = f.read(1)[0]
+        if code in (0xD8, 0x01) or 0xD0 <= code <= 0xD7:
+            continue
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack(">H", length_bytes)[0]
+        if code in (0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF):
+            data = f.read(5)
+            h, w = struct.unpack(">HH", data[1:5])
+            return w, h
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def _svg_length(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    m = SVG_LENGTH_RE.match(value)
+    return float(m.group(1)) if m else None
+
+
+def _svg_size(f, head: bytes) -> Optional[Tuple[int, int]]:
+    f.seek(0)
+    text = f.read(8192).decode("utf-8", errors="ignore")
+    m = SVG_ROOT_RE.search(text)
+    if not m:
+        return None
+    attrs = {k.lower(): v[1:-1] for k, v in ATTR_RE.findall(m.group(0))}
+    w = _svg_length(attrs.get("width"))
+    h = _svg_length(attrs.get("height"))
+    if w and h:
+        return round(w), round(h)
+    view_box = attrs.get("viewbox", "").replace(",", " ").split()
+    if len(view_box) == 4:
+        try:
+            vw, vh = float(view_box[2]), float(view_box[3])
+        except ValueError:
+            return None
+        if vw > 0 and vh > 0:
+            return round(vw), round(vh)
+    return None
+
+
+def read_image_size(path: str) -> Optional[Tuple[int, int]]:
+    """
+    Return (width, height) of a PNG, JPEG, GIF, WebP or SVG file by reading its
+    header only (the image data is never decoded). Returns None if unknown.
+    """
+    try:
+        with open(path, "rb") as f:
+            head = f.read(32)
+            if head.startswith(b"\x89PNG\r\n\x1a\n"):
+                size = _png_size(f, head)
+            elif head[:6] in (b"GIF87a", b"GIF89a"):
+                size = _gif_size(f, head)
+            elif head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+                size = _webp_size(f, head)
+            elif head[:2] == b"\xff\xd8":
+                size = _jpeg_size(f, head)
+            elif path.lower().endswith(".svg"):
+                size = _svg_size(f, head)
+            else:
+                size = None
+    except (OSError, struct.error, IndexError):
+        logger.warning("Could not read image header: %s", path)
+        return None
+    if size and size[0] > 0 and size[1] > 0:
+        return int(size[0]), int(size[1])
+    return None
+
+
+def _make_placeholder(path: str) -> Optional[str]:
+    """
+    Return a tiny blurred data: URI preview of a raster image (requires Pillow),
+    "" if the image shouldn't get one (e.g. it has transparency, which would let
+    the preview show through), or None if Pillow isn't installed.
+    """
+    try:
+        from PIL import Image, ImageFilter
+    except ImportError:
+        logger.debug("Pillow not installed — skipping image placeholders")
+        return None
+    try:
+        with Image.open(path) as im:
+            if im.mode in ("RGBA", "LA") or "transparency" in im.info:
+                return ""
+            im = im.convert("RGB")
+            im.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+            im = im.filter(ImageFilter.GaussianBlur(1))
+            buf = io.BytesIO()
+            im.save(buf, format="WEBP", quality=30)
+    except Exception:
+        logger.warning("Could not generate placeholder for %s", path)
+        return ""
+    return "data:image/webp;base64," + base64.b64encode(buf.getvalue()).decode("ascii")
+
+
+# ---------------------------------------------------------------------------
+# Cached lookups
+# ---------------------------------------------------------------------------
+
+def _get_cache() -> Dict[str, list]:
+    global _size_cache
+    if _size_cache is None:
+        _size_cache = load_cache("image_sizes")
+    return _size_cache
+
+
+def flush_image_cache() -> None:
+    """Persist newly measured image sizes to the build cache."""
+    global _size_cache_dirty
+    if _size_cache is not None and _size_cache_dirty:
+        save_cache("image_sizes", _size_cache)
+        _size_cache_dirty = False
+
+
+def _cached_entry(path: str, want_placeholder: bool) -> Optional[list]:
+    global _size_cache_dirty
+    stat_key = file_stat_key(path)
+    if stat_key is None:
+        return None
+    cache = _get_cache()
+    entry = cache.get(path)
+    if entry is None or entry[:2] != stat_key:
+        size = read_image_size(path)
+        entry = stat_key + (list(size) if size else [None, None]) + [None]
+        cache[path] = entry
+        _size_cache_dirty = True
+    if (
+        want_placeholder
+        and entry[4] is None
+        and entry[2] is not None
+        and not path.lower().endswith(".svg")
+        and stat_key[1] >= PLACEHOLDER_MIN_BYTES
+    ):
+        entry[4] = _make_placeholder(path)
+        _size_cache_dirty = True
+    return entry
+
+
+def get_image_size(path: str) -> Optional[Tuple[int, int]]:
+    """Return the cached (width, height) of a local image file, keyed by path and mtime."""
+    entry = _cached_entry(path, want_placeholder=False)
+    if entry is None or entry[2] is None:
+        return None
+    return entry[2], entry[3]
+
+
+def resolve_local_path(src: str, page_path: str, site_root: str = SITE_ROOT) -> Optional[str]:
+    """
+    Map an <img src> as written in a page to a file on disk. Root-relative URLs
+    resolve against `site_root`, relative ones against the page's directory.
+    Query strings and fragments are ignored. Remote and data: URLs return None.
+    """
+    parts = urlsplit(src)
+    if parts.scheme or parts.netloc or not parts.path:
+        return None
+    path = unquote(parts.path)
+    if path.startswith("/"):
+        full = os.path.join(site_root, path.lstrip("/"))
+    else:
+        full = os.path.join(os.path.dirname(page_path), path)
+    return os.path.normpath(full)
+
+
+def local_image_paths(html: str, page_path: str, site_root: str = SITE_ROOT) -> List[str]:
+    """Sorted paths of the local image files that the <img> tags in `html` point at."""
+    paths = set()
+    for tag in IMG_TAG_RE.findall(html):
+        attrs = {k.lower(): v[1:-1] for k, v in ATTR_RE.findall(tag)}
+        local_path = resolve_local_path(attrs["src"], page_path, site_root) if attrs.get("src") else None
+        if local_path and os.path.isfile(local_path):
+            paths.add(local_path)
+    return sorted(paths)
+
+
+# ---------------------------------------------------------------------------
+# HTML rewriting
+# ---------------------------------------------------------------------------
+
+def _add_attrs(tag: str, attrs: str) -> str:
+    if tag.endswith("/>"):
+        return tag[:-2].rstrip() + attrs + " />"
+    return tag[:-1].rstrip() + attrs + ">"
+
+
+def image_annotator(
+    page_path: str,
+    eager_count: Optional[int] = 1,
+    placeholders: bool = IMAGE_PLACEHOLDERS,
+    site_root: str = SITE_ROOT,
+) -> Callable[[str], str]:
+    """
+    Return a function applying annotate_images() to a page one chunk at a time,
+    in page order (the eager/lazy count carries over between chunks). Call
+    flush_image_cache() once the page is done.
+    """
+    counter = {"defaulted": 0}
+
+    def _rewrite(m: re.Match) -> str:
+        tag = m.group(0)
+        attrs = {k.lower(): v[1:-1] for k, v in ATTR_RE.findall(tag)}
+        extra = ""
+
+        loading = attrs.get("loading")
+        if loading is None:
+            eager = eager_count is None or counter["defaulted"] < eager_count
+            counter["defaulted"] += 1
+            loading = "eager" if eager else "lazy"
+            extra += f' loading="{loading}"'
+
+        if "decoding" not in attrs:
+            extra += ' decoding="async"'
+
+        src = attrs.get("src", "")
+        local_path = resolve_local_path(src, page_path, site_root) if src else None
+        if local_path:
+            want_placeholder = placeholders and loading == "lazy" and "style" not in attrs
+            entry = _cached_entry(local_path, want_placeholder)
+            if entry is None:
+                logger.warning("Image not found for %s: %s", page_path, src)
+            else:
+                if entry[2] is not None and "width" not in attrs and "height" not in attrs:
+                    extra += f' width="{entry[2]}" height="{entry[3]}"'
+                if want_placeholder and entry[4]:
+                    extra += (
+                        ' style="background-size:cover;background-position:center;'
+                        f'background-image:url({entry[4]})"'
+                    )
+
+        return _add_attrs(tag, extra) if extra else tag
+
+    return lambda html: IMG_TAG_RE.sub(_rewrite, html)
+
+
+def annotate_images(
+    html: str,
+    page_path: str,
+    eager_count: Optional[int] = 1,
+    placeholders: bool = IMAGE_PLACEHOLDERS,
+    site_root: str = SITE_ROOT,
+) -> str:
+    """
+    Add intrinsic `width`/`height`, `decoding="async"` and a `loading` hint to
+    every <img> in `html` so the browser can reserve space before images arrive.
+
+    Args:
+        html: rendered page (or page fragment).
+        page_path: output path of the page, used to resolve relative `src`s.
+        eager_count: the first N images without an explicit `loading` attribute
+                     load eagerly, the rest lazily. None makes every image eager
+                     (used for print pages, which are rendered in one go).
+        placeholders: if True, large raster images that load lazily get a tiny
+                      blurred preview inlined as a CSS background (needs Pillow).
+
+    Attributes already present in the markup are never overwritten.
+    """
+    result = image_annotator(page_path, eager_count, placeholders, site_root)(html)
+    flush_image_cache()
+    return result
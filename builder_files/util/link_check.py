@@ -0,0 +1,180 @@
+import os
+import re
+import glob
+import html as html_module
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import unquote, urlsplit
+
+from builder_files.util.images import ATTR_RE, resolve_local_path
+from builder_files.util.page_weight import PAGE_TYPES
+
+logger = logging.getLogger(__name__)
+
+SITE_ROOT = "."
+# Not part of the published site; never indexed
+INDEX_EXCLUDED_DIRS = {"builder_files", "build_reports", "venv", "node_modules", "__pycache__"}
+# Below this many pages parsing in one process beats starting a pool
+PARALLEL_MIN_PAGES = 16
+
+# Attributes whose value is a URL the browser will request or navigate to
+URL_ATTRS = {"href", "src", "poster", "data"}
+SRCSET_ATTRS = {"srcset", "imagesrcset"}
+# <link rel> values whose href is an origin, not a resource
+ORIGIN_LINK_RELS = {"preconnect", "dns-prefetch"}
+IGNORED_SCHEMES = {"mailto", "tel", "javascript", "data", "blob", "about"}
+# Referenced files known to be missing from the repository (content still to be
+# added). Reported as warnings so anything newly broken still fails the build;
+# remove an entry once its file exists. The content validation uses the same list.
+KNOWN_MISSING = {
+    "/resource/documents/Majdi_Jaigirdar_Computer_Science_NEA.pdf",
+    "/resource/articles/a-level-cs-nea-school-register-system-for-lower-income-countries/images/image1.png",
+    # simple-pykv's brand.large_image (relative to the projects page); not shown on any page yet
+    "/projects/assets/simple-pykv-logo.png",
+}
+
+TAG_RE = re.compile(r"<([a-zA-Z][a-zA-Z0-9-]*)\b([^>]*)>", re.DOTALL)
+COMMENT_RE = re.compile(r"<!--.*?-->", re.DOTALL)
+# Inline script/style bodies hold code, not markup; the opening tag is kept for <script src>
+RAW_TEXT_RE = re.compile(r"(<(script|style)\b[^>]*>).*?</\2\s*>", re.IGNORECASE | re.DOTALL)
+
+
+class BrokenLinkError(Exception):
+    """Raised when built pages reference files or anchors that don't exist."""
+
+
+def build_path_index(site_root: str = SITE_ROOT) -> Tuple[Set[str], Set[str]]:
+    """
+    Walk the site once and return (files, directories) as site-relative POSIX
+    paths ("" is the root directory). Every lookup afterwards is a set lookup.
+    """
+    files: Set[str] = set()
+    dirs: Set[str] = {""}
+    for root, subdirs, names in os.walk(site_root):
+        subdirs[:] = [d for d in subdirs if not d.startswith(".") and d not in INDEX_EXCLUDED_DIRS]
+        rel_root = os.path.relpath(root, site_root).replace(os.sep, "/")
+        prefix = "" if rel_root == "." else rel_root + "/"
+        dirs.update(prefix + d for d in subdirs)
+        files.update(prefix + n for n in names)
+    return files, dirs
+
+
+def _srcset_urls(value: str) -> List[str]:
+    return [candidate.split()[0] for candidate in value.split(",") if candidate.strip()]
+
+
+def extract_references(page_html: str) -> Tuple[List[Tuple[str, str]], Set[str]]:
+    """
+    Return ([(attribute, url), ...], {element ids}) for one page. Only markup is
+    scanned: comments and inline script/style bodies are skipped.
+    """
+    markup = RAW_TEXT_RE.sub(r"\1", COMMENT_RE.sub("", page_html))
+    refs: List[Tuple[str, str]] = []
+    ids: Set[str] = set()
+    for match in TAG_RE.finditer(markup):
+        tag = match.group(1).lower()
+        attrs = {m.group(1).lower(): html_module.unescape(m.group(2)[1:-1]) for m in ATTR_RE.finditer(match.group(2))}
+        if "id" in attrs:
+            ids.add(attrs["id"])
+        if tag == "a" and "name" in attrs:
+            ids.add(attrs["name"])
+        if tag == "link" and ORIGIN_LINK_RELS & set(attrs.get("rel", "").lower().split()):
+            continue
+        for name, value in attrs.items():
+            if name in URL_ATTRS and value.strip():
+                refs.append((name, value.strip()))
+            elif name in SRCSET_ATTRS:
+                refs.extend((name, url) for url in _srcset_urls(value))
+    return refs, ids
+
+
+def _parse_page(page_path: str) -> Tuple[str, List[Tuple[str, str]], Set[str]]:
+    """Worker: read and scan one built page."""
+    with open(page_path, "r", encoding="utf-8") as f:
+        refs, ids = extract_references(f.read())
+    return page_path, refs, ids
+
+
+def _resolve_page(rel: str, files: Set[str], dirs: Set[str]) -> Optional[str]:
+    """Map a site-relative path to the file a static host would serve for it, or None."""
+    if rel in files:
+        return rel
+    if rel in dirs or rel == ".":
+        index = "index.html" if rel in ("", ".") else f"{rel}/index.html"
+        return index if index in files else None
+    if f"{rel}.html" in files:
+        return f"{rel}.html"
+    return None
+
+
+def check_links(
+    site_root: str = SITE_ROOT,
+    max_workers: Optional[int] = None,
+    fail_on_broken: bool = True,
+) -> List[str]:
+    """
+    Check every reference in the built pages: `href`, `src`, `srcset` (and
+    `poster`/`data`) values pointing at this site must resolve to a file (or a
+    directory with an index.html), and `#fragment`s must match an element id on
+    the target page. Remote URLs are not checked.
+
+    The site is indexed once up front and pages are parsed in a pool of worker
+    processes, so each reference costs a set lookup. Run after every page is
+    built. Returns the problems found; raises BrokenLinkError listing them all
+    if there are any and `fail_on_broken` is True.
+    """
+    files, dirs = build_path_index(site_root)
+    pages = []
+    for _, pattern in PAGE_TYPES:
+        pages.extend(sorted(glob.glob(os.path.join(site_root, pattern))))
+
+    workers = min(len(pages), max_workers or os.cpu_count() or 1)
+    if workers <= 1 or len(pages) < PARALLEL_MIN_PAGES:
+        parsed = [_parse_page(p) for p in pages]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parsed = list(pool.map(_parse_page, pages, chunksize=max(1, len(pages) // (workers * 4))))
+
+    page_ids: Dict[str, Set[str]] = {
+        os.path.relpath(path, site_root).replace(os.sep, "/"): ids for path, _, ids in parsed
+    }
+
+    problems: List[str] = []
+    known: List[str] = []
+    checked = 0
+    for page_path, refs, ids in parsed:
+        page_rel = os.path.relpath(page_path, site_root).replace(os.sep, "/")
+        for attr, url in refs:
+            parts = urlsplit(url)
+            if parts.scheme in IGNORED_SCHEMES or (parts.scheme or parts.netloc):
+                continue
+            checked += 1
+            if parts.path:
+                full = resolve_local_path(url, page_path, site_root)
+                rel = os.path.relpath(full, site_root).replace(os.sep, "/")
+                if rel.startswith("../"):
+                    problems.append(f"{page_rel}: {attr}={url!r} points outside the site")
+                    continue
+                target = _resolve_page(rel, files, dirs)
+                if target is None:
+                    (known if parts.path in KNOWN_MISSING else problems).append(f"{page_rel}: {attr}={url!r} not found")
+                    continue
+            else:
+                target = page_rel
+
+            fragment = unquote(parts.fragment)
+            if fragment and target in page_ids and fragment not in page_ids[target]:
+                problems.append(f"{page_rel}: {attr}={url!r} has no element with id '{fragment}'")
+
+    for message in known:
+        logger.warning("Known missing file: %s", message)
+    for message in problems:
+        logger.error("Broken reference: %s", message)
+    logger.info(
+        "Checked %d internal references in %d pages (%d files indexed): %d broken",
+        checked, len(pages), len(files), len(problems),
+    )
+    if problems and fail_on_broken:
+        raise BrokenLinkError(f"{len(problems)} broken internal reference(s):\n  " + "\n  ".join(problems))
+    return problems
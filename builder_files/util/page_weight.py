@@ -0,0 +1,353 @@
+import os
+import re
+import glob
+import gzip
+import fnmatch
+import json
+import html as html_module
+import logging
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+from builder_files.util.images import ATTR_RE, resolve_local_path
+from builder_files.util.build_cache import load_cache, save_cache, file_stat_key
+
+try:
+    import brotli
+except ImportError:  # optional: brotli sizes are reported only if it is installed
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+SITE_ROOT = "."
+REPORT_DIR = "build_reports"
+REPORT_FILE = "page_weight.json"
+# An article's PDF download, next to its page
+ARTICLE_PDF = "article.pdf"
+
+# (page type, glob of output pages), first match wins
+PAGE_TYPES = [
+    ("home", "index.html"),
+    ("articles_list", "articles/index.html"),
+    ("article", "articles/*/index.html"),
+    ("projects", "projects/index.html"),
+    ("skills", "skills/index.html"),
+    ("error", "404.html"),
+]
+
+KB = 1024
+# Budgets per page type, in bytes of estimated transfer size (text resources
+# compressed, everything else raw). "total" is the HTML plus every same-site
+# asset it loads, transitively through CSS, including images with
+# loading="lazy"; "initial" is the same without the lazy images (what the
+# first render waits for); the other keys cap a single category. Keys not
+# listed are unbudgeted. The article PDF is a separate download, so it has its
+# own (raw) cap and is not part of "total".
+BUDGETS: Dict[str, Dict[str, int]] = {
+    "home": {"total": 600 * KB, "html": 20 * KB},
+    "articles_list": {"total": 600 * KB, "html": 20 * KB},
+    "article": {"total": 300 * KB, "html": 30 * KB, "pdf": 1024 * KB},
+    "projects": {"total": 800 * KB, "html": 20 * KB},
+    "skills": {"total": 800 * KB, "html": 20 * KB},
+    "error": {"total": 200 * KB},
+}
+CATEGORIES = ("html", "css", "js", "image", "font", "other")
+EXTENSION_CATEGORIES = {
+    ".css": "css",
+    ".js": "js",
+    ".mjs": "js",
+    ".png": "image", ".jpg": "image", ".jpeg": "image", ".gif": "image",
+    ".webp": "image", ".avif": "image", ".svg": "image", ".ico": "image",
+    ".woff2": "font", ".woff": "font", ".ttf": "font", ".otf": "font",
+}
+# Formats a host compresses on the fly (PNG/JPEG/WebP/WOFF2 are already compressed)
+COMPRESSIBLE_EXTENSIONS = {".html", ".css", ".js", ".mjs", ".json", ".svg", ".ttf", ".otf", ".xml"}
+
+ASSET_TAG_RE = re.compile(r"<(link|script|img|source)\b[^>]*>", re.IGNORECASE | re.DOTALL)
+STYLE_BLOCK_RE = re.compile(r"<style\b[^>]*>(.*?)</style>", re.IGNORECASE | re.DOTALL)
+STYLE_ATTR_RE = re.compile(r'\bstyle\s*=\s*"([^"]*)"', re.IGNORECASE)
+CSS_REF_RE = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)|@import\s+(['"])([^'"]+)\3""", re.IGNORECASE)
+CSS_IMPORT_RE = re.compile(r"""@import\s+(?:url\(\s*)?(['"]?)([^'")\s;]+)\1""", re.IGNORECASE)
+CSS_RULE_RE = re.compile(r"([^{}]+)\{([^{}]*)\}")
+SELECTOR_TOKEN_RE = re.compile(r"[.#][\w-]+")
+CLASS_ATTR_RE = re.compile(r'\bclass\s*=\s*"([^"]*)"', re.IGNORECASE)
+ID_ATTR_RE = re.compile(r'\bid\s*=\s*"([^"]*)"', re.IGNORECASE)
+# rel values whose href is fetched as part of loading the page
+FETCHED_LINK_RELS = {"stylesheet", "icon", "shortcut", "apple-touch-icon", "manifest", "modulepreload"}
+
+
+class BudgetExceededError(Exception):
+    """Raised when one or more pages are over their page-weight budget."""
+
+
+def _attrs(tag: str) -> Dict[str, str]:
+    return {k.lower(): html_module.unescape(v[1:-1]) for k, v in ATTR_RE.findall(tag)}
+
+
+def asset_category(path: str) -> str:
+    """Budget category of a file (html, css, js, image, font or other), by extension."""
+    return EXTENSION_CATEGORIES.get(os.path.splitext(path)[1].lower(), "other")
+
+
+def _file_sizes(path: str, size_cache: Dict[str, list]) -> Dict[str, int]:
+    """Raw, gzip and (if available) brotli sizes of `path`, cached by mtime/size."""
+    stat_key = file_stat_key(path)
+    entry = size_cache.get(path)
+    if entry is not None and entry[0] == stat_key:
+        return entry[1]
+
+    with open(path, "rb") as f:
+        data = f.read()
+    sizes = {"raw": len(data)}
+    if os.path.splitext(path)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+        sizes["gzip"] = len(gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            sizes["br"] = len(brotli.compress(data, quality=11))
+    size_cache[path] = [stat_key, sizes]
+    return sizes
+
+
+def page_type_of(rel_path: str) -> Optional[str]:
+    """The PAGE_TYPES name a site-relative page path falls under, or None."""
+    for page_type, pattern in PAGE_TYPES:
+        # fnmatch's "*" also matches "/", so compare directory depth too
+        if fnmatch.fnmatch(rel_path, pattern) and pattern.count("/") == rel_path.count("/"):
+            return page_type
+    return None
+
+
+def _srcset_urls(srcset: str) -> List[str]:
+    return [c.strip().split()[0] for c in srcset.split(",") if c.strip()]
+
+
+def _css_refs(css: str) -> List[str]:
+    return [m.group(2) or m.group(4) for m in CSS_REF_RE.finditer(css)]
+
+
+def _page_selector_tokens(html: str) -> Set[str]:
+    """".class" and "#id" tokens used anywhere in the page."""
+    tokens = {"." + c for value in CLASS_ATTR_RE.findall(html) for c in value.split()}
+    tokens.update("#" + i.strip() for i in ID_ATTR_RE.findall(html))
+    return tokens
+
+
+def _stylesheet_refs(css: str, page_tokens: Set[str]) -> List[str]:
+    """
+    URLs a stylesheet makes the browser fetch for this page: @imports, @font-face
+    sources, and url()s in rules whose selector can match the page. A selector
+    group matches if every class and id it names occurs in the page — a cheap
+    stand-in for real selector matching, good enough to leave out background
+    images that belong to other pages.
+    """
+    refs = [m.group(2) for m in CSS_IMPORT_RE.finditer(css)]
+    for selector, body in CSS_RULE_RE.findall(css):
+        urls = _css_refs(body)
+        if not urls:
+            continue
+        selector = selector.strip()
+        if selector.lower().startswith("@font-face") or any(
+            set(SELECTOR_TOKEN_RE.findall(group)) <= page_tokens for group in selector.split(",")
+        ):
+            refs.extend(urls)
+    return refs
+
+
+def page_assets(html: str, page_path: str, site_root: str = SITE_ROOT) -> Tuple[List[str], List[str], List[str]]:
+    """
+    Return (local asset paths, lazy local image paths, external URLs) for one
+    page.
+
+    Local assets are what the page loads up front, including what its
+    stylesheets pull in, recursively (@imports, fonts, and background images
+    of rules that match the page). Images only referenced by `loading="lazy"`
+    <img>s are listed separately: they are fetched as the reader scrolls, so
+    they count towards the page's weight but not its initial load. Each file
+    appears once, in first-reference order.
+    """
+    local: List[str] = []
+    lazy: List[str] = []
+    external: List[str] = []
+    page_tokens = _page_selector_tokens(html)
+
+    def _add(url: str, base_path: str, deferred: bool = False) -> None:
+        if not url or url.startswith(("data:", "#", "mailto:", "javascript:")):
+            return
+        parts = urlsplit(url)
+        if parts.scheme in ("http", "https") or parts.netloc:
+            if url not in external:
+                external.append(url)
+            return
+        path = resolve_local_path(url, base_path, site_root)
+        if path is None or path in local or not os.path.isfile(path):
+            return
+        if deferred:
+            if path not in lazy:
+                lazy.append(path)
+            return
+        if path in lazy:
+            # Also loaded eagerly elsewhere on the page
+            lazy.remove(path)
+        local.append(path)
+        if path.endswith(".css"):
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                css = f.read()
+            for ref in _stylesheet_refs(css, page_tokens):
+                _add(ref, path)
+
+    for m in ASSET_TAG_RE.finditer(html):
+        name = m.group(1).lower()
+        attrs = _attrs(m.group(0))
+        if name == "link":
+            rels = set(attrs.get("rel", "").lower().split())
+            if rels & FETCHED_LINK_RELS or (rels == {"preload"} and attrs.get("as") != "fetch"):
+                _add(attrs.get("href", ""), page_path)
+        else:
+            deferred = name == "img" and attrs.get("loading", "").lower() == "lazy"
+            _add(attrs.get("src", ""), page_path, deferred)
+            for url in _srcset_urls(attrs.get("srcset", "")):
+                _add(url, page_path, deferred)
+
+    for css in STYLE_BLOCK_RE.findall(html):
+        for ref in _stylesheet_refs(css, page_tokens):
+            _add(ref, page_path)
+    for style in STYLE_ATTR_RE.findall(html):
+        for ref in _css_refs(html_module.unescape(style)):
+            _add(ref, page_path)
+    return local, lazy, external
+
+
+def measure_page(page_path: str, site_root: str = SITE_ROOT, size_cache: Optional[Dict[str, list]] = None) -> Dict[str, Any]:
+    """
+    Weigh one built page: its HTML plus every same-site asset it loads,
+    grouped by category, with gzip/brotli sizes for text resources. Lazily
+    loaded images are part of the totals; "initial_compressed" leaves them
+    out, and "lazy" lists them.
+    """
+    size_cache = size_cache if size_cache is not None else {}
+    with open(page_path, "r", encoding="utf-8") as f:
+        html = f.read()
+    local, lazy, external = page_assets(html, page_path, site_root)
+    pdf_path = os.path.join(os.path.dirname(page_path), ARTICLE_PDF)
+
+    totals = {c: {"count": 0, "raw": 0, "compressed": 0} for c in CATEGORIES}
+    assets = []
+    lazy_raw = lazy_compressed = 0
+    for category, path in [("html", page_path)] + [(asset_category(p), p) for p in local + lazy]:
+        sizes = _file_sizes(path, size_cache)
+        # Transfer estimate: the best available compression for text, raw otherwise
+        compressed = min(sizes.get("br", sizes["raw"]), sizes.get("gzip", sizes["raw"]))
+        totals[category]["count"] += 1
+        totals[category]["raw"] += sizes["raw"]
+        totals[category]["compressed"] += compressed
+        if path in lazy:
+            lazy_raw, lazy_compressed = lazy_raw + sizes["raw"], lazy_compressed + compressed
+        assets.append({
+            "url": "/" + os.path.relpath(path, site_root).replace(os.sep, "/"),
+            "category": category,
+            "lazy": path in lazy,
+            **sizes,
+        })
+    total_compressed = sum(t["compressed"] for t in totals.values())
+
+    return {
+        "page": "/" + os.path.relpath(page_path, site_root).replace(os.sep, "/"),
+        "type": page_type_of(os.path.relpath(page_path, site_root).replace(os.sep, "/")),
+        "total": sum(t["raw"] for t in totals.values()),
+        "total_compressed": total_compressed,
+        "initial_compressed": total_compressed - lazy_compressed,
+        "categories": totals,
+        "lazy": {
+            "count": len(lazy),
+            "raw": lazy_raw,
+            "urls": ["/" + os.path.relpath(p, site_root).replace(os.sep, "/") for p in lazy],
+        },
+        "pdf": _file_sizes(pdf_path, size_cache)["raw"] if os.path.isfile(pdf_path) else 0,
+        "external": external,
+        "assets": assets,
+    }
+
+
+def budget_for(report: Dict[str, Any], budgets: Dict[str, Dict[str, int]] = BUDGETS) -> Dict[str, int]:
+    """The budget that applies to a page: the one for its page type."""
+    return dict(budgets.get(report["type"] or "", {}))
+
+
+def check_budgets(report: Dict[str, Any], budget: Dict[str, int]) -> List[str]:
+    """Return a message for every limit in `budget` that `report` (from measure_page) exceeds."""
+    actual = {"total": report["total_compressed"], "initial": report["initial_compressed"], "pdf": report["pdf"]}
+    actual.update({c: t["compressed"] for c, t in report["categories"].items()})
+
+    failures = []
+    for key, limit in budget.items():
+        if actual.get(key, 0) > limit:
+            failures.append(
+                f"{report['page']}: {key} {actual[key] / KB:.1f} KB exceeds the "
+                f"budget of {limit / KB:.0f} KB"
+            )
+    return failures
+
+
+def _format_table(reports: List[Dict[str, Any]]) -> List[str]:
+    header = (
+        f"{'page':<60} {'html':>8} {'css':>8} {'js':>8} {'img':>8} {'font':>8} {'total':>9} {'transfer':>9}"
+        f" {'initial':>9} {'lazy img':>9} {'pdf':>8}"
+    )
+    lines = [header, "-" * len(header)]
+    for r in reports:
+        c = r["categories"]
+        cells = [c[k]["raw"] / KB for k in ("html", "css", "js", "image", "font")]
+        page = r["page"] if len(r["page"]) <= 60 else "…" + r["page"][-59:]
+        lines.append(
+            f"{page:<60} " + " ".join(f"{v:>8.1f}" for v in cells)
+            + f" {r['total'] / KB:>9.1f} {r['total_compressed'] / KB:>9.1f} {r['initial_compressed'] / KB:>9.1f}"
+            + f" {r['lazy']['raw'] / KB:>9.1f} {r['pdf'] / KB:>8.1f}"
+        )
+    lines.append(
+        "(sizes in KB, uncompressed; transfer = estimated bytes on the wire with gzip/brotli; budgets apply to "
+        "transfer; initial = transfer without lazy img, the images loaded on scroll, which img and total include)"
+    )
+    return lines
+
+
+def build_page_weight_report(
+    site_root: str = SITE_ROOT,
+    report_dir: str = REPORT_DIR,
+    budgets: Dict[str, Dict[str, int]] = BUDGETS,
+    fail_on_budget: bool = True,
+) -> List[Dict[str, Any]]:
+    """
+    Measure every built page, write `build_reports/page_weight.json`, log a
+    summary table and check each page against the budget for its type (see
+    BUDGETS).
+
+    Run after all pages are built. Raises BudgetExceededError (after writing
+    the report) if any page is over budget and `fail_on_budget` is True.
+    """
+    size_cache = load_cache("page_weight_sizes")
+    reports = []
+    for _, pattern in PAGE_TYPES:
+        for page_path in sorted(glob.glob(os.path.join(site_root, pattern))):
+            reports.append(measure_page(page_path, site_root, size_cache))
+    save_cache("page_weight_sizes", {k: v for k, v in size_cache.items() if os.path.isfile(k)})
+
+    failures = []
+    for report in reports:
+        report["budget"] = budget_for(report, budgets)
+        report["over_budget"] = check_budgets(report, report["budget"])
+        failures.extend(report["over_budget"])
+
+    os.makedirs(report_dir, exist_ok=True)
+    report_path = os.path.join(report_dir, REPORT_FILE)
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump({"pages": reports}, f, indent=2)
+
+    for line in _format_table(reports):
+        logger.info(line)
+    logger.info("Wrote page weight report: %s (%d pages)", report_path, len(reports))
+
+    if failures:
+        for message in failures:
+            logger.error("Over budget: %s", message)
+        if fail_on_budget:
+            raise BudgetExceededError(f"{len(failures)} page-weight budget(s) exceeded; see {report_path}")
+    return reports
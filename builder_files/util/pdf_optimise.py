@@ -0,0 +1,349 @@
+import io
+import os
+import re
+import math
+import shutil
+import hashlib
+import logging
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
+
+from builder_files.util.build_cache import BUILD_CACHE_DIR, load_cache, save_cache, file_stat_key
+
+logger = logging.getLogger(__name__)
+
+# Images are resampled down to this resolution at the size they are drawn on the page
+PRINT_DPI = 150
+# Only resample when it saves at least this fraction of the pixels' width
+MIN_DOWNSCALE = 0.9
+JPEG_QUALITY = 85
+PDF_CACHE_DIR = os.path.join(BUILD_CACHE_DIR, "pdf")
+# Bump to invalidate cached outputs when the optimisation steps change
+OPTIMISER_VERSION = 1
+
+FONT_FILE_KEYS = ("/FontFile", "/FontFile2", "/FontFile3")
+# Parts of a PDF that differ on every render of the same page: the document
+# info dates and the trailer's file identifier. Blanked before hashing, so the
+# cache is keyed on what the PDF shows, not when it was written.
+VOLATILE_RE = re.compile(
+    rb"/(?:CreationDate|ModDate)\s*\((?:\\.|[^\\)])*\)"
+    rb"|/ID\s*\[\s*<[0-9A-Fa-f]*>\s*<[0-9A-Fa-f]*>\s*\]",
+    re.DOTALL,
+)
+
+Matrix = Tuple[float, float, float, float, float, float]
+IDENTITY: Matrix = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+
+def _settings_key(dpi: int, jpeg_quality: int) -> bytes:
+    return f"v{OPTIMISER_VERSION}:{dpi}:{jpeg_quality}".encode("ascii")
+
+
+def _input_digest(path: str, settings: bytes) -> str:
+    """Hash of a PDF's content and the settings, ignoring its timestamps and file id."""
+    with open(path, "rb") as f:
+        data = VOLATILE_RE.sub(b"", f.read())
+    return hashlib.sha256(settings + b"\0" + data).hexdigest()
+
+
+def _multiply(m: Matrix, n: Matrix) -> Matrix:
+    """m × n for PDF affine matrices [a b c d e f]."""
+    a, b, c, d, e, f = m
+    a2, b2, c2, d2, e2, f2 = n
+    return (
+        a * a2 + b * c2, a * b2 + b * d2,
+        c * a2 + d * c2, c * b2 + d * d2,
+        e * a2 + f * c2 + e2, e * b2 + f * d2 + f2,
+    )
+
+
+def _image_placements(pdf, container, ctm: Matrix, sizes: Dict[tuple, Tuple[float, float]], depth: int = 0) -> None:
+    """
+    Walk a page (or form XObject) content stream tracking the CTM, and record for
+    every image XObject the largest size, in points, it is drawn at.
+    """
+    import pikepdf
+
+    resources = container.get("/Resources")
+    xobjects = resources.get("/XObject") if resources is not None else None
+    if xobjects is None or depth > 8:
+        return
+
+    stack: List[Matrix] = []
+    for operands, operator in pikepdf.parse_content_stream(container):
+        op = str(operator)
+        if op == "q":
+            stack.append(ctm)
+        elif op == "Q":
+            ctm = stack.pop() if stack else IDENTITY
+        elif op == "cm" and len(operands) == 6:
+            ctm = _multiply(tuple(float(v) for v in operands), ctm)
+        elif op == "Do" and operands:
+            xobj = xobjects.get(operands[0])
+            if xobj is None:
+                continue
+            subtype = xobj.get("/Subtype")
+            if subtype == "/Image":
+                a, b, c, d = ctm[:4]
+                w, h = math.hypot(a, b), math.hypot(c, d)
+                prev = sizes.get(xobj.objgen, (0.0, 0.0))
+                sizes[xobj.objgen] = (max(prev[0], w), max(prev[1], h))
+            elif subtype == "/Form":
+                form_ctm = ctm
+                if "/Matrix" in xobj:
+                    form_ctm = _multiply(tuple(float(v) for v in xobj.Matrix), ctm)
+                _image_placements(pdf, xobj, form_ctm, sizes, depth + 1)
+
+
+def _encode_image(image) -> Tuple[bytes, str]:
+    """Encode a PIL image as the smaller of JPEG and Flate; returns (data, PDF filter name)."""
+    raw = image.tobytes()
+    flate = zlib.compress(raw, 9)
+    buf = io.BytesIO()
+    image.save(buf, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+    jpeg = buf.getvalue()
+    if len(jpeg) < len(flate):
+        return jpeg, "/DCTDecode"
+    return flate, "/FlateDecode"
+
+
+def _downsample_images(pdf, dpi: int) -> int:
+    """Resample every image drawn at more than `dpi`; returns how many were rewritten."""
+    import pikepdf
+    from PIL import Image
+
+    sizes: Dict[tuple, Tuple[float, float]] = {}
+    for page in pdf.pages:
+        _image_placements(pdf, page.obj, IDENTITY, sizes)
+
+    rewritten = 0
+    for objgen, (w_pt, h_pt) in sizes.items():
+        xobj = pdf.get_object(objgen)
+        width, height = int(xobj.Width), int(xobj.Height)
+        target_w = max(1, math.ceil(w_pt / 72 * dpi))
+        target_h = max(1, math.ceil(h_pt / 72 * dpi))
+        if target_w >= width * MIN_DOWNSCALE or target_h >= height * MIN_DOWNSCALE:
+            continue
+        if xobj.get("/ImageMask") or int(xobj.get("/BitsPerComponent", 8)) != 8:
+            continue
+
+        try:
+            image = pikepdf.PdfImage(xobj).as_pil_image()
+        except Exception:
+            logger.debug("Cannot decode image %s; left as is", objgen)
+            continue
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        image = image.resize((target_w, target_h), Image.LANCZOS)
+        data, filter_name = _encode_image(image)
+
+        # Keep an ICC profile when it still matches the component count
+        colour_space = xobj.get("/ColorSpace")
+        components = 3 if image.mode == "RGB" else 1
+        if not (isinstance(colour_space, pikepdf.Array) and colour_space[0] == "/ICCBased"
+                and int(colour_space[1].get("/N", 0)) == components):
+            colour_space = pikepdf.Name("/DeviceRGB" if components == 3 else "/DeviceGray")
+
+        xobj.write(data, filter=pikepdf.Name(filter_name))
+        xobj.Width, xobj.Height = target_w, target_h
+        xobj.ColorSpace = colour_space
+        xobj.BitsPerComponent = 8
+        for key in ("/DecodeParms", "/Decode"):
+            if key in xobj:
+                del xobj[key]
+
+        smask = xobj.get("/SMask")
+        if smask is not None:
+            mask = pikepdf.PdfImage(smask).as_pil_image().convert("L").resize((target_w, target_h), Image.LANCZOS)
+            smask.write(zlib.compress(mask.tobytes(), 9), filter=pikepdf.Name("/FlateDecode"))
+            smask.Width, smask.Height = target_w, target_h
+            if "/DecodeParms" in smask:
+                del smask["/DecodeParms"]
+        rewritten += 1
+    return rewritten
+
+
+def _dedupe_streams(pdf) -> int:
+    """
+    Point identical embedded font programs and images at a single stream object.
+    Chromium emits a separate font file per subset it creates and sometimes the
+    same bytes more than once; duplicates are dropped when the file is saved.
+    """
+    seen: Dict[bytes, object] = {}
+    replaced = 0
+
+    def _key(stream) -> bytes:
+        h = hashlib.sha256(stream.read_raw_bytes())
+        h.update(repr(sorted((k, str(v)) for k, v in stream.items() if k != "/Length")).encode("utf-8"))
+        return h.digest()
+
+    def _canonical(stream):
+        nonlocal replaced
+        k = _key(stream)
+        first = seen.setdefault(k, stream)
+        if first.objgen != stream.objgen:
+            replaced += 1
+        return first
+
+    for page in pdf.pages:
+        resources = page.obj.get("/Resources")
+        if resources is None:
+            continue
+        for font in (resources.get("/Font") or {}).values():
+            descriptors = [font.get("/FontDescriptor")]
+            descriptors += [d.get("/FontDescriptor") for d in font.get("/DescendantFonts") or []]
+            for descriptor in descriptors:
+                if descriptor is None:
+                    continue
+                for key in FONT_FILE_KEYS:
+                    if key in descriptor:
+                        descriptor[key] = _canonical(descriptor[key])
+        xobjects = resources.get("/XObject")
+        if xobjects is not None:
+            for name in list(xobjects.keys()):
+                if xobjects[name].get("/Subtype") == "/Image":
+                    xobjects[name] = _canonical(xobjects[name])
+    return replaced
+
+
+def optimise_pdf(
+    input_path: str,
+    output_path: Optional[str] = None,
+    dpi: int = PRINT_DPI,
+) -> Tuple[int, int]:
+    """
+    Shrink a PDF written by html_to_pdf(): drop duplicate font programs and
+    images, resample images to `dpi` at the size they are printed, recompress
+    streams into object streams and save linearised ("fast web view"), so
+    browsers can show the first page before the whole file has arrived.
+
+    Chromium already embeds only the glyphs each page uses, so fonts are not
+    re-subset here. The original is kept if the result is not smaller.
+    Returns (size before, size after). Requires pikepdf and Pillow.
+    """
+    import pikepdf
+
+    output_path = output_path or input_path
+    before = os.path.getsize(input_path)
+    tmp_path = f"{output_path}.tmp"
+
+    with pikepdf.open(input_path) as pdf:
+        deduped = _dedupe_streams(pdf)
+        resampled = _downsample_images(pdf, dpi)
+        pdf.remove_unreferenced_resources()
+        pdf.save(
+            tmp_path,
+            linearize=True,
+            object_stream_mode=pikepdf.ObjectStreamMode.generate,
+            compress_streams=True,
+            recompress_flate=True,
+        )
+
+    after = os.path.getsize(tmp_path)
+    if after < before:
+        os.replace(tmp_path, output_path)
+    else:
+        os.remove(tmp_path)
+        if output_path != input_path:
+            shutil.copyfile(input_path, output_path)
+        after = before
+    logger.debug("%s: %d duplicate stream(s), %d image(s) resampled", input_path, deduped, resampled)
+    return before, after
+
+
+def _optimise_cached(path: str, dpi: int, jpeg_quality: int, cache_dir: str) -> Tuple[str, int, int, bool, str]:
+    """
+    Worker: optimise `path` in place, reusing a cached result for the same
+    input content. Returns (path, size before, size after, cache hit, digest).
+    """
+    digest = _input_digest(path, _settings_key(dpi, jpeg_quality))
+    cached = os.path.join(cache_dir, f"{digest}.pdf")
+    before = os.path.getsize(path)
+    if os.path.isfile(cached):
+        shutil.copyfile(cached, path)
+        return path, before, os.path.getsize(path), True, digest
+
+    os.makedirs(cache_dir, exist_ok=True)
+    _, after = optimise_pdf(path, cached, dpi=dpi)
+    shutil.copyfile(cached, path)
+    return path, before, after, False, digest
+
+
+def _prune_cache(cache_dir: str, live: Set[str]) -> int:
+    """Delete cached outputs whose digest no published PDF has any more."""
+    if not os.path.isdir(cache_dir):
+        return 0
+    removed = 0
+    for name in os.listdir(cache_dir):
+        if os.path.splitext(name)[0] not in live:
+            os.remove(os.path.join(cache_dir, name))
+            removed += 1
+    return removed
+
+
+def optimise_pdfs(
+    paths: List[str],
+    dpi: int = PRINT_DPI,
+    max_workers: Optional[int] = None,
+    cache_dir: str = PDF_CACHE_DIR,
+) -> Dict[str, Tuple[int, int]]:
+    """
+    Optimise several PDFs in place, in a pool of worker processes.
+
+    Results are cached by a hash of the input file (and the settings) with its
+    creation/modification dates and file id left out, so re-rendering an
+    unchanged article hits the cache. Files this stage already wrote are
+    recognised by mtime/size, so re-running over unchanged PDFs costs a stat()
+    each. Cached outputs no published PDF uses any more are deleted. Does
+    nothing (with a warning) if pikepdf or Pillow is not installed. Returns
+    {path: (size before, size after)} for the files processed.
+    """
+    try:
+        import pikepdf  # noqa: F401
+        import PIL  # noqa: F401
+    except ImportError:
+        logger.warning("pikepdf/Pillow not installed — skipping PDF optimisation")
+        return {}
+
+    # path -> {"stat": mtime/size as this stage left it, "digest": its cache entry}
+    state = load_cache("pdf_optimise")
+    todo = [
+        p for p in paths
+        if os.path.isfile(p) and not (isinstance(state.get(p), dict) and state[p].get("stat") == file_stat_key(p))
+    ]
+    if not todo:
+        return {}
+
+    results: Dict[str, Tuple[int, int]] = {}
+    workers = min(len(todo), max_workers or os.cpu_count() or 1)
+
+    def _record(path: str, before: int, after: int, hit: bool, digest: str) -> None:
+        results[path] = (before, after)
+        state[path] = {"stat": file_stat_key(path), "digest": digest}
+        logger.info(
+            "Optimised PDF%s: %s (%d KB -> %d KB)",
+            " (cached)" if hit else "", path, before // 1024, after // 1024,
+        )
+
+    if workers == 1:
+        for path in todo:
+            try:
+                _record(*_optimise_cached(path, dpi, JPEG_QUALITY, cache_dir))
+            except Exception:
+                logger.exception("Failed to optimise PDF: %s", path)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_optimise_cached, p, dpi, JPEG_QUALITY, cache_dir): p for p in todo}
+            for future, path in futures.items():
+                try:
+                    _record(*future.result())
+                except Exception:
+                    logger.exception("Failed to optimise PDF: %s", path)
+
+    state = {p: s for p, s in state.items() if os.path.isfile(p) and isinstance(s, dict)}
+    save_cache("pdf_optimise", state)
+    removed = _prune_cache(cache_dir, {s["digest"] for s in state.values()})
+    if removed:
+        logger.info("Removed %d unused optimised PDF(s) from %s", removed, cache_dir)
+    return results
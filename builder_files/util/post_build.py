@@ -0,0 +1,38 @@
+import os
+from typing import Optional
+
+from builder_files.util.third_party import allowed_rules, rewrite_third_party, defer_third_party_scripts
+from builder_files.util.css_bundles import BundleCache, build_css_bundles
+from builder_files.page_constructors.service_worker import SW_OUTPUT, build_service_worker
+from builder_files.page_constructors.headers import build_headers_file
+
+SITE_ROOT = "."
+
+
+def finish_page(
+    page_html: str, page_path: str, site_root: str = SITE_ROOT, bundles: Optional[BundleCache] = None,
+) -> str:
+    """
+    One page, to be written to `page_path`, as finish_site() would leave it:
+    third-party scripts deferred and stylesheets swapped for its type's
+    bundle. For previews that don't write the page; pass `bundles` to keep
+    the built pages' tokens and the pruned bundles between calls.
+    """
+    page_rel = os.path.relpath(page_path, site_root).replace(os.sep, "/")
+    page_html = rewrite_third_party(page_html, allowed_rules(page_rel))
+    return (bundles or BundleCache(site_root)).bundle_page(page_html, page_path)
+
+
+def finish_site(site_root: str = SITE_ROOT) -> None:
+    """
+    The stages that run once every page is written, in order. The full build
+    and SiteBuilder's incremental rebuilds both end with this, so they write
+    the same output. Each stage only rewrites what changed.
+    """
+    # Rewrites the finished pages, so it comes before anything derived from their markup
+    defer_third_party_scripts(site_root)
+    # Needs every page's final markup; swaps each page's stylesheets for its type's pruned bundle
+    build_css_bundles(site_root)
+    # Last: the precache manifest is derived from everything built above
+    build_service_worker(output_path=os.path.join(site_root, SW_OUTPUT), site_root=site_root)
+    build_headers_file(site_root=site_root)
@@ -0,0 +1,160 @@
+import re
+import logging
+from collections import Counter
+from typing import Any, Dict, List
+
+import numpy as np
+from scipy import sparse
+
+from builder_files.util.catalogue import MD_ROOT, article_md_path
+from builder_files.util.front_matter import split_front_matter
+from builder_files.util.build_cache import load_cache, save_cache, file_stat_key, fingerprint
+
+logger = logging.getLogger(__name__)
+
+RELATED_TOP_K = 3
+# Keywords and labels are curated, so they count for more than body words
+METADATA_WEIGHT = 3
+# Rows of the similarity matrix computed per batch; bounds peak memory at
+# roughly BATCH_ROWS * n_articles floats regardless of catalogue size
+BATCH_ROWS = 512
+# Only each article's highest-weighted terms take part in the similarity; this
+# keeps the batched product sparse (and fast) for catalogues of 10k+ articles
+MAX_TERMS_PER_ARTICLE = 64
+
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#.-]*[a-z0-9+#]|[a-z0-9]")
+MARKUP_RE = re.compile(r"<[^>]+>|!\[[^\]]*\]\([^)]*\)|\]\([^)]*\)|`{3}.*?`{3}", re.DOTALL)
+STOP_WORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before being
+below between both but by can could did do does doing down during each few for from further
+had has have having he her here hers him his how i if in into is it its itself just me more
+most my no nor not now of off on once only or other our ours out over own same she should so
+some such than that the their theirs them then there these they this those through to too
+under until up very was we were what when where which while who whom why will with would you
+your yours
+""".split())
+
+
+def _tokenise(text: str) -> List[str]:
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOP_WORDS and len(t) > 1]
+
+
+def _article_terms(article_id: str, md_root: str) -> Dict[str, int]:
+    """Term counts for one article: body words plus (weighted) keywords and labels."""
+    md_path = article_md_path(article_id, md_root)
+    with open(md_path, "r", encoding="utf-8") as f:
+        meta, body = split_front_matter(f.read(), source=md_path)
+
+    counts = Counter(_tokenise(MARKUP_RE.sub(" ", body)))
+    curated = list(meta.get("keywords") or []) + list(meta.get("labels") or [])
+    curated.append(meta.get("title") or "")
+    for phrase in curated:
+        for token in _tokenise(str(phrase)):
+            counts[token] += METADATA_WEIGHT
+    return dict(counts)
+
+
+def _tfidf_matrix(term_counts: List[Dict[str, int]], max_terms: int = MAX_TERMS_PER_ARTICLE) -> sparse.csr_matrix:
+    """
+    Build an L2-normalised, sublinear TF-IDF matrix (one row per article), keeping
+    only the `max_terms` highest-weighted terms of each row.
+    """
+    vocab: Dict[str, int] = {}
+    indptr = [0]
+    indices: List[int] = []
+    data: List[float] = []
+    for counts in term_counts:
+        for term, count in counts.items():
+            indices.append(vocab.setdefault(term, len(vocab)))
+            data.append(count)
+        indptr.append(len(indices))
+
+    n_docs = len(term_counts)
+    x = sparse.csr_matrix(
+        (np.asarray(data, dtype=np.float32), np.asarray(indices, dtype=np.int32), np.asarray(indptr)),
+        shape=(n_docs, max(len(vocab), 1)),
+    )
+    x.data = 1.0 + np.log(x.data)
+
+    df = np.bincount(x.indices, minlength=x.shape[1])
+    idf = (np.log((1.0 + n_docs) / (1.0 + df)) + 1.0).astype(np.float32)
+    x = (x @ sparse.diags(idf)).tocsr()
+
+    for row in range(n_docs):
+        start, stop = x.indptr[row], x.indptr[row + 1]
+        if stop - start > max_terms:
+            row_data = x.data[start:stop]
+            row_data[np.argpartition(row_data, stop - start - max_terms)[:stop - start - max_terms]] = 0.0
+    x.eliminate_zeros()
+
+    norms = np.sqrt(np.asarray(x.multiply(x).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return (sparse.diags(1.0 / norms).astype(np.float32) @ x).tocsr()
+
+
+def _top_k_similar(x: sparse.csr_matrix, candidate_mask: np.ndarray, top_k: int) -> List[List[int]]:
+    """For every row of `x`, the indices of the `top_k` most cosine-similar candidate rows."""
+    n = x.shape[0]
+    xt = x.T.tocsc()
+    results: List[List[int]] = []
+    k = min(top_k, max(int(candidate_mask.sum()) - 1, 0))
+    for start in range(0, n, BATCH_ROWS):
+        stop = min(start + BATCH_ROWS, n)
+        scores = (x[start:stop] @ xt).toarray()
+        scores[:, ~candidate_mask] = -1.0
+        scores[np.arange(stop - start), np.arange(start, stop)] = -1.0  # not related to itself
+        if k == 0:
+            results.extend([] for _ in range(stop - start))
+            continue
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        for row, cols in enumerate(top):
+            cols = cols[np.argsort(-scores[row, cols], kind="stable")]
+            results.append([int(c) for c in cols if scores[row, c] > 0])
+    return results
+
+
+def compute_related_articles(
+    catalogue: List[Dict[str, Any]],
+    md_root: str = MD_ROOT,
+    top_k: int = RELATED_TOP_K,
+) -> Dict[str, List[str]]:
+    """
+    Return {article_id: [related article ids, most similar first]} for every
+    article in `catalogue`, using TF-IDF cosine similarity over each article's
+    markdown text, keywords and labels.
+
+    Only visible, built articles (not hidden, auto_build true) are recommended.
+    Term counts are cached per article by file mtime/size, so only changed
+    articles are re-read and re-tokenised; if nothing changed, the previous
+    result is reused without recomputing the similarity matrix.
+    """
+    if not catalogue:
+        return {}
+
+    term_cache = load_cache("related_terms")
+    ids = [entry["id"] for entry in catalogue]
+    term_counts: List[Dict[str, int]] = []
+    changed = 0
+    for article_id in ids:
+        stat_key = file_stat_key(article_md_path(article_id, md_root))
+        cached = term_cache.get(article_id)
+        if cached is None or cached["stat"] != stat_key:
+            cached = {"stat": stat_key, "terms": _article_terms(article_id, md_root)}
+            term_cache[article_id] = cached
+            changed += 1
+        term_counts.append(cached["terms"])
+
+    candidates = [not e.get("hidden", False) and e.get("auto_build", False) for e in catalogue]
+    state_key = fingerprint([top_k, ids, candidates] + [term_cache[i]["stat"] for i in ids])
+    result_cache = load_cache("related")
+    if result_cache.get("key") == state_key:
+        return result_cache["related"]
+
+    logger.info("Computing related articles (%d articles, %d re-tokenised)", len(ids), changed)
+    x = _tfidf_matrix(term_counts)
+    top = _top_k_similar(x, np.asarray(candidates, dtype=bool), top_k)
+    related = {article_id: [ids[j] for j in rows] for article_id, rows in zip(ids, top)}
+
+    save_cache("related_terms", {i: term_cache[i] for i in ids})
+    save_cache("related", {"key": state_key, "related": related})
+    return related
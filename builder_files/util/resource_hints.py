@@ -0,0 +1,344 @@
+import os
+import re
+import json
+import html as html_module
+import logging
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+from builder_files.util.images import ATTR_RE, resolve_local_path, SITE_ROOT
+
+logger = logging.getLogger(__name__)
+
+SITE_ORIGIN = "https://majdij.com"
+
+# How many same-site pages a list page asks the browser to prefetch up front
+MAX_PREFETCH = 3
+
+TAG_RE = re.compile(r"<(link|script|img|iframe|a)\b[^>]*>", re.IGNORECASE | re.DOTALL)
+STYLESHEET_LINE_RE = re.compile(r'^([ \t]*)<link\b[^>]*\brel=["\']stylesheet["\']', re.IGNORECASE | re.MULTILINE)
+HEAD_CLOSE_RE = re.compile(r"^([ \t]*)</head>", re.IGNORECASE | re.MULTILINE)
+FONT_FACE_RE = re.compile(r"@font-face\s*{([^}]*)}", re.IGNORECASE)
+CSS_URL_RE = re.compile(r"url\(\s*(['\"]?)([^'\")]+)\1\s*\)")
+FONT_FAMILY_RE = re.compile(r"font-family\s*:\s*([^;}]+)", re.IGNORECASE)
+CSS_DECLARATION_RE = re.compile(r"(--[\w-]+|font-family|font)\s*:\s*([^;{}]+)", re.IGNORECASE)
+
+FONT_TYPES = {
+    ".woff2": "font/woff2",
+    ".woff": "font/woff",
+    ".ttf": "font/ttf",
+    ".otf": "font/otf",
+}
+# When an @font-face lists several sources, the first of these formats is used
+FONT_SOURCE_ORDER = (".woff2", ".woff", ".ttf", ".otf")
+
+# Font families to preload, e.g. ["Geologica"]. None preloads every family the
+# page's stylesheets use outside @font-face (the text the first render needs),
+# but only in a compressed web format: a raw .ttf/.otf is too big to fetch ahead
+# of the page's content and is left to load when the browser needs it.
+PRELOAD_FONT_FAMILIES: Optional[List[str]] = None
+PRELOAD_FONT_TYPES = (".woff2", ".woff")
+
+
+def _attrs(tag: str) -> Dict[str, str]:
+    return {k.lower(): html_module.unescape(v[1:-1]) for k, v in ATTR_RE.findall(tag)}
+
+
+def _is_same_site(url: str) -> bool:
+    parts = urlsplit(url)
+    if not parts.scheme and not parts.netloc:
+        return True
+    return f"{parts.scheme}://{parts.netloc}".lower() == SITE_ORIGIN
+
+
+def _font_names(value: str) -> List[str]:
+    """Lower-cased family names in a font-family list (or a custom property holding one)."""
+    names = []
+    for part in value.split(","):
+        part = part.strip()
+        if part[:1] in ("'", '"'):
+            names.append(part.strip("'\"").lower())
+        elif part:
+            # Unquoted; in the `font` shorthand the family follows the size
+            names.append(part.split()[-1].lower())
+    return names
+
+
+def _font_url(css_url_dir: str, url: str) -> str:
+    if not url.startswith("/") and not urlsplit(url).scheme:
+        url = os.path.normpath(os.path.join(css_url_dir, url)).replace(os.sep, "/")
+    return url
+
+
+def _font_ext(url: str) -> str:
+    return os.path.splitext(urlsplit(url).path)[1].lower()
+
+
+def _source_rank(url: str) -> int:
+    ext = _font_ext(url)
+    return FONT_SOURCE_ORDER.index(ext) if ext in FONT_SOURCE_ORDER else len(FONT_SOURCE_ORDER)
+
+
+def _read_css(css_path: str) -> Optional[str]:
+    try:
+        with open(css_path, "r", encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def css_font_faces(css_path: str) -> List[Tuple[str, str]]:
+    """
+    Return (family, url) for every @font-face in a local stylesheet. The url is
+    the source the browser would pick (woff2 first, see FONT_SOURCE_ORDER), as a
+    root-relative URL; family is lower-cased.
+    """
+    css = _read_css(css_path)
+    if css is None:
+        return []
+    faces = []
+    css_url_dir = "/" + os.path.relpath(os.path.dirname(css_path), SITE_ROOT).replace(os.sep, "/")
+    for block in FONT_FACE_RE.findall(css):
+        urls = [m.group(2) for m in CSS_URL_RE.finditer(block)]
+        if not urls:
+            continue
+        family = FONT_FAMILY_RE.search(block)
+        url = min(urls, key=_source_rank)
+        faces.append((_font_names(family.group(1))[0] if family else "", _font_url(css_url_dir, url)))
+    return faces
+
+
+def css_font_urls(css_path: str) -> List[str]:
+    """Return the preferred url() of every @font-face in a local stylesheet, as root-relative URLs."""
+    return [url for _, url in css_font_faces(css_path)]
+
+
+def css_used_font_families(css_path: str) -> Set[str]:
+    """
+    Return the lower-cased font families a local stylesheet's rules refer to,
+    directly or through a custom property (@font-face declarations don't count).
+    """
+    css = _read_css(css_path)
+    if css is None:
+        return set()
+    used: Set[str] = set()
+    for _, value in CSS_DECLARATION_RE.findall(FONT_FACE_RE.sub("", css)):
+        used.update(_font_names(value))
+    return used
+
+
+class ResourceHintCollector:
+    """
+    Incremental collect_resource_hints() and collect_prefetch_urls(): feed()
+    the rendered page in order, in as many chunks as convenient (each holding
+    whole tags), then read hints() and prefetch_urls().
+    """
+
+    def __init__(
+        self,
+        page_path: str,
+        site_root: str = SITE_ROOT,
+        max_prefetch: int = MAX_PREFETCH,
+        preload_font_families: Optional[List[str]] = PRELOAD_FONT_FAMILIES,
+    ):
+        self.page_path = page_path
+        self.site_root = site_root
+        self.max_prefetch = max_prefetch
+        self.preload_font_families = preload_font_families
+        self.page_url = "/" + os.path.dirname(os.path.relpath(page_path, SITE_ROOT)).replace(os.sep, "/")
+        self.origins: List[str] = []
+        self.font_faces: List[Tuple[str, str]] = []
+        self.used_font_families: Set[str] = set()
+        self.lcp_image: Optional[str] = None
+        self.in_body = False
+        self.prefetch: List[str] = []
+
+    def feed(self, html: str) -> None:
+        for m in TAG_RE.finditer(html):
+            name = m.group(1).lower()
+            attrs = _attrs(m.group(0))
+            if name == "a":
+                continue
+            url = attrs.get("href") if name == "link" else attrs.get("src")
+            if not url:
+                continue
+
+            if not _is_same_site(url):
+                parts = urlsplit(url)
+                if parts.scheme in ("http", "https"):
+                    origin = f"{parts.scheme}://{parts.netloc}"
+                    if origin not in self.origins:
+                        self.origins.append(origin)
+                continue
+
+            if name == "link" and "stylesheet" in attrs.get("rel", "").lower().split():
+                css_path = resolve_local_path(url, self.page_path, self.site_root)
+                if css_path:
+                    for face in css_font_faces(css_path):
+                        if face not in self.font_faces:
+                            self.font_faces.append(face)
+                    self.used_font_families |= css_used_font_families(css_path)
+            elif name == "img" and self.lcp_image is None and attrs.get("fetchpriority", "").lower() == "high":
+                self.lcp_image = url
+        self._feed_prefetch(html)
+
+    def _feed_prefetch(self, html: str) -> None:
+        # Only links in the page body (from <main> on) are prefetch candidates
+        if not self.in_body:
+            body_start = html.lower().find("<main")
+            if body_start == -1:
+                return
+            self.in_body = True
+            html = html[body_start:]
+        if len(self.prefetch) >= self.max_prefetch:
+            return
+        for m in TAG_RE.finditer(html):
+            if m.group(1).lower() != "a":
+                continue
+            href = _attrs(m.group(0)).get("href", "")
+            parts = urlsplit(href)
+            if not href or not _is_same_site(href) or not parts.path.startswith("/"):
+                continue
+            path = parts.path
+            if path.rstrip("/") == self.page_url.rstrip("/") or path.endswith((".pdf", ".json", ".xml")):
+                continue
+            if path not in self.prefetch:
+                self.prefetch.append(path)
+            if len(self.prefetch) >= self.max_prefetch:
+                break
+
+    def fonts(self) -> List[str]:
+        """URLs of the fonts to preload; see PRELOAD_FONT_FAMILIES."""
+        if self.preload_font_families is not None:
+            wanted = {f.lower() for f in self.preload_font_families}
+            types = FONT_SOURCE_ORDER
+        else:
+            wanted, types = self.used_font_families, PRELOAD_FONT_TYPES
+        fonts = []
+        for family, url in self.font_faces:
+            if family in wanted and _font_ext(url) in types and url not in fonts:
+                fonts.append(url)
+        return fonts
+
+    def hints(self) -> List[Dict[str, Any]]:
+        hints: List[Dict[str, Any]] = [{"rel": "preconnect", "href": o} for o in self.origins]
+        for font in self.fonts():
+            ext = _font_ext(font)
+            hint = {"rel": "preload", "href": font, "as": "font", "crossorigin": True}
+            if ext in FONT_TYPES:
+                hint["type"] = FONT_TYPES[ext]
+            hints.append(hint)
+        if self.lcp_image:
+            hints.append({"rel": "preload", "href": self.lcp_image, "as": "image", "fetchpriority": "high"})
+        return hints
+
+    def prefetch_urls(self) -> List[str]:
+        return list(self.prefetch)
+
+
+def collect_resource_hints(html: str, page_path: str, site_root: str = SITE_ROOT) -> List[Dict[str, Any]]:
+    """
+    Derive resource hints from a rendered page.
+
+    Returns a list of hint dicts (keys: rel, href and optionally as, type,
+    crossorigin, fetchpriority), in the order they should appear:
+
+      - preconnect for every third-party origin the page loads scripts,
+        stylesheets, images or frames from;
+      - preload for the fonts the page's local stylesheets declare via
+        @font-face and use (see PRELOAD_FONT_FAMILIES);
+      - preload for the LCP image (the <img> marked fetchpriority="high").
+    """
+    collector = ResourceHintCollector(page_path, site_root)
+    collector.feed(html)
+    return collector.hints()
+
+
+def render_hint_tag(hint: Dict[str, Any]) -> str:
+    """Render a hint dict from collect_resource_hints() as a <link> tag."""
+    parts = [f'rel="{hint["rel"]}"', f'href="{html_module.escape(hint["href"], quote=True)}"']
+    for key in ("as", "type", "fetchpriority"):
+        if hint.get(key):
+            parts.append(f'{key}="{hint[key]}"')
+    if hint.get("crossorigin"):
+        parts.append("crossorigin")
+    return f"<link {' '.join(parts)} />"
+
+
+def collect_prefetch_urls(html: str, page_path: str, max_urls: int = MAX_PREFETCH) -> List[str]:
+    """Return the first `max_urls` distinct same-site page links in the page body, in order."""
+    collector = ResourceHintCollector(page_path, max_prefetch=max_urls)
+    collector._feed_prefetch(html)
+    return collector.prefetch_urls()
+
+
+def build_speculation_rules(prefetch_urls: List[str], prerender_pattern: Optional[str] = None) -> str:
+    """
+    Build a <script type="speculationrules"> block: prefetch `prefetch_urls` right
+    away and, if given, prerender links matching `prerender_pattern` on hover/press.
+    """
+    rules: Dict[str, Any] = {}
+    if prefetch_urls:
+        rules["prefetch"] = [{"source": "list", "urls": prefetch_urls}]
+    if prerender_pattern:
+        rules["prerender"] = [{
+            "source": "document",
+            "where": {"href_matches": prerender_pattern},
+            "eagerness": "moderate",
+        }]
+    if not rules:
+        return ""
+    return f'<script type="speculationrules">{json.dumps(rules, separators=(",", ":"))}</script>'
+
+
+def _insert_lines(html: str, pattern: re.Pattern, lines: List[str], after_comment: Optional[str] = None) -> str:
+    m = pattern.search(html)
+    if not m:
+        return html
+    indent = m.group(1)
+    block = "".join(f"{indent}{line}\n" for line in lines)
+    if after_comment:
+        block = f"{indent}<!-- {after_comment} -->\n" + block + "\n"
+    return html[:m.start()] + block + html[m.start():]
+
+
+def insert_resource_hints(
+    html: str,
+    hints: List[Dict[str, Any]],
+    prefetch_urls: Optional[List[str]] = None,
+    speculation: bool = False,
+    prerender_pattern: Optional[str] = None,
+) -> str:
+    """Insert already-collected hints (and Speculation Rules) into a page's <head>."""
+    if hints:
+        tags = [render_hint_tag(h) for h in hints]
+        if STYLESHEET_LINE_RE.search(html):
+            html = _insert_lines(html, STYLESHEET_LINE_RE, tags, after_comment="Resource hint(s) (generated)")
+        else:
+            html = _insert_lines(html, HEAD_CLOSE_RE, tags)
+
+    if speculation:
+        rules = build_speculation_rules(prefetch_urls or [], prerender_pattern)
+        if rules:
+            html = _insert_lines(html, HEAD_CLOSE_RE, ["    " + rules])
+    return html
+
+
+def add_resource_hints(
+    html: str,
+    page_path: str,
+    speculation: bool = False,
+    prerender_pattern: Optional[str] = None,
+    site_root: str = SITE_ROOT,
+) -> str:
+    """
+    Inject resource hints computed from the page itself into its <head>.
+
+    Hints go just before the first stylesheet so the browser sees them as early
+    as possible. When `speculation` is True (list-style pages), a Speculation
+    Rules block prefetching the first few linked pages (and prerendering links
+    matching `prerender_pattern` on hover) is added before </head>.
+    """
+    collector = ResourceHintCollector(page_path, site_root)
+    collector.feed(html)
+    return insert_resource_hints(html, collector.hints(), collector.prefetch_urls(), speculation, prerender_pattern)
@@ -0,0 +1,433 @@
+import os
+import re
+import gzip
+import asyncio
+import hashlib
+import logging
+import mimetypes
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+from builder_files.util.build_cache import file_stat_key
+from builder_files.page_constructors.headers import HEADERS_OUTPUT
+from builder_files.page_constructors.api import API_ROOT
+
+try:
+    import brotli
+except ImportError:  # optional: without it, on-the-fly compression is gzip only
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+SITE_ROOT = "."
+SERVE_HOST = "127.0.0.1"
+SERVE_PORT = 8000
+ERROR_PAGE = "404.html"
+# What a deployment publishes: these top-level directories, plus the pages and
+# generated files (sw.js, feeds, sitemap) at the top level. Everything else in
+# the working tree (build inputs, caches, reports, notes) is never served.
+DEPLOY_DIRS = {"articles", "projects", "skills", "resource", API_ROOT}
+DEPLOY_ROOT_EXTENSIONS = {".html", ".xml", ".js", ".txt", ".ico", ".webmanifest"}
+# Sources kept next to published files (article markdown)
+EXCLUDED_EXTENSIONS = {".py", ".md", ".pyc"}
+
+# Precompressed siblings, in order of preference
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+# Text types without a precompressed sibling are compressed on the fly, as a CDN
+# would; anything smaller than this is sent as is
+COMPRESSIBLE_EXTENSIONS = {".html", ".css", ".js", ".mjs", ".json", ".svg", ".xml", ".txt", ".ttf", ".otf"}
+MIN_COMPRESS_SIZE = 1024
+MIME_TYPES = {
+    ".js": "text/javascript",
+    ".mjs": "text/javascript",
+    ".webp": "image/webp",
+    ".avif": "image/avif",
+    ".woff2": "font/woff2",
+    ".woff": "font/woff",
+    ".ttf": "font/ttf",
+    ".otf": "font/otf",
+    ".webmanifest": "application/manifest+json",
+}
+TEXT_TYPES = ("text/", "application/json", "application/xml", "image/svg+xml", "application/manifest+json")
+MAX_HEADER_BYTES = 64 * 1024
+SEND_CHUNK = 256 * 1024
+KEEP_ALIVE_TIMEOUT = 15
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+REASONS = {
+    200: "OK", 206: "Partial Content", 304: "Not Modified", 400: "Bad Request", 404: "Not Found",
+    405: "Method Not Allowed", 412: "Precondition Failed", 416: "Range Not Satisfiable", 500: "Internal Server Error",
+}
+
+
+def _content_type(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    ctype = MIME_TYPES.get(ext) or mimetypes.guess_type(path)[0] or "application/octet-stream"
+    return f"{ctype}; charset=utf-8" if ctype.startswith(TEXT_TYPES) else ctype
+
+
+def load_header_rules(path: str) -> List[Tuple[re.Pattern, List[Tuple[str, str]]]]:
+    """
+    Parse a `_headers` file (as written by build_headers_file()) into
+    [(URL pattern, [(header, value), ...])]. A `*` in a pattern matches any
+    run of characters, as on the static hosts that read the file.
+    """
+    rules: List[Tuple[re.Pattern, List[Tuple[str, str]]]] = []
+    if not os.path.isfile(path):
+        return rules
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            if not line[0].isspace():
+                pattern = re.compile("^" + ".*".join(re.escape(p) for p in line.strip().split("*")) + "$")
+                rules.append((pattern, []))
+            elif rules and ":" in line:
+                name, value = line.strip().split(":", 1)
+                rules[-1][1].append((name.strip(), value.strip()))
+    return rules
+
+
+def _parse_range(value: str, size: int) -> Optional[Tuple[int, int]]:
+    """(start, end) inclusive for a single `bytes=` range; None when unsatisfiable."""
+    m = RANGE_RE.match(value.strip())
+    if not m or not (m.group(1) or m.group(2)):
+        return None
+    if not m.group(1):
+        length = int(m.group(2))
+        return (max(0, size - length), size - 1) if length and size else None
+    start = int(m.group(1))
+    end = min(int(m.group(2)), size - 1) if m.group(2) else size - 1
+    return (start, end) if start <= end and start < size else None
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # Weak comparison, as If-None-Match requires
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+class StaticServer:
+    """
+    An HTTP/1.1 server over the build output that behaves like the production
+    host, for previewing and measuring the site locally:
+
+      - clean URLs: `/articles/x`, `/articles/x/` and `/articles/x/index.html`
+        all serve the page; anything missing gets 404.html with a 404;
+      - only what a deployment publishes (DEPLOY_DIRS and top-level pages),
+        not the rest of the working tree;
+      - the `_headers` rules of the build (Cache-Control, Link preloads);
+      - precompressed `.br`/`.gz` siblings chosen by Accept-Encoding, and
+        on-the-fly compression of other text files;
+      - strong ETags and Last-Modified, answering conditional GETs with 304;
+      - single byte ranges (e.g. for article.pdf), with If-Range;
+      - keep-alive connections (closed after any response that says
+        `Connection: close`), and a log line per request with its latency.
+
+    File hashes and compressed bodies are memoised until the file changes, and
+    `_headers` is re-read whenever it is rebuilt.
+    """
+
+    def __init__(self, site_root: str = SITE_ROOT, host: str = SERVE_HOST, port: int = SERVE_PORT, quiet: bool = False):
+        self.root = os.path.abspath(site_root)
+        self.host = host
+        self.port = port
+        self.quiet = quiet
+        self._rules_key = None
+        self._rules: List[Tuple[re.Pattern, List[Tuple[str, str]]]] = []
+        # path -> (stat key, value)
+        self._etags: Dict[str, Tuple[list, str]] = {}
+        self._compressed: Dict[Tuple[str, str], Tuple[list, bytes]] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    # --- Resolution --------------------------------------------------------
+
+    def _header_rules(self) -> List[Tuple[re.Pattern, List[Tuple[str, str]]]]:
+        path = os.path.join(self.root, HEADERS_OUTPUT)
+        key = file_stat_key(path)
+        if key != self._rules_key:
+            self._rules_key, self._rules = key, load_header_rules(path)
+        return self._rules
+
+    def _file(self, rel: str) -> Optional[str]:
+        """The file a site-relative path names, if a deployment would publish it."""
+        parts = [p for p in rel.split("/") if p]
+        if not parts or any(p.startswith(".") for p in parts):
+            return None
+        ext = os.path.splitext(parts[-1])[1].lower()
+        deployed = parts[0] in DEPLOY_DIRS if len(parts) > 1 else ext in DEPLOY_ROOT_EXTENSIONS
+        path = os.path.join(self.root, *parts)
+        if not deployed or ext in EXCLUDED_EXTENSIONS or not os.path.isfile(path):
+            return None
+        return path
+
+    def resolve(self, url_path: str) -> Tuple[Optional[str], str]:
+        """(file to serve or None, the URL its `_headers` rules are keyed by)."""
+        rel = unquote(url_path).strip("/")
+        if ".." in rel.split("/"):
+            return None, url_path
+        if not rel or os.path.isdir(os.path.join(self.root, rel)):
+            index = self._file(f"{rel}/index.html")
+            return index, f"/{rel}/" if rel else "/"
+        if rel == "index.html" or rel.endswith("/index.html"):
+            return self._file(rel), "/" + rel[: -len("index.html")]
+        path = self._file(rel)
+        if path is None and self._file(f"{rel}.html"):
+            return self._file(f"{rel}.html"), f"/{rel}"
+        return path, f"/{rel}"
+
+    # --- Representations ---------------------------------------------------
+
+    def _etag(self, path: str, key: list) -> str:
+        cached = self._etags.get(path)
+        if cached is None or cached[0] != key:
+            h = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 16), b""):
+                    h.update(chunk)
+            cached = (key, h.hexdigest()[:20])
+            self._etags[path] = cached
+        return cached[1]
+
+    def _representation(self, path: str, accept_encoding: str, ranged: bool) -> Tuple[Optional[str], Optional[str], Optional[bytes]]:
+        """
+        (encoding, sibling file, in-memory body) for the response. Range
+        requests always get the identity encoding, so offsets refer to the file.
+        """
+        if ranged:
+            return None, None, None
+        accepted = {e.split(";")[0].strip().lower() for e in accept_encoding.split(",")}
+        for encoding, suffix in ENCODINGS:
+            sibling = path + suffix
+            if encoding in accepted and os.path.isfile(sibling):
+                return encoding, sibling, None
+        if os.path.splitext(path)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+            return None, None, None
+        key = file_stat_key(path)
+        if key is None or key[1] < MIN_COMPRESS_SIZE:
+            return None, None, None
+        for encoding in ("br", "gzip"):
+            if encoding not in accepted or (encoding == "br" and brotli is None):
+                continue
+            cached = self._compressed.get((path, encoding))
+            if cached is None or cached[0] != key:
+                with open(path, "rb") as f:
+                    data = f.read()
+                body = brotli.compress(data, quality=11) if encoding == "br" else gzip.compress(data, 9, mtime=0)
+                cached = (key, body)
+                self._compressed[(path, encoding)] = cached
+            return encoding, None, cached[1]
+        return None, None, None
+
+    # --- HTTP ----------------------------------------------------------------
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEP_ALIVE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    return
+                except asyncio.LimitOverrunError:
+                    await self._send_simple(writer, 400, time.perf_counter(), "-", "-")
+                    return
+                started = time.perf_counter()
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ")
+                except ValueError:
+                    await self._send_simple(writer, 400, started, "-", "-")
+                    return
+                headers: Dict[str, str] = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                # A response that said "Connection: close" ends the connection
+                if not await self._respond(writer, method, urlsplit(target).path or "/", headers, keep_alive, started):
+                    return
+        except ConnectionError:
+            return
+        finally:
+            writer.close()
+
+    async def _send_simple(self, writer, status: int, started: float, method: str, path: str) -> None:
+        body = f"{status} {REASONS[status]}\n".encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: text/plain; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body
+        )
+        await writer.drain()
+        self._log(method, path, status, len(body), None, started)
+
+    async def _respond(self, writer, method: str, url_path: str, req: Dict[str, str], keep_alive: bool, started: float) -> bool:
+        """Answer one request; returns whether the connection stays open."""
+        if method not in ("GET", "HEAD"):
+            await self._send_simple(writer, 405, started, method, url_path)
+            return False
+
+        path, rule_url = self.resolve(url_path)
+        status = 200
+        if path is None:
+            status = 404
+            path, rule_url = self._file(ERROR_PAGE), f"/{ERROR_PAGE}"
+            if path is None:
+                await self._send_simple(writer, 404, started, method, url_path)
+                return False
+
+        key = file_stat_key(path)
+        size = key[1]
+        etag = self._etag(path, key)
+        last_modified = formatdate(key[0] / 1e9, usegmt=True)
+
+        byte_range: Optional[Tuple[int, int]] = None
+        if status == 200 and "range" in req:
+            if_range = req.get("if-range")
+            if not if_range or if_range.strip('"') == etag or if_range == last_modified:
+                byte_range = _parse_range(req["range"], size)
+                if byte_range is None and RANGE_RE.match(req["range"].strip()):
+                    status = 416
+
+        encoding, sibling, memory_body = self._representation(path, req.get("accept-encoding", ""), "range" in req)
+        quoted_etag = f'"{etag}-{encoding}"' if encoding else f'"{etag}"'
+
+        response = [
+            ("Date", formatdate(usegmt=True)),
+            ("Content-Type", _content_type(path)),
+            ("ETag", quoted_etag),
+            ("Last-Modified", last_modified),
+            ("Accept-Ranges", "bytes"),
+        ]
+        if os.path.splitext(path)[1].lower() in COMPRESSIBLE_EXTENSIONS or sibling:
+            response.append(("Vary", "Accept-Encoding"))
+        for pattern, rule_headers in self._header_rules():
+            if pattern.match(rule_url):
+                response.extend(rule_headers)
+
+        if status == 200 and self._not_modified(req, quoted_etag, key[0]):
+            status = 304
+        if status == 416:
+            response.append(("Content-Range", f"bytes */{size}"))
+
+        offset, length = 0, size
+        if status in (304, 416):
+            length = 0
+        elif encoding:
+            response.append(("Content-Encoding", encoding))
+            length = len(memory_body) if memory_body is not None else os.path.getsize(sibling)
+        elif byte_range:
+            status = 206
+            offset, length = byte_range[0], byte_range[1] - byte_range[0] + 1
+            response.append(("Content-Range", f"bytes {byte_range[0]}-{byte_range[1]}/{size}"))
+        if status != 304:
+            response.append(("Content-Length", str(length)))
+        response.append(("Connection", "keep-alive" if keep_alive else "close"))
+
+        head = f"HTTP/1.1 {status} {REASONS[status]}\r\n" + "".join(f"{k}: {v}\r\n" for k, v in response) + "\r\n"
+        writer.write(head.encode("latin-1"))
+        sent = 0
+        if method == "GET" and length:
+            if memory_body is not None:
+                writer.write(memory_body)
+            else:
+                await self._send_file(writer, sibling or path, offset, length)
+            sent = length
+        await writer.drain()
+        self._log(method, url_path, status, sent, encoding, started)
+        return keep_alive
+
+    @staticmethod
+    def _not_modified(req: Dict[str, str], etag: str, mtime_ns: int) -> bool:
+        if "if-none-match" in req:
+            return _etag_matches(req["if-none-match"], etag)
+        if "if-modified-since" in req:
+            try:
+                since = parsedate_to_datetime(req["if-modified-since"]).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(mtime_ns / 1e9) <= since
+        return False
+
+    @staticmethod
+    async def _send_file(writer, path: str, offset: int, length: int) -> None:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            while length > 0:
+                chunk = f.read(min(SEND_CHUNK, length))
+                if not chunk:
+                    break
+                writer.write(chunk)
+                length -= len(chunk)
+                await writer.drain()
+
+    def _log(self, method: str, path: str, status: int, sent: int, encoding: Optional[str], started: float) -> None:
+        if self.quiet:
+            return
+        logger.info(
+            "%s %s %d %s%s %.1f ms",
+            method, path, status, f"{sent / 1024:.1f} KB", f" {encoding}" if encoding else "",
+            (time.perf_counter() - started) * 1000,
+        )
+
+    # --- Lifecycle -----------------------------------------------------------
+
+    async def start(self) -> str:
+        """Start listening; returns the origin ("http://127.0.0.1:8000")."""
+        self._server = await asyncio.start_server(self._handle, self.host, self.port, limit=MAX_HEADER_BYTES)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return f"http://{self.host}:{self.port}"
+
+    async def stop(self) -> None:
+        """Stop listening and wait (briefly) for the server to close."""
+        self._server.close()
+        try:
+            # Newer Pythons also wait for open keep-alive connections here
+            await asyncio.wait_for(self._server.wait_closed(), 1)
+        except asyncio.TimeoutError:
+            pass
+
+    async def serve_forever(self) -> None:
+        origin = await self.start()
+        logger.info("Serving %s at %s (Ctrl+C to stop)", self.root, origin)
+        async with self._server:
+            await self._server.serve_forever()
+
+
+def serve(site_root: str = SITE_ROOT, host: str = SERVE_HOST, port: int = SERVE_PORT) -> None:
+    """Serve the build output in the foreground until interrupted."""
+    try:
+        asyncio.run(StaticServer(site_root, host, port).serve_forever())
+    except KeyboardInterrupt:
+        logger.info("Server stopped")
+
+
+class BackgroundServer:
+    """
+    A StaticServer on a free localhost port, run in a background thread with
+    its own event loop, for tools that load the site (the performance audit).
+
+        with BackgroundServer(".") as server:
+            page.goto(server.origin + "/articles/")
+    """
+
+    def __init__(self, site_root: str = SITE_ROOT, quiet: bool = True):
+        self.server = StaticServer(site_root, SERVE_HOST, 0, quiet=quiet)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.origin = ""
+
+    def __enter__(self) -> "BackgroundServer":
+        self.thread.start()
+        self.origin = asyncio.run_coroutine_threadsafe(self.server.start(), self.loop).result()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        asyncio.run_coroutine_threadsafe(self.server.stop(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
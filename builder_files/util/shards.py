@@ -0,0 +1,194 @@
+import os
+import glob
+import json
+import shutil
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from builder_files.util.build_cache import load_cache, file_digest
+from builder_files.util.catalogue import ARTICLES_INDEX, MD_ROOT, load_catalogue
+
+logger = logging.getLogger(__name__)
+
+SITE_ROOT = "."
+OUTPUT_ROOT = "articles"
+# Partial manifests, one per shard; collected next to the outputs for `merge`
+SHARD_MANIFEST_DIR = "build_shards"
+SHARD_MANIFEST_NAME = "shard-{index}-of-{count}.json"
+MANIFEST_VERSION = 1
+
+Shard = Tuple[int, int]
+
+
+class ShardMergeError(Exception):
+    """Raised when shard manifests don't add up to one complete, consistent build."""
+
+
+def parse_shard(spec: str) -> Shard:
+    """Parse "i/n" (1-based, e.g. "3/8") into (i, n)."""
+    try:
+        index, count = (int(part) for part in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"shard must look like i/n, e.g. 3/8: {spec!r}") from None
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"shard index must be between 1 and {count}: {spec!r}")
+    return index, count
+
+
+def shard_of(article_id: str, count: int) -> int:
+    """
+    The 1-based shard an article belongs to when the build is split `count`
+    ways. Uses SHA-1 of the id, so every machine (and Python process, unlike
+    hash()) agrees, and adding an article never moves the others.
+    """
+    return int(hashlib.sha1(article_id.encode("utf-8")).hexdigest()[:8], 16) % count + 1
+
+
+def in_shard(article_id: str, shard: Optional[Shard]) -> bool:
+    return shard is None or shard_of(article_id, shard[1]) == shard[0]
+
+
+def _article_outputs(article_id: str, output_root: str, site_root: str) -> Dict[str, str]:
+    """{site-relative path: sha256} for every file built into an article's output directory."""
+    outputs = {}
+    for path in sorted(glob.glob(os.path.join(output_root, article_id, "*"))):
+        if os.path.isfile(path):
+            outputs[os.path.relpath(path, site_root).replace(os.sep, "/")] = file_digest(path)
+    return outputs
+
+
+def write_shard_manifest(
+    shard: Shard,
+    md_root: str = MD_ROOT,
+    catalogue_path: str = ARTICLES_INDEX,
+    output_root: str = OUTPUT_ROOT,
+    site_root: str = SITE_ROOT,
+    manifest_dir: str = SHARD_MANIFEST_DIR,
+) -> str:
+    """
+    Record what this shard built: for every auto-built article assigned to it,
+    the digest of its inputs and the output files with their hashes. Articles
+    that failed to build are listed under "failed". Run after
+    build_all_articles(shard=shard). Returns the manifest path.
+    """
+    index, count = shard
+    build_state = load_cache("articles")
+    articles: Dict[str, Any] = {}
+    failed: List[str] = []
+    for entry in load_catalogue(md_root=md_root, index_path=catalogue_path):
+        article_id = entry["id"]
+        if not entry.get("auto_build", False) or not in_shard(article_id, shard):
+            continue
+        outputs = _article_outputs(article_id, output_root, site_root)
+        if article_id not in build_state or not outputs:
+            failed.append(article_id)
+            continue
+        articles[article_id] = {"inputs": build_state[article_id], "files": outputs}
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "shard": index,
+        "count": count,
+        "articles": articles,
+        "failed": failed,
+    }
+    os.makedirs(manifest_dir, exist_ok=True)
+    path = os.path.join(manifest_dir, SHARD_MANIFEST_NAME.format(index=index, count=count))
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    logger.info(
+        "Wrote shard manifest: %s (%d articles, %d failed)", path, len(articles), len(failed),
+    )
+    return path
+
+
+def merge_shards(
+    shard_dirs: Optional[List[str]] = None,
+    md_root: str = MD_ROOT,
+    catalogue_path: str = ARTICLES_INDEX,
+    site_root: str = SITE_ROOT,
+    manifest_dir: str = SHARD_MANIFEST_DIR,
+) -> Dict[str, Any]:
+    """
+    Combine the outputs of a sharded build and check they add up: one manifest
+    for every shard 1..n, every auto-built article built by exactly the shard it
+    hashes to, and every listed file present with the recorded hash.
+
+    `shard_dirs` are directories holding one or more shards' outputs (as
+    downloaded CI artifacts, each with its own `build_shards/`); their files are
+    copied into `site_root` once verified. Without them the manifests and
+    outputs are expected to be in `site_root` already. Raises ShardMergeError
+    listing every problem. Returns {article id: manifest entry}.
+    """
+    sources = shard_dirs or [site_root]
+    errors: List[str] = []
+    manifests: Dict[int, Tuple[str, Dict[str, Any]]] = {}
+    counts = set()
+
+    for source in sources:
+        paths = sorted(glob.glob(os.path.join(source, manifest_dir, SHARD_MANIFEST_NAME.format(index="*", count="*"))))
+        if not paths:
+            errors.append(f"{source}: no shard manifests in {manifest_dir}/")
+        for path in paths:
+            with open(path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("version") != MANIFEST_VERSION:
+                errors.append(f"{path}: manifest version {manifest.get('version')}, expected {MANIFEST_VERSION}")
+                continue
+            index = manifest["shard"]
+            counts.add(manifest["count"])
+            if index in manifests:
+                errors.append(f"{path}: shard {index} also in {manifests[index][0]}")
+                continue
+            manifests[index] = (source, manifest)
+            errors.extend(f"{path}: article failed to build: {a}" for a in manifest.get("failed", []))
+
+    if len(counts) > 1:
+        errors.append(f"manifests disagree on the shard count: {sorted(counts)}")
+    count = max(counts, default=0)
+    missing_shards = sorted(set(range(1, count + 1)) - set(manifests))
+    if missing_shards:
+        errors.append(f"missing manifests for shard(s) {missing_shards} of {count}")
+
+    merged: Dict[str, Any] = {}
+    for index, (source, manifest) in sorted(manifests.items()):
+        for article_id, entry in manifest["articles"].items():
+            if article_id in merged:
+                errors.append(f"{article_id}: built by shard {merged[article_id]['shard']} and shard {index}")
+                continue
+            if shard_of(article_id, count) != index:
+                errors.append(f"{article_id}: built by shard {index} but belongs to shard {shard_of(article_id, count)}")
+            for rel, digest in entry["files"].items():
+                path = os.path.join(source, rel)
+                if not os.path.isfile(path):
+                    errors.append(f"{article_id}: output missing: {path}")
+                elif file_digest(path) != digest:
+                    errors.append(f"{article_id}: output differs from shard {index}'s manifest: {path}")
+            merged[article_id] = {**entry, "shard": index, "source": source}
+
+    expected = {
+        e["id"] for e in load_catalogue(md_root=md_root, index_path=catalogue_path) if e.get("auto_build", False)
+    }
+    for article_id in sorted(expected - set(merged)):
+        if not any(article_id in m.get("failed", []) for _, m in manifests.values()):
+            errors.append(f"{article_id}: not built by any shard")
+    for article_id in sorted(set(merged) - expected):
+        errors.append(f"{article_id}: built by shard {merged[article_id]['shard']} but not in the catalogue")
+
+    if errors:
+        for message in errors:
+            logger.error("Shard merge: %s", message)
+        raise ShardMergeError(f"{len(errors)} problem(s) merging shards:\n  " + "\n  ".join(errors))
+
+    copied = 0
+    for entry in merged.values():
+        if os.path.abspath(entry["source"]) == os.path.abspath(site_root):
+            continue
+        for rel in entry["files"]:
+            dest = os.path.join(site_root, rel)
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            shutil.copy2(os.path.join(entry["source"], rel), dest)
+            copied += 1
+    logger.info("Merged %d shard(s): %d articles, %d files copied", len(manifests), len(merged), copied)
+    return merged
@@ -0,0 +1,152 @@
+import io
+import os
+import contextlib
+import shutil
+import logging
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from playwright.sync_api import sync_playwright
+
+from builder_files.util.html import render_html_vars, make_local_route_handler
+from builder_files.util.build_cache import BUILD_CACHE_DIR, fingerprint
+
+logger = logging.getLogger(__name__)
+
+SITE_ROOT = "."
+CARD_TEMPLATE = "builder_files/templates/social_card.html"
+# Everything the template loads; part of every card's hash
+CARD_ASSETS = ["resource/font/Geologica/Geologica-VariableFont_CRSV,SHRP,slnt,wght.ttf"]
+CARD_WIDTH = 1200
+CARD_HEIGHT = 630
+# "webp" (needs Pillow, falls back to "png" without it) or "png"
+CARD_FORMAT = "webp"
+CARD_QUALITY = 82
+CARD_NAME = "social-card"
+CARD_CACHE_DIR = os.path.join(BUILD_CACHE_DIR, "social_cards")
+# Bump to re-render every cached card when the rendering itself changes
+CARD_VERSION = 1
+# The one page every card is rendered in; same-origin requests are served from disk
+CARD_PAGE_URL = "https://majdij.com/__social_card__.html"
+
+
+def _card_format() -> str:
+    if CARD_FORMAT == "webp":
+        try:
+            import PIL  # noqa: F401
+        except ImportError:
+            logger.warning("Pillow not installed — social cards are written as PNG")
+            return "png"
+    return CARD_FORMAT
+
+
+def _encode(png: bytes, fmt: str) -> bytes:
+    if fmt == "png":
+        return png
+    from PIL import Image
+
+    out = io.BytesIO()
+    with Image.open(io.BytesIO(png)) as im:
+        im.convert("RGB").save(out, format="WEBP", quality=CARD_QUALITY, method=6)
+    return out.getvalue()
+
+
+def _render_batch(jobs: List[Tuple[str, str]], site_root: str, browser=None) -> Dict[str, bytes]:
+    """
+    Screenshot each (digest, card HTML) in one headless Chromium session,
+    reusing a single page: the browser starts once and the font is fetched once
+    for the whole batch. `browser` is an already launched browser to use
+    instead. Returns {digest: PNG bytes}.
+    """
+    shots: Dict[str, bytes] = {}
+    with contextlib.ExitStack() as stack:
+        if browser is None:
+            p = stack.enter_context(sync_playwright())
+            browser = p.chromium.launch(headless=True)
+            stack.callback(browser.close)
+        page = browser.new_page(viewport={"width": CARD_WIDTH, "height": CARD_HEIGHT}, device_scale_factor=1)
+        stack.callback(page.close)
+        page.route("**/*", make_local_route_handler(CARD_PAGE_URL, "<!DOCTYPE html><html></html>", site_root))
+        page.goto(CARD_PAGE_URL, wait_until="load")
+        for digest, card_html in jobs:
+            # Keeps the page's URL, so the template's /resource/ paths resolve
+            page.set_content(card_html, wait_until="load")
+            page.evaluate("document.fonts.ready.then(() => true)")
+            shots[digest] = page.screenshot(
+                type="png", clip={"x": 0, "y": 0, "width": CARD_WIDTH, "height": CARD_HEIGHT},
+            )
+    return shots
+
+
+def render_social_cards(
+    cards: Mapping[str, Mapping[str, str]],
+    output_root: str = "articles",
+    template_path: str = CARD_TEMPLATE,
+    site_root: str = SITE_ROOT,
+    cache_dir: str = CARD_CACHE_DIR,
+    browser=None,
+) -> Dict[str, str]:
+    """
+    Write a CARD_WIDTH×CARD_HEIGHT Open Graph card for each article in `cards`
+    ({article id: template values, e.g. card_title}) to
+    `{output_root}/{id}/social-card.webp` (or .png).
+
+    Cards are cached in `cache_dir` by a hash of their content (template, its
+    assets, values, size and format), so an article only pays for a render when
+    its card would look different. Everything not cached is rendered in one
+    batched browser session. If rendering fails, the articles concerned get no
+    card and a warning is logged. `browser` is an already launched Playwright
+    browser to render in. Returns {article id: output path}.
+    """
+    if not cards:
+        return {}
+    fmt = _card_format()
+    with open(template_path, "r", encoding="utf-8") as f:
+        template = f.read()
+    # The template and assets are the same for every card: hash them once
+    shared = fingerprint([("file", template_path)] + [("file", a) for a in CARD_ASSETS])
+
+    digests: Dict[str, str] = {}
+    jobs: Dict[str, str] = {}
+    for article_id, values in cards.items():
+        digest = fingerprint(
+            [shared, CARD_VERSION, CARD_WIDTH, CARD_HEIGHT, fmt, CARD_QUALITY]
+            + [f"{k}={values[k]}" for k in sorted(values)]
+        )
+        digests[article_id] = digest
+        if not os.path.isfile(os.path.join(cache_dir, f"{digest}.{fmt}")) and digest not in jobs:
+            jobs[digest] = render_html_vars(template, values=values, html_escape=True, missing="")
+
+    shots: Dict[str, bytes] = {}
+    if jobs:
+        try:
+            shots = _render_batch(list(jobs.items()), site_root, browser)
+        except Exception as e:
+            logger.warning("Social card rendering failed (%s) — %d card(s) not rendered", str(e).splitlines()[0], len(jobs))
+        os.makedirs(cache_dir, exist_ok=True)
+        for digest, png in shots.items():
+            tmp_path = os.path.join(cache_dir, f"{digest}.{fmt}.tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(_encode(png, fmt))
+            os.replace(tmp_path, os.path.join(cache_dir, f"{digest}.{fmt}"))
+
+    written: Dict[str, str] = {}
+    for article_id, digest in digests.items():
+        cached = os.path.join(cache_dir, f"{digest}.{fmt}")
+        if not os.path.isfile(cached):
+            continue
+        out_path = os.path.join(output_root, article_id, f"{CARD_NAME}.{fmt}")
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        shutil.copyfile(cached, out_path)
+        written[article_id] = out_path
+    from_cache = sum(1 for article_id, digest in digests.items() if digest not in jobs and article_id in written)
+    logger.info(
+        "Social cards: %d written, %d rendered in one batch, %d from cache", len(written), len(shots), from_cache,
+    )
+    return written
+
+
+def card_url(path: Optional[str], site_root: str = SITE_ROOT) -> Optional[str]:
+    """Root-relative URL ("/articles/x/social-card.webp") of a card written by render_social_cards()."""
+    if not path:
+        return None
+    return "/" + os.path.relpath(path, site_root).replace(os.sep, "/")
@@ -0,0 +1,166 @@
+import os
+import re
+import logging
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Tuple, Union
+
+from builder_files.util.images import image_annotator, flush_image_cache, SITE_ROOT
+from builder_files.util.icon_sprites import icon_sprite_rewriter, insert_head_style
+from builder_files.util.resource_hints import ResourceHintCollector, insert_resource_hints
+
+logger = logging.getLogger(__name__)
+
+# Write buffer for streamed pages; chunks are small, so this is what bounds syscalls
+STREAM_BUFFER = 256 * 1024
+
+# Same token syntax as render_html_vars(); escaped tokens (\{html_var(x)}) are literal
+SLOT_RE = re.compile(r"(\\?)\{html_var\(\s*([^()]+?)\s*\)\}")
+HEAD_END_RE = re.compile(r"</head\s*>", re.IGNORECASE)
+
+# A slot value: a string, or an iterable of strings (e.g. a generator of cards),
+# each of which must hold whole tags
+SlotValue = Union[str, Iterable[str]]
+TemplateParts = List[Tuple[str, Optional[str]]]
+
+# path -> (mtime_ns, parts)
+_template_cache: Dict[str, Tuple[int, TemplateParts]] = {}
+
+
+def split_template(template: str) -> TemplateParts:
+    """
+    Split a template at its {html_var(name)} slots into [(literal, slot name), ...];
+    the last pair's slot is None.
+    """
+    parts: TemplateParts = []
+    pos = 0
+    literal = ""
+    for m in SLOT_RE.finditer(template):
+        literal += template[pos:m.start()]
+        pos = m.end()
+        if m.group(1):
+            literal += m.group(0)[1:]
+            continue
+        parts.append((literal, m.group(2).strip()))
+        literal = ""
+    parts.append((literal + template[pos:], None))
+    return parts
+
+
+def load_template_parts(template_path: str) -> TemplateParts:
+    """split_template() of a template file, re-read only when the file changes."""
+    mtime = os.stat(template_path).st_mtime_ns
+    cached = _template_cache.get(template_path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(template_path, "r", encoding="utf-8") as f:
+        parts = split_template(f.read())
+    _template_cache[template_path] = (mtime, parts)
+    return parts
+
+
+def _chunks(parts: TemplateParts, values: Mapping[str, SlotValue]) -> Iterator[str]:
+    """
+    Yield the rendered page in chunks: template text and string values are
+    joined up to the next iterable slot, whose items are yielded one by one.
+    Missing slots render as "".
+    """
+    pending: List[str] = []
+    for literal, name in parts:
+        pending.append(literal)
+        if name is None:
+            continue
+        value = values.get(name, "")
+        if isinstance(value, str):
+            pending.append(value)
+            continue
+        yield "".join(pending)
+        pending = []
+        yield from value
+    yield "".join(pending)
+
+
+def render_to_file(
+    template_path: str,
+    values: Mapping[str, SlotValue],
+    output_path: str,
+    eager_count: Optional[int] = 1,
+    sprites: bool = True,
+    speculation: bool = False,
+    prerender_pattern: Optional[str] = None,
+    site_root: str = SITE_ROOT,
+) -> str:
+    """
+    Render a page template straight to `output_path`, producing the same output
+    as render_html_vars() followed by apply_icon_sprites() (if `sprites`),
+    annotate_images() and add_resource_hints(), without holding the page.
+
+    Slot values that are iterables (card generators) are consumed one item at a
+    time: each chunk is post-processed and written to a buffered file as soon
+    as it is produced, so peak memory is one card, not the page. The <head>,
+    which the post-processing adds to based on the whole body, is kept and
+    written last: the body is streamed to a temporary file and appended to it.
+    """
+    parts = load_template_parts(template_path)
+    sprite_rewrite, sprite_style = icon_sprite_rewriter(output_path, site_root) if sprites else (None, None)
+    annotate = image_annotator(output_path, eager_count=eager_count, site_root=site_root)
+    hints = ResourceHintCollector(output_path, site_root)
+
+    def _process(chunk: str) -> str:
+        if sprite_rewrite:
+            chunk = sprite_rewrite(chunk)
+        chunk = annotate(chunk)
+        hints.feed(chunk)
+        return chunk
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    body_path = f"{output_path}.body.tmp"
+    tmp_path = f"{output_path}.tmp"
+    head: List[str] = []
+    in_head = True
+    try:
+        with open(body_path, "w", encoding="utf-8", buffering=STREAM_BUFFER) as body:
+            for chunk in _chunks(parts, values):
+                if in_head:
+                    m = HEAD_END_RE.search(chunk)
+                    if not m:
+                        head.append(chunk)
+                        continue
+                    head.append(chunk[:m.end()])
+                    chunk = chunk[m.end():]
+                    in_head = False
+                    head_html = _process("".join(head))
+                if chunk:
+                    body.write(_process(chunk))
+        if in_head:
+            head_html = _process("".join(head))
+
+        if sprite_style and sprite_style():
+            head_html = insert_head_style(head_html, sprite_style())
+        head_html = insert_resource_hints(
+            head_html, hints.hints(), hints.prefetch_urls(), speculation, prerender_pattern,
+        )
+
+        with open(tmp_path, "w", encoding="utf-8", buffering=STREAM_BUFFER) as out:
+            out.write(head_html)
+            with open(body_path, "r", encoding="utf-8", buffering=STREAM_BUFFER) as body:
+                while True:
+                    block = body.read(STREAM_BUFFER)
+                    if not block:
+                        break
+                    out.write(block)
+        os.replace(tmp_path, output_path)
+    finally:
+        for path in (body_path, tmp_path):
+            if os.path.exists(path):
+                os.remove(path)
+        flush_image_cache()
+    return output_path
+
+
+def join_chunks(items: Iterable[str], separator: str) -> Iterator[str]:
+    """Lazy separator.join(items), one item (or separator) per chunk."""
+    first = True
+    for item in items:
+        if not first:
+            yield separator
+        first = False
+        yield item
@@ -0,0 +1,230 @@
+import os
+import re
+import glob
+import fnmatch
+import html as html_module
+import logging
+from typing import Any, Dict, List, Optional, Set
+from urllib.parse import urlsplit
+
+from builder_files.util.images import ATTR_RE
+from builder_files.util.page_weight import PAGE_TYPES
+
+logger = logging.getLogger(__name__)
+
+SITE_ROOT = "."
+LOADER_SRC = "/resource/script/third_party_loader.js"
+
+# What to do with each third-party script or embed, first matching rule wins:
+#   name      identifies the group on the page (data-third-party) and in the allowlist
+#   strategy  "idle"        load after the load event, when the main thread is idle
+#             "interaction" load on the first pointer/key/touch/focus event, or only
+#                           on one inside `trigger` (a CSS selector) if given
+#             "consent"     load only once the visitor has granted consent
+#                           (window.thirdPartyConsent.grant())
+#             "facade"      replace the <iframe> with a button that swaps it in on click
+#   src       regex for the <script>/<iframe> src the rule applies to
+#   inline    regex for the bodies of inline scripts that belong to the group
+#   label     button text for a facade
+# Scripts and frames that match no rule are left alone.
+THIRD_PARTY_RULES: List[Dict[str, Any]] = [
+    {
+        "name": "google-analytics",
+        "strategy": "idle",
+        "src": r"^https://www\.googletagmanager\.com/gtag/js",
+        "inline": r"\bgtag\s*\(",
+    },
+    {
+        "name": "youtube",
+        "strategy": "facade",
+        "src": r"^https://www\.youtube(-nocookie)?\.com/embed/",
+        "label": "Play video (loads YouTube)",
+    },
+]
+
+# Page globs (as in PAGE_TYPES, relative to the site root) -> rule names whose
+# scripts load as authored on those pages; "*" keeps every rule's
+THIRD_PARTY_ALLOWLIST: Dict[str, Set[str]] = {}
+
+STRATEGIES = {"idle", "interaction", "consent", "facade"}
+# Script types the browser executes; anything else (JSON-LD, speculation
+# rules, an already deferred placeholder) is data and left alone
+SCRIPT_TYPES = {"", "text/javascript", "application/javascript", "module"}
+
+# Comments are matched so the scripts and frames in them are skipped; a
+# script's body is consumed with it, so markup inside script strings is too
+ELEMENT_RE = re.compile(
+    r"<!--.*?-->"
+    r"|(?P<script><script\b(?P<script_attrs>[^>]*)>(?P<body>.*?)</script\s*>)"
+    r"|(?P<iframe><iframe\b(?P<iframe_attrs>[^>]*)>.*?</iframe\s*>)",
+    re.IGNORECASE | re.DOTALL,
+)
+# Attributes a placeholder keeps under data-third-party-* until it is activated
+MOVED_ATTR_RE = re.compile(r"(\s)(src|type)(\s*=)", re.IGNORECASE)
+LINK_TAG_RE = re.compile(r"[ \t]*<link\b[^>]*>[ \t]*\n?", re.IGNORECASE)
+ORIGIN_HINT_RELS = {"preconnect", "dns-prefetch"}
+# Origins of the URLs a page still fetches as it loads (links to other pages aside)
+EAGER_ORIGIN_RE = re.compile(r"<(?!a\b)[a-zA-Z][^>]*?\s(?:src|href)\s*=\s*[\"']?(https?://[^/\"'\s>]+)", re.IGNORECASE)
+HEAD_CLOSE_RE = re.compile(r"^([ \t]*)</head>", re.IGNORECASE | re.MULTILINE)
+
+
+def _compile_rules(rules: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    compiled = []
+    for rule in rules:
+        if rule.get("strategy") not in STRATEGIES:
+            raise ValueError(f"Third-party rule {rule.get('name')!r}: unknown strategy {rule.get('strategy')!r}")
+        compiled.append({
+            **rule,
+            "src": re.compile(rule["src"]) if rule.get("src") else None,
+            "inline": re.compile(rule["inline"]) if rule.get("inline") else None,
+        })
+    return compiled
+
+
+# Compiled once at import, so a bad rule fails the build straight away
+_RULES = _compile_rules(THIRD_PARTY_RULES)
+
+
+def _attrs(tag_attrs: str) -> Dict[str, str]:
+    return {m.group(1).lower(): html_module.unescape(m.group(2)[1:-1]) for m in ATTR_RE.finditer(tag_attrs)}
+
+
+def _origin(url: str) -> Optional[str]:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}" if parts.scheme in ("http", "https") else None
+
+
+def allowed_rules(page_rel: str, allowlist: Dict[str, Set[str]] = THIRD_PARTY_ALLOWLIST) -> Set[str]:
+    """Names of the rules left as authored on a page (site-relative path)."""
+    allowed: Set[str] = set()
+    for pattern, names in allowlist.items():
+        if fnmatch.fnmatch(page_rel, pattern):
+            allowed |= set(names)
+    return allowed
+
+
+def _is_origin_hint(tag: str) -> bool:
+    return bool(ORIGIN_HINT_RELS & set(_attrs(tag).get("rel", "").lower().split()))
+
+
+def _match_rule(src: str, body: str, allowed: Set[str]) -> Optional[Dict[str, Any]]:
+    """The rule an element belongs to (external by `src`, inline by `body`), unless allowlisted."""
+    for rule in _RULES:
+        if src:
+            hit = rule["src"] is not None and rule["src"].search(src)
+        else:
+            hit = rule["inline"] is not None and rule["inline"].search(body)
+        if hit:
+            return None if "*" in allowed or rule["name"] in allowed else rule
+    return None
+
+
+def _placeholder_script(tag: str, attrs_text: str, rule: Dict[str, Any]) -> str:
+    """`<script ...>` -> an inert type="text/plain" placeholder the loader swaps back in."""
+    marker = f' type="text/plain" data-third-party="{rule["name"]}" data-third-party-strategy="{rule["strategy"]}"'
+    if rule.get("trigger"):
+        marker += f' data-third-party-trigger="{html_module.escape(rule["trigger"], quote=True)}"'
+    new_attrs = MOVED_ATTR_RE.sub(lambda m: f"{m.group(1)}data-third-party-{m.group(2).lower()}{m.group(3)}", attrs_text)
+    return "<script" + marker + new_attrs + tag[len("<script") + len(attrs_text):]
+
+
+def _facade(iframe: str, rule: Dict[str, Any]) -> str:
+    label = html_module.escape(rule.get("label") or f"Load {rule['name']}")
+    return (
+        f'<button type="button" class="third-party-facade" data-third-party="{rule["name"]}" '
+        f'data-third-party-facade="{html_module.escape(iframe, quote=True)}">{label}</button>'
+    )
+
+
+def rewrite_third_party(page_html: str, allowed: Set[str] = frozenset()) -> str:
+    """
+    Apply THIRD_PARTY_RULES to one page. Matching scripts become inert
+    placeholders (external ones keep their URL in data-third-party-src) that
+    third_party_loader.js activates per the rule's strategy, matching iframes
+    become facades, and preconnects to origins nothing on the page loads
+    eagerly any more are dropped. The loader is added to <head> if needed.
+
+    Idempotent: placeholders and facades never match a rule again.
+    """
+    deferred_origins: Set[str] = set()
+    deferred = False
+
+    def _replace(m: re.Match) -> str:
+        nonlocal deferred
+        if m.group("script"):
+            attrs = _attrs(m.group("script_attrs"))
+            if attrs.get("type", "").strip().lower() not in SCRIPT_TYPES:
+                return m.group(0)
+            src = attrs.get("src", "")
+            rule = _match_rule(src, m.group("body"), allowed)
+            if rule is None or rule["strategy"] == "facade":
+                return m.group(0)
+            deferred = True
+            if src and _origin(src):
+                deferred_origins.add(_origin(src))
+            return _placeholder_script(m.group("script"), m.group("script_attrs"), rule)
+        if m.group("iframe"):
+            src = _attrs(m.group("iframe_attrs")).get("src", "")
+            rule = _match_rule(src, "", allowed)
+            if rule is None or rule["strategy"] != "facade":
+                return m.group(0)
+            deferred = True
+            if _origin(src):
+                deferred_origins.add(_origin(src))
+            return _facade(m.group("iframe"), rule)
+        return m.group(0)
+
+    page_html = ELEMENT_RE.sub(_replace, page_html)
+    if not deferred:
+        return page_html
+
+    # A preconnect to an origin that is now only contacted later wastes a
+    # connection during first load
+    if deferred_origins:
+        without_hints = LINK_TAG_RE.sub(lambda m: "" if _is_origin_hint(m.group(0)) else m.group(0), page_html)
+        still_eager = {o.lower() for o in EAGER_ORIGIN_RE.findall(without_hints)}
+        unused = {o.lower() for o in deferred_origins} - still_eager
+
+        def _drop_hint(m: re.Match) -> str:
+            href = _attrs(m.group(0)).get("href", "").rstrip("/").lower()
+            return "" if _is_origin_hint(m.group(0)) and href in unused else m.group(0)
+
+        page_html = LINK_TAG_RE.sub(_drop_hint, page_html)
+
+    if LOADER_SRC not in page_html:
+        page_html = HEAD_CLOSE_RE.sub(
+            lambda m: f'{m.group(1)}    <script src="{LOADER_SRC}" defer></script>\n{m.group(0)}',
+            page_html, count=1,
+        )
+    return page_html
+
+
+def rewrite_page_file(path: str, site_root: str = SITE_ROOT) -> bool:
+    """rewrite_third_party() one built page in place. Returns True if it changed."""
+    page_rel = os.path.relpath(path, site_root).replace(os.sep, "/")
+    with open(path, "r", encoding="utf-8") as f:
+        original = f.read()
+    updated = rewrite_third_party(original, allowed_rules(page_rel))
+    if updated == original:
+        return False
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(updated)
+    return True
+
+
+def defer_third_party_scripts(site_root: str = SITE_ROOT) -> List[str]:
+    """
+    Rewrite the third-party scripts and embeds in every built page (see
+    THIRD_PARTY_RULES), honouring THIRD_PARTY_ALLOWLIST. Pages are only
+    written if they change, so running it over already rewritten pages (or
+    article pages cached from a previous build) is a cheap no-op. Run after
+    every page is built and before anything derived from their markup
+    (service worker, _headers). Returns the pages rewritten.
+    """
+    pages = []
+    for _, pattern in PAGE_TYPES:
+        pages.extend(sorted(glob.glob(os.path.join(site_root, pattern))))
+
+    rewritten = [path for path in pages if rewrite_page_file(path, site_root)]
+    logger.info("Third-party scripts: rewrote %d of %d page(s)", len(rewritten), len(pages))
+    return rewritten
@@ -0,0 +1,412 @@
+import os
+import re
+import json
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from builder_files.util.catalogue import MD_ROOT, article_md_path, list_article_ids, load_article_metadata
+from builder_files.util.front_matter import FrontMatterError, strip_front_matter
+from builder_files.util.images import ATTR_RE, resolve_local_path
+from builder_files.util.highlight import FENCED_BLOCK_RE
+from builder_files.util.link_check import KNOWN_MISSING
+
+logger = logging.getLogger(__name__)
+
+SITE_ROOT = "."
+PROJECTS_JSON = "resource/data/project_list.json"
+SKILLS_JSON = "resource/dynamic_blocks_skills.json"
+
+# Pages the references in each source are written relative to
+ARTICLE_PAGE = "articles/{id}/index.html"
+PROJECTS_PAGE = "projects/index.html"
+SKILLS_PAGE = "skills/index.html"
+
+# Written for a project that hasn't been published yet
+UNSET_DATE = "N/A"
+
+# Article pages are build outputs, so links to them are checked against the
+# article sources instead
+ARTICLE_URL_PREFIX = "articles/"
+
+# Links and images in article bodies: inline markdown links/images, reference
+# definitions and the src/href of raw HTML tags. Code is skipped.
+MD_LINK_RE = re.compile(r"(!?)\[(?:[^\[\]]|\[[^\]]*\])*\]\(\s*<?([^\s()<>]+)>?(?:\s+(?:\"[^\"]*\"|'[^']*'))?\s*\)")
+MD_REF_DEF_RE = re.compile(r"^ {0,3}\[[^\]]+\]:\s*<?([^\s>]+)>?", re.MULTILINE)
+HTML_TAG_RE = re.compile(r"<[a-zA-Z][a-zA-Z0-9-]*\b[^>]*>")
+CODE_SPAN_RE = re.compile(r"`[^`\n]+`")
+
+# ---------------------------------------------------------------------------
+# Schemas — a small subset of JSON Schema:
+#   type        "object" | "array" | "string" | "boolean"
+#   required    keys an object must have
+#   properties  schemas for known keys (other keys are allowed)
+#   values      schema for every value of an object with free-form keys
+#   items       schema for every item of an array
+#   unique      key whose value must not repeat across an array's items
+#   non_empty   string must not be blank / array must not be empty
+#   format      "date-time" (ISO 8601, as written by front matter normalisation,
+#               or UNSET_DATE)
+#   file        a local image/icon reference that must exist on disk
+#   link        a local page link that must resolve to a page or article
+# Empty strings are accepted for "file"/"link"/"format": the data uses "" for
+# "not set" throughout. Missing files listed in link_check.KNOWN_MISSING are
+# reported as warnings instead of errors.
+# ---------------------------------------------------------------------------
+
+STRING = {"type": "string"}
+TEXT = {"type": "string", "non_empty": True}
+BOOLEAN = {"type": "boolean"}
+DATE_TIME = {"type": "string", "format": "date-time"}
+STRING_LIST = {"type": "array", "items": STRING}
+IMAGE = {"type": "string", "file": True}
+LINK = {"type": "string", "link": True}
+
+ARTICLE_SCHEMA = {
+    "type": "object",
+    "required": ["title", "author", "strap_line", "date"],
+    "properties": {
+        "title": TEXT,
+        "author": {
+            "type": "array",
+            "non_empty": True,
+            "items": {
+                "type": "object",
+                "required": ["name"],
+                "properties": {"name": TEXT, "url": STRING},
+            },
+        },
+        "featured_image": IMAGE,
+        "image_alt": STRING,
+        "strap_line": TEXT,
+        "date": {
+            "type": "object",
+            "required": ["published"],
+            "properties": {"published": DATE_TIME, "edited": DATE_TIME},
+        },
+        "labels": STRING_LIST,
+        "keywords": STRING_LIST,
+        "featured": BOOLEAN,
+        "hidden": BOOLEAN,
+        "auto_build": BOOLEAN,
+    },
+}
+
+PROJECTS_SCHEMA = {
+    "type": "array",
+    "unique": "id",
+    "items": {
+        "type": "object",
+        "required": ["id", "name", "date"],
+        "properties": {
+            "id": TEXT,
+            "name": TEXT,
+            "brand": {
+                "type": "object",
+                "properties": {"icon": IMAGE, "large_image": IMAGE, "color": STRING},
+            },
+            "description": {
+                "type": "object",
+                "properties": {"long": STRING, "short_description": STRING},
+            },
+            "date": {
+                "type": "object",
+                "properties": {"started": DATE_TIME, "published": DATE_TIME},
+            },
+            "tags": STRING_LIST,
+            "technologies": STRING_LIST,
+            "links": {
+                "type": "object",
+                "properties": {"click": LINK, "article": LINK, "github": STRING, "demo": LINK},
+            },
+            "featured": BOOLEAN,
+            "hidden": BOOLEAN,
+        },
+    },
+}
+
+SKILLS_SCHEMA = {
+    "type": "object",
+    "values": {
+        "type": "array",
+        "unique": "name",
+        "items": {
+            "type": "object",
+            "required": ["name"],
+            "properties": {
+                "name": TEXT,
+                "description": STRING,
+                "icon": IMAGE,
+                "link": LINK,
+                "light-background": BOOLEAN,
+            },
+        },
+    },
+}
+
+PYTHON_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "boolean": bool,
+}
+
+
+class ContentValidationError(ValueError):
+    """Raised with every problem found when the site's content data is invalid."""
+
+    def __init__(self, errors: List[str]):
+        self.errors = errors
+        super().__init__(f"{len(errors)} content error(s):\n  " + "\n  ".join(errors))
+
+
+class _Context:
+    """Where the value being validated came from, and where its errors and warnings go."""
+
+    def __init__(self, source: str, page_path: str, site_root: str, article_ids: set):
+        self.source = source
+        self.page_path = page_path
+        self.site_root = site_root
+        self.article_ids = article_ids
+        self.errors: List[str] = []
+        self.warnings: List[str] = []
+
+    def error(self, path: str, message: str) -> None:
+        self.errors.append(f"{self.source}: {path or '<root>'}: {message}")
+
+    def missing(self, path: str, message: str, full: str) -> None:
+        """A reference to the file `full` is broken: an error, unless the file is KNOWN_MISSING."""
+        url = "/" + os.path.relpath(full, self.site_root).replace(os.sep, "/")
+        if url in KNOWN_MISSING:
+            self.warnings.append(f"{self.source}: {path or '<root>'}: {message}")
+        else:
+            self.error(path, message)
+
+
+Validator = Callable[[Any, str, _Context], None]
+
+
+def _is_date_time(value: str) -> bool:
+    try:
+        datetime.fromisoformat(value[:-1] + "+00:00" if value.endswith("Z") else value)
+    except ValueError:
+        return False
+    return True
+
+
+def _link_exists(href: str, ctx: _Context) -> bool:
+    full = resolve_local_path(href, ctx.page_path, ctx.site_root)
+    if full is None:
+        return True
+    rel = os.path.relpath(full, ctx.site_root).replace(os.sep, "/")
+    if rel.startswith(ARTICLE_URL_PREFIX):
+        article_id = rel[len(ARTICLE_URL_PREFIX):].split("/")[0]
+        return article_id in ctx.article_ids
+    return os.path.exists(full) or os.path.isfile(full + ".html")
+
+
+def _check_file_reference(value: str, path: str, ctx: _Context) -> None:
+    full = resolve_local_path(value, ctx.page_path, ctx.site_root) if value else None
+    if full is not None and not os.path.isfile(full):
+        ctx.missing(path, f"file not found: {value}", full)
+
+
+def _check_link_reference(value: str, path: str, ctx: _Context) -> None:
+    if value and not _link_exists(value, ctx):
+        ctx.missing(path, f"link target not found: {value}", resolve_local_path(value, ctx.page_path, ctx.site_root))
+
+
+def _check_article_body(body: str, first_line: int, ctx: _Context) -> None:
+    """Check the local links and images in an article's markdown (code blocks and spans excluded)."""
+    body = FENCED_BLOCK_RE.sub(lambda m: "\n" * m.group(0).count("\n"), body)
+    body = CODE_SPAN_RE.sub("", body)
+
+    def _line(pos: int) -> str:
+        return f"body line {first_line + body.count(chr(10), 0, pos)}"
+
+    for m in MD_LINK_RE.finditer(body):
+        check = _check_file_reference if m.group(1) else _check_link_reference
+        check(m.group(2), _line(m.start()), ctx)
+    for m in MD_REF_DEF_RE.finditer(body):
+        _check_link_reference(m.group(1), _line(m.start()), ctx)
+    for m in HTML_TAG_RE.finditer(body):
+        for name, value in ATTR_RE.findall(m.group(0)):
+            if name.lower() == "src":
+                _check_file_reference(value[1:-1], _line(m.start()), ctx)
+            elif name.lower() == "href":
+                _check_link_reference(value[1:-1], _line(m.start()), ctx)
+
+
+def compile_schema(schema: Dict[str, Any]) -> Validator:
+    """
+    Turn a schema dict into a validator(value, path, ctx) closure. The schema is
+    walked once here, so validating a document only runs the checks that apply.
+    """
+    checks: List[Validator] = []
+    expected = schema.get("type")
+
+    if "format" in schema:
+        fmt = schema["format"]
+        if fmt != "date-time":
+            raise ValueError(f"Unknown schema format: {fmt}")
+
+        def _check_format(value, path, ctx):
+            if value and value != UNSET_DATE and not _is_date_time(value):
+                ctx.error(path, f"not an ISO 8601 date-time: {value!r}")
+        checks.append(_check_format)
+
+    if schema.get("non_empty"):
+        def _check_non_empty(value, path, ctx):
+            if not (value.strip() if isinstance(value, str) else value):
+                ctx.error(path, "must not be empty")
+        checks.append(_check_non_empty)
+
+    if schema.get("file"):
+        def _check_file(value, path, ctx):
+            _check_file_reference(value, path, ctx)
+        checks.append(_check_file)
+
+    if schema.get("link"):
+        def _check_link(value, path, ctx):
+            _check_link_reference(value, path, ctx)
+        checks.append(_check_link)
+
+    if "required" in schema:
+        required = list(schema["required"])
+
+        def _check_required(value, path, ctx):
+            for key in required:
+                if key not in value:
+                    ctx.error(path, f"missing required field '{key}'")
+        checks.append(_check_required)
+
+    if "properties" in schema:
+        properties = {k: compile_schema(s) for k, s in schema["properties"].items()}
+
+        def _check_properties(value, path, ctx):
+            for key, validate in properties.items():
+                if key in value:
+                    validate(value[key], f"{path}.{key}" if path else key, ctx)
+        checks.append(_check_properties)
+
+    if "values" in schema:
+        validate_value = compile_schema(schema["values"])
+
+        def _check_values(value, path, ctx):
+            for key, item in value.items():
+                validate_value(item, f"{path}.{key}" if path else key, ctx)
+        checks.append(_check_values)
+
+    if "items" in schema:
+        validate_item = compile_schema(schema["items"])
+
+        def _check_items(value, path, ctx):
+            for i, item in enumerate(value):
+                validate_item(item, f"{path}[{i}]", ctx)
+        checks.append(_check_items)
+
+    if "unique" in schema:
+        unique_key = schema["unique"]
+
+        def _check_unique(value, path, ctx):
+            seen: Dict[Any, int] = {}
+            for i, item in enumerate(value):
+                if not isinstance(item, dict) or unique_key not in item:
+                    continue
+                key = item[unique_key]
+                if key in seen:
+                    ctx.error(f"{path}[{i}]", f"duplicate {unique_key} {key!r} (first at [{seen[key]}])")
+                else:
+                    seen[key] = i
+        checks.append(_check_unique)
+
+    python_type = PYTHON_TYPES.get(expected) if expected else None
+    if expected and python_type is None:
+        raise ValueError(f"Unknown schema type: {expected}")
+
+    def validate(value: Any, path: str, ctx: _Context) -> None:
+        if python_type is not None and not isinstance(value, python_type):
+            ctx.error(path, f"expected {expected}, got {type(value).__name__}")
+            return
+        for check in checks:
+            check(value, path, ctx)
+
+    return validate
+
+
+# Compiled once at import; validating the whole site is then a few dict walks
+_validate_article = compile_schema(ARTICLE_SCHEMA)
+_validate_projects = compile_schema(PROJECTS_SCHEMA)
+_validate_skills = compile_schema(SKILLS_SCHEMA)
+
+
+def _load_json(path: str, ctx: _Context) -> Optional[Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except OSError as e:
+        ctx.error("", f"cannot read file: {e.strerror}")
+    except json.JSONDecodeError as e:
+        ctx.error("", f"invalid JSON at line {e.lineno}, column {e.colno}: {e.msg}")
+    return None
+
+
+def validate_content(
+    site_root: str = SITE_ROOT,
+    md_root: str = MD_ROOT,
+    projects_path: str = PROJECTS_JSON,
+    skills_path: str = SKILLS_JSON,
+) -> None:
+    """
+    Check the site's content data before anything is built: every article's
+    front matter and body, the project list and the skills data. Required
+    fields, date formats, duplicate ids, and that referenced markdown, images,
+    icons and internal links (including those in article bodies) exist are
+    all checked. References to files in KNOWN_MISSING are logged as warnings.
+
+    Every problem is collected and a single ContentValidationError lists them
+    all, so a bad content push fails in well under a second instead of part way
+    through a build (or not at all, where a page builder logs and carries on).
+    """
+    errors: List[str] = []
+    warnings: List[str] = []
+    article_ids = set(list_article_ids(md_root))
+
+    for article_id in sorted(article_ids):
+        md_path = article_md_path(article_id, md_root)
+        ctx = _Context(md_path, os.path.join(site_root, ARTICLE_PAGE.format(id=article_id)), site_root, article_ids)
+        try:
+            meta = load_article_metadata(article_id, md_root)
+            with open(md_path, "r", encoding="utf-8") as f:
+                text = f.read()
+            body = strip_front_matter(text, md_path)
+        except FrontMatterError as e:
+            ctx.error("", str(e))
+        else:
+            meta.pop("id", None)
+            if not meta:
+                ctx.error("", "no front matter")
+            else:
+                _validate_article(meta, "", ctx)
+            _check_article_body(body, text[: len(text) - len(body)].count("\n") + 1, ctx)
+        errors.extend(ctx.errors)
+        warnings.extend(ctx.warnings)
+
+    for path, page, validate in (
+        (projects_path, PROJECTS_PAGE, _validate_projects),
+        (skills_path, SKILLS_PAGE, _validate_skills),
+    ):
+        ctx = _Context(path, os.path.join(site_root, page), site_root, article_ids)
+        data = _load_json(path, ctx)
+        if data is not None:
+            validate(data, "", ctx)
+        errors.extend(ctx.errors)
+        warnings.extend(ctx.warnings)
+
+    for message in warnings:
+        logger.warning("Known missing file: %s", message)
+    if errors:
+        for message in errors:
+            logger.error("%s", message)
+        raise ContentValidationError(errors)
+    logger.info("Content data valid (%d articles)", len(article_ids))
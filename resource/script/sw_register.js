@@ -0,0 +1,13 @@
+// sw_register.js
+// Registers the generated service worker (/sw.js) for repeat and offline visits.
+(function () {
+  'use strict';
+
+  if (!('serviceWorker' in navigator)) return;
+
+  window.addEventListener('load', function () {
+    navigator.serviceWorker.register('/sw.js').catch(function (err) {
+      console.warn('Service worker registration failed', err);
+    });
+  });
+})();
@@ -0,0 +1,102 @@
+// third_party_loader.js
+// Loads the third-party scripts the build deferred (builder_files/util/third_party.py).
+// Each deferred script is a <script type="text/plain" data-third-party="name"> placeholder;
+// a group is swapped for real scripts, in document order, once its strategy allows:
+//   idle         after the load event, when the main thread is idle
+//   interaction  on the first pointer/key/touch/focus event (inside data-third-party-trigger if set)
+//   consent      once thirdPartyConsent.grant() has been called (remembered in localStorage)
+// Embed facades are buttons holding the original iframe markup, swapped in on click.
+(function () {
+  'use strict';
+
+  const CONSENT_KEY = 'third-party-consent';
+  const IDLE_TIMEOUT_MS = 4000;
+  const INTERACTION_EVENTS = ['pointerdown', 'keydown', 'touchstart', 'focusin', 'scroll'];
+  // scroll has no useful target, so scoped triggers listen for the rest
+  const SCOPED_EVENTS = ['pointerdown', 'keydown', 'touchstart', 'focusin'];
+  const ATTR_PREFIX = 'data-third-party';
+
+  const loaded = new Set();
+  const consentQueue = [];
+
+  function activate(name) {
+    if (loaded.has(name)) return;
+    loaded.add(name);
+    document.querySelectorAll('script[type="text/plain"][data-third-party="' + name + '"]').forEach((placeholder) => {
+      const script = document.createElement('script');
+      Array.from(placeholder.attributes).forEach((attr) => {
+        if (attr.name === 'type' || attr.name.startsWith(ATTR_PREFIX)) return;
+        script.setAttribute(attr.name, attr.value);
+      });
+      const type = placeholder.getAttribute('data-third-party-type');
+      if (type) script.type = type;
+      const src = placeholder.getAttribute('data-third-party-src');
+      if (src) script.src = src;
+      else script.text = placeholder.textContent;
+      placeholder.replaceWith(script);
+    });
+  }
+
+  function onIdle(fn) {
+    const run = () => {
+      if ('requestIdleCallback' in window) window.requestIdleCallback(fn, { timeout: IDLE_TIMEOUT_MS });
+      else setTimeout(fn, 1);
+    };
+    if (document.readyState === 'complete') run();
+    else window.addEventListener('load', run, { once: true });
+  }
+
+  function onInteraction(selector, fn) {
+    const events = selector ? SCOPED_EVENTS : INTERACTION_EVENTS;
+    function handler(event) {
+      if (selector && !(event.target instanceof Element && event.target.closest(selector))) return;
+      events.forEach((type) => window.removeEventListener(type, handler, true));
+      fn();
+    }
+    events.forEach((type) => window.addEventListener(type, handler, { capture: true, passive: true }));
+  }
+
+  function hasConsent() {
+    try { return localStorage.getItem(CONSENT_KEY) === 'granted'; } catch (e) { return false; }
+  }
+
+  window.thirdPartyConsent = {
+    granted: hasConsent,
+    grant() {
+      try { localStorage.setItem(CONSENT_KEY, 'granted'); } catch (e) { /* still load for this page */ }
+      while (consentQueue.length) consentQueue.shift()();
+    },
+    revoke() {
+      try { localStorage.removeItem(CONSENT_KEY); } catch (e) { /* ignore */ }
+    }
+  };
+
+  const groups = new Map();
+  document.querySelectorAll('script[type="text/plain"][data-third-party]').forEach((el) => {
+    const name = el.getAttribute('data-third-party');
+    if (!groups.has(name)) {
+      groups.set(name, {
+        strategy: el.getAttribute('data-third-party-strategy'),
+        trigger: el.getAttribute('data-third-party-trigger')
+      });
+    }
+  });
+
+  groups.forEach(({ strategy, trigger }, name) => {
+    const load = () => activate(name);
+    if (strategy === 'idle') onIdle(load);
+    else if (strategy === 'interaction') onInteraction(trigger, load);
+    else if (strategy === 'consent') {
+      if (hasConsent()) onIdle(load);
+      else consentQueue.push(load);
+    }
+  });
+
+  document.addEventListener('click', (event) => {
+    const facade = event.target instanceof Element && event.target.closest('[data-third-party-facade]');
+    if (!facade) return;
+    const template = document.createElement('template');
+    template.innerHTML = facade.getAttribute('data-third-party-facade');
+    facade.replaceWith(template.content);
+  });
+})();
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The builder is run from the repository root and imports `builder_files` from there
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,95 @@
+import gzip
+import json
+import os
+
+import pytest
+
+from builder_files.page_constructors import api
+from builder_files.page_constructors.api import build_api
+from builder_files.util.content_store import open_content_store
+
+BASE = "https://example.com"
+MD_ROOT = "src"
+PROJECTS = "projects.json"
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def _read(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _article(article_id, published, extra="auto_build: true\n", body="See [this](/articles/other)."):
+    _write(
+        f"{MD_ROOT}/{article_id}/index.md",
+        f"---\ntitle: Title {article_id}\ndate:\n  published: {published}\n{extra}---\n{body}\n",
+    )
+
+
+def _build(store=None):
+    return build_api(
+        md_root=MD_ROOT, catalogue_path="articles_index.json", projects_path=PROJECTS, base_url=BASE, site_root=".",
+        store=store,
+    )
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(api, "API_PAGE_SIZE", 1)
+    _article("old", "2024-01-01T00:00:00Z")
+    _article("new", "2025-06-01T00:00:00Z")
+    _article("draft", "2025-07-01T00:00:00Z", extra="auto_build: false\n")
+    _article("secret", "2025-08-01T00:00:00Z", extra="auto_build: true\nhidden: true\n")
+    _write(PROJECTS, json.dumps([{"id": "p", "hidden": True}, {"id": "q", "date": {"published": "2025-01-01"}}]))
+    return tmp_path
+
+
+def test_only_articles_with_a_page_are_published(site):
+    _build()
+    first = _read("api/articles/page-1.json")
+    assert (first["pages"], first["total"], first["previous"]) == (2, 2, None)
+    assert first["next"] == f"{BASE}/api/articles/page-2.json"
+    assert [a["id"] for a in first["articles"] + _read("api/articles/page-2.json")["articles"]] == ["new", "old"]
+    # No endpoints for drafts (auto_build: false) or hidden articles
+    assert {n.split(".json")[0] for n in os.listdir("api/articles")} == {"new", "old", "page-1", "page-2"}
+
+    article = _read("api/articles/new.json")
+    assert article["url"] == f"{BASE}/articles/new"
+    assert f'href="{BASE}/articles/other"' in article["content_html"]
+    assert "auto_build" not in article and len(article["hash"]) == api.HASH_LENGTH
+    with gzip.open("api/articles/new.json.gz", "rt", encoding="utf-8") as f:
+        assert json.load(f) == article
+
+    assert [p["id"] for p in _read("api/projects.json")["projects"]] == ["q"]
+
+
+def test_store_and_json_sources_give_the_same_api(site):
+    _build()
+    from_json = {p: _read(p) for p in ("api/articles/page-1.json", "api/articles/old.json", "api/projects.json")}
+    store = open_content_store(path="store.sqlite", md_root=MD_ROOT, catalogue_path="articles_index.json", projects_path=PROJECTS)
+    try:
+        assert _build(store) == []
+    finally:
+        store.close()
+    assert {p: _read(p) for p in from_json} == from_json
+
+
+def test_unchanged_endpoints_are_kept_and_removed_articles_deleted(site, monkeypatch):
+    assert len(_build()) == 5
+    converted = []
+    monkeypatch.setattr(api, "md_file_to_html_fragment", lambda path: converted.append(path) or "<p>New body</p>")
+    assert _build() == []
+    assert converted == []
+
+    _article("old", "2024-01-01T00:00:00Z", body="New body.")
+    os.remove(f"{MD_ROOT}/new/index.md")
+    os.rmdir(f"{MD_ROOT}/new")
+    assert sorted(_build()) == [os.path.join(".", "api", "articles", "old.json"), os.path.join(".", "api", "articles", "page-1.json")]
+    assert converted == [os.path.join(MD_ROOT, "old", "index.md")]
+    assert not os.path.exists("api/articles/new.json") and not os.path.exists("api/articles/page-2.json.gz")
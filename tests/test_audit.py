@@ -0,0 +1,69 @@
+import contextlib
+import json
+import os
+
+import pytest
+
+from builder_files.util import audit
+from builder_files.util.audit import AUDIT_HISTORY_FILE, audit_page_urls, run_audit
+
+
+def _write(path, text=""):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+class _Browser:
+    def close(self):
+        pass
+
+
+class _Playwright:
+    class chromium:
+        @staticmethod
+        def launch(headless=True):
+            return _Browser()
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    """A built site, audited with canned measurements instead of a real browser."""
+    monkeypatch.chdir(tmp_path)
+    for page in ["index.html", "projects/index.html", "articles/index.html", "articles/a/index.html"]:
+        _write(page, "<html></html>")
+    loads = {}
+
+    def _measure_once(browser, url, throttling):
+        n = loads[url] = loads.get(url, 0) + 1
+        return {"lcp": 1000.0 * n, "cls": 0.01 * n, "tbt": 50.0, "fcp": 400.0, "transfer_bytes": 2048, "requests": n}
+
+    monkeypatch.setattr(audit, "sync_playwright", lambda: contextlib.nullcontext(_Playwright()))
+    monkeypatch.setattr(audit, "_measure_once", _measure_once)
+    return tmp_path
+
+
+def test_page_urls_follow_the_page_types(site):
+    urls = audit_page_urls(".")
+    assert sorted(urls) == ["/", "/articles/", "/articles/a/", "/projects/"]
+
+
+def test_medians_are_appended_to_the_history(site):
+    results = run_audit(urls=["/", "/articles/a/"], site_root=".", report_dir="reports", runs=3)
+    assert results["/"] == {
+        "lcp": 2000.0, "cls": 0.02, "tbt": 50.0, "fcp": 400.0, "transfer_bytes": 2048.0, "requests": 2.0,
+    }
+
+    run_audit(urls=["/"], site_root=".", report_dir="reports", runs=1)
+    with open(os.path.join("reports", AUDIT_HISTORY_FILE), encoding="utf-8") as f:
+        history = [json.loads(line) for line in f]
+    assert [sorted(entry["pages"]) for entry in history] == [["/", "/articles/a/"], ["/"]]
+    assert history[1]["runs"] == 1
+    assert history[1]["throttling"] == audit.THROTTLING
+
+
+def test_delta_against_the_previous_audit():
+    assert audit._format_delta("lcp", 1250.4, {"lcp": 1200.0}) == " (+50)"
+    assert audit._format_delta("cls", 0.1, {"cls": 0.125}) == " (-0.025)"
+    assert audit._format_delta("lcp", 1200.0, {"lcp": 1200.0}) == ""
+    assert audit._format_delta("lcp", 1200.0, None) == ""
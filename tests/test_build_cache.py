@@ -0,0 +1,41 @@
+import logging
+import os
+
+from builder_files.util import build_cache
+from builder_files.util.build_cache import fingerprint, load_cache, save_cache
+
+
+def test_cache_round_trip(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    assert load_cache("things", cache_dir) == {}
+    save_cache("things", {"a": [1, 2]}, cache_dir)
+    assert load_cache("things", cache_dir) == {"a": [1, 2]}
+    assert os.listdir(cache_dir) == ["things.json"]
+
+
+def test_corrupt_cache_is_treated_as_empty(tmp_path, caplog):
+    (tmp_path / "things.json").write_text('{"a": ', encoding="utf-8")
+    with caplog.at_level(logging.WARNING, logger=build_cache.__name__):
+        assert load_cache("things", str(tmp_path)) == {}
+    assert "Ignoring unreadable build cache" in caplog.text
+
+    (tmp_path / "things.json").write_text("[1, 2]", encoding="utf-8")
+    assert load_cache("things", str(tmp_path)) == {}
+
+
+def test_fingerprint_follows_file_contents(tmp_path):
+    path = tmp_path / "input.txt"
+    missing = fingerprint(["v1", ("file", str(path))])
+    path.write_text("one", encoding="utf-8")
+    one = fingerprint(["v1", ("file", str(path))])
+    assert one != missing
+
+    # Same contents, new mtime: still the same
+    os.utime(path, (1, 1))
+    assert fingerprint(["v1", ("file", str(path))]) == one
+
+    path.write_text("two", encoding="utf-8")
+    assert fingerprint(["v1", ("file", str(path))]) != one
+    assert fingerprint(["v2", ("file", str(path))]) != fingerprint(["v1", ("file", str(path))])
+    # Parts are separated, so they can't run together
+    assert fingerprint(["ab", "c"]) != fingerprint(["a", "bc"])
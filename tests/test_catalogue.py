@@ -0,0 +1,96 @@
+import json
+import os
+
+import pytest
+
+from builder_files.page_constructors.article import _article_fingerprint
+from builder_files.util.catalogue import load_catalogue
+from builder_files.util.front_matter import FrontMatterError, split_front_matter
+from builder_files.util.images import local_image_paths
+
+MD_ROOT = "articles-src"
+INDEX = "data/articles_index.json"
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def test_split_front_matter_yaml_and_toml():
+    meta, body = split_front_matter("---\ntitle: Hello\npublished: 2025-10-29\n---\nBody\n")
+    assert meta == {"title": "Hello", "published": "2025-10-29T00:00:00Z"}
+    assert body == "Body\n"
+
+    meta, body = split_front_matter('+++\ntitle = "Hello"\nlabels = ["a", "b"]\n+++\nBody\n')
+    assert meta == {"title": "Hello", "labels": ["a", "b"]}
+    assert body == "Body\n"
+
+    assert split_front_matter("# Just a heading\n") == ({}, "# Just a heading\n")
+
+
+def test_split_front_matter_rejects_malformed_blocks():
+    with pytest.raises(FrontMatterError):
+        split_front_matter("---\ntitle: [unclosed\n---\nBody\n")
+    with pytest.raises(FrontMatterError):
+        split_front_matter("---\n- a list\n---\nBody\n")
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _write(f"{MD_ROOT}/one/index.md", "---\ntitle: One\nkeywords: [x]\nauto_build: true\n---\nBody\n")
+    _write(f"{MD_ROOT}/two/index.md", "---\ntitle: Two\n---\nBody\n")
+    _write(f"{MD_ROOT}/bare/index.md", "No front matter\n")
+    return tmp_path
+
+
+def test_load_catalogue_keeps_catalogue_fields_only(site):
+    entries = load_catalogue(md_root=MD_ROOT, index_path=INDEX)
+    assert entries == [
+        {"id": "one", "title": "One", "auto_build": True},
+        {"id": "two", "title": "Two"},
+    ]
+    with open(INDEX, encoding="utf-8") as f:
+        assert json.load(f) == entries
+
+
+def test_load_catalogue_rewrites_index_only_when_it_changes(site):
+    load_catalogue(md_root=MD_ROOT, index_path=INDEX)
+    os.utime(INDEX, ns=(0, 0))
+
+    load_catalogue(md_root=MD_ROOT, index_path=INDEX)
+    assert os.stat(INDEX).st_mtime_ns == 0
+
+    _write(f"{MD_ROOT}/two/index.md", "---\ntitle: Two, renamed\n---\nBody\n")
+    entries = load_catalogue(md_root=MD_ROOT, index_path=INDEX)
+    assert entries[1]["title"] == "Two, renamed"
+    assert os.stat(INDEX).st_mtime_ns != 0
+
+
+def _fingerprint(article_id, related=(), assets=()):
+    return _article_fingerprint(article_id, MD_ROOT, "template.html", list(related), list(assets))
+
+
+def test_article_fingerprint_is_per_article(site):
+    one, two = _fingerprint("one"), _fingerprint("two")
+    _write(f"{MD_ROOT}/two/index.md", "---\ntitle: Two\n---\nEdited body\n")
+    assert _fingerprint("one") == one
+    assert _fingerprint("two") != two
+
+    assert _fingerprint("one", related=[{"id": "two", "title": "Two, renamed"}]) != one
+
+
+def test_article_fingerprint_follows_referenced_images(site):
+    _write("articles/one/index.html", '<img src="diagram.png"><img src="/img/logo.svg"><img src="https://x.test/a.png">')
+    _write("articles/one/diagram.png", "png")
+    _write("img/logo.svg", "<svg/>")
+    with open("articles/one/index.html", encoding="utf-8") as f:
+        assets = local_image_paths(f.read(), "articles/one/index.html", ".")
+    assert assets == [os.path.join("articles", "one", "diagram.png"), os.path.join("img", "logo.svg")]
+
+    before = _fingerprint("one", assets=assets)
+    assert _fingerprint("one", assets=assets) == before
+    _write("articles/one/diagram.png", "a bigger png")
+    assert _fingerprint("one", assets=assets) != before
@@ -0,0 +1,104 @@
+import json
+import os
+import sqlite3
+
+import pytest
+
+from builder_files.util import content_store
+from builder_files.util.content_store import ContentStore, open_content_store
+
+MD_ROOT = "src"
+PROJECTS = "projects.json"
+DB = "cache/content.sqlite"
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def _article(article_id, published, extra="", body="Plain text."):
+    _write(
+        f"{MD_ROOT}/{article_id}/index.md",
+        f"---\ntitle: Title {article_id}\ndate:\n  published: {published}\n{extra}---\n{body}\n",
+    )
+
+
+def _open():
+    return open_content_store(path=DB, md_root=MD_ROOT, catalogue_path="articles_index.json", projects_path=PROJECTS)
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _article("old", "2024-01-01T00:00:00Z", "labels: [python]\nauto_build: true\n", "About [sqlite](/x) indexes.")
+    _article("new", "2025-06-01T00:00:00+02:00", "labels: [python, web]\nfeatured: true\n")
+    _article("secret", "2025-08-01T00:00:00Z", "labels: [web]\nhidden: true\n", "Hidden sqlite notes.")
+    _write(PROJECTS, json.dumps([
+        {"id": "undated"},
+        {"id": "p1", "date": {"published": "2023-01-01"}},
+        {"id": "p2", "date": {"started": "2024-01-01"}, "featured": True},
+        {"id": "p3", "date": {"published": "2025-01-01"}, "hidden": True},
+    ]))
+    return tmp_path
+
+
+def test_queries_filter_and_sort_in_sql(site):
+    with _open() as store:
+        assert [e["id"] for e in store.articles()] == ["new", "old"]
+        assert [e["id"] for e in store.articles(include_hidden=True)] == ["secret", "new", "old"]
+        assert [e["id"] for e in store.articles(label="python", limit=1, offset=1)] == ["old"]
+        assert [e["id"] for e in store.articles(featured=True)] == ["new"]
+        assert [e["id"] for e in store.articles(auto_build=True)] == ["old"]
+        assert store.count_articles(label="web") == 1
+        assert store.labels() == {"python": 2, "web": 1}
+        assert [p["id"] for p in store.projects()] == ["p2", "p1", "undated"]
+        assert [p["id"] for p in store.projects(order="source", include_hidden=True)] == ["undated", "p1", "p2", "p3"]
+        assert [p["id"] for p in store.projects(featured=True)] == ["p2"]
+        if store.fts:
+            # Link targets are not indexed; hidden articles are not found
+            assert [r["id"] for r in store.search("sqlite")] == ["old"]
+            assert store.search("x") == []
+
+
+def test_sync_only_rewrites_what_changed(site, monkeypatch):
+    _open().close()
+    written = []
+    original = ContentStore._write_article
+    monkeypatch.setattr(ContentStore, "_write_article", lambda self, *a: written.append(a[1]["id"]) or original(self, *a))
+    loads = []
+    original_load = ContentStore._load_projects
+    monkeypatch.setattr(ContentStore, "_load_projects", lambda self, p: loads.append(p) or original_load(self, p))
+
+    _open().close()
+    assert (written, loads) == ([], [])
+
+    with open(f"{MD_ROOT}/old/index.md", "a", encoding="utf-8") as f:
+        f.write("Appended.\n")
+    os.remove(f"{MD_ROOT}/secret/index.md")
+    os.rmdir(f"{MD_ROOT}/secret")
+    _write(PROJECTS, json.dumps([{"id": "only"}]))
+    with _open() as store:
+        assert written == ["old"]
+        assert loads == [PROJECTS]
+        assert [e["id"] for e in store.articles(include_hidden=True)] == ["new", "old"]
+        assert store.labels(include_hidden=True) == {"python": 2, "web": 1}
+        assert [p["id"] for p in store.projects()] == ["only"]
+
+
+def test_outdated_or_unreadable_store_is_rebuilt(site, monkeypatch):
+    _open().close()
+    monkeypatch.setattr(content_store, "SCHEMA_VERSION", content_store.SCHEMA_VERSION + 1)
+    with _open() as store:
+        assert len(store.articles()) == 2
+
+    _write(DB, "not a database")
+    with _open() as store:
+        assert len(store.articles()) == 2
+    with sqlite3.connect(DB) as db:
+        assert db.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()[0] == str(
+            content_store.SCHEMA_VERSION
+        )
+
+    assert open_content_store(enabled=False) is None
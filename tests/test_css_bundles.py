@@ -0,0 +1,230 @@
+import glob
+import os
+
+import pytest
+
+from builder_files.util.css_bundles import (
+    BUNDLE_GRACE_SECONDS as GRACE, build_css_bundles, linked_stylesheets, page_tokens, prune_css,
+    retire_unused_bundles, selector_can_match,
+)
+
+TAGS = {"html", "body", "p", "a", "ul", "li"}
+CLASSES = {"card", "card-title", "md:wide", "is-open"}
+IDS = {"main"}
+
+
+def _prune(css):
+    return prune_css(css, TAGS, CLASSES, IDS)
+
+
+@pytest.mark.parametrize(
+    "selector, expected",
+    [
+        ("p", True),
+        ("table", False),
+        ("P", True),
+        (".card", True),
+        (".missing", False),
+        ("#main", True),
+        ("#sidebar", False),
+        ("ul > li + li ~ a", True),
+        ("ul > li table", False),
+        (".card.missing", False),
+        ("a.card-title:hover", True),
+        ("p::first-line", True),
+        ("a[href^='https://'] .card", True),
+        ("a[data-x='.missing'] ", True),
+        (".card:not(.missing)", True),
+        (":is(.missing, table) p", True),
+        (".md\\:wide", True),
+        (".lg\\:wide", False),
+        ("*", True),
+        ("::selection", True),
+    ],
+)
+def test_selector_can_match(selector, expected):
+    assert selector_can_match(selector, TAGS, CLASSES, IDS) is expected
+
+
+def test_unused_selectors_are_pruned_from_lists():
+    css, kept, removed = _prune("p, table, .missing { color: red; }\n.card{margin:0}")
+    assert css == "p{color: red;}\n.card{margin:0}"
+    assert (kept, removed) == (2, 2)
+
+
+def test_empty_nested_blocks_are_dropped():
+    css, kept, removed = _prune(
+        "@media (min-width: 40em) {\n  .missing { display: none; }\n  @supports (display: grid) { table { x: y } }\n}\n"
+        "@media print { a { color: black; } }"
+    )
+    assert css == "@media print{a{color: black;}}"
+    assert (kept, removed) == (1, 2)
+
+
+def test_other_at_rules_are_kept_as_they_are():
+    css, _, _ = _prune(
+        '@charset "utf-8";\n@import url("x.css");\n'
+        "@font-face { font-family: X; src: url(x.woff2); }\n"
+        "@keyframes spin { from { transform: rotate(0) } to { transform: rotate(1turn) } }"
+    )
+    assert css.splitlines() == [
+        '@charset "utf-8";',
+        '@import url("x.css");',
+        "@font-face{font-family: X; src: url(x.woff2);}",
+        "@keyframes spin{from { transform: rotate(0) } to { transform: rotate(1turn) }}",
+    ]
+
+
+def test_braces_inside_strings_do_not_split_rules():
+    css, kept, removed = _prune('.card::after { content: "}"; }\ntable::before { content: "{"; }')
+    assert css == '.card::after{content: "}";}'
+    assert (kept, removed) == (1, 1)
+
+
+def test_page_tokens_count_inline_script_strings():
+    tags, classes, ids = page_tokens(
+        '<div class="a  b" id="top"><script>el.classList.add("is-open"); q("#later")</script></div>'
+    )
+    assert {"div", "script", "html", "body"} <= tags
+    assert {"a", "b", "is-open", "later"} <= classes
+    assert {"top", "is-open", "later"} <= ids
+
+
+def _write(root, rel, text):
+    path = os.path.join(root, rel)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def _page(body):
+    return (
+        '<html><head>\n  <link rel="stylesheet" href="/resource/style/base.css" />\n'
+        '  <link rel="stylesheet" href="/resource/style/print.css" media="print" />\n'
+        f"</head><body>{body}</body></html>"
+    )
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _write(tmp_path, "resource/style/base.css", ".used { color: red }\n.unused { color: blue }\np { margin: 0 }")
+    _write(tmp_path, "resource/style/print.css", "body { color: black }")
+    _write(tmp_path, "resource/script/menu.js", "menu.classList.toggle('open');")
+    _write(tmp_path, "articles/one/index.html", _page('<p class="used">One</p>'))
+    return str(tmp_path)
+
+
+def _bundles(site):
+    return sorted(os.path.relpath(p, site) for p in glob.glob(os.path.join(site, "resource/style/bundles/*.css")))
+
+
+def test_build_css_bundles(site):
+    _write(site, "resource/style/base.css", ".used{a:b}\n.unused{a:b}\n.open{a:b}\np{a:b}")
+    written = build_css_bundles(site)
+
+    assert len(written) == 1
+    with open(written[0], encoding="utf-8") as f:
+        bundle = f.read()
+    assert bundle == "/* /resource/style/base.css */\n.used{a:b}\n.open{a:b}\np{a:b}\n"
+
+    with open(os.path.join(site, "articles/one/index.html"), encoding="utf-8") as f:
+        page = f.read()
+    bundle_url = "/" + os.path.relpath(written[0], site)
+    assert linked_stylesheets(page) == [bundle_url]
+    assert 'data-css-bundle="/resource/style/base.css"' in page
+    # Links with a media query are left alone
+    assert 'href="/resource/style/print.css" media="print"' in page
+
+    # Rebuilding from the rewritten page gives the same bundle and page
+    assert build_css_bundles(site) == []
+    with open(os.path.join(site, "articles/one/index.html"), encoding="utf-8") as f:
+        assert f.read() == page
+
+
+def test_superseded_bundles_are_kept_for_the_grace_period(site):
+    build_css_bundles(site)
+    first = _bundles(site)
+
+    _write(site, "articles/one/index.html", _page('<p class="used unused">One</p>'))
+    build_css_bundles(site)
+    second = _bundles(site)
+
+    # The previous build's bundle is still linked from cached HTML
+    assert len(second) == 2 and set(first) < set(second)
+
+
+def _outputs(root, *names):
+    for name in names:
+        (root / name).write_text(name, encoding="utf-8")
+    return sorted(names)
+
+
+def _retire(root, in_use, now):
+    existing = sorted(p.name for p in root.iterdir() if p.suffix == ".css")
+    return retire_unused_bundles(existing, set(in_use), str(root), now=now, cache_dir=str(root / "cache"))
+
+
+def test_superseded_bundles_outlive_the_grace_period(tmp_path):
+    _outputs(tmp_path, "a.css", "b.css")
+
+    # Build 1 uses a; b was never in use but is kept until the grace period has passed
+    assert _retire(tmp_path, {"a.css"}, now=1000) == []
+    # Build 2 switches to b: a is the previous build's, so it stays
+    assert _retire(tmp_path, {"b.css"}, now=1000 + GRACE) == []
+    assert (tmp_path / "a.css").exists()
+    # Build 3, soon after: a was superseded by build 2, so its grace period starts then
+    assert _retire(tmp_path, {"b.css"}, now=1000 + GRACE + 10) == []
+    # ... and ends GRACE seconds later
+    assert _retire(tmp_path, {"b.css"}, now=1000 + 2 * GRACE - 1) == []
+    assert _retire(tmp_path, {"b.css"}, now=1000 + 2 * GRACE) == ["a.css"]
+    assert not (tmp_path / "a.css").exists()
+    assert (tmp_path / "b.css").exists()
+
+
+def test_bundles_back_in_use_are_not_retired(tmp_path):
+    _outputs(tmp_path, "a.css", "b.css")
+    _retire(tmp_path, {"a.css"}, now=0)
+    _retire(tmp_path, {"b.css"}, now=10)
+    # a is in use again before its grace period ends, then unused once more
+    _retire(tmp_path, {"a.css"}, now=20)
+    _retire(tmp_path, {"b.css"}, now=30)
+    # Its grace period restarted when it was superseded again
+    assert _retire(tmp_path, {"b.css"}, now=30 + GRACE - 1) == []
+    assert _retire(tmp_path, {"b.css"}, now=30 + GRACE) == ["a.css"]
+
+
+def test_unused_bundles_without_a_previous_build(tmp_path):
+    _outputs(tmp_path, "stale.css")
+    assert _retire(tmp_path, set(), now=0) == []
+    assert _retire(tmp_path, set(), now=GRACE) == ["stale.css"]
+
+
+def test_bundle_cache_matches_bundle_page_and_stays_warm(site, monkeypatch):
+    from builder_files.util import css_bundles
+
+    page_path = os.path.join(site, "articles/two/index.html")
+    cache = css_bundles.BundleCache(site)
+    html = _page('<p class="used">Two</p>')
+    assert cache.bundle_page(html, page_path) == css_bundles.bundle_page(html, page_path, site)
+
+    calls = []
+    monkeypatch.setattr(css_bundles, "_page_groups", lambda *a: calls.append("pages") or {})
+    real_write = css_bundles._write_bundle
+    monkeypatch.setattr(css_bundles, "_write_bundle", lambda *a: calls.append("prune") or real_write(*a))
+
+    # New text, no new names from the stylesheets: the same bundle, nothing re-read
+    edited = cache.bundle_page(_page('<p class="used other">Edited</p>'), page_path)
+    assert calls == []
+    assert linked_stylesheets(edited) == linked_stylesheets(cache.bundle_page(html, page_path))
+
+    # A class the stylesheet styles: re-pruned, and the rule is kept
+    unused = cache.bundle_page(_page('<p class="unused">Two</p>'), page_path)
+    assert calls == ["prune"]
+    with open(os.path.join(site, linked_stylesheets(unused)[0].lstrip("/")), encoding="utf-8") as f:
+        assert ".unused" in f.read()
+
+    # The built pages are only read again, and bundles re-pruned, after reset()
+    cache.reset()
+    cache.bundle_page(html, page_path)
+    assert calls == ["prune", "pages", "prune"]
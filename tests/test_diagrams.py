@@ -0,0 +1,90 @@
+import json
+import os
+
+import pytest
+
+from builder_files.util import diagrams
+from builder_files.util.diagrams import (
+    DIAGRAM_FALLBACK_CLASS, RENDERER_SCRIPTS, diagram_html, normalise_source, prerender_diagrams, renderer_script,
+)
+from builder_files.util.html import md_file_to_html_fragment
+
+SVG = '<svg id="d" aria-labelledby="d t"><title id="t">x</title><use href="#d"/></svg>'
+ARTICLE = """# Diagrams
+
+```mermaid
+graph TD; A-->B
+```
+
+```math
+E = mc^2
+```
+
+```mermaid
+graph TD; A-->B
+```
+
+```python
+print("not a diagram")
+```
+"""
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(diagrams, "_memo", {})
+    _write("a/index.md", ARTICLE)
+    batches = []
+    monkeypatch.setattr(diagrams, "_render_batch", lambda jobs, browser=None: batches.append(jobs) or {k: SVG for k in jobs})
+    return batches
+
+
+def test_normalise_source():
+    assert normalise_source("a\r\n\tb\r  \nc\n") == "a\n    b\n\nc\n"
+
+
+def test_blocks_are_rendered_once_in_one_batch(site):
+    assert prerender_diagrams(["a/index.md", "missing.md"]) == 2
+    assert [sorted(kind for kind, _ in jobs.values()) for jobs in site] == [["math", "mermaid"]]
+    assert prerender_diagrams(["a/index.md"]) == 0
+    assert len(site) == 1
+
+    html = md_file_to_html_fragment("a/index.md")
+    assert html.count('<figure class="diagram diagram-mermaid">') == 2
+    assert '<div class="math-display" role="img" aria-label="E = mc^2">' in html
+    # The second copy of a block gets its own ids, references included
+    assert 'id="d-2"' in html and 'href="#d-2"' in html and 'aria-labelledby="d-2 t-2"' in html
+    assert DIAGRAM_FALLBACK_CLASS not in html
+
+
+def test_unrendered_blocks_show_their_source(site, monkeypatch):
+    def _fail(jobs, browser=None):
+        raise RuntimeError("no browser")
+    monkeypatch.setattr(diagrams, "_render_batch", _fail)
+    assert prerender_diagrams(["a/index.md"]) == 0
+    assert diagram_html("A<B\n", "Mermaid") == (
+        f'<div class="{DIAGRAM_FALLBACK_CLASS}"><pre><code class="language-Mermaid">A&lt;B\n</code></pre></div>'
+    )
+
+
+def test_renderer_scripts_are_vendored_and_pinned(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(diagrams, "VENDOR_DIR", "vendor")
+    monkeypatch.setattr(diagrams, "RENDERER_LOCK", os.path.join("vendor", "renderers.json"))
+    _write(diagrams._vendored_path(RENDERER_SCRIPTS["mermaid"]), "window.mermaid = {};")
+
+    assert renderer_script("mermaid") == b"window.mermaid = {};"
+    with open(os.path.join("vendor", "renderers.json"), encoding="utf-8") as f:
+        assert list(json.load(f)) == [RENDERER_SCRIPTS["mermaid"]]
+    assert renderer_script("mermaid") == b"window.mermaid = {};"
+
+    _write(diagrams._vendored_path(RENDERER_SCRIPTS["mermaid"]), "tampered")
+    with pytest.raises(RuntimeError):
+        renderer_script("mermaid")
@@ -0,0 +1,96 @@
+import json
+import os
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from builder_files.page_constructors import feeds
+from builder_files.page_constructors.feeds import (
+    ATOM_OUTPUT, RSS_OUTPUT, SITEMAP_OUTPUT, absolute_urls, article_dates, build_feeds,
+)
+
+BASE = "https://example.com"
+MD_ROOT = "src/articles"
+NS = {
+    "sm": "http://www.sitemaps.org/schemas/sitemap/0.9",
+    "atom": "http://www.w3.org/2005/Atom",
+    "content": "http://purl.org/rss/1.0/modules/content/",
+}
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def _article(article_id, published, extra="", body="Body with [a link](/articles/other) & ![x](img.png)."):
+    _write(
+        f"{MD_ROOT}/{article_id}/index.md",
+        f"---\ntitle: Title {article_id}\nauto_build: true\ndate:\n  published: {published}\n{extra}---\n{body}\n",
+    )
+
+
+def _build():
+    return build_feeds(
+        md_root=MD_ROOT, catalogue_path="articles_index.json", projects_path="projects.json", base_url=BASE, site_root=".",
+    )
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _article("old", "2024-01-01T00:00:00Z")
+    _article("new", "2025-06-01T00:00:00Z", extra="  edited: 2025-07-01T12:00:00Z\n")
+    _article("secret", "2025-08-01T00:00:00Z", extra="hidden: true\n")
+    _write("projects.json", json.dumps([{"id": "p", "date": {"published": "2025-09-01T00:00:00Z"}}]))
+    return tmp_path
+
+
+def test_article_dates_and_urls():
+    published, modified = article_dates({"date": {"published": "2025-06-01T00:00:00Z", "edited": "2025-07-01T12:00:00+01:00"}})
+    assert (published.isoformat(), modified.isoformat()) == ("2025-06-01T00:00:00+00:00", "2025-07-01T11:00:00+00:00")
+    assert article_dates({}) == (None, None)
+    assert absolute_urls('<a href="/x">x</a><img src="a.png">', f"{BASE}/articles/a") == (
+        f'<a href="{BASE}/x">x</a><img src="{BASE}/articles/a/a.png">'
+    )
+
+
+def test_sitemap_lists_pages_and_published_articles(site):
+    _build()
+    root = ET.parse(SITEMAP_OUTPUT).getroot()
+    urls = {u.find("sm:loc", NS).text: getattr(u.find("sm:lastmod", NS), "text", None) for u in root.findall("sm:url", NS)}
+    assert urls == {
+        f"{BASE}/": "2025-09-01",
+        f"{BASE}/articles": "2025-07-01",
+        f"{BASE}/projects": "2025-09-01",
+        f"{BASE}/skills": None,
+        f"{BASE}/articles/new": "2025-07-01",
+        f"{BASE}/articles/old": "2024-01-01",
+    }
+
+
+def test_rss_and_atom_are_valid_and_newest_first(site):
+    _build()
+    channel = ET.parse(RSS_OUTPUT).getroot().find("channel")
+    items = channel.findall("item")
+    assert [i.find("link").text for i in items] == [f"{BASE}/articles/new", f"{BASE}/articles/old"]
+    content = items[0].find("content:encoded", NS).text
+    assert f'href="{BASE}/articles/other"' in content and f'src="{BASE}/articles/new/img.png"' in content
+
+    feed = ET.parse(ATOM_OUTPUT).getroot()
+    entries = feed.findall("atom:entry", NS)
+    assert [e.find("atom:id", NS).text for e in entries] == [f"{BASE}/articles/new", f"{BASE}/articles/old"]
+    assert feed.find("atom:updated", NS).text == "2025-07-01T12:00:00Z"
+
+
+def test_unchanged_feeds_are_not_rewritten_and_entries_are_cached(site, monkeypatch):
+    assert sorted(_build()) == sorted(os.path.join(".", n) for n in (SITEMAP_OUTPUT, RSS_OUTPUT, ATOM_OUTPUT))
+    assert _build() == []
+
+    rendered = []
+    original = feeds._render_entries
+    monkeypatch.setattr(feeds, "_render_entries", lambda e, c, b: rendered.append(e["id"]) or original(e, c, b))
+    _article("old", "2024-01-01T00:00:00Z", body="A new body.")
+    assert _build() == [os.path.join(".", RSS_OUTPUT), os.path.join(".", ATOM_OUTPUT)]
+    assert rendered == ["old"]
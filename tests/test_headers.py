@@ -0,0 +1,74 @@
+import os
+
+import pytest
+
+from builder_files.page_constructors.headers import (
+    CACHE_HTML, CACHE_IMMUTABLE, CACHE_MEDIUM, CACHE_NONE, CACHE_SHORT,
+    build_headers_file, build_headers_rules, cache_policy,
+)
+
+
+def _write(path, text=""):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _write(
+        "index.html",
+        '<html><head><link rel="stylesheet" href="/resource/style/main.css" />'
+        '<script src="https://cdn.example.com/lib.js"></script></head>'
+        '<body><main><img src="/resource/image/hero.png" fetchpriority="high"></main></body></html>',
+    )
+    _write("articles/a/index.html", "<html></html>")
+    _write("articles/a/article.pdf", "%PDF")
+    _write("sw.js", "")
+    _write("resource/style/main.css", "@font-face { font-family: F; src: url('/resource/font/f.woff2'); } p { font-family: F; }")
+    _write("resource/style/bundles/article.0123abcd.css", "")
+    _write("resource/font/f.woff2", "")
+    _write("resource/image/hero.png", "")
+    _write("resource/image/notes.md", "")
+    return tmp_path
+
+
+def test_cache_policy_by_file_name():
+    assert cache_policy("main.3f9a1c2e.css") == CACHE_IMMUTABLE
+    assert cache_policy("logo-0a1b2c3d4e.png") == CACHE_IMMUTABLE
+    assert cache_policy("index.html") == CACHE_HTML
+    assert cache_policy("article.pdf") == CACHE_MEDIUM
+    assert cache_policy("font.woff2") == CACHE_MEDIUM
+    assert cache_policy("main.css") == CACHE_SHORT
+
+
+def test_rules_cover_pages_assets_and_the_service_worker(site):
+    rules = dict(build_headers_rules("."))
+    assert rules["/"] == [
+        ("Cache-Control", CACHE_HTML),
+        ("Link", "<https://cdn.example.com>; rel=preconnect"),
+        ("Link", '</resource/font/f.woff2>; rel=preload; as=font; type="font/woff2"; crossorigin'),
+        ("Link", "</resource/image/hero.png>; rel=preload; as=image; fetchpriority=high"),
+    ]
+    assert rules["/articles/a/"] == [("Cache-Control", CACHE_HTML)]
+    assert rules["/sw.js"] == [("Cache-Control", CACHE_NONE)]
+    assert rules["/articles/a/article.pdf"] == [("Cache-Control", CACHE_MEDIUM)]
+    # Directories with a single policy collapse into one rule; mixed ones don't
+    assert rules["/resource/font/*"] == [("Cache-Control", CACHE_MEDIUM)]
+    assert rules["/resource/image/*"] == [("Cache-Control", CACHE_MEDIUM)]
+    assert rules["/resource/style/main.css"] == [("Cache-Control", CACHE_SHORT)]
+    assert rules["/resource/style/bundles/*"] == [("Cache-Control", CACHE_IMMUTABLE)]
+    assert "/resource/*" not in rules
+
+
+def test_headers_file_is_only_rewritten_when_it_changes(site):
+    path = build_headers_file(site_root=".")
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    assert text.startswith("# Generated by builder.py")
+    assert "/sw.js\n  Cache-Control: no-cache\n" in text
+
+    os.utime(path, ns=(0, 0))
+    build_headers_file(site_root=".")
+    assert os.stat(path).st_mtime_ns == 0
@@ -0,0 +1,65 @@
+import os
+
+from builder_files.util import highlight
+from builder_files.util.highlight import highlight_code, highlight_key, prune_highlight_cache
+
+
+def _article(tmp_path, name, body):
+    path = tmp_path / name
+    path.write_text(body, encoding="utf-8")
+    return str(path)
+
+
+def test_key_changes_with_code_language_and_style():
+    key = highlight_key("x = 1\n", "python", "monokai")
+    assert key == highlight_key("x = 1\n", "python", "monokai")
+    assert key != highlight_key("x = 2\n", "python", "monokai")
+    assert key != highlight_key("x = 1\n", "ruby", "monokai")
+    assert key != highlight_key("x = 1\n", "python", "default")
+
+
+def test_cached_block_is_reused(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(highlight, "_memo", {})
+    html = highlight_code("x = 1\n", "python")
+    cache_file = os.path.join(highlight.HIGHLIGHT_CACHE_DIR, highlight_key("x = 1\n", "python") + ".html")
+    assert os.path.isfile(cache_file)
+
+    # A later build reads the cached file instead of re-highlighting
+    with open(cache_file, "w", encoding="utf-8") as f:
+        f.write("<cached/>")
+    monkeypatch.setattr(highlight, "_memo", {})
+    assert highlight_code("x = 1\n", "python") == "<cached/>"
+    assert html != "<cached/>"
+
+
+def test_prune_keeps_live_blocks_and_deletes_the_rest(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(highlight, "_memo", {})
+    md = _article(tmp_path, "a.md", "Text\n\n```python\nx = 1\n```\n\n```mermaid\ngraph TD\n  A-->B\n```\n")
+    highlight_code("x = 1\n", "python")
+    highlight_code("old = True\n", "python")
+
+    removed = prune_highlight_cache([md])
+
+    assert removed == 1
+    assert os.listdir(highlight.HIGHLIGHT_CACHE_DIR) == [highlight_key("x = 1\n", "python") + ".html"]
+
+
+def test_prune_after_edit_drops_the_old_block(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(highlight, "_memo", {})
+    md = _article(tmp_path, "a.md", "```python\nx = 1\n```\n")
+    highlight_code("x = 1\n", "python")
+    _article(tmp_path, "a.md", "```python\nx = 2\n```\n")
+    highlight_code("x = 2\n", "python")
+
+    assert prune_highlight_cache([md]) == 1
+    assert prune_highlight_cache([md]) == 0
+
+
+def test_committed_stylesheet_matches_the_highlight_style():
+    # Regenerate with `python builder.py highlight-css` after changing HIGHLIGHT_STYLE
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(os.path.join(root, highlight.HIGHLIGHT_CSS_OUTPUT), encoding="utf-8") as f:
+        assert f.read() == highlight.highlight_css(highlight.HIGHLIGHT_STYLE)
@@ -0,0 +1,89 @@
+import glob
+import os
+import random
+
+import pytest
+
+from builder_files.util import icon_sprites
+from builder_files.util.icon_sprites import INLINE_MAX_BYTES, apply_icon_sprites, build_icon_sprites
+
+Image = pytest.importorskip("PIL.Image")
+
+FAMILIES = {
+    "tech": {"dir": "icons/tech", "height": 32, "square": True},
+    "social": {"dir": "icons/social", "height": 20, "square": False},
+}
+SPRITE_DIR = "sprites"
+
+
+def _noise_png(path, size, seed):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    Image.frombytes("RGB", size, random.Random(seed).randbytes(size[0] * size[1] * 3)).save(path)
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def _build():
+    return build_icon_sprites(families=FAMILIES, sprite_dir=SPRITE_DIR, site_root=".")
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(icon_sprites, "_icons", None)
+    _noise_png("icons/tech/python.png", (64, 64), 1)
+    _noise_png("icons/tech/rust.png", (64, 48), 2)
+    _write("icons/tech/tiny.svg", '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 8 8"><rect width="8" height="8"/></svg>')
+    paths = "".join(f'<path id="p{i}" d="M{i} 0 L{i} 10 L0 {i} Z"/>' for i in range(120))
+    _write("icons/tech/big.svg", f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 100 50">{paths}</svg>')
+    _noise_png("icons/social/mail.png", (60, 30), 3)
+    return tmp_path
+
+
+def test_icons_are_packed_inlined_or_given_a_view_by_size(site):
+    assert os.path.getsize("icons/tech/tiny.svg") <= INLINE_MAX_BYTES < os.path.getsize("icons/tech/big.svg")
+    icons = _build()
+    kinds = {os.path.basename(p): e["kind"] for p, e in icons.items()}
+    assert kinds == {"python.png": "sprite", "rust.png": "sprite", "mail.png": "sprite", "tiny.svg": "inline", "big.svg": "view"}
+    assert icons[os.path.join("icons", "tech", "tiny.svg")]["src"].startswith("data:image/svg+xml,")
+    assert "#" in icons[os.path.join("icons", "tech", "big.svg")]["src"]
+    # One raster sheet per family plus the SVG view sheet, all content-hashed
+    assert len(glob.glob(f"{SPRITE_DIR}/*")) == 3
+
+
+def test_sheets_are_rebuilt_only_when_an_icon_changes(site):
+    first = _build()
+    sheets = sorted(glob.glob(f"{SPRITE_DIR}/*"))
+    assert _build() == first
+    assert sorted(glob.glob(f"{SPRITE_DIR}/*")) == sheets
+
+    _noise_png("icons/social/mail.png", (60, 30), 4)
+    _build()
+    after = sorted(glob.glob(f"{SPRITE_DIR}/*"))
+    # Only the social sheet changed, and its old version was removed
+    assert len(after) == 3
+    assert len(set(after) - set(sheets)) == 1
+
+
+def test_pages_point_at_the_sheets(site):
+    _build()
+    html = (
+        "<html>\n  <head>\n  </head>\n  <body>\n"
+        '    <img src="/icons/tech/python.png" alt="Python" class="skill">\n'
+        '    <img src="/icons/tech/tiny.svg" alt="Tiny">\n'
+        '    <img src="/icons/tech/big.svg" alt="Big">\n'
+        '    <img src="/photos/other.png" alt="Not an icon">\n'
+        "  </body>\n</html>\n"
+    )
+    out = apply_icon_sprites(html, "index.html", site_root=".")
+    # Cells are 2x the displayed size, for high-DPI screens
+    assert 'alt="Python" class="skill icon-sprite icon-tech-python" width="16" height="16"' in out
+    assert out.count("<style>") == 1 and out.index("<style>") < out.index("</head>")
+    assert ".icon-tech-python{" in out and ".icon-social-mail" not in out
+    assert '<img src="data:image/svg+xml,' in out
+    assert 'src="/sprites/' in out and "#" in out
+    assert '<img src="/photos/other.png" alt="Not an icon">' in out
@@ -0,0 +1,99 @@
+import os
+import random
+import struct
+
+import pytest
+
+from builder_files.util import images
+from builder_files.util.images import annotate_images, get_image_size, read_image_size, resolve_local_path
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "wb" if isinstance(data, bytes) else "w") as f:
+        f.write(data)
+    return path
+
+
+def _png(width, height):
+    return b"\x89PNG\r\n\x1a\n" + struct.pack(">I4sII", 13, b"IHDR", width, height) + b"\0" * 16
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(images, "_size_cache", None)
+    _write("resource/image/wide.png", _png(640, 360))
+    _write("resource/image/tall.gif", b"GIF89a" + struct.pack("<HH", 20, 80) + b"\0" * 22)
+    _write("resource/image/logo.svg", '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 120 30"></svg>')
+    _write("articles/a/figure.png", _png(100, 50))
+    return tmp_path
+
+
+def test_read_image_size_from_headers(site):
+    assert read_image_size("resource/image/wide.png") == (640, 360)
+    assert read_image_size("resource/image/tall.gif") == (20, 80)
+    assert read_image_size("resource/image/logo.svg") == (120, 30)
+    _write("resource/image/broken.png", b"not an image")
+    assert read_image_size("resource/image/broken.png") is None
+
+
+def test_jpeg_size(site):
+    pil = pytest.importorskip("PIL.Image")
+    pil.new("RGB", (33, 17)).save("photo.jpg", format="JPEG")
+    assert read_image_size("photo.jpg") == (33, 17)
+
+
+def test_resolve_local_path(site):
+    assert resolve_local_path("/resource/image/wide.png?v=2", "articles/a/index.html", ".") == os.path.join(
+        "resource", "image", "wide.png"
+    )
+    assert resolve_local_path("figure.png#x", "articles/a/index.html", ".") == os.path.join("articles", "a", "figure.png")
+    assert resolve_local_path("https://example.com/a.png", "articles/a/index.html", ".") is None
+    assert resolve_local_path("data:image/png;base64,AAAA", "articles/a/index.html", ".") is None
+
+
+def test_sizes_and_loading_hints_are_injected(site):
+    html = (
+        '<img src="/resource/image/wide.png" alt="">'
+        '<img src="figure.png" alt="" />'
+        '<img src="/resource/image/logo.svg" width="60" loading="eager">'
+        '<img src="https://example.com/remote.png">'
+    )
+    out = annotate_images(html, "articles/a/index.html", eager_count=1, placeholders=False, site_root=".")
+    assert out == (
+        '<img src="/resource/image/wide.png" alt="" loading="eager" decoding="async" width="640" height="360">'
+        '<img src="figure.png" alt="" loading="lazy" decoding="async" width="100" height="50" />'
+        '<img src="/resource/image/logo.svg" width="60" loading="eager" decoding="async">'
+        '<img src="https://example.com/remote.png" loading="lazy" decoding="async">'
+    )
+    # Already annotated markup is left as it is
+    assert annotate_images(out, "articles/a/index.html", eager_count=1, placeholders=False, site_root=".") == out
+
+
+def test_print_pages_load_every_image_eagerly(site):
+    html = '<img src="/resource/image/wide.png"><img src="/resource/image/tall.gif">'
+    out = annotate_images(html, "articles/a/index.html", eager_count=None, placeholders=False, site_root=".")
+    assert out.count('loading="eager"') == 2
+
+
+def test_sizes_are_cached_until_the_file_changes(site):
+    assert get_image_size("resource/image/wide.png") == (640, 360)
+    images.flush_image_cache()
+    images._size_cache = None
+    assert images._get_cache()[os.path.join("resource", "image", "wide.png")][2:4] == [640, 360]
+
+    _write("resource/image/wide.png", _png(800, 450) + b"\0")
+    assert get_image_size("resource/image/wide.png") == (800, 450)
+
+
+def test_large_lazy_images_get_a_blurred_placeholder(site):
+    pil = pytest.importorskip("PIL.Image")
+    noise = random.Random(0).randbytes(3 * 200 * 200)
+    pil.frombytes("RGB", (200, 200), noise).save("resource/image/big.png")
+    assert os.path.getsize("resource/image/big.png") >= images.PLACEHOLDER_MIN_BYTES
+
+    html = '<img src="/resource/image/wide.png"><img src="/resource/image/big.png">'
+    out = annotate_images(html, "articles/a/index.html", eager_count=1, site_root=".")
+    assert out.count("background-image:url(data:image/webp;base64,") == 1
+    assert 'src="/resource/image/big.png" loading="lazy"' in out
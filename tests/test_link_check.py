@@ -0,0 +1,74 @@
+import logging
+import os
+
+import pytest
+
+from builder_files.util import link_check
+from builder_files.util.link_check import BrokenLinkError, check_links, extract_references
+
+
+def _write(root, rel, text):
+    path = os.path.join(root, rel)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+@pytest.fixture
+def site(tmp_path):
+    _write(tmp_path, "index.html", '<a href="/articles/one/#intro">One</a><a href="projects/">Projects</a>')
+    _write(tmp_path, "articles/one/index.html", '<h2 id="intro">Intro</h2><img src="cover.png" srcset="cover.png 1x">')
+    _write(tmp_path, "articles/one/cover.png", "")
+    _write(tmp_path, "projects/index.html", '<a href="#top" id="top">Top</a><a href="https://example.com/x">x</a>')
+    return str(tmp_path)
+
+
+def test_valid_site_has_no_problems(site):
+    assert check_links(site) == []
+
+
+def test_missing_file_fails(site):
+    _write(site, "skills/index.html", '<img src="/resource/image/gone.webp"><a href="../nowhere/">x</a>')
+
+    with pytest.raises(BrokenLinkError) as raised:
+        check_links(site)
+
+    message = str(raised.value)
+    assert "2 broken internal reference(s)" in message
+    assert "skills/index.html: src='/resource/image/gone.webp' not found" in message
+    assert "skills/index.html: href='../nowhere/' not found" in message
+
+
+def test_missing_anchor_fails(site):
+    _write(site, "skills/index.html", '<a href="/articles/one/#outro">x</a><a href="#nope">y</a>')
+
+    problems = check_links(site, fail_on_broken=False)
+
+    assert problems == [
+        "skills/index.html: href='/articles/one/#outro' has no element with id 'outro'",
+        "skills/index.html: href='#nope' has no element with id 'nope'",
+    ]
+
+
+def test_references_outside_the_site_fail(site):
+    _write(site, "skills/index.html", '<a href="../../../etc/passwd">x</a>')
+    assert check_links(site, fail_on_broken=False) == ["skills/index.html: href='../../../etc/passwd' points outside the site"]
+
+
+def test_known_missing_files_only_warn(site, monkeypatch, caplog):
+    monkeypatch.setattr(link_check, "KNOWN_MISSING", {"/resource/documents/later.pdf"})
+    _write(site, "skills/index.html", '<a href="/resource/documents/later.pdf">PDF</a>')
+
+    with caplog.at_level(logging.WARNING, logger=link_check.__name__):
+        assert check_links(site) == []
+
+    assert "Known missing file: skills/index.html: href='/resource/documents/later.pdf' not found" in caplog.text
+
+
+def test_comments_and_inline_scripts_are_not_scanned():
+    refs, ids = extract_references(
+        '<!-- <a href="/old/">old</a> --><script>var a = \'<a href="/js/">\';</script>'
+        '<a name="legacy" href="/real/">real</a>'
+    )
+    assert refs == [("href", "/real/")]
+    assert ids == {"legacy"}
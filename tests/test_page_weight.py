@@ -0,0 +1,83 @@
+import os
+
+import pytest
+
+from builder_files.util.page_weight import (
+    BudgetExceededError,
+    KB,
+    build_page_weight_report,
+    measure_page,
+    page_assets,
+)
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    mode = "wb" if isinstance(data, bytes) else "w"
+    with open(path, mode) as f:
+        f.write(data)
+    return str(path)
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _write(tmp_path / "resource/image/hero.png", b"\0" * (40 * KB))
+    _write(tmp_path / "resource/image/below.png", b"\0" * (90 * KB))
+    _write(tmp_path / "resource/documents/linked.pdf", b"%PDF" + b"\0" * (500 * KB))
+    _write(tmp_path / "articles/a/article.pdf", b"%PDF" + b"\0" * (20 * KB))
+    page = _write(
+        tmp_path / "articles/a/index.html",
+        '<html><body><img src="/resource/image/hero.png">'
+        '<img src="/resource/image/below.png" loading="lazy">'
+        '<a href="/resource/documents/linked.pdf">Linked</a></body></html>',
+    )
+    return tmp_path, page
+
+
+def test_lazy_images_count_towards_the_total(site):
+    root, page = site
+    with open(page, encoding="utf-8") as f:
+        local, lazy, _ = page_assets(f.read(), page, str(root))
+    assert [os.path.basename(p) for p in local] == ["hero.png"]
+    assert [os.path.basename(p) for p in lazy] == ["below.png"]
+
+    report = measure_page(page, str(root))
+    assert report["categories"]["image"] == {"count": 2, "raw": 130 * KB, "compressed": 130 * KB}
+    assert report["lazy"] == {"count": 1, "raw": 90 * KB, "urls": ["/resource/image/below.png"]}
+    assert report["total_compressed"] - report["initial_compressed"] == 90 * KB
+    assert [a["url"] for a in report["assets"] if a["lazy"]] == ["/resource/image/below.png"]
+
+
+def test_an_eager_reference_makes_an_image_count(site):
+    root, page = site
+    html = '<img src="/resource/image/below.png" loading="lazy"><img src="/resource/image/below.png">'
+    local, lazy, _ = page_assets(html, page, str(root))
+    assert [os.path.basename(p) for p in local] == ["below.png"]
+    assert lazy == []
+
+
+def test_pdf_is_the_pages_own_article_pdf_not_linked_documents(site):
+    root, page = site
+    assert measure_page(page, str(root))["pdf"] == 4 + 20 * KB
+
+
+def test_over_budget_page_fails_the_build_after_writing_the_report(site):
+    root, _ = site
+    budgets = {"article": {"image": 30 * KB}}
+    with pytest.raises(BudgetExceededError):
+        build_page_weight_report(str(root), str(root / "reports"), budgets=budgets)
+    assert os.path.isfile(root / "reports" / "page_weight.json")
+
+    reports = build_page_weight_report(str(root), str(root / "reports"), budgets=budgets, fail_on_budget=False)
+    assert reports[0]["over_budget"] == ["/articles/a/index.html: image 130.0 KB exceeds the budget of 30 KB"]
+
+
+def test_lazy_images_count_against_the_total_budget(site):
+    root, _ = site
+    reports = build_page_weight_report(
+        str(root), str(root / "reports"), budgets={"article": {"total": 100 * KB, "initial": 100 * KB}},
+        fail_on_budget=False,
+    )
+    assert len(reports[0]["over_budget"]) == 1
+    assert reports[0]["over_budget"][0].startswith("/articles/a/index.html: total ")
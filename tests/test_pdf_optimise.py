@@ -0,0 +1,63 @@
+import os
+
+import pytest
+
+from builder_files.util.pdf_optimise import _input_digest, _prune_cache, _settings_key, optimise_pdfs
+
+SETTINGS = _settings_key(150, 85)
+
+
+def _pdf(path, text, created):
+    pikepdf = pytest.importorskip("pikepdf")
+    pdf = pikepdf.new()
+    pdf.add_blank_page(page_size=(200, 200))
+    pdf.pages[0].Contents = pdf.make_stream(f"BT /F1 12 Tf 10 10 Td ({text}) Tj ET".encode("ascii"))
+    pdf.docinfo["/CreationDate"] = created
+    pdf.docinfo["/ModDate"] = created
+    pdf.save(str(path), static_id=False, deterministic_id=False)
+    return str(path)
+
+
+def test_digest_ignores_render_timestamps_and_file_id(tmp_path):
+    first = _pdf(tmp_path / "a.pdf", "Hello", "D:20260101000000Z")
+    second = _pdf(tmp_path / "b.pdf", "Hello", "D:20260202000000Z")
+    with open(first, "rb") as f1, open(second, "rb") as f2:
+        assert f1.read() != f2.read()
+    assert _input_digest(first, SETTINGS) == _input_digest(second, SETTINGS)
+
+
+def test_digest_changes_with_content_and_settings(tmp_path):
+    first = _pdf(tmp_path / "a.pdf", "Hello", "D:20260101000000Z")
+    edited = _pdf(tmp_path / "b.pdf", "Hello again", "D:20260101000000Z")
+    assert _input_digest(first, SETTINGS) != _input_digest(edited, SETTINGS)
+    assert _input_digest(first, SETTINGS) != _input_digest(first, _settings_key(96, 85))
+
+
+def test_rerendered_pdf_hits_the_cache_and_stale_entries_are_pruned(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cache_dir = str(tmp_path / "pdf_cache")
+    page = _pdf(tmp_path / "article.pdf", "Hello", "D:20260101000000Z")
+    first = f"{_input_digest(page, SETTINGS)}.pdf"
+    optimise_pdfs([page], max_workers=1, cache_dir=cache_dir)
+    assert os.listdir(cache_dir) == [first]
+    cached_at = os.stat(os.path.join(cache_dir, first)).st_mtime_ns
+
+    # The same article rendered again later: new dates and id, same content
+    _pdf(tmp_path / "article.pdf", "Hello", "D:20260303000000Z")
+    optimise_pdfs([page], max_workers=1, cache_dir=cache_dir)
+    assert os.listdir(cache_dir) == [first]
+    assert os.stat(os.path.join(cache_dir, first)).st_mtime_ns == cached_at
+
+    # Edited: the old entry is no longer used by any PDF
+    _pdf(tmp_path / "article.pdf", "Edited", "D:20260404000000Z")
+    edited = f"{_input_digest(page, SETTINGS)}.pdf"
+    optimise_pdfs([page], max_workers=1, cache_dir=cache_dir)
+    assert os.listdir(cache_dir) == [edited]
+
+
+def test_prune_cache_keeps_only_live_digests(tmp_path):
+    for name in ("live.pdf", "stale.pdf"):
+        (tmp_path / name).write_bytes(b"%PDF")
+    assert _prune_cache(str(tmp_path), {"live"}) == 1
+    assert os.listdir(tmp_path) == ["live.pdf"]
+    assert _prune_cache(str(tmp_path / "missing"), set()) == 0
@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+from builder_files.page_constructors.article import TEMPLATE_PRINT_PATH, render_article_print_page
+from builder_files.util.html import make_local_route_handler
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGE_URL = "https://majdij.com/articles/a/print.html"
+
+
+class _Route:
+    def __init__(self):
+        self.result = None
+
+    def abort(self):
+        self.result = ("abort",)
+
+    def fulfill(self, status=200, body=None, path=None, content_type=None):
+        self.result = ("fulfill", status, body, path)
+
+
+class _Request:
+    def __init__(self, url):
+        self.url = url
+
+
+def _fetch(handler, url):
+    route = _Route()
+    handler(route, _Request(url))
+    return route.result
+
+
+@pytest.fixture
+def site(tmp_path):
+    (tmp_path / "resource" / "style").mkdir(parents=True)
+    (tmp_path / "resource" / "style" / "print.css").write_text("body {}", encoding="utf-8")
+    (tmp_path / "secret.txt").write_text("outside", encoding="utf-8")
+    return tmp_path
+
+
+def test_route_handler_serves_the_page_from_memory_and_resources_from_disk(site):
+    handler = make_local_route_handler(PAGE_URL, "<html></html>", str(site / "resource"), {"/in-memory.svg": b"<svg/>"})
+    assert _fetch(handler, PAGE_URL) == ("fulfill", 200, "<html></html>", None)
+    assert _fetch(handler, "https://majdij.com/in-memory.svg") == ("fulfill", 200, b"<svg/>", None)
+    assert _fetch(handler, "https://majdij.com/style/print.css") == (
+        "fulfill", 200, None, str(site / "resource" / "style" / "print.css"),
+    )
+    assert _fetch(handler, "https://majdij.com/missing.css") == ("fulfill", 404, "", None)
+
+
+def test_route_handler_blocks_third_parties_and_paths_outside_the_root(site):
+    handler = make_local_route_handler(PAGE_URL, "<html></html>", str(site / "resource"))
+    assert _fetch(handler, "https://fonts.example.com/font.woff2") == ("abort",)
+    assert _fetch(handler, "https://majdij.com/../secret.txt") == ("fulfill", 404, "", None)
+    assert _fetch(handler, "https://majdij.com/%2e%2e/secret.txt") == ("fulfill", 404, "", None)
+
+
+def test_print_page_is_rendered_in_memory_with_site_paths(tmp_path, monkeypatch):
+    template = os.path.join(REPO, TEMPLATE_PRINT_PATH)
+    monkeypatch.chdir(tmp_path)
+    article = {"id": "a", "title": "A title", "date": {"published": "2025-10-29T00:00:00Z"}}
+    html = render_article_print_page(
+        article, template_path=template, output_root="out", content_html='<p><img src="/resource/image/x.png"></p>',
+    )
+    assert "A title" in html
+    assert "29 Oct 2025" in html
+    assert "html_var" not in html
+    # Paths stay as authored for a page served at /articles/a/print.html, and
+    # every image loads eagerly since the PDF is printed in one go
+    assert '<img src="/resource/image/x.png" loading="eager"' in html
+    assert not os.path.exists("out")
@@ -0,0 +1,75 @@
+import os
+
+import pytest
+
+from builder_files.util import related as related_module
+from builder_files.util.related import compute_related_articles
+
+MD_ROOT = "articles-src"
+
+ARTICLES = {
+    "python-packaging": ("Python packaging", ["python", "packaging"], "Wheels, sdists and pip install for python packages."),
+    "python-typing": ("Python typing", ["python", "typing"], "Type hints and mypy for python code and packages."),
+    "rust-ownership": ("Rust ownership", ["rust"], "Borrowing, lifetimes and the rust borrow checker."),
+    "rust-async": ("Rust async", ["rust", "async"], "Futures, tokio and async rust lifetimes."),
+    "drafts": ("Python drafts", ["python"], "Unpublished python packaging notes."),
+}
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def _catalogue():
+    return [
+        {"id": a, "title": t, "auto_build": a != "drafts"} for a, (t, _, _) in ARTICLES.items()
+    ]
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for article_id, (title, keywords, body) in ARTICLES.items():
+        _write(f"{MD_ROOT}/{article_id}/index.md", f"---\ntitle: {title}\nkeywords: {keywords}\n---\n{body}\n")
+    return tmp_path
+
+
+def test_related_articles_are_the_most_similar_visible_ones(site):
+    related = compute_related_articles(_catalogue(), md_root=MD_ROOT, top_k=1)
+    assert related["python-packaging"] == ["python-typing"]
+    assert related["rust-ownership"] == ["rust-async"]
+    # Unbuilt articles get recommendations but are never recommended
+    assert related["drafts"] == ["python-packaging"]
+    assert all("drafts" not in ids for ids in related.values())
+    assert all(article_id not in ids for article_id, ids in related.items())
+
+
+def test_unchanged_catalogue_reuses_the_previous_result(site, monkeypatch):
+    first = compute_related_articles(_catalogue(), md_root=MD_ROOT)
+
+    def _fail(*args, **kwargs):
+        raise AssertionError("similarity recomputed")
+
+    monkeypatch.setattr(related_module, "_tfidf_matrix", _fail)
+    assert compute_related_articles(_catalogue(), md_root=MD_ROOT) == first
+
+
+def test_only_edited_articles_are_re_read(site, monkeypatch):
+    compute_related_articles(_catalogue(), md_root=MD_ROOT)
+    _write(f"{MD_ROOT}/rust-async/index.md", "---\ntitle: Rust async\n---\nPython packaging with pip and wheels.\n")
+
+    read = []
+    original = related_module._article_terms
+    monkeypatch.setattr(related_module, "_article_terms", lambda a, r: read.append(a) or original(a, r))
+    related = compute_related_articles(_catalogue(), md_root=MD_ROOT, top_k=1)
+    assert read == ["rust-async"]
+    assert related["rust-async"] == ["python-packaging"]
+
+
+def test_batches_give_the_same_result(site, monkeypatch):
+    expected = compute_related_articles(_catalogue(), md_root=MD_ROOT)
+    monkeypatch.setattr(related_module, "BATCH_ROWS", 2)
+    monkeypatch.setattr(related_module, "load_cache", lambda name: {})
+    assert compute_related_articles(_catalogue(), md_root=MD_ROOT) == expected
@@ -0,0 +1,81 @@
+import os
+
+import pytest
+
+from builder_files.util.resource_hints import (
+    ResourceHintCollector, add_resource_hints, build_speculation_rules, collect_resource_hints, css_font_urls,
+)
+
+PAGE = "page/index.html"
+FONT_CSS = """
+:root { --body-font: 'Body Sans', sans-serif; }
+@font-face { font-family: 'Body Sans'; src: url('../font/body.woff2') format('woff2'), url('../font/body.ttf'); }
+@font-face { font-family: "Big Ttf"; src: url('/font/big.ttf') format('truetype'); }
+@font-face { font-family: Unused; src: url('/font/unused.woff2') format('woff2'); }
+body { font-family: var(--body-font); }
+h1 { font: 700 2rem "Big Ttf", serif; }
+"""
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def _page(body="", head=""):
+    return (
+        "<html>\n  <head>\n"
+        f'    <link rel="stylesheet" href="/style/main.css" />\n{head}'
+        f"  </head>\n  <body>\n    <main>\n{body}    </main>\n  </body>\n</html>\n"
+    )
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _write("style/main.css", FONT_CSS)
+    return tmp_path
+
+
+def test_font_urls_prefer_woff2(site):
+    assert css_font_urls("style/main.css") == ["/font/body.woff2", "/font/big.ttf", "/font/unused.woff2"]
+
+
+def test_only_used_web_fonts_are_preloaded(site):
+    fonts = [h["href"] for h in collect_resource_hints(_page(), PAGE) if h.get("as") == "font"]
+    # Big Ttf is used but only ships as a raw .ttf; Unused is never referenced
+    assert fonts == ["/font/body.woff2"]
+
+
+def test_configured_families_override_detection(site):
+    collector = ResourceHintCollector(PAGE, preload_font_families=["Big Ttf"])
+    collector.feed(_page())
+    assert collector.fonts() == ["/font/big.ttf"]
+    assert collector.hints()[0]["type"] == "font/ttf"
+
+
+def test_preconnect_and_lcp_image_hints(site):
+    html = _page(
+        body='      <img src="/img/hero.png" fetchpriority="high" />\n',
+        head='    <script src="https://cdn.example.com/lib.js"></script>\n',
+    )
+    hints = collect_resource_hints(html, PAGE)
+    assert hints[0] == {"rel": "preconnect", "href": "https://cdn.example.com"}
+    assert hints[-1] == {"rel": "preload", "href": "/img/hero.png", "as": "image", "fetchpriority": "high"}
+
+
+def test_hints_go_before_the_first_stylesheet(site):
+    html = add_resource_hints(_page(), PAGE)
+    assert html.index('href="/font/body.woff2"') < html.index('rel="stylesheet"')
+    assert '<link rel="preload" href="/font/body.woff2" as="font" type="font/woff2" crossorigin />' in html
+
+
+def test_speculation_rules_prefetch_body_links_only(site):
+    body = (
+        '      <a href="/one/">1</a><a href="/page/">self</a><a href="/doc.pdf">pdf</a>\n'
+        '      <a href="https://elsewhere.example/">x</a><a href="/two/">2</a><a href="/three/">3</a><a href="/four/">4</a>\n'
+    )
+    html = add_resource_hints(_page(body, head='    <link rel="alternate" href="/head-only/" />\n'), PAGE, speculation=True)
+    assert build_speculation_rules(["/one/", "/two/", "/three/"]) in html
+    assert build_speculation_rules([]) == ""
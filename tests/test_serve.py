@@ -0,0 +1,154 @@
+import gzip
+import http.client
+import os
+import socket
+from urllib.parse import urlsplit
+
+import pytest
+
+from builder_files.util.serve import BackgroundServer
+
+PDF_BYTES = bytes(range(256)) * 8
+
+
+def _write(root, rel, data):
+    path = os.path.join(root, rel)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data if isinstance(data, bytes) else data.encode("utf-8"))
+
+
+@pytest.fixture
+def server(tmp_path):
+    root = str(tmp_path)
+    _write(root, "index.html", "<h1>Home</h1>")
+    _write(root, "404.html", "<h1>Not found</h1>")
+    _write(root, "articles/one/index.html", "<h1>One</h1>" + "<p>text</p>" * 200)
+    _write(root, "articles/one/article.pdf", PDF_BYTES)
+    _write(root, "articles/one/index.md", "# Source")
+    _write(root, "builder.py", "print('source')")
+    _write(root, "REVIEW_DIFF.patch", "diff")
+    _write(root, ".build_cache/images.json", "{}")
+    _write(root, "builder_files/templates/page.html", "<html>")
+    with BackgroundServer(root) as running:
+        yield running
+
+
+def _request(server, path, method="GET", headers=None):
+    parts = urlsplit(server.origin)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=5)
+    try:
+        conn.request(method, path, headers=headers or {})
+        response = conn.getresponse()
+        return response, response.read()
+    finally:
+        conn.close()
+
+
+def _raw(server, request_bytes):
+    """Send raw bytes and read until the server closes the connection."""
+    parts = urlsplit(server.origin)
+    with socket.create_connection((parts.hostname, parts.port), timeout=5) as sock:
+        sock.sendall(request_bytes)
+        received = b""
+        while chunk := sock.recv(65536):
+            received += chunk
+    return received
+
+
+@pytest.mark.parametrize("path", ["/articles/one", "/articles/one/", "/articles/one/index.html"])
+def test_clean_urls_serve_the_page(server, path):
+    response, body = _request(server, path)
+    assert response.status == 200
+    assert body.startswith(b"<h1>One</h1>")
+    assert response.getheader("Content-Type") == "text/html; charset=utf-8"
+
+
+def test_missing_pages_get_the_error_page(server):
+    response, body = _request(server, "/articles/two/")
+    assert response.status == 404
+    assert body == b"<h1>Not found</h1>"
+
+
+@pytest.mark.parametrize(
+    "path", ["/builder.py", "/REVIEW_DIFF.patch", "/.build_cache/images.json", "/articles/one/index.md",
+             "/builder_files/templates/page.html"],
+)
+def test_only_deployable_files_are_served(server, path):
+    response, _ = _request(server, path)
+    assert response.status == 404
+
+
+@pytest.mark.parametrize("path", ["/articles/../builder.py", "/articles/%2e%2e/builder.py", "/../../etc/passwd"])
+def test_path_traversal_is_refused(server, path):
+    response = _raw(server, f"GET {path} HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n".encode("ascii"))
+    assert response.startswith(b"HTTP/1.1 404 ")
+    assert b"source" not in response
+
+
+def test_byte_ranges(server):
+    response, body = _request(server, "/articles/one/article.pdf", headers={"Range": "bytes=10-19"})
+    assert response.status == 206
+    assert response.getheader("Content-Range") == f"bytes 10-19/{len(PDF_BYTES)}"
+    assert body == PDF_BYTES[10:20]
+
+    response, body = _request(server, "/articles/one/article.pdf", headers={"Range": "bytes=-5"})
+    assert response.status == 206
+    assert body == PDF_BYTES[-5:]
+
+
+def test_unsatisfiable_range(server):
+    response, body = _request(server, "/articles/one/article.pdf", headers={"Range": f"bytes={len(PDF_BYTES)}-"})
+    assert response.status == 416
+    assert response.getheader("Content-Range") == f"bytes */{len(PDF_BYTES)}"
+    assert body == b""
+
+
+def test_if_range_with_a_stale_etag_sends_the_whole_file(server):
+    response, body = _request(
+        server, "/articles/one/article.pdf", headers={"Range": "bytes=0-9", "If-Range": '"stale"'},
+    )
+    assert response.status == 200
+    assert body == PDF_BYTES
+
+
+def test_conditional_get(server):
+    response, _ = _request(server, "/articles/one/article.pdf")
+    etag = response.getheader("ETag")
+
+    response, body = _request(server, "/articles/one/article.pdf", headers={"If-None-Match": f'"other", W/{etag}'})
+    assert response.status == 304
+    assert body == b""
+    assert response.getheader("ETag") == etag
+
+    response, _ = _request(server, "/articles/one/article.pdf", headers={"If-None-Match": '"other"'})
+    assert response.status == 200
+
+
+def test_text_is_compressed_on_the_fly(server):
+    response, body = _request(server, "/articles/one/", headers={"Accept-Encoding": "gzip"})
+    assert response.getheader("Content-Encoding") == "gzip"
+    assert gzip.decompress(body).startswith(b"<h1>One</h1>")
+    assert response.getheader("Vary") == "Accept-Encoding"
+
+
+def test_other_methods_are_refused_and_close_the_connection(server):
+    # Two requests on one connection: the second is never answered
+    response = _raw(
+        server,
+        b"POST / HTTP/1.1\r\nHost: x\r\nContent-Length: 0\r\n\r\n"
+        b"GET / HTTP/1.1\r\nHost: x\r\n\r\n",
+    )
+    assert response.startswith(b"HTTP/1.1 405 Method Not Allowed\r\n")
+    assert b"Connection: close\r\n" in response
+    assert response.count(b"HTTP/1.1 ") == 1
+
+
+def test_keep_alive_serves_several_requests(server):
+    response = _raw(
+        server,
+        b"GET / HTTP/1.1\r\nHost: x\r\n\r\n"
+        b"HEAD /articles/one/ HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n",
+    )
+    assert response.count(b"HTTP/1.1 200 OK\r\n") == 2
+    assert response.endswith(b"Connection: close\r\n\r\n")
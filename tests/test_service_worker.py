@@ -0,0 +1,84 @@
+import json
+import os
+import re
+
+import pytest
+
+from builder_files.page_constructors.service_worker import (
+    STRATEGY_ARTICLE, STRATEGY_IMAGE, STRATEGY_PAGE, STRATEGY_SHELL, SW_TEMPLATE,
+    build_precache_manifest, build_service_worker,
+)
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def _page(body=""):
+    return (
+        '<html><head><link rel="stylesheet" href="/resource/style/main.css" />'
+        '<script src="/resource/script/app.js" defer></script></head>'
+        f"<body>{body}</body></html>"
+    )
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _write("index.html", _page('<img src="/resource/image/hero.png">'))
+    _write("articles/index.html", _page())
+    _write("articles/a/index.html", _page('<img src="/resource/image/lazy.png" loading="lazy">'))
+    _write("resource/style/main.css", "@font-face { font-family: F; src: url('../font/f.woff2'); } body { font-family: F; }")
+    _write("resource/style/unlinked.css", "p { color: red; }")
+    _write("resource/script/app.js", "console.log(1);")
+    _write("resource/font/f.woff2", "font")
+    _write("resource/image/hero.png", "hero")
+    _write("resource/image/lazy.png", "lazy")
+    _write("resource/image/unused.png", "unused")
+    return tmp_path
+
+
+def test_manifest_lists_pages_shell_fonts_and_used_images(site):
+    manifest = {url: strategy for url, _, strategy in build_precache_manifest(".")}
+    assert manifest == {
+        "/": STRATEGY_PAGE,
+        "/articles/": STRATEGY_PAGE,
+        "/articles/a/": STRATEGY_ARTICLE,
+        "/resource/style/main.css": STRATEGY_SHELL,
+        "/resource/script/app.js": STRATEGY_SHELL,
+        "/resource/font/f.woff2": STRATEGY_SHELL,
+        "/resource/image/hero.png": STRATEGY_IMAGE,
+        "/resource/image/lazy.png": STRATEGY_IMAGE,
+    }
+
+
+def test_revisions_follow_file_contents(site):
+    before = {url: rev for url, rev, _ in build_precache_manifest(".")}
+    assert build_precache_manifest(".") == sorted(build_precache_manifest("."))
+    _write("resource/script/app.js", "console.log(2);")
+    after = {url: rev for url, rev, _ in build_precache_manifest(".")}
+    assert {url for url in before if before[url] != after[url]} == {"/resource/script/app.js"}
+
+
+def test_service_worker_embeds_the_manifest_and_is_only_rewritten_on_change(site):
+    template = os.path.join(REPO, SW_TEMPLATE)
+    build_service_worker(template_path=template, output_path="sw.js", site_root=".")
+    with open("sw.js", encoding="utf-8") as f:
+        sw = f.read()
+    assert "html_var" not in sw
+    manifest = json.loads(re.search(r"const MANIFEST = (.*);", sw).group(1))
+    assert manifest == build_precache_manifest(".")
+    version = re.search(r"const VERSION = '(\w+)';", sw).group(1)
+
+    os.utime("sw.js", ns=(0, 0))
+    build_service_worker(template_path=template, output_path="sw.js", site_root=".")
+    assert os.stat("sw.js").st_mtime_ns == 0
+
+    _write("resource/image/hero.png", "new hero")
+    build_service_worker(template_path=template, output_path="sw.js", site_root=".")
+    with open("sw.js", encoding="utf-8") as f:
+        assert re.search(r"const VERSION = '(\w+)';", f.read()).group(1) != version
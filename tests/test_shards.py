@@ -0,0 +1,153 @@
+import json
+import os
+import shutil
+
+import pytest
+
+from builder_files.util.build_cache import save_cache
+from builder_files.util.shards import (
+    ShardMergeError, merge_shards, parse_shard, shard_of, write_shard_manifest,
+)
+
+# Split two ways: delta and epsilon go to shard 1, the rest to shard 2
+ARTICLES = ["alpha", "beta", "delta", "epsilon", "gamma"]
+COUNT = 2
+
+
+def test_parse_shard():
+    assert parse_shard("3/8") == (3, 8)
+    for spec in ["0/2", "3/2", "1/0", "1", "a/b"]:
+        with pytest.raises(ValueError):
+            parse_shard(spec)
+
+
+def test_shard_of_is_stable():
+    assert [shard_of(a, COUNT) for a in ARTICLES] == [2, 2, 1, 1, 2]
+    assert shard_of("alpha", 1) == 1
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+@pytest.fixture
+def build(tmp_path, monkeypatch):
+    """Each shard built into its own directory, as CI artifacts; returns (site, [shard dirs])."""
+    monkeypatch.chdir(tmp_path)
+    md_root = "content/articles"
+    for article_id in ARTICLES:
+        _write(f"{md_root}/{article_id}/index.md", f"---\ntitle: {article_id}\nauto_build: true\n---\nBody\n")
+    _write(f"{md_root}/manual/index.md", "---\ntitle: Built by hand\n---\nBody\n")
+    save_cache("articles", {a: f"inputs-{a}" for a in ARTICLES})
+
+    shard_dirs = []
+    for index in range(1, COUNT + 1):
+        shard_dir = f"shard-{index}"
+        for article_id in ARTICLES:
+            if shard_of(article_id, COUNT) == index:
+                _write(f"{shard_dir}/articles/{article_id}/index.html", f"<h1>{article_id}</h1>")
+        write_shard_manifest(
+            (index, COUNT), md_root=md_root, catalogue_path="catalogue.json", output_root=f"{shard_dir}/articles",
+            site_root=shard_dir, manifest_dir=f"{shard_dir}/build_shards",
+        )
+        shard_dirs.append(shard_dir)
+    os.makedirs("site")
+    return "site", shard_dirs
+
+
+def _merge(site, shard_dirs):
+    return merge_shards(
+        shard_dirs, md_root="content/articles", catalogue_path="catalogue.json", site_root=site,
+        manifest_dir="build_shards",
+    )
+
+
+def _manifest_path(shard_dir):
+    index = shard_dir.rsplit("-", 1)[1]
+    return f"{shard_dir}/build_shards/shard-{index}-of-{COUNT}.json"
+
+
+def _edit_manifest(shard_dir, edit):
+    with open(_manifest_path(shard_dir), encoding="utf-8") as f:
+        manifest = json.load(f)
+    edit(manifest)
+    with open(_manifest_path(shard_dir), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+
+def _problems(site, shard_dirs):
+    with pytest.raises(ShardMergeError) as raised:
+        _merge(site, shard_dirs)
+    return str(raised.value)
+
+
+def test_merge_copies_every_article(build):
+    site, shard_dirs = build
+    merged = _merge(site, shard_dirs)
+
+    assert sorted(merged) == ARTICLES
+    assert merged["delta"]["shard"] == 1 and merged["alpha"]["shard"] == 2
+    assert merged["alpha"]["inputs"] == "inputs-alpha"
+    for article_id in ARTICLES:
+        with open(f"{site}/articles/{article_id}/index.html", encoding="utf-8") as f:
+            assert f.read() == f"<h1>{article_id}</h1>"
+    assert not os.path.exists(f"{site}/articles/manual")
+
+
+def test_missing_shard_fails(build):
+    site, shard_dirs = build
+    message = _problems(site, shard_dirs[:1])
+    assert "missing manifests for shard(s) [2] of 2" in message
+    assert "alpha: not built by any shard" in message
+    # Nothing is copied from a merge that failed
+    assert not os.path.exists(f"{site}/articles")
+
+
+def test_tampered_or_missing_outputs_fail(build):
+    site, shard_dirs = build
+    _write("shard-1/articles/delta/index.html", "<h1>changed</h1>")
+    os.remove("shard-2/articles/gamma/index.html")
+
+    message = _problems(site, shard_dirs)
+    assert "delta: output differs from shard 1's manifest: shard-1/articles/delta/index.html" in message
+    assert "gamma: output missing: shard-2/articles/gamma/index.html" in message
+
+
+def test_articles_built_by_the_wrong_shard_fail(build):
+    site, shard_dirs = build
+    _write("shard-1/articles/alpha/index.html", "<h1>alpha</h1>")
+
+    def _add_alpha(manifest):
+        manifest["articles"]["alpha"] = {"inputs": "inputs-alpha", "files": {"articles/alpha/index.html": ""}}
+
+    _edit_manifest("shard-1", _add_alpha)
+    message = _problems(site, shard_dirs)
+    assert "alpha: built by shard 1 but belongs to shard 2" in message
+    assert "alpha: built by shard 1 and shard 2" in message
+
+
+def test_duplicate_and_inconsistent_manifests_fail(build):
+    site, shard_dirs = build
+    os.makedirs("copy/build_shards")
+    shutil.copy(_manifest_path("shard-1"), "copy/build_shards/")
+    _edit_manifest("shard-2", lambda m: m.update(count=3))
+
+    message = _problems(site, shard_dirs + ["copy"])
+    assert "shard 1 also in shard-1" in message
+    assert "manifests disagree on the shard count: [2, 3]" in message
+
+
+def test_failed_articles_are_reported(build):
+    site, shard_dirs = build
+
+    def _fail_beta(manifest):
+        del manifest["articles"]["beta"]
+        manifest["failed"] = ["beta"]
+
+    _edit_manifest("shard-2", _fail_beta)
+    message = _problems(site, shard_dirs)
+    assert "article failed to build: beta" in message
+    assert "beta: not built by any shard" not in message
+    assert message.startswith("1 problem(s) merging shards")
@@ -0,0 +1,99 @@
+import os
+
+import pytest
+
+from builder_files import site_builder
+from builder_files.site_builder import SiteBuilder
+from builder_files.util import css_bundles
+
+MD_ROOT = "src"
+TEMPLATE = "templates/article.html"
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def _article(article_id, title, auto_build=True):
+    _write(
+        f"{MD_ROOT}/{article_id}/index.md",
+        f"---\ntitle: {title}\nauto_build: {str(auto_build).lower()}\n---\nSome text about {title}.\n",
+    )
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _write(
+        TEMPLATE,
+        '<html><head><link rel="stylesheet" href="/style/main.css" /></head>'
+        "<body><h1 class=\"title\">{html_var(article_title)}</h1>{html_var(article_content_html)}</body></html>\n",
+    )
+    _write("style/main.css", ".title { color: red; } .unused { color: blue; }")
+    _article("a", "Alpha")
+    _article("b", "Beta")
+    _article("draft", "Draft", auto_build=False)
+
+    calls = {"fragment": 0, "catalogue": 0, "groups": 0}
+
+    def _counted(name, module, attr):
+        original = getattr(module, attr)
+
+        def wrapper(*args, **kwargs):
+            calls[name] += 1
+            return original(*args, **kwargs)
+        monkeypatch.setattr(module, attr, wrapper)
+
+    _counted("fragment", site_builder, "md_file_to_html_fragment")
+    _counted("catalogue", site_builder, "load_catalogue")
+    _counted("groups", css_bundles, "_page_groups")
+    return calls
+
+
+def _builder():
+    return SiteBuilder(
+        md_root=MD_ROOT, catalogue_path="articles_index.json", template_path=TEMPLATE, print_template_path=TEMPLATE,
+        output_root="articles", site_root=".", pdfs=False, social_cards=False,
+    )
+
+
+def test_warm_render_article_reuses_what_it_loaded(site):
+    with _builder() as builder:
+        first = builder.render_article("a")
+        assert "Alpha" in first and 'href="/resource/style/bundles/article.' in first
+        assert builder.render_article("a") == first
+        assert site == {"fragment": 1, "catalogue": 1, "groups": 1}
+
+        with open(f"{MD_ROOT}/a/index.md", "a", encoding="utf-8") as f:
+            f.write("More text.\n")
+        assert "More text." in builder.render_article("a")
+        assert site["fragment"] == 2
+
+
+def test_rebuild_changed_rebuilds_dependants_and_invalidates_bundles(site, monkeypatch):
+    rebuilt = []
+    monkeypatch.setattr(site_builder, "SITE_PAGES", {
+        "articles_list": (lambda store: rebuilt.append("articles_list") or "articles/index.html", []),
+    })
+    monkeypatch.setattr(site_builder, "build_feeds", lambda fragments, store: rebuilt.append(("feeds", sorted(fragments))) or [])
+    monkeypatch.setattr(site_builder, "build_api", lambda fragments, store: rebuilt.append(("api", sorted(fragments))) or [])
+    monkeypatch.setattr(site_builder, "finish_site", lambda site_root: rebuilt.append("finish_site"))
+
+    with _builder() as builder:
+        builder.render_article("a")
+        assert builder.rebuild_changed(["notes.txt"]) == []
+        assert rebuilt == []
+        # Pages or stylesheets may have changed on disk: the next render re-reads them
+        builder.render_article("a")
+        assert site["groups"] == 2
+
+        _write(f"{MD_ROOT}/draft/index.md", "---\ntitle: Draft\nauto_build: false\n---\nEdited.\n")
+        assert builder.rebuild_changed([f"{MD_ROOT}/draft/index.md"]) == ["articles/index.html"]
+        assert rebuilt == ["articles_list", ("feeds", []), ("api", []), "finish_site"]
+
+        rebuilt.clear()
+        written = builder.rebuild_changed([os.path.abspath(TEMPLATE)])
+        assert sorted(written) == [os.path.join("articles", "a", "index.html"), os.path.join("articles", "b", "index.html")]
+        assert rebuilt == ["finish_site"]
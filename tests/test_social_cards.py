@@ -0,0 +1,107 @@
+import io
+import os
+
+import pytest
+
+from builder_files.page_constructors.article import social_card_values
+from builder_files.util.social_cards import CARD_HEIGHT, CARD_TEMPLATE, CARD_WIDTH, card_url, render_social_cards
+
+Image = pytest.importorskip("PIL.Image")
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _png():
+    out = io.BytesIO()
+    Image.new("RGB", (CARD_WIDTH, CARD_HEIGHT), "navy").save(out, format="PNG")
+    return out.getvalue()
+
+
+class _Page:
+    def __init__(self, browser):
+        self.browser = browser
+
+    def route(self, pattern, handler):
+        pass
+
+    def goto(self, url, wait_until=None):
+        pass
+
+    def set_content(self, html, wait_until=None):
+        self.browser.rendered.append(html)
+
+    def evaluate(self, script):
+        return True
+
+    def screenshot(self, **kwargs):
+        if self.browser.fail:
+            raise RuntimeError("browser crashed")
+        return _png()
+
+    def close(self):
+        pass
+
+
+class _Browser:
+    """Stands in for a launched Chromium: records every card it is asked to render."""
+
+    def __init__(self, fail=False):
+        self.pages = 0
+        self.rendered = []
+        self.fail = fail
+
+    def new_page(self, **kwargs):
+        self.pages += 1
+        return _Page(self)
+
+
+@pytest.fixture
+def render(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    def _render(cards, browser):
+        return render_social_cards(
+            cards, output_root="articles", template_path=os.path.join(REPO, CARD_TEMPLATE), site_root=".",
+            cache_dir="cache", browser=browser,
+        )
+    return _render
+
+
+def _values(title):
+    return {"card_title": title, "card_strap_line": "Strap", "card_author": "A", "card_date": "1 Jan 2025"}
+
+
+def test_cards_are_rendered_in_one_batch_and_cached(render):
+    browser = _Browser()
+    written = render({"a": _values("A <b>"), "b": _values("B"), "same-as-b": _values("B")}, browser)
+    assert sorted(written) == ["a", "b", "same-as-b"]
+    assert written["a"] == os.path.join("articles", "a", "social-card.webp")
+    with Image.open(written["a"]) as im:
+        assert (im.format, im.size) == ("WEBP", (CARD_WIDTH, CARD_HEIGHT))
+    # One page for the batch; identical cards are rendered once; values are escaped
+    assert browser.pages == 1
+    assert len(browser.rendered) == 2
+    assert "A &lt;b&gt;" in browser.rendered[0]
+
+    again = _Browser()
+    assert render({"a": _values("A <b>"), "b": _values("B edited")}, again) == {
+        "a": written["a"], "b": written["b"],
+    }
+    assert len(again.rendered) == 1
+
+
+def test_failed_rendering_leaves_articles_without_a_card(render):
+    assert render({"a": _values("A")}, _Browser(fail=True)) == {}
+    assert not os.path.exists(os.path.join("articles", "a"))
+
+
+def test_card_values_and_url():
+    entry = {
+        "title": "T", "description": "D", "author": [{"name": "X"}, {"name": "Y"}],
+        "date": {"published": "2025-10-29T00:00:00Z"},
+    }
+    assert social_card_values(entry) == {
+        "card_title": "T", "card_strap_line": "D", "card_author": "X, Y", "card_date": "29 Oct 2025",
+    }
+    assert card_url(os.path.join("articles", "a", "social-card.webp")) == "/articles/a/social-card.webp"
+    assert card_url(None) is None
@@ -0,0 +1,96 @@
+import os
+import struct
+
+import pytest
+
+from builder_files.util import icon_sprites, images
+from builder_files.util.html import render_html_vars
+from builder_files.util.icon_sprites import apply_icon_sprites
+from builder_files.util.images import annotate_images
+from builder_files.util.resource_hints import add_resource_hints
+from builder_files.util.stream_render import join_chunks, render_to_file, split_template
+
+TEMPLATE = """<html>
+  <head>
+    <title>{html_var(title)}</title>
+    <link rel="stylesheet" href="/style/main.css" />
+  </head>
+  <body>
+    <main>
+      <img src="/img/hero.png" alt="">
+      <ul>
+{html_var(cards)}
+      </ul>
+      {html_var(missing)}
+    </main>
+  </body>
+</html>
+"""
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "wb" if isinstance(data, bytes) else "w") as f:
+        f.write(data)
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(images, "_size_cache", None)
+    # No icon families to sprite; keeps the test independent of the site's icons
+    monkeypatch.setattr(icon_sprites, "_icons", {})
+    _write("page.html", TEMPLATE)
+    _write("style/main.css", "@font-face { font-family: F; src: url('/font/f.woff2'); } body { font-family: F; }")
+    _write("img/hero.png", b"\x89PNG\r\n\x1a\n" + struct.pack(">I4sII", 13, b"IHDR", 1200, 600) + b"\0" * 16)
+    return tmp_path
+
+
+def _cards(n):
+    for i in range(n):
+        yield f'        <li><a href="/articles/{i}/"><img src="/img/hero.png" alt="{i}"></a></li>\n'
+
+
+def test_split_template_keeps_escaped_tokens_literal():
+    assert split_template("a{html_var(x)}b\\{html_var(y)}c") == [("a", "x"), ("b{html_var(y)}c", None)]
+
+
+def test_streamed_page_matches_render_html_vars(site):
+    values = {"title": "Cards & more", "cards": "".join(_cards(5))}
+    expected = render_html_vars(TEMPLATE, values, missing="")
+    expected = apply_icon_sprites(expected, "out/index.html", site_root=".")
+    expected = annotate_images(expected, "out/index.html", eager_count=1, site_root=".")
+    expected = add_resource_hints(expected, "out/index.html", speculation=True, site_root=".")
+
+    render_to_file(
+        "page.html", {"title": "Cards & more", "cards": _cards(5)}, "out/index.html", speculation=True, site_root=".",
+    )
+    with open("out/index.html", encoding="utf-8") as f:
+        streamed = f.read()
+    assert streamed == expected
+    assert '<link rel="preload" href="/font/f.woff2"' in streamed
+    assert sorted(os.listdir("out")) == ["index.html"]
+
+
+def test_card_generators_are_consumed_once(site):
+    seen = []
+
+    def _cards_logged():
+        for card in _cards(3):
+            seen.append(card)
+            yield card
+
+    render_to_file("page.html", {"title": "t", "cards": join_chunks(_cards_logged(), "")}, "out/index.html", site_root=".")
+    assert len(seen) == 3
+    with open("out/index.html", encoding="utf-8") as f:
+        assert f.read().count("<li>") == 3
+
+
+def test_failed_render_leaves_no_partial_output(site):
+    def _broken():
+        yield "        <li>one</li>\n"
+        raise RuntimeError("card failed")
+
+    with pytest.raises(RuntimeError):
+        render_to_file("page.html", {"title": "t", "cards": _broken()}, "out/index.html", site_root=".")
+    assert os.listdir("out") == []
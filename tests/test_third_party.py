@@ -0,0 +1,65 @@
+import pytest
+
+from builder_files.util import third_party
+from builder_files.util.third_party import LOADER_SRC, allowed_rules, rewrite_third_party
+
+GTAG = "https://www.googletagmanager.com/gtag/js?id=G-TEST"
+
+
+def _page(head="", body=""):
+    return f"<html>\n  <head>\n{head}  </head>\n  <body>\n{body}  </body>\n</html>\n"
+
+
+def test_analytics_is_deferred_until_idle():
+    html = rewrite_third_party(_page(
+        head=(
+            '    <link rel="preconnect" href="https://www.googletagmanager.com" />\n'
+            f'    <script async src="{GTAG}"></script>\n'
+            "    <script>gtag('config', 'G-TEST');</script>\n"
+        ),
+    ))
+    assert f'type="text/plain" data-third-party="google-analytics" data-third-party-strategy="idle" async data-third-party-src="{GTAG}"' in html
+    assert "<script type=\"text/plain\" data-third-party=\"google-analytics\" data-third-party-strategy=\"idle\">gtag(" in html
+    # Nothing contacts the origin on first load any more
+    assert 'rel="preconnect"' not in html
+    assert html.count(LOADER_SRC) == 1
+    assert rewrite_third_party(html) == html
+
+
+def test_youtube_embed_becomes_a_facade():
+    iframe = '<iframe src="https://www.youtube-nocookie.com/embed/abc"></iframe>'
+    html = rewrite_third_party(_page(body=f"    {iframe}\n"))
+    assert "<iframe" not in html.replace("&lt;iframe", "")
+    assert 'class="third-party-facade" data-third-party="youtube"' in html
+    assert "Play video (loads YouTube)" in html
+
+
+def test_unmatched_and_data_scripts_are_left_alone():
+    page = _page(
+        head=(
+            '    <script src="https://cdn.example.com/lib.js"></script>\n'
+            f'    <script type="application/ld+json">{{"gtag(": 1}}</script>\n'
+            f"    <!-- <script src=\"{GTAG}\"></script> -->\n"
+        ),
+    )
+    assert rewrite_third_party(page) == page
+
+
+def test_allowlisted_rules_stay_as_authored():
+    assert allowed_rules("articles/x/index.html", {"articles/*": {"google-analytics"}}) == {"google-analytics"}
+    page = _page(head=f'    <script async src="{GTAG}"></script>\n')
+    assert rewrite_third_party(page, allowed={"google-analytics"}) == page
+    assert rewrite_third_party(page, allowed={"*"}) == page
+
+
+def test_interaction_trigger_is_recorded(monkeypatch):
+    monkeypatch.setattr(third_party, "_RULES", third_party._compile_rules([
+        {"name": "widget", "strategy": "interaction", "trigger": "#signup", "src": r"^https://widget\.example/"},
+    ]))
+    html = rewrite_third_party(_page(head='    <script src="https://widget.example/w.js"></script>\n'))
+    assert 'data-third-party-strategy="interaction" data-third-party-trigger="#signup"' in html
+
+
+def test_unknown_strategy_is_rejected():
+    with pytest.raises(ValueError):
+        third_party._compile_rules([{"name": "x", "strategy": "later", "src": "x"}])
@@ -0,0 +1,108 @@
+import json
+import logging
+import os
+
+import pytest
+
+from builder_files.util import validation
+from builder_files.util.validation import ContentValidationError, validate_content
+
+FRONT_MATTER = """---
+title: An article
+author:
+- name: Someone
+strap_line: A strap line.
+date:
+  published: '2026-01-01T00:00:00Z'
+{extra}---
+"""
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(tmp_path / "resource/image")
+    (tmp_path / "resource/image/a.webp").write_bytes(b"RIFF")
+    (tmp_path / "projects.json").write_text("[]", encoding="utf-8")
+    (tmp_path / "skills.json").write_text("{}", encoding="utf-8")
+    return tmp_path
+
+
+def _article(root, article_id, body="", extra=""):
+    path = root / "resource/articles" / article_id / "index.md"
+    os.makedirs(path.parent, exist_ok=True)
+    path.write_text(FRONT_MATTER.format(extra=extra) + body, encoding="utf-8")
+
+
+def _validate(root):
+    validate_content(
+        site_root=str(root),
+        md_root=str(root / "resource/articles"),
+        projects_path=str(root / "projects.json"),
+        skills_path=str(root / "skills.json"),
+    )
+
+
+def test_valid_content_passes(site):
+    _article(site, "one", "See [two](/articles/two/) and ![pic](/resource/image/a.webp).\n")
+    _article(site, "two", "Back to [one](../one/).\n", extra="featured_image: /resource/image/a.webp\n")
+    _validate(site)
+
+
+def test_every_problem_is_reported_at_once(site):
+    _article(site, "one", extra="featured_image: /resource/image/missing.webp\n")
+    _article(site, "two", extra="date:\n  published: 'last Tuesday'\n")
+    (site / "projects.json").write_text(
+        json.dumps([{"id": "p", "name": "P", "date": {}}, {"id": "p", "name": "Q", "date": {}}]), encoding="utf-8",
+    )
+
+    with pytest.raises(ContentValidationError) as raised:
+        _validate(site)
+
+    errors = "\n".join(raised.value.errors)
+    assert "featured_image: file not found: /resource/image/missing.webp" in errors
+    assert "not an ISO 8601 date-time" in errors
+    assert "duplicate id 'p'" in errors
+    assert len(raised.value.errors) == 3
+
+
+def test_broken_links_in_article_bodies_fail(site):
+    # Line numbers count from the top of index.md, front matter included
+    body = (
+        "Intro\n\n"
+        "A [missing page](/nowhere/) and ![a missing image](images/gone.png).\n\n"
+        "[ref]: /also-missing.html\n\n"
+        '<img src="/resource/image/nope.webp">\n'
+    )
+    _article(site, "one", body)
+
+    with pytest.raises(ContentValidationError) as raised:
+        _validate(site)
+
+    errors = raised.value.errors
+    assert any("body line 11: link target not found: /nowhere/" in e for e in errors)
+    assert any("body line 11: file not found: images/gone.png" in e for e in errors)
+    assert any("link target not found: /also-missing.html" in e for e in errors)
+    assert any("file not found: /resource/image/nope.webp" in e for e in errors)
+
+
+def test_links_in_code_are_not_checked(site):
+    _article(site, "one", "Use `[x](/nowhere/)` like this:\n\n```markdown\n![x](/missing.png)\n```\n")
+    _validate(site)
+
+
+def test_links_to_unknown_articles_fail(site):
+    _article(site, "one", "See [two](/articles/two/).\n")
+    with pytest.raises(ContentValidationError, match="link target not found: /articles/two/"):
+        _validate(site)
+
+
+def test_known_missing_files_are_warnings(site, monkeypatch, caplog):
+    monkeypatch.setattr(validation, "KNOWN_MISSING", {"/resource/documents/later.pdf"})
+    _article(site, "one", "Download [it](/resource/documents/later.pdf).\n")
+
+    with caplog.at_level(logging.WARNING, logger=validation.__name__):
+        _validate(site)
+
+    assert "Known missing file" in caplog.text
+    assert "/resource/documents/later.pdf" in caplog.text